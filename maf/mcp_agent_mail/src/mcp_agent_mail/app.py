@@ -4,24 +4,31 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import fnmatch
 import functools
 import hashlib
+import heapq
 import inspect
 import json
 import logging
+import os
+import threading
 import time
-from collections import defaultdict, deque
-from collections.abc import Sequence
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import Iterable, Sequence
 from contextlib import asynccontextmanager, suppress
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from difflib import SequenceMatcher
 from functools import wraps
+from itertools import islice
 from pathlib import Path
+from stat import S_ISDIR, S_ISREG
 from typing import Any, AsyncIterator, Callable, Optional, cast
 from urllib.parse import parse_qsl
 import uuid
+import weakref
 
 from fastmcp import Context, FastMCP
 from git import Repo
@@ -32,36 +39,70 @@ try:
 except Exception:  # pragma: no cover - optional dependency fallback
     PathSpec = None  # type: ignore[misc,assignment]
     GitWildMatchPattern = None  # type: ignore[misc,assignment]
-from sqlalchemy import asc, bindparam, desc, func, or_, select, text, update
-from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import aliased
+from sqlalchemy import (
+    DateTime,
+    asc,
+    bindparam,
+    desc,
+    event,
+    func,
+    inspect as sa_inspect,
+    literal,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import NoResultFound, OperationalError
+from sqlalchemy.orm import Session, aliased, make_transient_to_detached
 
 from . import rich_logger
 from .config import Settings, get_settings
-from .db import ensure_schema, get_session, init_engine
+from .db import (
+    FTS_MESSAGES_BM25,
+    ensure_schema,
+    get_session,
+    get_session_factory,
+    init_engine,
+    scope_fts_query,
+)
 from .guard import install_guard as install_guard_script, uninstall_guard as uninstall_guard_script
 from .llm import complete_system_user
 from .models import (
     Agent,
     AgentLink,
+    ArchiveOutboxEntry,
+    BuildSlotLease,
     FileReservation,
+    MailboxEntry,
     Message,
     MessageRecipient,
     Project,
     ProjectSiblingSuggestion,
     Product,
     ProductProjectLink,
+    RecentContact,
+    ThreadSummary,
 )
 from .storage import (
+    MAILBOX_INDEX_NAME,
+    PROJECT_IDENTITY_CACHE_NAME,
     ProjectArchive,
     archive_write_lock,
     clear_repo_cache,
     collect_lock_status,
+    commit_batch,
     ensure_archive,
     heal_archive_locks,
+    mailbox_layout,
     process_attachments,
+    reservation_literal_prefix,
+    segment_file_names,
+    shutdown_image_pool,
     write_agent_profile,
     write_file_reservation_record,
+    write_file_reservations_snapshot,
     write_message_bundle,
 )
 from .utils import generate_agent_name, sanitize_agent_name, slugify, validate_agent_name_format
@@ -468,7 +509,20 @@ def _lifespan_factory(settings: Settings) -> Callable[[FastMCP], AsyncIterator[N
                 },
             )
         await ensure_schema(settings)
-        yield
+        writer: asyncio.Task[None] | None = None
+        if settings.storage.write_behind_enabled:
+            writer = asyncio.create_task(_archive_outbox_worker(settings))
+        try:
+            yield
+        finally:
+            if writer is not None:
+                writer.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await writer
+                # Best-effort final flush so a clean shutdown leaves the archive current
+                with suppress(Exception):
+                    await drain_archive_outbox(settings)
+            await asyncio.to_thread(shutdown_image_pool)
 
     return lifespan  # type: ignore[return-value]
 
@@ -954,7 +1008,191 @@ def _message_frontmatter(
         "attachments": attachments,
     }
 
+
+_PROJECT_IDENTITY_CACHE_VERSION = 1
+
+
+def _git_user_config_paths() -> list[Path]:
+    """System, global and XDG git config files: GitPython's ``config_reader`` layers them under the repo config."""
+    xdg_home = os.environ.get("XDG_CONFIG_HOME") or str(Path.home() / ".config")
+    return [Path("/etc/gitconfig"), Path.home() / ".gitconfig", Path(xdg_home) / "git" / "config"]
+
+
+def _git_metadata_paths(path: Path, remote_name: str, *, markers: bool = True) -> list[Path]:
+    """Files whose contents decide a path's git identity, found by walking up to the nearest ``.git``.
+
+    Covers the worktree's ``.git`` entry and ``HEAD``, the linked-worktree ``commondir`` pointer, the shared
+    ``config`` plus the system/global configs layered under it (``core.ignorecase``, ``url.*.insteadOf``),
+    the remote HEAD symref, and (with ``markers``) the project-uid markers. Nothing is spawned:
+    ``.git`` files and ``commondir`` are read directly, so the whole walk is a handful of ``stat`` calls.
+    """
+    work_root: Optional[Path] = None
+    for candidate in (path, *path.parents):
+        if (candidate / ".git").exists():
+            work_root = candidate
+            break
+    if work_root is None:
+        return [path / ".agent-mail.yaml"] if markers else []
+    dot_git = work_root / ".git"
+    git_dir = dot_git
+    if dot_git.is_file():
+        with suppress(OSError):
+            pointer = dot_git.read_text(encoding="utf-8").strip()
+            if pointer.startswith("gitdir:"):
+                git_dir = (work_root / pointer[len("gitdir:") :].strip()).resolve()
+    common_dir = git_dir
+    with suppress(OSError):
+        common_dir = (git_dir / (git_dir / "commondir").read_text(encoding="utf-8").strip()).resolve()
+    paths = [
+        dot_git,
+        git_dir / "HEAD",
+        git_dir / "commondir",
+        common_dir / "config",
+        *_git_user_config_paths(),
+        common_dir / "refs" / "remotes" / remote_name / "HEAD",
+    ]
+    if markers:
+        paths += [
+            common_dir / "agent-mail" / "project-id",
+            work_root / ".agent-mail-project-id",
+            work_root / ".agent-mail.yaml",
+        ]
+    return paths
+
+
+class _ProjectIdentityCache:
+    """Persistent cache of git-derived project slugs and identity payloads.
+
+    Entries are keyed by the identity settings plus the resolved path and stored with a fingerprint of
+    ``(path, mtime_ns, size)`` for every file in ``_git_metadata_paths``; a lookup re-stats those files and
+    recomputes only when one changed. The cache lives in ``identity_cache.json`` under the storage root so the
+    server, the CLI and guard hooks (separate processes) share the GitPython/subprocess work between them.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._path: Optional[Path] = None
+        self._loaded_stamp: Optional[tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _fingerprint(paths: Sequence[Path]) -> list[list[Any]]:
+        stamps: list[list[Any]] = []
+        for item in paths:
+            try:
+                st = item.stat()
+            except OSError:
+                stamps.append([str(item), None, None])
+                continue
+            if S_ISDIR(st.st_mode):
+                # A .git directory's mtime moves on every commit (index.lock); only its presence matters
+                stamps.append([str(item), "dir", None])
+            else:
+                stamps.append([str(item), st.st_mtime_ns, st.st_size])
+        return stamps
+
+    def _sync(self, cache_path: Path) -> None:
+        """Load (or reload, when another process rewrote it) the on-disk cache file."""
+        try:
+            st = cache_path.stat()
+            stamp: Optional[tuple[int, int]] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if cache_path == self._path and stamp == self._loaded_stamp:
+            return
+        if cache_path != self._path:
+            self._entries.clear()
+            self._path = cache_path
+        self._loaded_stamp = stamp
+        if stamp is None:
+            return
+        try:
+            data = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != _PROJECT_IDENTITY_CACHE_VERSION:
+            return
+        entries = data.get("entries")
+        if isinstance(entries, dict):
+            self._entries.update(entries)
+
+    def _flush(self, cache_path: Path) -> None:
+        payload = {"version": _PROJECT_IDENTITY_CACHE_VERSION, "entries": self._entries}
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(payload, sort_keys=True), encoding="utf-8")
+            tmp_path.replace(cache_path)
+            st = cache_path.stat()
+            self._loaded_stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            with suppress(OSError):
+                tmp_path.unlink()
+
+    def lookup(self, kind: str, human_key: str, compute: Callable[[], Any]) -> Any:
+        settings = get_settings()
+        if not settings.identity_cache_enabled:
+            return compute()
+        remote_name = settings.project_identity_remote or "origin"
+        resolved = Path(human_key).expanduser().resolve()
+        key = "|".join(
+            (
+                kind,
+                "worktrees" if settings.worktrees_enabled else "plain",
+                (settings.project_identity_mode or "dir").strip().lower(),
+                remote_name,
+                human_key if kind == "slug" else str(resolved),
+            )
+        )
+        # Slugs never read the uid markers, so writing one must not evict them
+        metadata_paths = _git_metadata_paths(resolved, remote_name, markers=kind != "slug")
+        cache_path = Path(settings.storage.root).expanduser().resolve() / PROJECT_IDENTITY_CACHE_NAME
+        with self._lock:
+            self._sync(cache_path)
+            entry = self._entries.get(key)
+            if entry is not None and entry.get("fingerprint") == self._fingerprint(metadata_paths):
+                self.hits += 1
+                return copy.deepcopy(entry["value"])
+        self.misses += 1
+        value = compute()
+        # Stamp after computing: identity resolution may itself write the private project-id marker
+        fingerprint = self._fingerprint(metadata_paths)
+        with self._lock:
+            self._sync(cache_path)
+            self._entries[key] = {"fingerprint": fingerprint, "value": value}
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(1, int(settings.identity_cache_max_entries)):
+                self._entries.popitem(last=False)
+            self._flush(cache_path)
+        return copy.deepcopy(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._path = None
+            self._loaded_stamp = None
+
+
+_PROJECT_IDENTITY_CACHE = _ProjectIdentityCache()
+
+
 def _compute_project_slug(human_key: str) -> str:
+    """Compute the project slug, serving git-derived slugs from the persistent identity cache.
+
+    Plain ``dir`` slugs (and everything while WORKTREES_ENABLED is off) are a pure function of the path and
+    are computed directly; git-backed modes only re-run their GitPython lookups when the repository's
+    metadata files change.
+    """
+    settings = get_settings()
+    mode = (settings.project_identity_mode or "dir").strip().lower()
+    if not settings.worktrees_enabled or mode not in {"git-remote", "git-toplevel", "git-common-dir"}:
+        return slugify(human_key)
+    return cast(str, _PROJECT_IDENTITY_CACHE.lookup("slug", human_key, lambda: _compute_project_slug_uncached(human_key)))
+
+
+def _compute_project_slug_uncached(human_key: str) -> str:
     """
     Compute the project slug with strict backward compatibility by default.
     When worktree-friendly behavior is enabled, we still default to 'dir' mode
@@ -1065,14 +1303,31 @@ def _compute_project_slug(human_key: str) -> str:
     return slugify(human_key)
 
 
-def _resolve_project_identity(human_key: str) -> dict[str, Any]:
+def _resolve_project_identity(human_key: str, *, write_marker: bool = True) -> dict[str, Any]:
+    """Resolve identity details for ``human_key`` through the persistent identity cache.
+
+    See ``_resolve_project_identity_uncached`` for the payload; a cached payload is reused until one of the
+    repository's metadata files (``.git``, ``HEAD``, ``config``, ``commondir``, uid markers) changes.
+    ``write_marker=False`` is the read-only lookup for guard hooks: it never creates the private marker, and
+    its entries are cached apart from the writing ones so a later server lookup still writes the marker.
+    """
+    kind = "identity" if write_marker else "identity-readonly"
+    return cast(
+        dict[str, Any],
+        _PROJECT_IDENTITY_CACHE.lookup(
+            kind, human_key, lambda: _resolve_project_identity_uncached(human_key, write_marker=write_marker)
+        ),
+    )
+
+
+def _resolve_project_identity_uncached(human_key: str, *, write_marker: bool = True) -> dict[str, Any]:
     """
     Resolve identity details for a given human_key path.
     Returns: { slug, identity_mode_used, canonical_path, human_key,
                repo_root, git_common_dir, branch, worktree_name,
                core_ignorecase, normalized_remote, project_uid }
-    Writes a private marker under .git/agent-mail/project-id when WORKTREES_ENABLED=1
-    and no marker exists yet.
+    Writes a private marker under .git/agent-mail/project-id when WORKTREES_ENABLED=1,
+    ``write_marker`` is set, and no marker exists yet.
     """
     settings_local = get_settings()
     mode_config = (settings_local.project_identity_mode or "dir").strip().lower()
@@ -1269,7 +1524,7 @@ def _resolve_project_identity(human_key: str) -> dict[str, Any]:
             project_uid = str(uuid.uuid4())
 
     # Write private marker if gated and we have a git common dir
-    if settings_local.worktrees_enabled and marker_private and not marker_private.exists():
+    if write_marker and settings_local.worktrees_enabled and marker_private and not marker_private.exists():
         try:
             marker_private.parent.mkdir(parents=True, exist_ok=True)
             marker_private.write_text(project_uid + "\n", encoding="utf-8")
@@ -1363,14 +1618,14 @@ async def _find_similar_agents(project: Project, name: str, limit: int = 5, min_
     """Find agents with similar names in the project. Returns list of (name, score)."""
     suggestions: list[tuple[str, float]] = []
     async with get_session() as session:
+        # Similarity scoring only needs names; skip loading full agent rows
         result = await session.execute(
-            select(Agent).where(cast(Any, Agent.project_id == project.id))
+            select(Agent.name).where(cast(Any, Agent.project_id == project.id))  # type: ignore[call-overload]
         )
-        agents = result.scalars().all()
-        for a in agents:
-            score = _similarity_score(name, a.name)
+        for (agent_name,) in result.all():
+            score = _similarity_score(name, agent_name)
             if score >= min_score:
-                suggestions.append((a.name, score))
+                suggestions.append((agent_name, score))
     suggestions.sort(key=lambda x: x[1], reverse=True)
     return suggestions[:limit]
 
@@ -1384,6 +1639,256 @@ async def _list_project_agents(project: Project, limit: int = 10) -> list[str]:
         return [row[0] for row in result.all()]
 
 
+# --- Identity cache ---
+
+
+class _IdentityCache:
+    """Bounded TTL cache of Project/Agent rows keyed by slug and (project_id, lower(name)).
+
+    Entries hold column snapshots; callers get fresh detached instances so they can mutate and
+    ``session.add`` them like rows they loaded themselves. ORM commits that touch a Project or
+    Agent write through (see ``_identity_cache_after_commit``); raw SQL writes are covered by the TTL.
+    The cache is scoped to the current session factory so a re-pointed database starts empty.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[tuple[Any, ...], tuple[float, dict[str, Any]]] = OrderedDict()
+        self._keys_by_row: dict[tuple[str, int], tuple[Any, ...]] = {}
+        self._scope: Any = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _settings() -> tuple[bool, float, int]:
+        settings = get_settings()
+        return (
+            bool(settings.identity_cache_enabled),
+            float(max(0, settings.identity_cache_ttl_seconds)),
+            max(1, int(settings.identity_cache_max_entries)),
+        )
+
+    def _check_scope(self) -> None:
+        factory = get_session_factory()
+        if factory is not self._scope:
+            self._entries.clear()
+            self._keys_by_row.clear()
+            self._scope = factory
+
+    @staticmethod
+    def project_key(slug: str) -> tuple[Any, ...]:
+        return ("project", slug)
+
+    @staticmethod
+    def agent_key(project_id: Optional[int], name: str) -> tuple[Any, ...]:
+        return ("agent", project_id, name.lower())
+
+    def get(self, key: tuple[Any, ...], model: type[Any]) -> Any:
+        enabled, _ttl, _cap = self._settings()
+        if not enabled:
+            return None
+        self._check_scope()
+        item = self._entries.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        instance = model(**item[1])
+        make_transient_to_detached(instance)
+        return instance
+
+    def put(self, obj: Project | Agent) -> None:
+        enabled, ttl, cap = self._settings()
+        if not enabled or ttl <= 0 or obj.id is None:
+            return
+        self._check_scope()
+        # Read only already-loaded state: never trigger a lazy load (this also runs inside commit hooks)
+        loaded = cast(Any, sa_inspect(obj)).dict
+        fields = type(obj).model_fields
+        if any(name not in loaded for name in fields):
+            return
+        data = {name: loaded[name] for name in fields}
+        if isinstance(obj, Project):
+            key, row = self.project_key(obj.slug), ("project", obj.id)
+        else:
+            key, row = self.agent_key(obj.project_id, obj.name), ("agent", obj.id)
+        self.forget_row(*row, count=False)
+        self._entries[key] = (time.monotonic() + ttl, data)
+        self._entries.move_to_end(key)
+        self._keys_by_row[row] = key
+        while len(self._entries) > cap:
+            oldest, (_expires, oldest_data) = self._entries.popitem(last=False)
+            self._forget_key(oldest, oldest_data)
+            self.evictions += 1
+
+    @staticmethod
+    def _row_of(key: tuple[Any, ...], data: dict[str, Any]) -> tuple[str, int]:
+        return ("project" if key[0] == "project" else "agent", int(data.get("id") or 0))
+
+    def _forget_key(self, key: tuple[Any, ...], data: dict[str, Any]) -> None:
+        row = self._row_of(key, data)
+        if self._keys_by_row.get(row) == key:
+            del self._keys_by_row[row]
+
+    def _drop(self, key: tuple[Any, ...]) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._forget_key(key, item[1])
+
+    def forget_row(self, kind: str, row_id: int, *, count: bool = True) -> None:
+        key = self._keys_by_row.pop((kind, row_id), None)
+        if key is not None:
+            self._entries.pop(key, None)
+            if count:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_row.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+_IDENTITY_CACHE = _IdentityCache()
+_IDENTITY_PENDING_KEY = "identity_cache_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _identity_cache_after_flush(session: Session, _flush_context: Any) -> None:
+    # new/dirty/deleted still show the pre-flush state here; ids are already assigned
+    pending = session.info.setdefault(_IDENTITY_PENDING_KEY, {})
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, (Project, Agent)) and obj.id is not None:
+            pending[(type(obj).__name__, obj.id)] = obj
+    for obj in session.deleted:
+        if isinstance(obj, (Project, Agent)) and obj.id is not None:
+            pending[(type(obj).__name__, obj.id)] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _identity_cache_after_commit(session: Session) -> None:
+    pending = session.info.pop(_IDENTITY_PENDING_KEY, None)
+    if not pending:
+        return
+    for (kind, row_id), obj in pending.items():
+        _IDENTITY_CACHE.forget_row(kind.lower(), row_id)
+        if obj is not None:
+            _IDENTITY_CACHE.put(obj)
+
+
+@event.listens_for(Session, "after_rollback")
+def _identity_cache_after_rollback(session: Session) -> None:
+    pending = session.info.pop(_IDENTITY_PENDING_KEY, None)
+    for kind, row_id in pending or {}:
+        _IDENTITY_CACHE.forget_row(kind.lower(), row_id)
+
+
+def _identity_cache_snapshot() -> dict[str, Any]:
+    return _IDENTITY_CACHE.snapshot()
+
+
+class _ApprovedLinkCache:
+    """Approved AgentLink targets per requesting agent, keyed by (a_project_id, a_agent_id).
+
+    One query loads every approved target of a sender, so the contact gate checks a whole recipient
+    list against an in-memory set. ORM commits that touch an AgentLink drop the requester's entry
+    (see ``_link_cache_after_commit``); raw SQL writes are covered by the identity-cache TTL, whose
+    enable flag and TTL this cache shares.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[int, int], tuple[float, frozenset[tuple[int, int]]]] = {}
+        self._scope: Any = None
+
+    def _check_scope(self) -> None:
+        factory = get_session_factory()
+        if factory is not self._scope:
+            self._entries.clear()
+            self._scope = factory
+
+    async def approved(self, project_id: int, agent_id: int) -> frozenset[tuple[int, int]]:
+        """``(b_project_id, b_agent_id)`` pairs the agent holds an approved link to."""
+        enabled, ttl, _cap = _IdentityCache._settings()
+        self._check_scope()
+        key = (project_id, agent_id)
+        item = self._entries.get(key)
+        if enabled and item is not None and item[0] >= time.monotonic():
+            return item[1]
+        async with get_session() as session:
+            rows = await session.execute(
+                select(AgentLink.b_project_id, AgentLink.b_agent_id).where(  # type: ignore[call-overload]
+                    cast(Any, AgentLink.a_project_id) == project_id,
+                    cast(Any, AgentLink.a_agent_id) == agent_id,
+                    cast(Any, AgentLink.status == "approved"),
+                )
+            )
+            targets = frozenset((int(p), int(a)) for p, a in rows.all())
+        if enabled and ttl > 0:
+            self._entries[key] = (time.monotonic() + ttl, targets)
+        return targets
+
+    def forget(self, project_id: int, agent_id: int) -> None:
+        self._entries.pop((project_id, agent_id), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_APPROVED_LINKS = _ApprovedLinkCache()
+_LINK_PENDING_KEY = "approved_links_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _link_cache_after_flush(session: Session, _flush_context: Any) -> None:
+    pending = session.info.setdefault(_LINK_PENDING_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, AgentLink):
+            pending.add((obj.a_project_id, obj.a_agent_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _link_cache_after_commit(session: Session) -> None:
+    for project_id, agent_id in session.info.pop(_LINK_PENDING_KEY, None) or ():
+        _APPROVED_LINKS.forget(project_id, agent_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _link_cache_after_rollback(session: Session) -> None:
+    session.info.pop(_LINK_PENDING_KEY, None)
+
+
+async def _recent_contact_ids(project: Project, sender: Agent, recipient_ids: Sequence[int], since: datetime) -> set[int]:
+    """Ids among ``recipient_ids`` that exchanged a message with ``sender`` (either direction) after ``since``."""
+    ids = [rid for rid in recipient_ids if rid != sender.id]
+    if not ids:
+        return set()
+    async with get_session() as session:
+        rows = await session.execute(
+            select(RecentContact.a_agent_id, RecentContact.b_agent_id).where(  # type: ignore[call-overload]
+                cast(Any, RecentContact.project_id) == project.id,
+                cast(Any, RecentContact.last_ts) > since,
+                or_(
+                    (cast(Any, RecentContact.a_agent_id) == sender.id) & cast(Any, RecentContact.b_agent_id).in_(ids),
+                    (cast(Any, RecentContact.b_agent_id) == sender.id) & cast(Any, RecentContact.a_agent_id).in_(ids),
+                ),
+            )
+        )
+        return {int(b) if int(a) == sender.id else int(a) for a, b in rows.all()}
+
+
 async def _get_project_by_identifier(identifier: str) -> Project:
     """Get project by identifier with helpful error messages and suggestions."""
     await ensure_schema()
@@ -1398,10 +1903,14 @@ async def _get_project_by_identifier(identifier: str) -> Project:
         )
 
     slug = slugify(identifier)
+    cached = _IDENTITY_CACHE.get(_IDENTITY_CACHE.project_key(slug), Project)
+    if cached is not None:
+        return cast(Project, cached)
     async with get_session() as session:
         result = await session.execute(select(Project).where(Project.slug == slug))  # type: ignore[arg-type]
         project = result.scalars().first()
         if project:
+            _IDENTITY_CACHE.put(project)
             return project
 
     # Project not found - provide helpful suggestions
@@ -1602,6 +2111,232 @@ async def _archive_write_lock(archive: ProjectArchive, *, timeout_seconds: float
         ) from exc
 
 
+# --- Archive write-behind ---------------------------------------------------------------------
+
+_ARCHIVE_OUTBOX_WAKE: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Event] = weakref.WeakKeyDictionary()
+
+
+def _archive_outbox_event() -> asyncio.Event:
+    """Return the wake-up event for the archive writer bound to the running loop."""
+    loop = asyncio.get_running_loop()
+    event = _ARCHIVE_OUTBOX_WAKE.get(loop)
+    if event is None:
+        event = asyncio.Event()
+        _ARCHIVE_OUTBOX_WAKE[loop] = event
+    return event
+
+
+def _signal_archive_outbox() -> None:
+    with suppress(RuntimeError):
+        _archive_outbox_event().set()
+
+
+async def drain_archive_outbox(settings: Optional[Settings] = None, *, limit: Optional[int] = None) -> dict[str, int]:
+    """Write pending ``archive_outbox`` rows into the Git archive.
+
+    Rows are processed in id order within each project (projects drain concurrently). When a
+    write fails, the remaining rows for that project are left for the next pass so per-project
+    ordering is preserved; after ``write_behind_max_attempts`` failures a row is marked ``failed``
+    and the project's later rows stay queued behind it (reported as ``blocked`` by health_check)
+    until ``requeue_archive_outbox`` (``mcp-agent-mail archive outbox-requeue``) retries or skips
+    it. Other projects keep
+    draining. The bundles written in one pass are folded into a single
+    Git commit per project (split at ``commit_batch_max_files``). Delivery is at-least-once: a crash
+    between the Git commit and the status update replays the (idempotent) bundle write.
+    """
+    settings = settings or get_settings()
+    await ensure_schema()
+    batch_size = max(1, int(limit or settings.storage.write_behind_batch_size))
+    max_attempts = max(1, int(settings.storage.write_behind_max_attempts))
+    async with get_session() as session:
+        # A dead-lettered row holds back every later row of its project
+        failed_row = aliased(ArchiveOutboxEntry)
+        failed_before = (
+            select(literal(1))
+            .select_from(failed_row)
+            .where(
+                cast(Any, failed_row.project_id) == ArchiveOutboxEntry.project_id,
+                cast(Any, failed_row.status) == "failed",
+                cast(Any, failed_row.id) < ArchiveOutboxEntry.id,
+            )
+        )
+        rows = await session.execute(
+            select(ArchiveOutboxEntry, cast(Any, Project.slug))
+            .join(Project, cast(Any, Project.id) == ArchiveOutboxEntry.project_id)
+            .where(cast(Any, ArchiveOutboxEntry.status) == "pending", ~failed_before.exists())
+            .order_by(asc(cast(Any, ArchiveOutboxEntry.id)))
+            .limit(batch_size)
+        )
+        pending = rows.all()
+    if not pending:
+        return {"written": 0, "failed": 0, "deferred": 0}
+
+    by_project: dict[str, list[ArchiveOutboxEntry]] = defaultdict(list)
+    for entry, slug in pending:
+        by_project[slug].append(entry)
+
+    totals = {"written": 0, "failed": 0, "deferred": 0}
+
+    async def _mark(entry: ArchiveOutboxEntry, *, status: str, error: str = "") -> None:
+        async with get_session() as session:
+            await session.execute(
+                update(ArchiveOutboxEntry)
+                .where(cast(Any, ArchiveOutboxEntry.id) == entry.id)
+                .values(
+                    status=status,
+                    attempts=entry.attempts + (1 if error else 0),
+                    last_error=error[:2048],
+                    processed_ts=datetime.now(timezone.utc) if status != "pending" else None,
+                )
+            )
+            await session.commit()
+
+    async def _fail(entry: ArchiveOutboxEntry, slug: str, exc: Exception) -> str:
+        attempts = entry.attempts + 1
+        status = "failed" if attempts >= max_attempts else "pending"
+        await _mark(entry, status=status, error=f"{type(exc).__name__}: {exc}")
+        logger.warning(
+            "archive_outbox.write_failed",
+            extra={"project": slug, "outbox_id": entry.id, "attempts": attempts, "status": status},
+        )
+        if status == "failed":
+            totals["failed"] += 1
+        return status
+
+    async def _drain_project(slug: str, entries: list[ArchiveOutboxEntry]) -> None:
+        archive = await ensure_archive(settings, slug)
+        max_files = max(1, int(settings.storage.commit_batch_max_files))
+        async with _archive_write_lock(archive):
+            # Write every bundle first, then fold them into as few commits as the file cap allows
+            written: list[tuple[ArchiveOutboxEntry, tuple[str, list[str]]]] = []
+            for index, entry in enumerate(entries):
+                job = entry.payload or {}
+                try:
+                    bundle = await write_message_bundle(
+                        archive,
+                        dict(job.get("frontmatter") or {}),
+                        str(job.get("body_md") or ""),
+                        str(job.get("sender") or ""),
+                        list(job.get("recipients") or []),
+                        list(job.get("extra_paths") or []),
+                        job.get("commit_text"),
+                        commit=False,
+                    )
+                except Exception as exc:
+                    # Dead-lettered or not, the rows after it wait so the project's order is kept
+                    failed = await _fail(entry, slug, exc) == "failed"
+                    totals["deferred"] += len(entries) - index - (1 if failed else 0)
+                    break
+                written.append((entry, bundle))
+
+            chunk: list[tuple[ArchiveOutboxEntry, tuple[str, list[str]]]] = []
+            chunk_files = 0
+            chunks: list[list[tuple[ArchiveOutboxEntry, tuple[str, list[str]]]]] = []
+            for item in written:
+                size = len(item[1][1])
+                if chunk and chunk_files + size > max_files:
+                    chunks.append(chunk)
+                    chunk, chunk_files = [], 0
+                chunk.append(item)
+                chunk_files += size
+            if chunk:
+                chunks.append(chunk)
+
+            for position, chunk in enumerate(chunks):
+                try:
+                    await commit_batch(archive.repo, settings, [bundle for _entry, bundle in chunk])
+                except Exception as exc:
+                    # Files are on disk but uncommitted; replaying the bundle write is idempotent.
+                    # Later chunks wait for the next pass so they never commit ahead of this one.
+                    for entry, _bundle in chunk:
+                        if await _fail(entry, slug, exc) == "pending":
+                            totals["deferred"] += 1
+                    totals["deferred"] += sum(len(rest) for rest in chunks[position + 1 :])
+                    break
+                for entry, _bundle in chunk:
+                    await _mark(entry, status="done")
+                    totals["written"] += 1
+
+    await asyncio.gather(*(_drain_project(slug, entries) for slug, entries in by_project.items()))
+    return totals
+
+
+async def requeue_archive_outbox(project_id: Optional[int] = None, *, skip: bool = False) -> int:
+    """Release dead-lettered ``archive_outbox`` rows so their projects drain again; returns the row count.
+
+    Failed rows go back to ``pending`` with a fresh attempt budget. With ``skip`` they are marked
+    ``skipped`` instead: the message stays in the database but is never written to the Git archive.
+    """
+    await ensure_schema()
+    stmt = update(ArchiveOutboxEntry).where(cast(Any, ArchiveOutboxEntry.status) == "failed")
+    if project_id is not None:
+        stmt = stmt.where(cast(Any, ArchiveOutboxEntry.project_id) == project_id)
+    if skip:
+        stmt = stmt.values(status="skipped", processed_ts=datetime.now(timezone.utc))
+    else:
+        stmt = stmt.values(status="pending", attempts=0, processed_ts=None)
+    async with get_session() as session:
+        result = await session.execute(stmt)
+        await session.commit()
+    released = int(result.rowcount or 0)  # type: ignore[attr-defined]
+    if released:
+        _signal_archive_outbox()
+    return released
+
+
+async def _archive_outbox_status(settings: Settings) -> dict[str, Any]:
+    """Queue depth and lag for the write-behind archive writer (used by health_check)."""
+    status: dict[str, Any] = {"enabled": bool(settings.storage.write_behind_enabled)}
+    if not settings.storage.write_behind_enabled:
+        return status
+    await ensure_schema()
+    async with get_session() as session:
+        pending = await session.execute(
+            text("SELECT COUNT(*), MIN(created_ts) FROM archive_outbox WHERE status = 'pending'")
+        )
+        depth, oldest = pending.one()
+        failed = await session.execute(text("SELECT COUNT(*) FROM archive_outbox WHERE status = 'failed'"))
+        failed_count = int(failed.scalar() or 0)
+        blocked = await session.execute(
+            text(
+                "SELECT COUNT(*) FROM archive_outbox o WHERE o.status = 'pending' AND EXISTS ("
+                "SELECT 1 FROM archive_outbox f WHERE f.project_id = o.project_id "
+                "AND f.status = 'failed' AND f.id < o.id)"
+            )
+        )
+        blocked_count = int(blocked.scalar() or 0)
+    oldest_dt = _ensure_utc(_parse_iso(str(oldest))) if oldest else None
+    lag = (datetime.now(timezone.utc) - oldest_dt).total_seconds() if oldest_dt else 0.0
+    status.update(
+        {
+            "depth": int(depth or 0),
+            "failed": failed_count,
+            "blocked": blocked_count,
+            "oldest_pending_ts": _iso(oldest_dt) if oldest_dt else None,
+            "lag_seconds": round(max(lag, 0.0), 3),
+        }
+    )
+    return status
+
+
+async def _archive_outbox_worker(settings: Settings) -> None:
+    """Background writer: drain on wake-up (new sends) or every poll interval."""
+    event = _archive_outbox_event()
+    interval = max(1, int(settings.storage.write_behind_poll_interval_seconds))
+    while True:
+        event.clear()
+        try:
+            result = await drain_archive_outbox(settings)
+        except Exception as exc:
+            logger.warning("archive_outbox.drain_failed", extra={"error": str(exc)})
+            result = {"written": 0, "deferred": 0}
+        if result.get("written") and not result.get("deferred"):
+            # A full batch may have left more work behind; loop again without waiting
+            continue
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(event.wait(), timeout=interval)
+
+
 async def _read_file_preview(path: Path, *, max_chars: int) -> str:
     def _read() -> str:
         try:
@@ -1614,33 +2349,58 @@ async def _read_file_preview(path: Path, *, max_chars: int) -> str:
     return await asyncio.to_thread(_read)
 
 
+_PROJECT_PROFILE_CACHE: dict[str, tuple[tuple[Any, ...], str]] = {}
+_PROJECT_PROFILE_CACHE_MAX_ENTRIES = 1024
+
+
+def _project_profile_files(base_path: Path) -> tuple[tuple[str, int, int], ...]:
+    """Return ``(rel_name, mtime_ns, size)`` for each profile file present under ``base_path``."""
+    found: list[tuple[str, int, int]] = []
+    for rel_name in _PROJECT_PROFILE_FILENAMES:
+        try:
+            info = (base_path / rel_name).stat()
+        except OSError:
+            continue
+        if S_ISREG(info.st_mode):
+            found.append((rel_name, info.st_mtime_ns, info.st_size))
+    return tuple(found)
+
+
 async def _build_project_profile(
     project: Project,
     agent_names: list[str],
 ) -> str:
+    """Render the text profile used for sibling scoring.
+
+    Profiles are cached per project and rebuilt only when the agent roster or the mtime/size of one
+    of the profile files changes, so periodic refreshes cost a handful of ``stat`` calls.
+    """
+    base_path = Path(project.human_key)
+    files = await asyncio.to_thread(_project_profile_files, base_path)
+    signature = (project.slug, tuple(agent_names), files)
+    cached = _PROJECT_PROFILE_CACHE.get(project.human_key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
     pieces: list[str] = [
         f"Identifier: {project.human_key}",
         f"Slug: {project.slug}",
         f"Agents: {', '.join(agent_names) if agent_names else 'None registered'}",
     ]
-
-    base_path = Path(project.human_key)
-    if base_path.exists():
-        total_chars = 0
-        seen_files: set[Path] = set()
-        for rel_name in _PROJECT_PROFILE_FILENAMES:
-            candidate = base_path / rel_name
-            if candidate in seen_files or not candidate.exists() or not candidate.is_file():
-                continue
-            preview = await _read_file_preview(candidate, max_chars=_PROJECT_PROFILE_PER_FILE_CHARS)
-            if not preview:
-                continue
-            pieces.append(f"===== {rel_name} =====\n{preview}")
-            seen_files.add(candidate)
-            total_chars += len(preview)
-            if total_chars >= _PROJECT_PROFILE_MAX_TOTAL_CHARS:
-                break
-    return "\n\n".join(pieces)
+    total_chars = 0
+    for rel_name, _mtime_ns, _size in files:
+        preview = await _read_file_preview(base_path / rel_name, max_chars=_PROJECT_PROFILE_PER_FILE_CHARS)
+        if not preview:
+            continue
+        pieces.append(f"===== {rel_name} =====\n{preview}")
+        total_chars += len(preview)
+        if total_chars >= _PROJECT_PROFILE_MAX_TOTAL_CHARS:
+            break
+    profile = "\n\n".join(pieces)
+    if len(_PROJECT_PROFILE_CACHE) >= _PROJECT_PROFILE_CACHE_MAX_ENTRIES:
+        _PROJECT_PROFILE_CACHE.clear()
+    _PROJECT_PROFILE_CACHE[project.human_key] = (signature, profile)
+    return profile
 
 
 def _heuristic_project_similarity(project_a: Project, project_b: Project) -> tuple[float, str]:
@@ -1710,12 +2470,24 @@ async def _score_project_pair(
         return heuristic_score, heuristic_reason + " (LLM fallback)"
 
 
-async def refresh_project_sibling_suggestions(*, max_pairs: int = _PROJECT_SIBLING_REFRESH_LIMIT) -> None:
+async def refresh_project_sibling_suggestions(
+    *,
+    max_pairs: int = _PROJECT_SIBLING_REFRESH_LIMIT,
+    concurrency: Optional[int] = None,
+) -> int:
+    """Score stale or unseen project pairs and persist them to ``project_sibling_suggestions``.
+
+    Pairs flow through a bounded queue drained by ``concurrency`` workers (default
+    ``PROJECT_SIBLINGS_REFRESH_CONCURRENCY``), so at most that many LLM calls are in flight.
+    No DB session is held while scoring. Returns the number of pairs scored.
+    """
+    if concurrency is None:
+        concurrency = get_settings().project_siblings_refresh_concurrency
     await ensure_schema()
     async with get_session() as session:
         projects = (await session.execute(select(Project))).scalars().all()
         if len(projects) < 2:
-            return
+            return 0
 
         agents_rows = await session.execute(select(Agent.project_id, Agent.name))  # type: ignore[call-overload]
         agent_map: dict[int, list[str]] = defaultdict(list)
@@ -1728,54 +2500,85 @@ async def refresh_project_sibling_suggestions(*, max_pairs: int = _PROJECT_SIBLI
             pair = _canonical_project_pair(suggestion.project_a_id, suggestion.project_b_id)
             existing_map[pair] = suggestion
 
-        now = datetime.now(timezone.utc)
-        to_evaluate: list[tuple[Project, Project, ProjectSiblingSuggestion | None]] = []
-        for idx, project_a in enumerate(projects):
-            if project_a.id is None:
+    now = datetime.now(timezone.utc)
+    to_evaluate: list[tuple[Project, Project]] = []
+    for idx, project_a in enumerate(projects):
+        if project_a.id is None:
+            continue
+        for project_b in projects[idx + 1 :]:
+            if project_b.id is None:
                 continue
-            for project_b in projects[idx + 1 :]:
-                if project_b.id is None:
-                    continue
 
-                # CRITICAL: Skip projects with identical human_key - they're the SAME project, not siblings
-                # Two agents in /data/projects/smartedgar_mcp are on the SAME project
-                # Siblings would be different directories like /data/projects/smartedgar_mcp_frontend
-                if project_a.human_key == project_b.human_key:
-                    continue
+            # CRITICAL: Skip projects with identical human_key - they're the SAME project, not siblings
+            # Two agents in /data/projects/smartedgar_mcp are on the SAME project
+            # Siblings would be different directories like /data/projects/smartedgar_mcp_frontend
+            if project_a.human_key == project_b.human_key:
+                continue
 
-                pair = _canonical_project_pair(project_a.id, project_b.id)
-                suggestion = existing_map.get(pair)  # type: ignore[assignment]
-                if suggestion is None:
-                    to_evaluate.append((project_a, project_b, None))
-                else:
-                    eval_ts = suggestion.evaluated_ts
-                    # Normalize to timezone-aware UTC before arithmetic; SQLite may return naive datetimes
-                    if eval_ts is not None:
-                        if eval_ts.tzinfo is None or eval_ts.tzinfo.utcoffset(eval_ts) is None:
-                            eval_ts = eval_ts.replace(tzinfo=timezone.utc)
-                        else:
-                            eval_ts = eval_ts.astimezone(timezone.utc)
-                        age = now - eval_ts
+            pair = _canonical_project_pair(project_a.id, project_b.id)
+            suggestion = existing_map.get(pair)  # type: ignore[assignment]
+            if suggestion is None:
+                to_evaluate.append((project_a, project_b))
+            else:
+                eval_ts = suggestion.evaluated_ts
+                # Normalize to timezone-aware UTC before arithmetic; SQLite may return naive datetimes
+                if eval_ts is not None:
+                    if eval_ts.tzinfo is None or eval_ts.tzinfo.utcoffset(eval_ts) is None:
+                        eval_ts = eval_ts.replace(tzinfo=timezone.utc)
                     else:
-                        age = _PROJECT_SIBLING_REFRESH_TTL
-                    if suggestion.status == "dismissed" and age < timedelta(days=7):
-                        continue
-                    if age >= _PROJECT_SIBLING_REFRESH_TTL and len(to_evaluate) < max_pairs:
-                        to_evaluate.append((project_a, project_b, suggestion))
-            if len(to_evaluate) >= max_pairs:
-                break
-
-        if not to_evaluate:
-            return
+                        eval_ts = eval_ts.astimezone(timezone.utc)
+                    age = now - eval_ts
+                else:
+                    age = _PROJECT_SIBLING_REFRESH_TTL
+                if suggestion.status == "dismissed" and age < timedelta(days=7):
+                    continue
+                if age >= _PROJECT_SIBLING_REFRESH_TTL and len(to_evaluate) < max_pairs:
+                    to_evaluate.append((project_a, project_b))
+        if len(to_evaluate) >= max_pairs:
+            break
+    to_evaluate = to_evaluate[:max_pairs]
+    if not to_evaluate:
+        return 0
+
+    # One profile per project, however many pairs it appears in
+    involved = {project.id: project for pair_projects in to_evaluate for project in pair_projects}
+    built = await asyncio.gather(
+        *(_build_project_profile(project, agent_map.get(pid or -1, [])) for pid, project in involved.items())
+    )
+    profiles = dict(zip(involved, built, strict=True))
+
+    workers = max(1, min(int(concurrency), len(to_evaluate)))
+    queue: asyncio.Queue[tuple[Project, Project] | None] = asyncio.Queue(maxsize=workers * 2)
+    scored: dict[tuple[int, int], tuple[float, str]] = {}
+
+    async def _produce() -> None:
+        for item in to_evaluate:
+            await queue.put(item)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def _consume() -> None:
+        while (item := await queue.get()) is not None:
+            project_a, project_b = item
+            scored[_canonical_project_pair(project_a.id or 0, project_b.id or 0)] = await _score_project_pair(
+                project_a, profiles[project_a.id], project_b, profiles[project_b.id]
+            )
 
-        updated = False
-        for project_a, project_b, suggestion in to_evaluate[:max_pairs]:  # type: ignore[assignment]
-            profile_a = await _build_project_profile(project_a, agent_map.get(project_a.id or -1, []))
-            profile_b = await _build_project_profile(project_b, agent_map.get(project_b.id or -1, []))
-            score, rationale = await _score_project_pair(project_a, profile_a, project_b, profile_b)
+    await asyncio.gather(_produce(), *(_consume() for _ in range(workers)))
 
-            pair = _canonical_project_pair(project_a.id or 0, project_b.id or 0)
-            record = existing_map.get(pair) if suggestion is None else suggestion
+    evaluated_ts = datetime.now(timezone.utc)
+    async with get_session() as session:
+        # Re-read the rows: statuses may have been confirmed/dismissed while scoring ran
+        current = (
+            await session.execute(
+                select(ProjectSiblingSuggestion).where(
+                    cast(Any, ProjectSiblingSuggestion.project_a_id).in_({pair[0] for pair in scored})
+                )
+            )
+        ).scalars().all()
+        current_map = {(row.project_a_id, row.project_b_id): row for row in current}
+        for pair, (score, rationale) in scored.items():
+            record = current_map.get(pair)
             if record is None:
                 record = ProjectSiblingSuggestion(
                     project_a_id=pair[0],
@@ -1785,18 +2588,15 @@ async def refresh_project_sibling_suggestions(*, max_pairs: int = _PROJECT_SIBLI
                     status="suggested",
                 )
                 session.add(record)
-                existing_map[pair] = record
             else:
                 record.score = score
                 record.rationale = rationale
                 # Preserve user decisions
                 if record.status not in {"confirmed", "dismissed"}:
                     record.status = "suggested"
-            record.evaluated_ts = now
-            updated = True
-
-        if updated:
-            await session.commit()
+            record.evaluated_ts = evaluated_ts
+        await session.commit()
+    return len(scored)
 
 
 async def get_project_sibling_data() -> dict[int, dict[str, list[dict[str, Any]]]]:
@@ -2093,12 +2893,16 @@ async def _get_agent(project: Project, name: str) -> Agent:
             data={"parameter": "agent_name", "provided": repr(name), "project": project.slug},
         )
 
+    cached = _IDENTITY_CACHE.get(_IDENTITY_CACHE.agent_key(project.id, name), Agent)
+    if cached is not None:
+        return cast(Agent, cached)
     async with get_session() as session:
         result = await session.execute(
             select(Agent).where(Agent.project_id == project.id, func.lower(Agent.name) == name.lower())  # type: ignore[arg-type]
         )
         agent = result.scalars().first()
         if agent:
+            _IDENTITY_CACHE.put(agent)
             return agent
 
     # Agent not found - provide helpful suggestions
@@ -2158,7 +2962,14 @@ async def _create_message(
     ack_required: bool,
     thread_id: Optional[str],
     attachments: Sequence[dict[str, Any]],
+    *,
+    archive_job: Optional[Callable[[Message], dict[str, Any]]] = None,
 ) -> Message:
+    """Insert a message and its recipients.
+
+    When ``archive_job`` is given, its result is queued in ``archive_outbox`` within the same
+    transaction so the archive writer can never miss a committed message.
+    """
     if project.id is None:
         raise ValueError("Project must have an id before creating messages.")
     if sender.id is None:
@@ -2182,8 +2993,21 @@ async def _create_message(
             session.add(entry)
         sender.last_active_ts = datetime.now(timezone.utc)
         session.add(sender)
+        if archive_job is not None:
+            session.add(
+                ArchiveOutboxEntry(
+                    project_id=project.id,
+                    message_id=cast(int, message.id),
+                    payload=archive_job(message),
+                )
+            )
         await session.commit()
         await session.refresh(message)
+    if ack_required:
+        _ACK_DEADLINES.schedule(
+            cast(int, message.id), project.id, message.created_ts, [cast(int, r.id) for r, _kind in recipients]
+        )
+    _signal_mail(cast(int, r.id) for r, _kind in recipients)
     return message
 
 
@@ -2211,6 +3035,7 @@ async def _create_file_reservation(
         session.add(file_reservation)
         await session.commit()
         await session.refresh(file_reservation)
+    _RESERVATION_INDEX.add(file_reservation, agent.name)
     return file_reservation
 
 
@@ -2363,7 +3188,7 @@ async def _expire_stale_file_reservations(project_id: int) -> list[FileReservati
 
     # Release any entries whose TTL has already elapsed
     async with get_session() as session:
-        await session.execute(
+        expired = await session.execute(
             update(FileReservation)
             .where(
                 cast(Any, FileReservation.project_id) == project_id,
@@ -2374,10 +3199,13 @@ async def _expire_stale_file_reservations(project_id: int) -> list[FileReservati
         )
         await session.commit()
   # type: ignore[arg-type]
+    _RESERVATION_INDEX.discard_expired(project_id, now)
     statuses = await _collect_file_reservation_statuses(project, include_released=False, now=now)
     stale_statuses = [status for status in statuses if status.stale and status.reservation.id is not None]  # type: ignore[arg-type]
     stale_ids = [cast(int, status.reservation.id) for status in stale_statuses]
     if not stale_ids:
+        if int(expired.rowcount or 0):  # type: ignore[attr-defined]
+            await _refresh_file_reservations_snapshot(project_id, project.slug)
         return []
 
     async with get_session() as session:
@@ -2392,94 +3220,947 @@ async def _expire_stale_file_reservations(project_id: int) -> list[FileReservati
         )
         await session.commit()
   # type: ignore[arg-type]
+    _RESERVATION_INDEX.discard(project_id, stale_ids)
     for status in stale_statuses:
         status.reservation.released_ts = now
+    await _refresh_file_reservations_snapshot(project_id, project.slug)
     return stale_statuses
 
 
-def _file_reservations_conflict(existing: FileReservation, candidate_path: str, candidate_exclusive: bool, candidate_agent: Agent) -> bool:
-    if existing.released_ts is not None:
-        return False
-    if existing.agent_id == candidate_agent.id:
-        return False
-    if not existing.exclusive and not candidate_exclusive:
-        return False
+async def _refresh_file_reservations_snapshot(project_id: int, project_slug: str) -> None:
+    """Rewrite the compiled active-reservation snapshot the guard hooks read.
+
+    Called after every reserve/renew/release/expire. Failures are logged, never raised: the
+    snapshot is removed on a failed write and the hooks fall back to scanning the JSON artifacts.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        async with get_session() as session:
+            rows = await session.execute(
+                select(FileReservation, Agent.name)  # type: ignore[call-overload]
+                .join(Agent, cast(Any, FileReservation.agent_id) == Agent.id)
+                .where(
+                    cast(Any, FileReservation.project_id) == project_id,
+                    cast(Any, FileReservation.released_ts).is_(None),
+                    cast(Any, FileReservation.exclusive).is_(True),
+                    cast(Any, FileReservation.expires_ts) > now,
+                )
+                .order_by(asc(cast(Any, FileReservation.id)))
+            )
+            records = [
+                {
+                    "id": reservation.id,
+                    "agent": holder_name,
+                    "path_pattern": reservation.path_pattern,
+                    "exclusive": True,
+                    "expires_ts": _iso(reservation.expires_ts),
+                }
+                for reservation, holder_name in rows.all()
+            ]
+        archive = await ensure_archive(get_settings(), project_slug)
+        await write_file_reservations_snapshot(archive, records)
+    except Exception as exc:
+        logger.warning(
+            "file_reservations.snapshot_failed",
+            extra={"project_id": project_id, "error": str(exc)},
+        )
+
+
+def _normalize_reservation_path(p: str) -> str:
+    """Repo-root relative forward-slash form: ``./`` segments and doubled slashes dropped, a trailing ``/`` kept."""
+    normalized = p.replace("\\", "/")
+    canonical = "/".join(segment for segment in normalized.split("/") if segment and segment != ".")
+    return f"{canonical}/" if canonical and normalized.endswith("/") else canonical
+
+
+@functools.lru_cache(maxsize=4096)
+def _compiled_reservation_pattern(pattern: str) -> Any:
+    """Memoized Git wildmatch spec for a reservation pattern (None when pathspec is unavailable)."""
+    if PathSpec is None or GitWildMatchPattern is None:
+        return None
+    return PathSpec.from_lines("gitwildmatch", [pattern])
+
+
+def _reservation_pattern_matches(pattern: str, candidate_path: str) -> bool:
     # Git wildmatch semantics; treat inputs as repo-root relative forward-slash paths
-    def _normalize(p: str) -> str:
-        return p.replace("\\", "/").lstrip("/")
-    if PathSpec is not None and GitWildMatchPattern is not None:
-        spec = PathSpec.from_lines("gitwildmatch", [existing.path_pattern])
-        return spec.match_file(_normalize(candidate_path))
+    spec = _compiled_reservation_pattern(pattern)
+    if spec is not None:
+        return bool(spec.match_file(_normalize_reservation_path(candidate_path)))
     # Fallback to conservative fnmatch if pathspec not available
-    pat = existing.path_pattern
-    a = _normalize(candidate_path)
-    b = _normalize(pat)
+    a = _normalize_reservation_path(candidate_path)
+    b = _normalize_reservation_path(pattern)
     return fnmatch.fnmatchcase(a, b) or fnmatch.fnmatchcase(b, a) or (a == b)
 
 
 def _patterns_overlap(a: str, b: str) -> bool:
     # Overlap if any file could be matched by both patterns (approximate by cross-matching)
-    def _normalize(p: str) -> str:
-        return p.replace("\\", "/").lstrip("/")
-    if PathSpec is not None and GitWildMatchPattern is not None:
-        a_spec = PathSpec.from_lines("gitwildmatch", [a])
-        b_spec = PathSpec.from_lines("gitwildmatch", [b])
+    a_spec = _compiled_reservation_pattern(a)
+    b_spec = _compiled_reservation_pattern(b)
+    if a_spec is not None and b_spec is not None:
         # Heuristic: check direct cross-matches on normalized patterns
-        return a_spec.match_file(_normalize(b)) or b_spec.match_file(_normalize(a))
+        return bool(a_spec.match_file(_normalize_reservation_path(b)) or b_spec.match_file(_normalize_reservation_path(a)))
     # Fallback approximate
-    a1 = _normalize(a)
-    b1 = _normalize(b)
+    a1 = _normalize_reservation_path(a)
+    b1 = _normalize_reservation_path(b)
     return fnmatch.fnmatchcase(a1, b1) or fnmatch.fnmatchcase(b1, a1) or (a1 == b1)
 
 
-def _file_reservations_patterns_overlap(paths_a: Sequence[str], paths_b: Sequence[str]) -> bool:
-    for pa in paths_a:
-        for pb in paths_b:
-            if _patterns_overlap(pa, pb):
-                return True
-    return False
+@dataclass(slots=True)
+class _IndexedReservation:
+    id: int
+    agent_id: int
+    holder: str
+    path_pattern: str
+    exclusive: bool
+    expires_ts: datetime
 
-async def _list_inbox(
+
+class _ReservationTrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _ReservationTrieNode] = {}
+        self.entries: dict[int, _IndexedReservation] = {}
+
+
+class _ProjectReservationIndex:
+    """Active reservations of one project in a trie keyed by literal directory prefix.
+
+    A pattern can only match paths under its literal prefix (``src/api/*.py`` lives at
+    ``src -> api``; slash-free patterns such as ``*.lock`` live at the root), so a conflict check
+    walks the candidate path's ancestor directories and only tests the reservations found there.
+    """
+
+    def __init__(self) -> None:
+        self.root = _ReservationTrieNode()
+        self.entries: dict[int, _IndexedReservation] = {}
+        self._nodes: dict[int, _ReservationTrieNode] = {}
+        self.loaded_at = time.monotonic()
+
+    def add(self, entry: _IndexedReservation) -> None:
+        self.discard(entry.id)
+        node = self.root
+        # Backslashes are wildmatch escapes in the stored pattern; keep those at the root
+        prefix = "" if "\\" in entry.path_pattern else reservation_literal_prefix(entry.path_pattern)
+        for segment in prefix.split("/") if prefix else ():
+            node = node.children.setdefault(segment, _ReservationTrieNode())
+        node.entries[entry.id] = entry
+        self._nodes[entry.id] = node
+        self.entries[entry.id] = entry
+
+    def discard(self, reservation_id: int) -> None:
+        node = self._nodes.pop(reservation_id, None)
+        if node is not None:
+            node.entries.pop(reservation_id, None)
+        self.entries.pop(reservation_id, None)
+
+    def renew(self, reservation_id: int, expires_ts: datetime) -> None:
+        entry = self.entries.get(reservation_id)
+        if entry is not None:
+            entry.expires_ts = _as_utc(expires_ts)
+
+    def candidates(self, candidate_path: str) -> list[_IndexedReservation]:
+        if PathSpec is None or GitWildMatchPattern is None:
+            # Symmetric fnmatch fallback lets a glob candidate match outside a pattern's prefix
+            return list(self.entries.values())
+        node: Optional[_ReservationTrieNode] = self.root
+        found = list(self.root.entries.values())
+        for segment in _normalize_reservation_path(candidate_path).split("/")[:-1]:
+            node = node.children.get(segment) if node is not None else None
+            if node is None:
+                break
+            found.extend(node.entries.values())
+        return found
+
+    def conflicts(
+        self, candidate_path: str, *, exclusive: bool, agent_id: Optional[int], now: datetime
+    ) -> list[_IndexedReservation]:
+        """Active reservations held by other agents whose pattern matches ``candidate_path``."""
+        return [
+            entry
+            for entry in self.candidates(candidate_path)
+            if entry.agent_id != agent_id
+            and (entry.exclusive or exclusive)
+            and entry.expires_ts > now
+            and _reservation_pattern_matches(entry.path_pattern, candidate_path)
+        ]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes that are already UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class _ReservationIndex:
+    """Per-project ``_ProjectReservationIndex`` cache, updated incrementally by the reservation tools.
+
+    Acquire/renew/release/expire patch the cached trie in place; writes from other processes (or raw
+    SQL) are picked up when the project's index is reloaded after the TTL. Mutations bump a
+    per-project generation so a reload that raced with one is used once but not cached.
+    """
+
+    def __init__(self) -> None:
+        self._projects: dict[int, _ProjectReservationIndex] = {}
+        self._generations: dict[int, int] = defaultdict(int)
+        self._scope: Any = None
+        self.hits = 0
+        self.loads = 0
+
+    def _check_scope(self) -> None:
+        factory = get_session_factory()
+        if factory is not self._scope:
+            self._projects.clear()
+            self._scope = factory
+
+    async def get(self, project_id: int) -> _ProjectReservationIndex:
+        settings = get_settings()
+        enabled = bool(settings.file_reservations_index_enabled)
+        ttl = float(max(0, settings.file_reservations_index_ttl_seconds))
+        self._check_scope()
+        cached = self._projects.get(project_id)
+        if enabled and cached is not None and cached.loaded_at + ttl > time.monotonic():
+            self.hits += 1
+            return cached
+        generation = self._generations[project_id]
+        index = _ProjectReservationIndex()
+        async with get_session() as session:
+            rows = await session.execute(
+                cast(Any, select(FileReservation, Agent.name))  # type: ignore[call-overload]
+                .join(Agent, cast(Any, FileReservation.agent_id) == Agent.id)
+                .where(
+                    cast(Any, FileReservation.project_id) == project_id,
+                    cast(Any, FileReservation.released_ts).is_(None),
+                    cast(Any, FileReservation.expires_ts) > datetime.now(timezone.utc),
+                )
+            )
+            for reservation, holder_name in rows.all():
+                index.add(_indexed_reservation(reservation, holder_name))
+        self.loads += 1
+        if enabled and ttl > 0 and self._generations[project_id] == generation:
+            self._projects[project_id] = index
+        else:
+            self._projects.pop(project_id, None)
+        return index
+
+    def add(self, reservation: FileReservation, holder_name: str) -> None:
+        self._check_scope()
+        self._generations[reservation.project_id] += 1
+        index = self._projects.get(reservation.project_id)
+        if index is not None and reservation.released_ts is None:
+            index.add(_indexed_reservation(reservation, holder_name))
+
+    def discard(self, project_id: int, reservation_ids: Sequence[int]) -> None:
+        self._check_scope()
+        self._generations[project_id] += 1
+        index = self._projects.get(project_id)
+        if index is not None:
+            for reservation_id in reservation_ids:
+                index.discard(reservation_id)
+
+    def discard_expired(self, project_id: int, now: datetime) -> None:
+        index = self._projects.get(project_id)
+        if index is not None:
+            self.discard(project_id, [e.id for e in index.entries.values() if e.expires_ts < now])
+
+    def renew(self, project_id: int, reservation_id: int, expires_ts: datetime) -> None:
+        self._check_scope()
+        self._generations[project_id] += 1
+        index = self._projects.get(project_id)
+        if index is not None:
+            index.renew(reservation_id, expires_ts)
+
+    def invalidate(self, project_id: int) -> None:
+        self._check_scope()
+        self._generations[project_id] += 1
+        self._projects.pop(project_id, None)
+
+    def clear(self) -> None:
+        self._projects.clear()
+
+
+def _indexed_reservation(reservation: FileReservation, holder_name: str) -> _IndexedReservation:
+    return _IndexedReservation(
+        id=cast(int, reservation.id),
+        agent_id=reservation.agent_id,
+        holder=holder_name,
+        path_pattern=reservation.path_pattern,
+        exclusive=bool(reservation.exclusive),
+        expires_ts=_as_utc(reservation.expires_ts),
+    )
+
+
+_RESERVATION_INDEX = _ReservationIndex()
+
+
+# --- Ack deadline scheduler ---------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class _AckDeadline:
+    message_id: int
+    agent_id: int
+    project_id: int
+    created_ts: datetime
+
+
+class _AckDeadlineScheduler:
+    """Min-heap of outstanding (message, recipient) ack deadlines for the ack-TTL worker.
+
+    Seeded once from the DB, then fed by ``send_message``/``acknowledge_message`` in this process and
+    by an incremental ``id > last_seen`` scan for messages written elsewhere. Each pair is handed out
+    by :meth:`pop_due` at most once; acknowledged pairs are dropped lazily when they reach the top.
+    """
+
+    _VERIFY_CHUNK = 500
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, int]] = []
+        self._pending: dict[tuple[int, int], _AckDeadline] = {}
+        # Fired pairs whose message id is beyond the last scan; pruned as the scan catches up
+        self._fired: set[tuple[int, int]] = set()
+        self._last_message_id = 0
+        self._seeded = False
+        self._scope: Any = None
+        self.fired = 0
+
+    def _check_scope(self) -> None:
+        factory = get_session_factory()
+        if factory is not self._scope:
+            self._heap.clear()
+            self._pending.clear()
+            self._fired.clear()
+            self._last_message_id = 0
+            self._seeded = False
+            self._scope = factory
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._pending)
+
+    def _push(self, entry: _AckDeadline, *, heapify: bool = True) -> bool:
+        key = (entry.message_id, entry.agent_id)
+        if key in self._pending or key in self._fired:
+            return False
+        self._pending[key] = entry
+        item = (_as_utc(entry.created_ts).timestamp(), entry.message_id, entry.agent_id)
+        if heapify:
+            heapq.heappush(self._heap, item)
+        else:
+            self._heap.append(item)
+        return True
+
+    def schedule(self, message_id: int, project_id: int, created_ts: datetime, agent_ids: Iterable[int]) -> None:
+        """Track a freshly sent ack-required message (no-op until the worker has seeded the scheduler)."""
+        self._check_scope()
+        if not self._seeded:
+            return
+        for agent_id in agent_ids:
+            self._push(_AckDeadline(message_id, agent_id, project_id, created_ts))
+
+    def cancel(self, message_id: int, agent_id: int) -> None:
+        self._check_scope()
+        self._pending.pop((message_id, agent_id), None)
+
+    async def sync(self) -> int:
+        """Seed on first use, afterwards pick up only ack-required messages newer than the last scan."""
+        self._check_scope()
+        await ensure_schema()
+        async with get_session() as session:
+            rows = await session.execute(
+                cast(Any, select(Message.id, Message.project_id, Message.created_ts, MessageRecipient.agent_id))  # type: ignore[call-overload]
+                .join(MessageRecipient, cast(Any, MessageRecipient.message_id) == Message.id)
+                .where(
+                    cast(Any, Message.ack_required).is_(True),
+                    cast(Any, MessageRecipient.ack_ts).is_(None),
+                    cast(Any, Message.id) > self._last_message_id,
+                )
+            )
+            added = 0
+            last_id = self._last_message_id
+            for message_id, project_id, created_ts, agent_id in rows.all():
+                entry = _AckDeadline(int(message_id), int(agent_id), int(project_id), created_ts)
+                added += self._push(entry, heapify=False)
+                last_id = max(last_id, int(message_id))
+            # Also advance past newer messages that need no ack so the next scan starts after them
+            newest = (await session.execute(select(func.max(Message.id)))).scalar()
+        if added:
+            heapq.heapify(self._heap)
+        self._last_message_id = max(last_id, int(newest or 0))
+        self._fired = {key for key in self._fired if key[0] > self._last_message_id}
+        self._seeded = True
+        return added
+
+    def pop_due(self, now: datetime, ttl_seconds: int) -> list[_AckDeadline]:
+        cutoff = _as_utc(now).timestamp() - ttl_seconds
+        due: list[_AckDeadline] = []
+        while self._heap and self._heap[0][0] <= cutoff:
+            _created, message_id, agent_id = heapq.heappop(self._heap)
+            entry = self._pending.pop((message_id, agent_id), None)
+            if entry is None:
+                continue
+            if message_id > self._last_message_id:
+                self._fired.add((message_id, agent_id))
+            due.append(entry)
+        self.fired += len(due)
+        return due
+
+    def seconds_until_next(self, now: datetime, ttl_seconds: int) -> Optional[float]:
+        while self._heap and (self._heap[0][1], self._heap[0][2]) not in self._pending:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] + ttl_seconds - _as_utc(now).timestamp())
+
+    async def still_unacknowledged(self, entries: Sequence[_AckDeadline]) -> list[_AckDeadline]:
+        """Drop entries acknowledged elsewhere (another process or raw SQL) since they were scheduled."""
+        open_pairs: set[tuple[int, int]] = set()
+        message_ids = sorted({entry.message_id for entry in entries})
+        async with get_session() as session:
+            for start in range(0, len(message_ids), self._VERIFY_CHUNK):
+                chunk = message_ids[start : start + self._VERIFY_CHUNK]
+                rows = await session.execute(
+                    select(MessageRecipient.message_id, MessageRecipient.agent_id).where(  # type: ignore[call-overload]
+                        cast(Any, MessageRecipient.message_id).in_(chunk),
+                        cast(Any, MessageRecipient.ack_ts).is_(None),
+                    )
+                )
+                open_pairs.update((int(mid), int(aid)) for mid, aid in rows.all())
+        return [entry for entry in entries if (entry.message_id, entry.agent_id) in open_pairs]
+
+
+_ACK_DEADLINES = _AckDeadlineScheduler()
+
+
+# --- Build slot scheduler ------------------------------------------------------------------------
+
+_BUILD_SLOT_MIN_TTL_SECONDS = 60
+# Waiters re-check at least this often so grants made by another server process are noticed
+_BUILD_SLOT_POLL_SECONDS = 5.0
+_BUILD_SLOT_LOCKS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[int, str], asyncio.Lock]] = (
+    weakref.WeakKeyDictionary()
+)
+_BUILD_SLOT_WAKE: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[int, str], asyncio.Event]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _build_slot_lock(key: tuple[int, str]) -> asyncio.Lock:
+    locks = _BUILD_SLOT_LOCKS.setdefault(asyncio.get_running_loop(), {})
+    lock = locks.get(key)
+    if lock is None:
+        lock = locks[key] = asyncio.Lock()
+    return lock
+
+
+def _build_slot_event(key: tuple[int, str]) -> asyncio.Event:
+    """Return the current wake-up event for ``key``; it is replaced each time it fires."""
+    events = _BUILD_SLOT_WAKE.setdefault(asyncio.get_running_loop(), {})
+    event = events.get(key)
+    if event is None:
+        event = events[key] = asyncio.Event()
+    return event
+
+
+def _signal_build_slot(key: tuple[int, str]) -> None:
+    with suppress(RuntimeError):
+        event = _BUILD_SLOT_WAKE.setdefault(asyncio.get_running_loop(), {}).pop(key, None)
+        if event is not None:
+            event.set()
+
+
+def _build_slot_lease_to_dict(lease: BuildSlotLease) -> dict[str, Any]:
+    return {
+        "slot": lease.slot,
+        "agent": lease.agent,
+        "branch": lease.branch or None,
+        "exclusive": lease.exclusive,
+        "priority": lease.priority,
+        "status": lease.status,
+        "acquired_ts": _iso(lease.acquired_ts) if lease.acquired_ts else None,
+        "expires_ts": _iso(lease.expires_ts),
+    }
+
+
+def _build_slot_filter(project_id: int, slot: str) -> list[Any]:
+    return [cast(Any, BuildSlotLease.project_id) == project_id, cast(Any, BuildSlotLease.slot) == slot]
+
+
+async def _expire_build_slot_leases(session: Any, project_id: int, slot: str, now: datetime) -> int:
+    expired = 0
+    for status, new_status in (("active", "expired"), ("waiting", "cancelled")):
+        result = await session.execute(
+            update(BuildSlotLease)
+            .where(
+                *_build_slot_filter(project_id, slot),
+                cast(Any, BuildSlotLease.status) == status,
+                cast(Any, BuildSlotLease.expires_ts) <= now,
+            )
+            .values(status=new_status)
+        )
+        expired += int(result.rowcount or 0)
+    return expired
+
+
+async def _build_slot_queue(session: Any, project_id: int, slot: str) -> tuple[list[BuildSlotLease], list[BuildSlotLease]]:
+    rows = (
+        await session.execute(
+            select(BuildSlotLease)
+            .where(*_build_slot_filter(project_id, slot), cast(Any, BuildSlotLease.status).in_(["active", "waiting"]))
+            .order_by(desc(cast(Any, BuildSlotLease.priority)), asc(cast(Any, BuildSlotLease.id)))
+        )
+    ).scalars().all()
+    active = [row for row in rows if row.status == "active"]
+    waiting = [row for row in rows if row.status == "waiting"]
+    return active, waiting
+
+
+async def _grant_build_slot_waiters(project_id: int, slot: str) -> list[BuildSlotLease]:
+    """Expire lapsed leases and hand the slot to the head of the wait queue (priority desc, then FIFO).
+
+    Exclusive requests need an idle slot; shared requests may join other shared holders. The queue is strict:
+    nothing is granted past a head that cannot run yet. Each grant is a conditional UPDATE, so two server
+    processes promoting the same slot can never both hand out an exclusive lease.
+    """
+    key = (project_id, slot)
+    granted: list[BuildSlotLease] = []
+    async with _build_slot_lock(key):
+        now = datetime.now(timezone.utc)
+        async with get_session() as session:
+            expired = await _expire_build_slot_leases(session, project_id, slot, now)
+            active, waiting = await _build_slot_queue(session, project_id, slot)
+            for lease in waiting:
+                if lease.exclusive and (active or granted):
+                    break
+                if not lease.exclusive and any(held.exclusive for held in (*active, *granted)):
+                    break
+                other = aliased(BuildSlotLease)
+                blocking = (
+                    select(cast(Any, other.id))
+                    .where(
+                        cast(Any, other.project_id) == project_id,
+                        cast(Any, other.slot) == slot,
+                        cast(Any, other.status) == "active",
+                        cast(Any, other.expires_ts) > now,
+                    )
+                )
+                if not lease.exclusive:
+                    blocking = blocking.where(cast(Any, other.exclusive).is_(True))
+                expires = now + timedelta(seconds=lease.ttl_seconds)
+                result = await session.execute(
+                    update(BuildSlotLease)
+                    .where(
+                        cast(Any, BuildSlotLease.id) == lease.id,
+                        cast(Any, BuildSlotLease.status) == "waiting",
+                        ~blocking.exists(),
+                    )
+                    .values(status="active", acquired_ts=now, expires_ts=expires)
+                )
+                if not result.rowcount:  # type: ignore[attr-defined]
+                    break
+                lease.status, lease.acquired_ts, lease.expires_ts = "active", now, expires
+                granted.append(lease)
+            await session.commit()
+    if granted or expired:
+        _signal_build_slot(key)
+    return granted
+
+
+async def _next_build_slot_change(project_id: int, slot: str) -> Optional[datetime]:
+    async with get_session() as session:
+        return cast(
+            Optional[datetime],
+            (
+                await session.execute(
+                    select(func.min(BuildSlotLease.expires_ts)).where(  # type: ignore[call-overload]
+                        *_build_slot_filter(project_id, slot), cast(Any, BuildSlotLease.status) == "active"
+                    )
+                )
+            ).scalar(),
+        )
+
+
+async def acquire_build_slot_lease(
+    project_id: int,
+    slot: str,
+    agent: str,
+    branch: str,
+    *,
+    exclusive: bool = True,
+    ttl_seconds: int = 3600,
+    priority: int = 0,
+    wait_seconds: float = 0.0,
+) -> dict[str, Any]:
+    """Request a build slot lease, optionally blocking up to ``wait_seconds`` in the slot's wait queue.
+
+    A holder (agent + branch) that already has an active lease just has it extended. Requests that are not
+    granted before the deadline leave the queue. Returns ``granted`` (lease dict or ``None``), the other
+    ``conflicts`` currently holding the slot, the final queue ``position`` and ``waited_seconds``.
+    """
+    await ensure_schema()
+    key = (project_id, slot)
+    ttl_seconds = max(int(ttl_seconds), _BUILD_SLOT_MIN_TTL_SECONDS)
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    deadline = now + timedelta(seconds=max(0.0, float(wait_seconds)))
+    holder = [cast(Any, BuildSlotLease.agent) == agent, cast(Any, BuildSlotLease.branch) == branch]
+    async with _build_slot_lock(key), get_session() as session:
+        await _expire_build_slot_leases(session, project_id, slot, now)
+        mine = (
+            await session.execute(
+                select(BuildSlotLease).where(
+                    *_build_slot_filter(project_id, slot),
+                    *holder,
+                    cast(Any, BuildSlotLease.status).in_(["active", "waiting"]),
+                )
+            )
+        ).scalars().first()
+        if mine is not None and mine.status == "active":
+            mine.expires_ts = max(_as_utc(mine.expires_ts), now + timedelta(seconds=ttl_seconds))
+        elif mine is not None:
+            mine.exclusive, mine.priority, mine.ttl_seconds = exclusive, priority, ttl_seconds
+            mine.expires_ts = max(_as_utc(mine.expires_ts), deadline)
+        else:
+            mine = BuildSlotLease(
+                project_id=project_id,
+                slot=slot,
+                agent=agent,
+                branch=branch,
+                exclusive=exclusive,
+                priority=priority,
+                ttl_seconds=ttl_seconds,
+                requested_ts=now,
+                # A waiting row's expiry is its wait deadline, so abandoned requests drop out of the queue
+                expires_ts=deadline + timedelta(seconds=1),
+            )
+        session.add(mine)
+        await session.commit()
+        await session.refresh(mine)
+    lease_id = mine.id
+
+    while True:
+        event = _build_slot_event(key)
+        await _grant_build_slot_waiters(project_id, slot)
+        async with get_session() as session:
+            active, waiting = await _build_slot_queue(session, project_id, slot)
+        lease = next((row for row in (*active, *waiting) if row.id == lease_id), None)
+        if lease is not None and lease.status == "active":
+            return {
+                "granted": _build_slot_lease_to_dict(lease),
+                "conflicts": [_build_slot_lease_to_dict(row) for row in active if row.id != lease_id],
+                "position": None,
+                "waited_seconds": round(time.monotonic() - started, 3),
+            }
+        now = datetime.now(timezone.utc)
+        if lease is None or now >= deadline:
+            position = next((idx for idx, row in enumerate(waiting) if row.id == lease_id), None)
+            async with get_session() as session:
+                await session.execute(
+                    update(BuildSlotLease)
+                    .where(cast(Any, BuildSlotLease.id) == lease_id, cast(Any, BuildSlotLease.status) == "waiting")
+                    .values(status="cancelled", released_ts=now)
+                )
+                await session.commit()
+            return {
+                "granted": None,
+                "conflicts": [_build_slot_lease_to_dict(row) for row in active],
+                "position": position,
+                "waited_seconds": round(time.monotonic() - started, 3),
+            }
+        timeout = min((deadline - now).total_seconds(), _BUILD_SLOT_POLL_SECONDS)
+        next_expiry = await _next_build_slot_change(project_id, slot)
+        if next_expiry is not None:
+            timeout = min(timeout, max(0.05, (_as_utc(next_expiry) - now).total_seconds()))
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+
+
+async def renew_build_slot_lease(project_id: int, slot: str, agent: str, branch: str, *, extend_seconds: int) -> Optional[datetime]:
+    """Extend the holder's active lease; returns the new expiry, or ``None`` when the holder has no live lease."""
+    await ensure_schema()
+    now = datetime.now(timezone.utc)
+    new_expiry = now + timedelta(seconds=max(int(extend_seconds), _BUILD_SLOT_MIN_TTL_SECONDS))
+    async with get_session() as session:
+        result = await session.execute(
+            update(BuildSlotLease)
+            .where(
+                *_build_slot_filter(project_id, slot),
+                cast(Any, BuildSlotLease.agent) == agent,
+                cast(Any, BuildSlotLease.branch) == branch,
+                cast(Any, BuildSlotLease.status) == "active",
+                cast(Any, BuildSlotLease.expires_ts) > now,
+            )
+            .values(expires_ts=new_expiry)
+        )
+        await session.commit()
+    return new_expiry if result.rowcount else None  # type: ignore[attr-defined]
+
+
+async def release_build_slot_lease(project_id: int, slot: str, agent: str, branch: str) -> tuple[bool, list[BuildSlotLease]]:
+    """Release the holder's lease (or withdraw its queued request) and hand the slot to the next waiters."""
+    await ensure_schema()
+    now = datetime.now(timezone.utc)
+    async with get_session() as session:
+        result = await session.execute(
+            update(BuildSlotLease)
+            .where(
+                *_build_slot_filter(project_id, slot),
+                cast(Any, BuildSlotLease.agent) == agent,
+                cast(Any, BuildSlotLease.branch) == branch,
+                cast(Any, BuildSlotLease.status).in_(["active", "waiting"]),
+            )
+            .values(status="released", released_ts=now)
+        )
+        await session.commit()
+    released = bool(result.rowcount)  # type: ignore[attr-defined]
+    handed_off = await _grant_build_slot_waiters(project_id, slot)
+    if released and not handed_off:
+        _signal_build_slot((project_id, slot))
+    return released, handed_off
+
+
+def _file_reservations_patterns_overlap(paths_a: Sequence[str], paths_b: Sequence[str]) -> bool:
+    for pa in paths_a:
+        for pb in paths_b:
+            if _patterns_overlap(pa, pb):
+                return True
+    return False
+
+async def _list_inbox(
     project: Project,
     agent: Agent,
     limit: int,
     urgent_only: bool,
     include_bodies: bool,
     since_ts: Optional[str],
+    *,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    oldest_first: bool = False,
 ) -> list[dict[str, Any]]:
+    """Newest-first inbox page from ``mailbox_entries``.
+
+    ``before_id``/``after_id`` are keyset cursors (message ids): the page holds the ``limit`` messages just
+    older/newer than that message in (created_ts, id) order, so any page costs one index seek.
+    ``oldest_first`` returns the oldest ``limit`` matches in ascending order instead, for readers that
+    consume the inbox as a stream and resume from the last row they got.
+    """
     if project.id is None or agent.id is None:
         raise ValueError("Project and agent must have ids before listing inbox.")
     sender_alias = aliased(Agent)
     await ensure_schema()
     async with get_session() as session:
+        position = tuple_(cast(Any, MailboxEntry.created_ts), cast(Any, MailboxEntry.message_id))
         stmt = (
-            select(Message, MessageRecipient.kind, sender_alias.name)  # type: ignore[call-overload]
-            .join(MessageRecipient, MessageRecipient.message_id == Message.id)
-            .join(sender_alias, cast(Any, Message.sender_id == sender_alias.id))
+            select(Message, cast(Any, MailboxEntry.kind), cast(Any, sender_alias.name))
+            .select_from(MailboxEntry)
+            .join(Message, cast(Any, Message.id) == MailboxEntry.message_id)
+            .join(sender_alias, cast(Any, Message.sender_id) == sender_alias.id)
             .where(
-                cast(Any, Message.project_id) == project.id,
-                MessageRecipient.agent_id == agent.id,
+                cast(Any, MailboxEntry.agent_id) == agent.id,
+                cast(Any, MailboxEntry.project_id) == project.id,
             )
-            .order_by(desc(Message.created_ts))  # type: ignore[arg-type]
-            .limit(limit)  # type: ignore[arg-type]
-        )  # type: ignore[arg-type]
+            .limit(limit)
+        )
         if urgent_only:
-            stmt = stmt.where(cast(Any, Message.importance).in_(["high", "urgent"]))  # type: ignore[arg-type]
-        if since_ts:  # type: ignore[arg-type]
+            stmt = stmt.where(cast(Any, MailboxEntry.importance).in_(["high", "urgent"]))
+        if since_ts:
             since_dt = _parse_iso(since_ts)
-            if since_dt:  # type: ignore[arg-type]
-                stmt = stmt.where(Message.created_ts > since_dt)
+            if since_dt:
+                stmt = stmt.where(cast(Any, MailboxEntry.created_ts) > since_dt)
+        for cursor_id, older in ((before_id, True), (after_id, False)):
+            if cursor_id is None:
+                continue
+            cursor_ts = (
+                await session.execute(select(cast(Any, Message.created_ts)).where(cast(Any, Message.id) == cursor_id))
+            ).scalar_one_or_none()
+            if cursor_ts is None:
+                raise ToolExecutionError(
+                    "NOT_FOUND",
+                    f"Cursor message {cursor_id} not found.",
+                    recoverable=True,
+                    data={"before_id" if older else "after_id": cursor_id},
+                )
+            # Bind the timestamp as DateTime so it renders exactly like the stored column values
+            cursor = tuple_(literal(cursor_ts, DateTime()), literal(cursor_id))
+            stmt = stmt.where(position < cursor if older else position > cursor)
+        ascending = oldest_first or (after_id is not None and before_id is None)
+        if ascending:
+            # Oldest-first seek just past the cursor; flipped below so callers always get newest-first
+            stmt = stmt.order_by(asc(cast(Any, MailboxEntry.created_ts)), asc(cast(Any, MailboxEntry.message_id)))
+        else:
+            stmt = stmt.order_by(desc(cast(Any, MailboxEntry.created_ts)), desc(cast(Any, MailboxEntry.message_id)))
         result = await session.execute(stmt)
-        rows = result.all()
+        rows = list(result.all())
+    if ascending and not oldest_first:
+        rows.reverse()
     messages: list[dict[str, Any]] = []
     for message, recipient_kind, sender_name in rows:
         payload = _message_to_dict(message, include_body=include_bodies)
         payload["from"] = sender_name
-        payload["kind"] = recipient_kind  # type: ignore[arg-type]
+        payload["kind"] = recipient_kind
         messages.append(payload)
     return messages
 
 
+# --- Inbox wake-ups -------------------------------------------------------------------------------
+
+_MAIL_WAIT_MAX_SECONDS = 300.0
+# Waiters re-check at least this often so messages written by another process (CLI, second server) are noticed
+_MAIL_WAIT_POLL_SECONDS = 30.0
+_MAIL_WAKE: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[int, asyncio.Event]] = weakref.WeakKeyDictionary()
+
+
+def _mail_event(agent_id: int) -> asyncio.Event:
+    """Return the current new-mail event for ``agent_id``; it is replaced each time it fires."""
+    events = _MAIL_WAKE.setdefault(asyncio.get_running_loop(), {})
+    event = events.get(agent_id)
+    if event is None:
+        event = events[agent_id] = asyncio.Event()
+    return event
+
+
+def _signal_mail(agent_ids: Iterable[int]) -> None:
+    with suppress(RuntimeError):
+        events = _MAIL_WAKE.setdefault(asyncio.get_running_loop(), {})
+        for agent_id in agent_ids:
+            event = events.pop(agent_id, None)
+            if event is not None:
+                event.set()
+
+
+async def _wait_for_inbox(
+    project: Project,
+    agent: Agent,
+    *,
+    since_ts: Optional[str],
+    timeout_seconds: float,
+    limit: int,
+    urgent_only: bool,
+    include_bodies: bool,
+    after_id: Optional[int] = None,
+) -> list[dict[str, Any]]:
+    """Block until ``agent`` has inbox messages newer than ``since_ts`` (or newer than the call when omitted).
+
+    ``after_id`` replaces ``since_ts`` with a (created_ts, id) keyset cursor, so messages sharing the cursor's
+    timestamp are not lost. Returns the oldest ``limit`` matches, oldest first, or ``[]`` once
+    ``timeout_seconds`` pass: resuming from the last item drains a backlog larger than ``limit`` without
+    skipping any of it. The inbox is queried once up
+    front and again only when a delivery in this process signals the agent (or every
+    ``_MAIL_WAIT_POLL_SECONDS``), so an idle waiter costs no database work.
+    """
+    if agent.id is None:
+        raise ValueError("Agent must have an id before waiting for mail.")
+    deadline = time.monotonic() + min(max(0.0, float(timeout_seconds)), _MAIL_WAIT_MAX_SECONDS)
+    since = since_ts or datetime.now(timezone.utc).isoformat()
+    while True:
+        # Take the event before querying so a delivery landing mid-query still wakes the next wait
+        event = _mail_event(agent.id)
+        items = await _list_inbox(
+            project,
+            agent,
+            limit,
+            urgent_only,
+            include_bodies,
+            None if after_id is not None else since,
+            after_id=after_id,
+            oldest_first=True,
+        )
+        remaining = deadline - time.monotonic()
+        if items or remaining <= 0:
+            return items
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(event.wait(), timeout=min(remaining, _MAIL_WAIT_POLL_SECONDS))
+
+
+# Per-project fallback for product tools: how many projects are queried at once
+_PRODUCT_FANOUT_CONCURRENCY = 8
+
+
+def _inbox_sort_key(item: dict[str, Any]) -> tuple[float, int]:
+    ts = _parse_iso(str(item.get("created_ts") or ""))
+    return (ts.timestamp() if ts else 0.0, int(item.get("id") or 0))
+
+
+async def _list_inbox_product(
+    product_id: int,
+    agent_name: str,
+    limit: int,
+    urgent_only: bool,
+    include_bodies: bool,
+    since_ts: Optional[str],
+) -> list[dict[str, Any]]:
+    """Newest inbox rows for ``agent_name`` across every project linked to a product, in one statement.
+
+    Reads the ``mailbox_entries`` index like ``_list_inbox``. The agent is matched per project
+    (case-insensitive, like ``_get_agent``), so a project without an agent of that name simply
+    contributes nothing.
+    """
+    if limit <= 0 or not agent_name.strip():
+        return []
+    recipient_alias = aliased(Agent)
+    sender_alias = aliased(Agent)
+    await ensure_schema()
+    async with get_session() as session:
+        stmt = (
+            select(Message, cast(Any, MailboxEntry.kind), cast(Any, sender_alias.name))
+            .select_from(MailboxEntry)
+            .join(recipient_alias, cast(Any, MailboxEntry.agent_id) == recipient_alias.id)
+            .join(ProductProjectLink, cast(Any, ProductProjectLink.project_id) == MailboxEntry.project_id)
+            .join(Message, cast(Any, Message.id) == MailboxEntry.message_id)
+            .join(sender_alias, cast(Any, Message.sender_id) == sender_alias.id)
+            .where(
+                cast(Any, ProductProjectLink.product_id) == product_id,
+                cast(Any, recipient_alias.project_id) == MailboxEntry.project_id,
+                func.lower(cast(Any, recipient_alias.name)) == agent_name.strip().lower(),
+            )
+            .order_by(desc(cast(Any, MailboxEntry.created_ts)), desc(cast(Any, MailboxEntry.message_id)))
+            .limit(limit)
+        )
+        if urgent_only:
+            stmt = stmt.where(cast(Any, MailboxEntry.importance).in_(["high", "urgent"]))
+        if since_ts:
+            since_dt = _parse_iso(since_ts)
+            if since_dt:
+                stmt = stmt.where(cast(Any, MailboxEntry.created_ts) > since_dt)
+        rows = (await session.execute(stmt)).all()
+    messages: list[dict[str, Any]] = []
+    for message, recipient_kind, sender_name in rows:
+        payload = _message_to_dict(message, include_body=include_bodies)
+        payload["from"] = sender_name
+        payload["kind"] = recipient_kind
+        messages.append(payload)
+    return messages
+
+
+async def _list_inbox_fanout(
+    projects: Sequence[Project],
+    agent_name: str,
+    limit: int,
+    urgent_only: bool,
+    include_bodies: bool,
+    since_ts: Optional[str],
+) -> list[dict[str, Any]]:
+    """Per-project inbox listing with bounded concurrency, k-way merged newest-first."""
+    if limit <= 0:
+        return []
+    gate = asyncio.Semaphore(_PRODUCT_FANOUT_CONCURRENCY)
+
+    async def _one(project: Project) -> list[dict[str, Any]]:
+        async with gate:
+            try:
+                agent = await _get_agent(project, agent_name)
+            except Exception:
+                return []
+            items = await _list_inbox(project, agent, limit, urgent_only, include_bodies, since_ts)
+        # Each list is already newest-first; a stable re-sort only settles created_ts ties by id
+        items.sort(key=_inbox_sort_key, reverse=True)
+        return items
+
+    per_project = await asyncio.gather(*(_one(project) for project in projects))
+    merged = heapq.merge(*per_project, key=_inbox_sort_key, reverse=True)
+    return list(islice(merged, limit))
+
+
 async def _list_outbox(
     project: Project,
     agent: Agent,
@@ -2555,6 +4236,10 @@ def _canonical_relpath_for_message(project: Project, message: Message, archive:
             legacy = base_dir / f"{id_str}.md"
             if legacy.exists():
                 candidates.append(legacy)
+            # Compacted month: the file lives in the segment but keeps its path in git history
+            for name in segment_file_names(base_dir):
+                if name.endswith(f"__{id_str}.md") or name == f"{id_str}.md":
+                    candidates.append(base_dir / name)
     except Exception:
         return None
 
@@ -2576,8 +4261,13 @@ async def _commit_info_for_message(settings: Settings, project: Project, message
         return None
 
     def _lookup() -> dict[str, Any] | None:
+        # A packed file's latest commit is the compaction that removed it; report the one that added it
+        loose = (archive.repo_root / relpath).exists()
         try:
-            commit = next(archive.repo.iter_commits(paths=[relpath], max_count=1))
+            if loose:
+                commit = next(archive.repo.iter_commits(paths=[relpath], max_count=1))
+            else:
+                commit = next(archive.repo.iter_commits(paths=[relpath], max_count=1, diff_filter="A"))
         except StopIteration:
             return None
         data: dict[str, Any] = {
@@ -2624,14 +4314,46 @@ async def _commit_info_for_message(settings: Settings, project: Project, message
     return await asyncio.to_thread(_lookup)
 
 
-def _summarize_messages(messages: Sequence[tuple[Message, str]]) -> dict[str, Any]:
-    participants: set[str] = set()
-    key_points: list[str] = []
-    action_items: list[str] = []
-    open_actions = 0
-    done_actions = 0
-    mentions: dict[str, int] = {}
-    code_references: set[str] = set()
+_THREAD_SUMMARY_LIMIT = 10
+_THREAD_SUMMARY_EXAMPLES = 3
+# The LLM refinement only ever sees the first N messages of a thread
+_THREAD_SUMMARY_LLM_EXCERPTS = 15
+_THREAD_SUMMARY_LLM_KEYS = (
+    "participants",
+    "key_points",
+    "action_items",
+    "mentions",
+    "code_references",
+    "total_messages",
+    "open_actions",
+    "done_actions",
+)
+
+
+def _empty_thread_summary_state() -> dict[str, Any]:
+    return {
+        "participants": [],
+        "key_points": [],
+        "action_items": [],
+        "total_messages": 0,
+        "open_actions": 0,
+        "done_actions": 0,
+        "mentions": {},
+        "code_references": [],
+    }
+
+
+def _fold_thread_summary_state(state: dict[str, Any], messages: Sequence[tuple[Message, str]]) -> dict[str, Any]:
+    """Fold ``messages`` (in thread order) into a JSON-serializable summarizer state, in place.
+
+    Only what the rendered summary can show is retained: the first 10 key points and action items and the
+    10 lexicographically smallest code references; participants and mention counts are kept whole.
+    """
+    participants: set[str] = set(state["participants"])
+    key_points: list[str] = state["key_points"]
+    action_items: list[str] = state["action_items"]
+    mentions: dict[str, int] = state["mentions"]
+    code_references: set[str] = set(state["code_references"])
     keywords = ("TODO", "ACTION", "FIXME", "NEXT", "BLOCKED")
 
     def _record_mentions(text: str) -> None:
@@ -2657,6 +4379,10 @@ def _summarize_messages(messages: Sequence[tuple[Message, str]]) -> dict[str, An
                 code_references.add(snippet)
             start = j + 1
 
+    def _add_action(item: str) -> None:
+        if len(action_items) < _THREAD_SUMMARY_LIMIT:
+            action_items.append(item)
+
     for message, sender_name in messages:
         participants.add(sender_name)
         for line in message.body_md.splitlines():
@@ -2671,37 +4397,281 @@ def _summarize_messages(messages: Sequence[tuple[Message, str]]) -> dict[str, An
                 normalized = stripped
                 if normalized.startswith(('- [ ]', '- [x]', '- [X]')):
                     normalized = normalized.split(']', 1)[-1].strip()
-                key_points.append(normalized.lstrip("-+* "))
+                if len(key_points) < _THREAD_SUMMARY_LIMIT:
+                    key_points.append(normalized.lstrip("-+* "))
             # checkbox TODOs
             if stripped.startswith(('- [ ]', '* [ ]', '+ [ ]')):
-                open_actions += 1
-                action_items.append(stripped)
+                state["open_actions"] += 1
+                _add_action(stripped)
                 continue
             if stripped.startswith(('- [x]', '- [X]', '* [x]', '* [X]', '+ [x]', '+ [X]')):
-                done_actions += 1
-                action_items.append(stripped)
+                state["done_actions"] += 1
+                _add_action(stripped)
                 continue
             # keyword-based action detection
             upper = stripped.upper()
             if any(token in upper for token in keywords):
-                action_items.append(stripped)
+                _add_action(stripped)
 
+    state["participants"] = sorted(participants)
+    state["code_references"] = sorted(code_references)[:_THREAD_SUMMARY_LIMIT]
+    state["total_messages"] += len(messages)
+    return state
+
+
+def _render_thread_summary(state: dict[str, Any]) -> dict[str, Any]:
     # Sort mentions by frequency desc
-    sorted_mentions = sorted(mentions.items(), key=lambda kv: (-kv[1], kv[0]))[:10]
+    sorted_mentions = sorted(state["mentions"].items(), key=lambda kv: (-kv[1], kv[0]))[:_THREAD_SUMMARY_LIMIT]
     summary: dict[str, Any] = {
-        "participants": sorted(participants),
-        "key_points": key_points[:10],
-        "action_items": action_items[:10],
-        "total_messages": len(messages),
-        "open_actions": open_actions,
-        "done_actions": done_actions,
+        "participants": list(state["participants"]),
+        "key_points": list(state["key_points"]),
+        "action_items": list(state["action_items"]),
+        "total_messages": state["total_messages"],
+        "open_actions": state["open_actions"],
+        "done_actions": state["done_actions"],
         "mentions": [{"name": name, "count": count} for name, count in sorted_mentions],
     }
-    if code_references:
-        summary["code_references"] = sorted(code_references)[:10]
+    if state["code_references"]:
+        summary["code_references"] = list(state["code_references"])
     return summary
 
 
+def _summarize_messages(messages: Sequence[tuple[Message, str]]) -> dict[str, Any]:
+    return _render_thread_summary(_fold_thread_summary_state(_empty_thread_summary_state(), messages))
+
+
+def _thread_examples(messages: Sequence[tuple[Message, str]]) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": message.id,
+            "subject": message.subject,
+            "from": sender_name,
+            "created_ts": _iso(message.created_ts),
+        }
+        for message, sender_name in messages[:_THREAD_SUMMARY_EXAMPLES]
+    ]
+
+
+async def _llm_thread_overrides(
+    messages: Sequence[tuple[Message, str]], llm_model: Optional[str], *, thread_id: str
+) -> dict[str, Any]:
+    """Ask the LLM to refine a thread summary from its first excerpts; returns the keys it filled in."""
+    overrides: dict[str, Any] = {}
+    try:
+        excerpts: list[str] = []
+        for message, sender_name in messages[:_THREAD_SUMMARY_LLM_EXCERPTS]:
+            excerpts.append(f"- {sender_name}: {message.subject}\n{message.body_md[:800]}")
+        if excerpts:
+            system = (
+                "You are a senior engineer. Produce a concise JSON summary with keys: "
+                "participants[], key_points[], action_items[], mentions[{name,count}], code_references[], "
+                "total_messages, open_actions, done_actions. Derive from the given thread excerpts."
+            )
+            user = "\n\n".join(excerpts)
+            llm_resp = await complete_system_user(system, user, model=llm_model)
+            parsed = _parse_json_safely(llm_resp.content)
+            if parsed:
+                for key in _THREAD_SUMMARY_LLM_KEYS:
+                    value = parsed.get(key)
+                    if value:
+                        overrides[key] = value
+    except Exception as e:
+        logger.debug("thread_summary.llm_skipped", extra={"thread_id": thread_id, "error": str(e)})
+    return overrides
+
+
+def _thread_criteria(thread_id: str) -> list[Any]:
+    try:
+        seed_id = int(thread_id)
+    except ValueError:
+        seed_id = None
+    criteria = [cast(Any, Message.thread_id) == thread_id]
+    if seed_id is not None:
+        criteria.append(cast(Any, Message.id) == seed_id)
+    return criteria
+
+
+async def _load_thread_rows(
+    project_ids: Sequence[int], thread_id: str, *, after_id: int = 0, limit: Optional[int] = None
+) -> list[Any]:
+    sender_alias = aliased(Agent)
+    stmt = (
+        cast(Any, select(Message, sender_alias.name))  # type: ignore[call-overload]
+        .join(sender_alias, cast(Any, Message.sender_id == sender_alias.id))
+        .where(cast(Any, Message.project_id).in_(list(project_ids)), or_(*_thread_criteria(thread_id)))
+    )
+    if after_id:
+        # Deltas are folded in id order (ids are assigned in send order)
+        stmt = stmt.where(cast(Any, Message.id) > after_id).order_by(asc(cast(Any, Message.id)))
+    else:
+        stmt = stmt.order_by(asc(cast(Any, Message.created_ts)))
+    if limit:
+        stmt = stmt.limit(limit)
+    async with get_session() as session:
+        return list((await session.execute(stmt)).all())
+
+
+async def _summarize_thread_cached(
+    scope: str,
+    project_ids: Sequence[int],
+    thread_id: str,
+    include_examples: bool,
+    llm_mode: bool,
+    llm_model: Optional[str],
+    *,
+    per_thread_limit: Optional[int] = None,
+) -> tuple[dict[str, Any], list[dict[str, Any]], int]:
+    """Summarize a thread from the ``thread_summaries`` cache, folding in only messages past its high-water mark.
+
+    The cached row is rebuilt from scratch when messages at or below the mark changed (count mismatch). The LLM
+    is only consulted again once the thread grew by ``THREAD_SUMMARY_LLM_REFRESH_MESSAGES`` messages that fall
+    inside the excerpt window it reads.
+    """
+    settings = get_settings()
+    await ensure_schema()
+    async with get_session() as session:
+        count, high_water = (
+            await session.execute(
+                select(func.count(cast(Any, Message.id)), func.max(Message.id)).where(  # type: ignore[call-overload]
+                    cast(Any, Message.project_id).in_(list(project_ids)), or_(*_thread_criteria(thread_id))
+                )
+            )
+        ).one()
+        count = int(count or 0)
+        high_water = int(high_water or 0)
+        if not count:
+            return _summarize_messages([]), [], 0
+        if per_thread_limit and count > per_thread_limit:
+            # The first N messages are a fixed prefix; bounded work, not worth a cache row per limit
+            rows = await _load_thread_rows(project_ids, thread_id, limit=per_thread_limit)
+            summary = _summarize_messages(rows)
+            return summary, _thread_examples(rows) if include_examples else [], len(rows)
+        cached = (
+            await session.execute(
+                select(ThreadSummary).where(
+                    cast(Any, ThreadSummary.scope) == scope, cast(Any, ThreadSummary.thread_key) == thread_id
+                )
+            )
+        ).scalars().first()
+
+    thread_rows: Optional[list[Any]] = None
+    if cached is None or cached.last_message_id > high_water:
+        rebuild = True
+    elif cached.last_message_id == high_water:
+        rebuild = cached.message_count != count
+    else:
+        delta = await _load_thread_rows(project_ids, thread_id, after_id=cached.last_message_id)
+        rebuild = cached.message_count + len(delta) != count
+        if not rebuild:
+            state = _fold_thread_summary_state(dict(cached.state), delta)
+            examples = list(cached.examples)
+            if len(examples) < _THREAD_SUMMARY_EXAMPLES:
+                examples.extend(_thread_examples(delta)[: _THREAD_SUMMARY_EXAMPLES - len(examples)])
+    if rebuild:
+        thread_rows = await _load_thread_rows(project_ids, thread_id)
+        state = _fold_thread_summary_state(_empty_thread_summary_state(), thread_rows)
+        examples = _thread_examples(thread_rows)
+    elif high_water == cached.last_message_id:  # type: ignore[union-attr]
+        state = cached.state  # type: ignore[union-attr]
+        examples = cached.examples  # type: ignore[union-attr]
+
+    llm_model_key = llm_model or ""
+    llm_overrides: dict[str, Any] = dict(cached.llm_overrides) if cached is not None and not rebuild else {}
+    llm_count = cached.llm_message_count if cached is not None and not rebuild else 0
+    if llm_mode and settings.llm.enabled and count:
+        stale = (
+            llm_count == 0
+            or cached is None
+            or cached.llm_model != llm_model_key
+            or (
+                llm_count < _THREAD_SUMMARY_LLM_EXCERPTS
+                and count - llm_count >= max(1, settings.thread_summary_llm_refresh_messages)
+            )
+        )
+        if stale:
+            if thread_rows is None:
+                thread_rows = await _load_thread_rows(project_ids, thread_id, limit=_THREAD_SUMMARY_LLM_EXCERPTS)
+            llm_overrides = await _llm_thread_overrides(thread_rows, llm_model, thread_id=thread_id)
+            llm_count = count
+
+    if (
+        cached is None
+        or rebuild
+        or cached.last_message_id != high_water
+        or cached.llm_message_count != llm_count
+        or cached.llm_overrides != llm_overrides
+    ):
+        await _store_thread_summary(
+            scope, thread_id, high_water, count, state, examples, llm_model_key, llm_count, llm_overrides
+        )
+
+    summary = _render_thread_summary(state)
+    if llm_mode and settings.llm.enabled:
+        summary.update(llm_overrides)
+    return summary, list(examples) if include_examples else [], count
+
+
+async def _store_thread_summary(
+    scope: str,
+    thread_key: str,
+    last_message_id: int,
+    message_count: int,
+    state: dict[str, Any],
+    examples: list[dict[str, Any]],
+    llm_model: str,
+    llm_message_count: int,
+    llm_overrides: dict[str, Any],
+) -> None:
+    summary = ThreadSummary(
+        scope=scope,
+        thread_key=thread_key,
+        last_message_id=last_message_id,
+        message_count=message_count,
+        state=state,
+        examples=examples,
+        llm_model=llm_model,
+        llm_message_count=llm_message_count,
+        llm_overrides=llm_overrides,
+        updated_ts=datetime.now(timezone.utc),
+    )
+    values = summary.model_dump(exclude={"id", "scope", "thread_key"})
+    try:
+        async with get_session() as session:
+            updated = await session.execute(
+                update(ThreadSummary)
+                .where(cast(Any, ThreadSummary.scope) == scope, cast(Any, ThreadSummary.thread_key) == thread_key)
+                .values(**values)
+            )
+            if not updated.rowcount:  # type: ignore[attr-defined]
+                session.add(summary)
+            await session.commit()
+    except Exception as exc:
+        # Cache write races (two callers inserting the same thread) only cost a recompute next time
+        logger.debug("thread_summary.cache_store_failed", extra={"scope": scope, "thread_id": thread_key, "error": str(exc)})
+
+
+async def _summarize_thread_across(
+    scope: str,
+    project_ids: Sequence[int],
+    thread_id: str,
+    include_examples: bool,
+    llm_mode: bool,
+    llm_model: Optional[str],
+    *,
+    per_thread_limit: Optional[int] = None,
+) -> tuple[dict[str, Any], list[dict[str, Any]], int]:
+    if get_settings().thread_summary_cache_enabled:
+        return await _summarize_thread_cached(
+            scope, project_ids, thread_id, include_examples, llm_mode, llm_model, per_thread_limit=per_thread_limit
+        )
+    await ensure_schema()
+    rows = await _load_thread_rows(project_ids, thread_id, limit=per_thread_limit)
+    summary = _summarize_messages(rows)
+    if llm_mode and get_settings().llm.enabled:
+        summary.update(await _llm_thread_overrides(rows, llm_model, thread_id=thread_id))
+    return summary, _thread_examples(rows) if include_examples else [], len(rows)
+
+
 async def _compute_thread_summary(
     project: Project,
     thread_id: str,
@@ -2713,85 +4683,72 @@ async def _compute_thread_summary(
 ) -> tuple[dict[str, Any], list[dict[str, Any]], int]:
     if project.id is None:
         raise ValueError("Project must have an id before summarizing threads.")
+    return await _summarize_thread_across(
+        f"project:{project.id}",
+        [project.id],
+        thread_id,
+        include_examples,
+        llm_mode,
+        llm_model,
+        per_thread_limit=per_thread_limit,
+    )
+
+
+async def _get_message(project: Project, message_id: int) -> Message:
+    if project.id is None:
+        raise ValueError("Project must have an id before reading messages.")
     await ensure_schema()
-    sender_alias = aliased(Agent)
-    try:
-        message_id = int(thread_id)
-    except ValueError:
-        message_id = None
-    criteria = [Message.thread_id == thread_id]
-    if message_id is not None:
-        criteria.append(Message.id == message_id)
     async with get_session() as session:
-        stmt = (
-            cast(Any, select(Message, sender_alias.name))  # type: ignore[call-overload]
-            .join(sender_alias, cast(Any, Message.sender_id == sender_alias.id))
-            .where(Message.project_id == project.id, or_(*criteria))  # type: ignore[arg-type]
-            .order_by(asc(cast(Any, Message.created_ts)))
+        result = await session.execute(
+            select(Message).where(Message.project_id == project.id, Message.id == message_id)  # type: ignore[arg-type]
         )
-        if per_thread_limit:
-            stmt = stmt.limit(per_thread_limit)
-        result = await session.execute(stmt)
-        rows = result.all()
-    summary = _summarize_messages(rows)  # type: ignore[arg-type]
+        message = result.scalars().first()
+        if not message:
+            raise NoResultFound(f"Message '{message_id}' not found for project '{project.human_key}'.")
+        return message
 
-    if llm_mode and get_settings().llm.enabled:
-        try:
-            excerpts: list[str] = []
-            for message, sender_name in rows[:15]:
-                excerpts.append(f"- {sender_name}: {message.subject}\n{message.body_md[:800]}")
-            if excerpts:
-                system = (
-                    "You are a senior engineer. Produce a concise JSON summary with keys: "
-                    "participants[], key_points[], action_items[], mentions[{name,count}], code_references[], "
-                    "total_messages, open_actions, done_actions. Derive from the given thread excerpts."
-                )
-                user = "\n\n".join(excerpts)
-                llm_resp = await complete_system_user(system, user, model=llm_model)
-                parsed = _parse_json_safely(llm_resp.content)
-                if parsed:
-                    for key in (
-                        "participants",
-                        "key_points",
-                        "action_items",
-                        "mentions",
-                        "code_references",
-                        "total_messages",
-                        "open_actions",
-                        "done_actions",
-                    ):
-                        value = parsed.get(key)
-                        if value:
-                            summary[key] = value
-        except Exception as e:
-            logger.debug("thread_summary.llm_skipped", extra={"thread_id": thread_id, "error": str(e)})
-
-    examples: list[dict[str, Any]] = []
-    if include_examples:
-        for message, sender_name in rows[:3]:
-            examples.append(
-                {
-                    "id": message.id,
-                    "subject": message.subject,
-                    "from": sender_name,
-                    "created_ts": _iso(message.created_ts),
-                }
+
+async def _get_agents_batch(project: Project, names: Sequence[str]) -> dict[str, Agent]:
+    """Resolve several agent names (case-insensitive) with one ``IN (...)`` query for cache misses.
+
+    Returns a mapping keyed by ``name.lower()``; unknown names are simply absent.
+    """
+    resolved: dict[str, Agent] = {}
+    missing: list[str] = []
+    for name in names:
+        if not name or not name.strip():
+            continue
+        lowered = name.lower()
+        if lowered in resolved or lowered in missing:
+            continue
+        cached = _IDENTITY_CACHE.get(_IDENTITY_CACHE.agent_key(project.id, name), Agent)
+        if cached is not None:
+            resolved[lowered] = cast(Agent, cached)
+        else:
+            missing.append(lowered)
+    if missing:
+        await ensure_schema()
+        async with get_session() as session:
+            result = await session.execute(
+                select(Agent).where(
+                    cast(Any, Agent.project_id) == project.id,
+                    func.lower(Agent.name).in_(missing),
+                )
             )
-    return summary, examples, len(rows)
+            for agent in result.scalars().all():
+                resolved.setdefault(agent.name.lower(), agent)
+                _IDENTITY_CACHE.put(agent)
+    return resolved
 
 
-async def _get_message(project: Project, message_id: int) -> Message:
-    if project.id is None:
-        raise ValueError("Project must have an id before reading messages.")
-    await ensure_schema()
-    async with get_session() as session:
-        result = await session.execute(
-            select(Message).where(Message.project_id == project.id, Message.id == message_id)  # type: ignore[arg-type]
-        )
-        message = result.scalars().first()
-        if not message:
-            raise NoResultFound(f"Message '{message_id}' not found for project '{project.human_key}'.")
-        return message
+async def _resolve_agents(project: Project, names: Sequence[str]) -> list[Agent]:
+    """Batched ``_get_agent`` preserving order; unknown names raise the usual NOT_FOUND error."""
+    found = await _get_agents_batch(project, names)
+    agents: list[Agent] = []
+    for name in names:
+        agent = found.get(name.lower()) if name else None
+        agents.append(agent if agent is not None else await _get_agent(project, name))
+    return agents
 
 
 async def _get_agent_by_id(project: Project, agent_id: int) -> Agent:
@@ -2815,6 +4772,8 @@ async def _update_recipient_timestamp(
 ) -> Optional[datetime]:
     if agent.id is None:
         raise ValueError("Agent must have an id before updating message state.")
+    if field == "ack_ts":
+        _ACK_DEADLINES.cancel(message_id, agent.id)
     now = datetime.now(timezone.utc)
     async with get_session() as session:
         # Read current value first
@@ -2891,9 +4850,10 @@ def build_mcp_server() -> FastMCP:
         to_names = _unique(to_names)
         cc_names = _unique(cc_names)
         bcc_names = _unique(bcc_names)
-        to_agents = [await _get_agent(project, name) for name in to_names]
-        cc_agents = [await _get_agent(project, name) for name in cc_names]
-        bcc_agents = [await _get_agent(project, name) for name in bcc_names]
+        resolved_agents = await _resolve_agents(project, [*to_names, *cc_names, *bcc_names])
+        to_agents = resolved_agents[: len(to_names)]
+        cc_agents = resolved_agents[len(to_names) : len(to_names) + len(cc_names)]
+        bcc_agents = resolved_agents[len(to_names) + len(cc_names) :]
         recipient_records: list[tuple[Agent, str]] = [(agent, "to") for agent in to_agents]
         recipient_records.extend((agent, "cc") for agent in cc_agents)
         recipient_records.extend((agent, "bcc") for agent in bcc_agents)
@@ -2909,8 +4869,12 @@ def build_mcp_server() -> FastMCP:
             embed_policy = sender.attachments_policy
 
         payload: dict[str, Any] | None = None
+        # Write-behind: the DB transaction also queues the archive write, so the Git commit leaves the
+        # request path and the project archive lock is only needed while attachments are stored.
+        write_behind = settings.storage.write_behind_enabled
+        recipients_for_archive = [agent.name for agent in to_agents + cc_agents + bcc_agents]
 
-        async with _archive_write_lock(archive):
+        async with contextlib.nullcontext() if write_behind else _archive_write_lock(archive):
             # Server-side file_reservations enforcement: block if conflicting active exclusive file_reservation exists
             if settings.file_reservations_enforcement_enabled:
                 await _expire_stale_file_reservations(project.id or 0)
@@ -2921,30 +4885,22 @@ def build_mcp_server() -> FastMCP:
                 candidate_surfaces.append(f"agents/{sender.name}/outbox/{y_dir}/{m_dir}/*.md")
                 for r in to_agents + cc_agents + bcc_agents:
                     candidate_surfaces.append(f"agents/{r.name}/inbox/{y_dir}/{m_dir}/*.md")
+                if mailbox_layout(settings) == "index":
+                    candidate_surfaces.append(f"agents/{sender.name}/outbox/{y_dir}/{m_dir}/{MAILBOX_INDEX_NAME}")
+                    for r in to_agents + cc_agents + bcc_agents:
+                        candidate_surfaces.append(f"agents/{r.name}/inbox/{y_dir}/{m_dir}/{MAILBOX_INDEX_NAME}")
 
-                async with get_session() as session:
-                    rows = await session.execute(
-                        cast(Any, select(FileReservation, Agent.name))  # type: ignore[call-overload]
-                        .join(Agent, cast(Any, FileReservation.agent_id) == Agent.id)
-                        .where(
-                            cast(Any, FileReservation.project_id) == project.id,
-                            cast(Any, FileReservation.released_ts).is_(None),
-                            cast(Any, FileReservation.expires_ts) > now_ts,
-                        )
-                    )
-                    active_file_reservations = rows.all()
-
+                reservation_index = await _RESERVATION_INDEX.get(project.id or 0)
                 conflicts: list[dict[str, Any]] = []
                 for surface in candidate_surfaces:
-                    for file_reservation_record, holder_name in active_file_reservations:
-                        if _file_reservations_conflict(file_reservation_record, surface, True, sender):
-                            conflicts.append({
-                                "surface": surface,
-                                "holder": holder_name,
-                                "path_pattern": file_reservation_record.path_pattern,
-                                "exclusive": file_reservation_record.exclusive,
-                                "expires_ts": _iso(file_reservation_record.expires_ts),
-                            })
+                    for held in reservation_index.conflicts(surface, exclusive=True, agent_id=sender.id, now=now_ts):
+                        conflicts.append({
+                            "surface": surface,
+                            "holder": held.holder,
+                            "path_pattern": held.path_pattern,
+                            "exclusive": held.exclusive,
+                            "expires_ts": _iso(held.expires_ts),
+                        })
                 if conflicts:
                     # Return a structured error payload that clients can surface directly
                     return {
@@ -2955,16 +4911,72 @@ def build_mcp_server() -> FastMCP:
                         }
                     }
 
-            processed_body, attachments_meta, attachment_files = await process_attachments(
-                archive,
-                body_md,
-                attachment_paths or [],
-                convert_markdown,
-                embed_policy=embed_policy,
-            )
+            stores_attachments = bool(attachment_paths) or (convert_markdown and "![" in body_md)
+            async with (
+                _archive_write_lock(archive) if write_behind and stores_attachments else contextlib.nullcontext()
+            ):
+                processed_body, attachments_meta, attachment_files = await process_attachments(
+                    archive,
+                    body_md,
+                    attachment_paths or [],
+                    convert_markdown,
+                    embed_policy=embed_policy,
+                )
             # Fallback: if body contains inline data URI, reflect that in attachments meta for API parity
             if not attachments_meta and ("data:image" in body_md):
                 attachments_meta.append({"type": "inline", "media_type": "image/webp"})
+
+            rendered: dict[str, Any] = {}
+
+            def _render_archive_job(created: Message) -> dict[str, Any]:
+                frontmatter = _message_frontmatter(
+                    created,
+                    project,
+                    sender,
+                    to_agents,
+                    cc_agents,
+                    bcc_agents,
+                    attachments_meta,
+                )
+                message_payload = _message_to_dict(created)
+                message_payload.update(
+                    {
+                        "from": sender.name,
+                        "to": [agent.name for agent in to_agents],
+                        "cc": [agent.name for agent in cc_agents],
+                        "bcc": [agent.name for agent in bcc_agents],
+                        "attachments": attachments_meta,
+                    }
+                )
+                result_snapshot: dict[str, Any] = {
+                    "deliveries": [
+                        {
+                            "project": project.human_key,
+                            "payload": message_payload,
+                        }
+                    ],
+                    "count": 1,
+                }
+                panel_end = time.perf_counter()
+                commit_panel_text = _render_commit_panel(
+                    tool_name,
+                    project.human_key,
+                    sender.name,
+                    call_start,
+                    panel_end,
+                    result_snapshot,
+                    frontmatter.get("created"),
+                )
+                rendered["payload"] = message_payload
+                return {
+                    "frontmatter": frontmatter,
+                    "body_md": processed_body,
+                    "sender": sender.name,
+                    "recipients": recipients_for_archive,
+                    "extra_paths": list(attachment_files),
+                    "commit_text": commit_panel_text,
+                }
+
             message = await _create_message(
                 project,
                 sender,
@@ -2975,55 +4987,23 @@ def build_mcp_server() -> FastMCP:
                 ack_required,
                 thread_id,
                 attachments_meta,
+                archive_job=_render_archive_job if write_behind else None,
             )
-            frontmatter = _message_frontmatter(
-                message,
-                project,
-                sender,
-                to_agents,
-                cc_agents,
-                bcc_agents,
-                attachments_meta,
-            )
-            recipients_for_archive = [agent.name for agent in to_agents + cc_agents + bcc_agents]
-            payload = _message_to_dict(message)
-            payload.update(
-                {
-                    "from": sender.name,
-                    "to": [agent.name for agent in to_agents],
-                    "cc": [agent.name for agent in cc_agents],
-                    "bcc": [agent.name for agent in bcc_agents],
-                    "attachments": attachments_meta,
-                }
-            )
-            result_snapshot: dict[str, Any] = {
-                "deliveries": [
-                    {
-                        "project": project.human_key,
-                        "payload": payload,
-                    }
-                ],
-                "count": 1,
-            }
-            panel_end = time.perf_counter()
-            commit_panel_text = _render_commit_panel(
-                tool_name,
-                project.human_key,
-                sender.name,
-                call_start,
-                panel_end,
-                result_snapshot,
-                frontmatter.get("created"),
-            )
-            await write_message_bundle(
-                archive,
-                frontmatter,
-                processed_body,
-                sender.name,
-                recipients_for_archive,
-                attachment_files,
-                commit_panel_text,
-            )
+            if write_behind:
+                payload = rendered["payload"]
+                _signal_archive_outbox()
+            else:
+                job = _render_archive_job(message)
+                payload = rendered["payload"]
+                await write_message_bundle(
+                    archive,
+                    job["frontmatter"],
+                    processed_body,
+                    sender.name,
+                    recipients_for_archive,
+                    attachment_files,
+                    job["commit_text"],
+                )
         await ctx.info(
             f"Message {message.id} created by {sender.name} (to {', '.join(recipients_for_archive)})"
         )
@@ -3047,6 +5027,7 @@ def build_mcp_server() -> FastMCP:
         ----------------------------------
         - Reports current environment and HTTP binding details.
         - Returns the configured database URL (not a live connection test).
+        - When archive write-behind is enabled, reports the archive outbox queue depth and lag.
         - Does not perform deep dependency health checks or connection attempts.
 
         Returns
@@ -3057,7 +5038,8 @@ def build_mcp_server() -> FastMCP:
               "environment": str,
               "http_host": str,
               "http_port": int,
-              "database_url": str
+              "database_url": str,
+              "archive_outbox": {"enabled": bool, "depth": int, "failed": int, "blocked": int, "lag_seconds": float, ...}
             }
 
         Examples
@@ -3078,6 +5060,7 @@ def build_mcp_server() -> FastMCP:
             "http_host": settings.http.host,
             "http_port": settings.http.port,
             "database_url": settings.database.url,
+            "archive_outbox": await _archive_outbox_status(get_settings()),
         }
 
     @mcp.tool(name="ensure_project")
@@ -3686,74 +5669,51 @@ def build_mcp_server() -> FastMCP:
                 pass
             # For each recipient, require link unless policy/open or in auto_ok
             blocked_recipients: list[str] = []
-            async with get_session() as s3:
-                for nm in to + (cc or []) + (bcc or []):
-                    if nm in auto_ok_names:
-                        continue
-                    # recipient lookup
-                    try:
-                        rec = await _get_agent(project, nm)
-                    except Exception:
-                        continue
-                    rec_policy = getattr(rec, "contact_policy", "auto").lower()
-                    # allow self always
-                    if rec.name == sender.name:
-                        continue
-                    if rec_policy == "open":
-                        continue
-                    if rec_policy == "block_all":
-                        await ctx.error("CONTACT_BLOCKED: Recipient is not accepting messages.")
-                        raise ToolExecutionError(
-                            "CONTACT_BLOCKED",
-                            "Recipient is not accepting messages.",
-                            recoverable=True,
-                        )
-                    # contacts_only or auto -> must have approved link or prior contact within TTL
-                    ttl = timedelta(seconds=int(settings_local.contact_auto_ttl_seconds))
-                    recent_ok = False
-                    try:
-                        # check any message between these two within TTL
-                        since_dt = now_utc - ttl
-                        q = text(
-                            """
-                            SELECT 1 FROM messages m
-                            WHERE m.project_id = :pid
-                              AND m.created_ts > :since
-                              AND (
-                                   (m.sender_id = :sid AND EXISTS (SELECT 1 FROM message_recipients mr JOIN agents a ON a.id = mr.agent_id WHERE mr.message_id=m.id AND a.name = :rname))
-                                   OR
-                                   (EXISTS (SELECT 1 FROM message_recipients mr JOIN agents a ON a.id = mr.agent_id WHERE mr.message_id=m.id AND a.name = :sname) AND m.sender_id = (SELECT id FROM agents WHERE project_id=:pid AND name=:rname))
-                              )
-                            LIMIT 1
-                            """
-                        )
-                        row = await s3.execute(q, {"pid": project.id, "since": since_dt, "sid": sender.id, "sname": sender.name, "rname": rec.name})
-                        recent_ok = row.first() is not None
-                    except Exception:
-                        recent_ok = False
-                    if rec_policy == "auto" and recent_ok:
-                        continue
-                    # check approved AgentLink (local project)
-                    try:
-                        link = await s3.execute(
-                            select(AgentLink)
-                            .where(  # type: ignore[arg-type]
-                                cast(Any, AgentLink.a_project_id) == project.id,
-                                cast(Any, AgentLink.a_agent_id) == sender.id,
-                                cast(Any, AgentLink.b_project_id) == project.id,
-                                cast(Any, AgentLink.b_agent_id) == rec.id,
-                                cast(Any, AgentLink.status == "approved"),
-                            )
-                            .limit(1)
-                        )
-                        if link.first() is not None:
-                            continue
-                    except Exception:
-                        pass
-                    # If message requires acknowledgement and recipient is local, allow to proceed without a link
-                    if ack_required:
-                        continue
-                    blocked_recipients.append(rec.name)
+            policy_agents = await _get_agents_batch(
+                project, [nm for nm in to + (cc or []) + (bcc or []) if nm not in auto_ok_names]
+            )
+            # One recent_contacts lookup and one (cached) approved-links set cover the whole recipient list
+            ttl = timedelta(seconds=int(settings_local.contact_auto_ttl_seconds))
+            try:
+                recent_ids = await _recent_contact_ids(
+                    project, sender, [cast(int, a.id) for a in policy_agents.values()], now_utc - ttl
+                )
+            except Exception:
+                recent_ids = set()
+            try:
+                approved_links = await _APPROVED_LINKS.approved(cast(int, project.id), cast(int, sender.id))
+            except Exception:
+                approved_links = frozenset()
+            for nm in to + (cc or []) + (bcc or []):
+                if nm in auto_ok_names:
+                    continue
+                # recipient lookup
+                rec = policy_agents.get(nm.lower())
+                if rec is None:
+                    continue
+                rec_policy = getattr(rec, "contact_policy", "auto").lower()
+                # allow self always
+                if rec.name == sender.name:
+                    continue
+                if rec_policy == "open":
+                    continue
+                if rec_policy == "block_all":
+                    await ctx.error("CONTACT_BLOCKED: Recipient is not accepting messages.")
+                    raise ToolExecutionError(
+                        "CONTACT_BLOCKED",
+                        "Recipient is not accepting messages.",
+                        recoverable=True,
+                    )
+                # contacts_only or auto -> must have approved link or prior contact within TTL
+                if rec_policy == "auto" and rec.id in recent_ids:
+                    continue
+                # check approved AgentLink (local project)
+                if (project.id, rec.id) in approved_links:
+                    continue
+                # If message requires acknowledgement and recipient is local, allow to proceed without a link
+                if ack_required:
+                    continue
+                blocked_recipients.append(rec.name)
 
             if blocked_recipients:
                 remedies = [
@@ -3785,31 +5745,21 @@ def build_mcp_server() -> FastMCP:
                         # If auto-retry is enabled and at least one handshake happened, re-evaluate recipients once
                         if settings_local.contact_auto_retry_enabled and attempted:
                             blocked_recipients = []
-                            async with get_session() as s3b:
-                                for nm in to + (cc or []) + (bcc or []):
-                                    try:
-                                        rec = await _get_agent(project, nm)
-                                    except Exception:
-                                        continue
-                                    if rec.name == sender.name:
-                                        continue
-                                    rec_policy = getattr(rec, "contact_policy", "auto").lower()
-                                    if rec_policy == "open":
-                                        continue
-                                    # After auto-approval, link should exist; double-check
-                                    link = await s3b.execute(
-                                        select(AgentLink)
-                                        .where(  # type: ignore[arg-type]
-                                            cast(Any, AgentLink.a_project_id) == project.id,
-                                            cast(Any, AgentLink.a_agent_id) == sender.id,
-                                            cast(Any, AgentLink.b_project_id) == project.id,
-                                            cast(Any, AgentLink.b_agent_id) == rec.id,
-                                            cast(Any, AgentLink.status == "approved"),
-                                        )
-                                        .limit(1)
-                                    )
-                                    if link.first() is None and not ack_required:
-                                        blocked_recipients.append(rec.name)
+                            # The handshake commits dropped the sender's cached link set, so this reloads it once
+                            approved_links = await _APPROVED_LINKS.approved(cast(int, project.id), cast(int, sender.id))
+                            retry_agents = await _get_agents_batch(project, to + (cc or []) + (bcc or []))
+                            for nm in to + (cc or []) + (bcc or []):
+                                rec = retry_agents.get(nm.lower())
+                                if rec is None:
+                                    continue
+                                if rec.name == sender.name:
+                                    continue
+                                rec_policy = getattr(rec, "contact_policy", "auto").lower()
+                                if rec_policy == "open":
+                                    continue
+                                # After auto-approval, link should exist; double-check
+                                if (project.id, rec.id) not in approved_links and not ack_required:
+                                    blocked_recipients.append(rec.name)
                     except Exception:
                         pass
                 if blocked_recipients:
@@ -4816,6 +6766,8 @@ def build_mcp_server() -> FastMCP:
         urgent_only: bool = False,
         include_bodies: bool = False,
         since_ts: Optional[str] = None,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
     ) -> list[dict[str, Any]]:
         """
         Retrieve recent messages for an agent without mutating read/ack state.
@@ -4826,11 +6778,13 @@ def build_mcp_server() -> FastMCP:
         - `since_ts`: ISO-8601 timestamp string; messages strictly newer than this are returned
         - `limit`: max number of messages (default 20)
         - `include_bodies`: include full Markdown bodies in the payloads
+        - `before_id` / `after_id`: page cursors; the `limit` messages just older / newer than that message id
 
         Usage patterns
         --------------
         - Poll after each editing step in an agent loop to pick up coordination messages.
         - Use `since_ts` with the timestamp from your last poll for efficient incremental fetches.
+        - Page back through history with `before_id` set to the oldest id of the previous page.
         - Combine with `acknowledge_message` if `ack_required` is true.
 
         Returns
@@ -4874,13 +6828,95 @@ def build_mcp_server() -> FastMCP:
         try:
             project = await _get_project_by_identifier(project_key)
             agent = await _get_agent(project, agent_name)
-            items = await _list_inbox(project, agent, limit, urgent_only, include_bodies, since_ts)
+            items = await _list_inbox(
+                project, agent, limit, urgent_only, include_bodies, since_ts, before_id=before_id, after_id=after_id
+            )
             await ctx.info(f"Fetched {len(items)} messages for '{agent.name}'. urgent_only={urgent_only}")
             return items
         except Exception as exc:
             _rich_error_panel("fetch_inbox", {"error": str(exc)})
             raise
 
+    @mcp.tool(name="wait_for_mail")
+    @_instrument_tool(
+        "wait_for_mail",
+        cluster=CLUSTER_MESSAGING,
+        capabilities={"messaging", "read"},
+        project_arg="project_key",
+        agent_arg="agent_name",
+    )
+    async def wait_for_mail(
+        ctx: Context,
+        project_key: str,
+        agent_name: str,
+        timeout_seconds: float = 60.0,
+        since_ts: Optional[str] = None,
+        limit: int = 20,
+        urgent_only: bool = False,
+        include_bodies: bool = False,
+        after_id: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Block until new inbox messages arrive for an agent, then return them (long-poll `fetch_inbox`).
+
+        Parameters
+        ----------
+        timeout_seconds : float
+            How long to wait (capped at 300). An empty list means nothing arrived in time.
+        since_ts : Optional[str]
+            ISO-8601 cursor; messages strictly newer than this are returned immediately if any exist.
+            When omitted, only messages delivered after the call starts count.
+        after_id : Optional[int]
+            Message-id cursor that replaces `since_ts`: returns messages after that message in (created_ts, id)
+            order, so messages sharing its timestamp are not skipped.
+        limit, urgent_only, include_bodies
+            Same as `fetch_inbox`.
+
+        Usage patterns
+        --------------
+        - Replace sleep-and-poll loops: call again with the last item's `id` as `after_id`; a backlog
+          larger than `limit` is returned across successive calls without gaps. `since_ts` is a strict
+          timestamp cursor and can skip messages that share a `created_ts` when `limit` cuts a burst.
+        - The server wakes the call the moment a message is delivered; idle waits do no database work.
+
+        Returns
+        -------
+        list[dict]
+            Same shape as `fetch_inbox`, but oldest first: the `limit` messages just after the cursor. The last
+            item's `id` is the `after_id` for the next call.
+
+        Example
+        -------
+        ```json
+        {"jsonrpc":"2.0","id":"8","method":"tools/call","params":{"name":"wait_for_mail","arguments":{
+          "project_key":"/abs/path/backend","agent_name":"BlueLake","timeout_seconds":60,"after_id":1234
+        }}}
+        ```
+        """
+        if limit < 1:
+            raise ToolExecutionError(
+                error_type="INVALID_LIMIT",
+                message=f"limit must be at least 1, got {limit}. Use a positive integer.",
+                recoverable=True,
+                data={"provided": limit, "min": 1, "max": 1000},
+            )
+        limit = min(limit, 1000)
+        _validate_iso_timestamp(since_ts, "since_ts")
+        project = await _get_project_by_identifier(project_key)
+        agent = await _get_agent(project, agent_name)
+        items = await _wait_for_inbox(
+            project,
+            agent,
+            since_ts=since_ts,
+            timeout_seconds=timeout_seconds,
+            limit=limit,
+            urgent_only=urgent_only,
+            include_bodies=include_bodies,
+            after_id=after_id,
+        )
+        await ctx.info(f"wait_for_mail returned {len(items)} messages for '{agent.name}'.")
+        return items
+
     @mcp.tool(name="mark_message_read")
     @_instrument_tool(
         "mark_message_read",
@@ -5431,18 +7467,18 @@ def build_mcp_server() -> FastMCP:
             async with get_session() as session:
                 result = await session.execute(
                     text(
-                        """
+                        f"""
                         SELECT m.id, m.subject, m.body_md, m.importance, m.ack_required, m.created_ts,
                                m.thread_id, a.name AS sender_name
                         FROM fts_messages
                         JOIN messages m ON fts_messages.rowid = m.id
                         JOIN agents a ON m.sender_id = a.id
                         WHERE m.project_id = :project_id AND fts_messages MATCH :query
-                        ORDER BY bm25(fts_messages) ASC
+                        ORDER BY {FTS_MESSAGES_BM25} ASC
                         LIMIT :limit
                         """
                     ),
-                    {"project_id": project.id, "query": sanitized_query, "limit": limit},
+                    {"project_id": project.id, "query": scope_fts_query(sanitized_query, [project.id]), "limit": limit},
                 )
                 rows = list(result.mappings().all())
         except Exception as fts_err:
@@ -5553,39 +7589,24 @@ def build_mcp_server() -> FastMCP:
             raise ValueError("Project must have an id before summarizing threads.")
         await ensure_schema()
 
-        sender_alias = aliased(Agent)
         all_mentions: dict[str, int] = {}
         all_actions: list[str] = []
         all_points: list[str] = []
         thread_summaries: list[dict[str, Any]] = []
 
-        async with get_session() as session:
-            for tid in thread_ids:
-                try:
-                    seed_id = int(tid)
-                except ValueError:
-                    seed_id = None
-                criteria = [cast(Any, Message.thread_id) == tid]
-                if seed_id is not None:
-                    criteria.append(cast(Any, Message.id) == seed_id)
-                stmt = (
-                    cast(Any, select(Message, sender_alias.name))  # type: ignore[call-overload]
-                    .join(sender_alias, cast(Any, Message.sender_id == sender_alias.id))
-                    .where(Message.project_id == project.id, or_(*criteria))
-                    .order_by(asc(cast(Any, Message.created_ts)))
-                    .limit(per_thread_limit)
-                )
-                rows = (await session.execute(stmt)).all()
-                summary = _summarize_messages(rows)  # type: ignore[arg-type]
-                # accumulate
-                for m in summary.get("mentions", []):
-                    name = str(m.get("name", "")).strip()
-                    if not name:
-                        continue
-                    all_mentions[name] = all_mentions.get(name, 0) + int(m.get("count", 0) or 0)
-                all_actions.extend(summary.get("action_items", []))
-                all_points.extend(summary.get("key_points", []))
-                thread_summaries.append({"thread_id": tid, "summary": summary})
+        for tid in thread_ids:
+            summary, _examples, _total = await _compute_thread_summary(
+                project, tid, False, False, None, per_thread_limit=per_thread_limit
+            )
+            # accumulate
+            for m in summary.get("mentions", []):
+                name = str(m.get("name", "")).strip()
+                if not name:
+                    continue
+                all_mentions[name] = all_mentions.get(name, 0) + int(m.get("count", 0) or 0)
+            all_actions.extend(summary.get("action_items", []))
+            all_points.extend(summary.get("key_points", []))
+            thread_summaries.append({"thread_id": tid, "summary": summary})
 
         # Lightweight heuristic digest
         top_mentions = sorted(all_mentions.items(), key=lambda kv: (-kv[1], kv[0]))[:10]
@@ -5810,34 +7831,23 @@ def build_mcp_server() -> FastMCP:
             warning = _detect_suspicious_file_reservation(pattern)
             if warning:
                 await ctx.info(f"[warn] {warning}")
-        async with get_session() as session:
-            existing_rows = await session.execute(
-                cast(Any, select(FileReservation, Agent.name))  # type: ignore[call-overload]
-                .join(Agent, cast(Any, FileReservation.agent_id) == Agent.id)
-                .where(
-                    cast(Any, FileReservation.project_id) == project_id,
-                    cast(Any, FileReservation.released_ts).is_(None),
-                    cast(Any, FileReservation.expires_ts) > datetime.now(timezone.utc),
-                )
-            )
-            existing_reservations = existing_rows.all()
-
         granted: list[dict[str, Any]] = []
         conflicts: list[dict[str, Any]] = []
         archive = await ensure_archive(settings, project.slug)
         async with _archive_write_lock(archive):
+            reservation_index = await _RESERVATION_INDEX.get(project_id)
             for path in paths:
-                conflicting_holders: list[dict[str, Any]] = []
-                for file_reservation_record, holder_name in existing_reservations:
-                    if _file_reservations_conflict(file_reservation_record, path, exclusive, agent):
-                        conflicting_holders.append(
-                            {
-                                "agent": holder_name,
-                                "path_pattern": file_reservation_record.path_pattern,
-                                "exclusive": file_reservation_record.exclusive,
-                                "expires_ts": _iso(file_reservation_record.expires_ts),
-                            }
-                        )
+                conflicting_holders: list[dict[str, Any]] = [
+                    {
+                        "agent": held.holder,
+                        "path_pattern": held.path_pattern,
+                        "exclusive": held.exclusive,
+                        "expires_ts": _iso(held.expires_ts),
+                    }
+                    for held in reservation_index.conflicts(
+                        path, exclusive=exclusive, agent_id=agent.id, now=datetime.now(timezone.utc)
+                    )
+                ]
                 if conflicting_holders:
                     # Advisory model: still grant the file_reservation but surface conflicts
                     conflicts.append({"path": path, "holders": conflicting_holders})
@@ -5882,7 +7892,7 @@ def build_mcp_server() -> FastMCP:
                         "expires_ts": _iso(file_reservation.expires_ts),
                     }
                 )
-                existing_reservations.append((file_reservation, agent.name))  # type: ignore[attr-defined]
+            await _refresh_file_reservations_snapshot(project_id, project.slug)
         await ctx.info(f"Issued {len(granted)} file_reservations for '{agent.name}'. Conflicts: {len(conflicts)}")
         return {"granted": granted, "conflicts": conflicts}
 
@@ -5950,23 +7960,31 @@ def build_mcp_server() -> FastMCP:
                 raise ValueError("Project and agent must have ids before releasing file_reservations.")
             await ensure_schema()
             now = datetime.now(timezone.utc)
+            filters = [
+                cast(Any, FileReservation.project_id) == project.id,
+                cast(Any, FileReservation.agent_id) == agent.id,
+                cast(Any, FileReservation.released_ts).is_(None),
+            ]
+            if file_reservation_ids:
+                filters.append(cast(Any, FileReservation.id).in_(file_reservation_ids))
+            if paths:
+                filters.append(cast(Any, FileReservation.path_pattern).in_(paths))
+            affected = 0
             async with get_session() as session:
-                stmt = (
-                    update(FileReservation)
-                    .where(
-                        cast(Any, FileReservation.project_id) == project.id,
-                        cast(Any, FileReservation.agent_id) == agent.id,
-                        cast(Any, FileReservation.released_ts).is_(None),
+                # Resolve ids first so the reservation index can drop exactly the released rows
+                id_rows = await session.execute(select(FileReservation.id).where(*filters))  # type: ignore[call-overload]
+                released_ids = [int(rid) for rid in id_rows.scalars().all()]
+                if released_ids:
+                    result = await session.execute(
+                        update(FileReservation)
+                        .where(*filters, cast(Any, FileReservation.id).in_(released_ids))
+                        .values(released_ts=now)
                     )
-                    .values(released_ts=now)
-                )
-                if file_reservation_ids:
-                    stmt = stmt.where(cast(Any, FileReservation.id).in_(file_reservation_ids))
-                if paths:
-                    stmt = stmt.where(cast(Any, FileReservation.path_pattern).in_(paths))
-                result = await session.execute(stmt)
-                await session.commit()
-            affected = int(result.rowcount or 0)  # type: ignore[attr-defined]
+                    await session.commit()
+                    affected = int(result.rowcount or 0)  # type: ignore[attr-defined]
+            _RESERVATION_INDEX.discard(project.id, released_ids)
+            if affected:
+                await _refresh_file_reservations_snapshot(project.id, project.slug)
             await ctx.info(f"Released {affected} file_reservations for '{agent.name}'.")
             return {"released": affected, "released_at": _iso(now)}
         except Exception as exc:
@@ -6069,6 +8087,8 @@ def build_mcp_server() -> FastMCP:
                 .values(released_ts=now)
             )
             await session.commit()
+        _RESERVATION_INDEX.discard(project.id, [file_reservation_id])
+        await _refresh_file_reservations_snapshot(project.id, project.slug)
 
         reservation.released_ts = now
         settings = get_settings()
@@ -6244,6 +8264,8 @@ def build_mcp_server() -> FastMCP:
                     }
                 )
             await session.commit()
+        for file_reservation in file_reservations:
+            _RESERVATION_INDEX.renew(project.id, cast(int, file_reservation.id), file_reservation.expires_ts)
 
         # Update Git artifacts for the renewed file_reservations
         archive = await ensure_archive(settings, project.slug)
@@ -6260,6 +8282,7 @@ def build_mcp_server() -> FastMCP:
                     "expires_ts": file_reservation_info["new_expires_ts"],
                 }
                 await write_file_reservation_record(archive, payload)
+            await _refresh_file_reservations_snapshot(project.id, project.slug)
         await ctx.info(f"Renewed {len(updated)} file_reservation(s) for '{agent.name}'.")
         return {"renewed": len(updated), "file_reservations": updated}
 
@@ -6267,17 +8290,6 @@ def build_mcp_server() -> FastMCP:
     # Only registered when WORKTREES_ENABLED=1 to reduce token overhead for single-worktree setups
 
     if settings.worktrees_enabled:
-        def _safe_component(value: str) -> str:
-            # Keep it simple and dependency-free: replace common problematic filesystem chars
-            safe = value.strip()
-            for ch in ("/", "\\", ":", "*", "?", "\"", "<", ">", "|", " "):
-                safe = safe.replace(ch, "_")
-            return safe or "unknown"
-
-        def _slot_dir(archive: ProjectArchive, slot: str) -> Path:
-            safe = _safe_component(slot)
-            return archive.root / "build_slots" / safe
-
         def _compute_branch(path: str) -> Optional[str]:
             try:
                 with _git_repo(path) as repo:
@@ -6288,25 +8300,6 @@ def build_mcp_server() -> FastMCP:
             except Exception:
                 return None
 
-        def _read_active_slots(slot_path: Path, now: datetime) -> list[dict[str, Any]]:
-            results: list[dict[str, Any]] = []
-            if not slot_path.exists():
-                return results
-            for f in slot_path.glob("*.json"):
-                try:
-                    data = json.loads(f.read_text(encoding="utf-8"))
-                    exp = data.get("expires_ts")
-                    if exp:
-                        try:
-                            if datetime.fromisoformat(exp) <= now:
-                                continue
-                        except Exception:
-                            pass
-                    results.append(data)
-                except Exception:
-                    continue
-            return results
-
         @mcp.tool(name="acquire_build_slot")
         @_instrument_tool("acquire_build_slot", cluster=CLUSTER_BUILD_SLOTS, capabilities={"build"}, project_arg="project_key", agent_arg="agent_name")
         async def acquire_build_slot(
@@ -6316,41 +8309,43 @@ def build_mcp_server() -> FastMCP:
             slot: str,
             ttl_seconds: int = 3600,
             exclusive: bool = True,
+            wait_seconds: float = 0,
+            priority: int = 0,
         ) -> dict[str, Any]:
             """
-            Acquire a build slot (advisory), optionally exclusive. Returns conflicts when another holder is active.
+            Acquire a build slot, optionally exclusive, queueing behind current holders.
+
+            Requests are served in priority order (higher first), FIFO within a priority. With
+            ``wait_seconds > 0`` the call blocks until the slot is handed over (on release or lease
+            expiry) or the wait times out; otherwise it returns immediately.
+
+            A busy slot is not granted: ``granted`` is ``null`` and ``conflicts`` lists the holders.
+            Earlier releases were advisory and always returned a lease alongside the conflicts, so
+            callers must now check ``granted`` before assuming they hold the slot.
+
+            Returns
+            -------
+            dict
+                { granted: {slot, agent, branch, exclusive, expires_ts, ...} | null, conflicts: [...],
+                  position: int | null, waited_seconds }
             """
             project = await _get_project_by_identifier(project_key)
-            archive = await ensure_archive(settings, project.slug)
-            now = datetime.now(timezone.utc)
-            slot_path = _slot_dir(archive, slot)
-            await asyncio.to_thread(slot_path.mkdir, parents=True, exist_ok=True)
-            active = _read_active_slots(slot_path, now)
-
-            branch = _compute_branch(project.human_key)
-            holder_id = _safe_component(f"{agent_name}__{branch or 'unknown'}")
-            lease_path = slot_path / f"{holder_id}.json"
-
-            conflicts: list[dict[str, Any]] = []
-            if exclusive:
-                for entry in active:
-                    if entry.get("agent") == agent_name and entry.get("branch") == branch:
-                        continue
-                    if entry.get("exclusive", True):
-                        conflicts.append(entry)
-            payload = {
-                "slot": slot,
-                "agent": agent_name,
-                "branch": branch,
-                "exclusive": exclusive,
-                "acquired_ts": _iso(now),
-                "expires_ts": _iso(now + timedelta(seconds=max(ttl_seconds, 60))),
-            }
-            with contextlib.suppress(Exception):
-                await asyncio.to_thread(lease_path.write_text, json.dumps(payload, indent=2), "utf-8")
-            if conflicts:
-                await ctx.info(f"Build slot conflicts for '{slot}': {len(conflicts)}")
-            return {"granted": payload, "conflicts": conflicts}
+            branch = _compute_branch(project.human_key) or ""
+            result = await acquire_build_slot_lease(
+                cast(int, project.id),
+                slot,
+                agent_name,
+                branch,
+                exclusive=exclusive,
+                ttl_seconds=ttl_seconds,
+                priority=priority,
+                wait_seconds=wait_seconds,
+            )
+            if result["granted"] is None:
+                await ctx.info(
+                    f"Build slot '{slot}' busy: {len(result['conflicts'])} holder(s), queue position {result['position']}."
+                )
+            return result
 
         @mcp.tool(name="renew_build_slot")
         @_instrument_tool("renew_build_slot", cluster=CLUSTER_BUILD_SLOTS, capabilities={"build"}, project_arg="project_key", agent_arg="agent_name")
@@ -6362,24 +8357,12 @@ def build_mcp_server() -> FastMCP:
             extend_seconds: int = 1800,
         ) -> dict[str, Any]:
             """
-            Extend expiry for an existing build slot lease. No-op if missing.
+            Extend expiry for an existing build slot lease. No-op if the lease is missing or already expired.
             """
             project = await _get_project_by_identifier(project_key)
-            archive = await ensure_archive(settings, project.slug)
-            now = datetime.now(timezone.utc)
-            slot_path = _slot_dir(archive, slot)
-            branch = _compute_branch(project.human_key)
-            holder_id = _safe_component(f"{agent_name}__{branch or 'unknown'}")
-            lease_path = slot_path / f"{holder_id}.json"
-            try:
-                current = json.loads(lease_path.read_text(encoding="utf-8"))
-            except Exception:
-                current = {}
-            new_exp = _iso(now + timedelta(seconds=max(extend_seconds, 60)))
-            current.update({"slot": slot, "agent": agent_name, "branch": branch, "expires_ts": new_exp})
-            with contextlib.suppress(Exception):
-                await asyncio.to_thread(lease_path.write_text, json.dumps(current, indent=2), "utf-8")
-            return {"renewed": True, "expires_ts": new_exp}
+            branch = _compute_branch(project.human_key) or ""
+            new_exp = await renew_build_slot_lease(cast(int, project.id), slot, agent_name, branch, extend_seconds=extend_seconds)
+            return {"renewed": new_exp is not None, "expires_ts": _iso(new_exp) if new_exp else None}
 
         @mcp.tool(name="release_build_slot")
         @_instrument_tool("release_build_slot", cluster=CLUSTER_BUILD_SLOTS, capabilities={"build"}, project_arg="project_key", agent_arg="agent_name")
@@ -6390,26 +8373,16 @@ def build_mcp_server() -> FastMCP:
             slot: str,
         ) -> dict[str, Any]:
             """
-            Mark an active slot lease as released (non-destructive; keeps JSON with released_ts).
+            Release a slot lease (or withdraw a queued request) and hand the slot to the next waiter(s).
             """
             project = await _get_project_by_identifier(project_key)
-            archive = await ensure_archive(settings, project.slug)
-            now = datetime.now(timezone.utc)
-            slot_path = _slot_dir(archive, slot)
-            branch = _compute_branch(project.human_key)
-            holder_id = _safe_component(f"{agent_name}__{branch or 'unknown'}")
-            lease_path = slot_path / f"{holder_id}.json"
-            released = False
-            try:
-                data = {}
-                if lease_path.exists():
-                    data = json.loads(lease_path.read_text(encoding="utf-8"))
-                data.update({"released_ts": _iso(now), "expires_ts": _iso(now)})
-                await asyncio.to_thread(lease_path.write_text, json.dumps(data, indent=2), "utf-8")
-                released = True
-            except Exception:
-                released = False
-            return {"released": released, "released_at": _iso(now)}
+            branch = _compute_branch(project.human_key) or ""
+            released, handed_off = await release_build_slot_lease(cast(int, project.id), slot, agent_name, branch)
+            return {
+                "released": released,
+                "released_at": _iso(datetime.now(timezone.utc)),
+                "handed_off_to": [lease.agent for lease in handed_off],
+            }
 
     @mcp.resource("resource://config/environment", mime_type="application/json")
     def environment_resource() -> dict[str, Any]:
@@ -6631,18 +8604,18 @@ def build_mcp_server() -> FastMCP:
                 try:
                     result = await session.execute(
                         text(
-                            """
+                            f"""
                             SELECT m.id, m.subject, m.body_md, m.importance, m.ack_required, m.created_ts,
                                    m.thread_id, a.name AS sender_name, m.project_id
                             FROM fts_messages
                             JOIN messages m ON fts_messages.rowid = m.id
                             JOIN agents a ON m.sender_id = a.id
                             WHERE m.project_id IN :proj_ids AND fts_messages MATCH :query
-                            ORDER BY bm25(fts_messages) ASC
+                            ORDER BY {FTS_MESSAGES_BM25} ASC
                             LIMIT :limit
                             """
                         ).bindparams(bindparam("proj_ids", expanding=True)),
-                        {"proj_ids": proj_ids, "query": sanitized_query, "limit": limit},
+                        {"proj_ids": proj_ids, "query": scope_fts_query(sanitized_query, proj_ids), "limit": limit},
                     )
                     rows = list(result.mappings().all())
                 except Exception as fts_err:
@@ -6686,34 +8659,27 @@ def build_mcp_server() -> FastMCP:
             Retrieve recent messages for an agent across all projects linked to a product (non-mutating).
             """
             await ensure_schema()
-            # Collect linked projects
             async with get_session() as session:
                 prod = await _get_product_by_key(session, product_key.strip())
                 if prod is None:
                     raise ToolExecutionError("NOT_FOUND", f"Product '{product_key}' not found.", recoverable=True)
+            if prod.id is None:
+                return []
+            try:
+                return await _list_inbox_product(prod.id, agent_name, int(limit), urgent_only, include_bodies, since_ts)
+            except OperationalError as exc:
+                logger.warning(
+                    "product.inbox_query_failed",
+                    extra={"product_id": prod.id, "error": str(exc)},
+                )
+            async with get_session() as session:
                 proj_rows = await session.execute(
                     select(Project).join(ProductProjectLink, cast(Any, ProductProjectLink.project_id) == Project.id).where(
                         cast(Any, ProductProjectLink.product_id) == cast(Any, prod.id)
                     )
                 )
                 projects: list[Project] = list(proj_rows.scalars().all())
-            # For each project, if agent exists, list inbox items
-            messages: list[dict[str, Any]] = []
-            for project in projects:
-                try:
-                    ag = await _get_agent(project, agent_name)
-                except Exception:
-                    continue
-                proj_items = await _list_inbox(project, ag, limit, urgent_only, include_bodies, since_ts)
-                for item in proj_items:
-                    item["project_id"] = item.get("project_id") or project.id
-                    messages.append(item)
-            # Sort by created_ts desc and trim to limit
-            def _dt_key(it: dict[str, Any]) -> float:
-                ts = _parse_iso(str(it.get("created_ts") or ""))
-                return ts.timestamp() if ts else 0.0
-            messages.sort(key=_dt_key, reverse=True)
-            return messages[: max(0, int(limit))]
+            return await _list_inbox_fanout(projects, agent_name, int(limit), urgent_only, include_bodies, since_ts)
     else:
         async def fetch_inbox_product(ctx: Context, product_key: str, agent_name: str, limit: int = 20, urgent_only: bool = False, include_bodies: bool = False, since_ts: Optional[str] = None) -> list[dict[str, Any]]:  # type: ignore[misc]
             raise ToolExecutionError("FEATURE_DISABLED", "Product Bus is disabled. Enable WORKTREES_ENABLED to use this tool.")
@@ -6734,15 +8700,6 @@ def build_mcp_server() -> FastMCP:
             Summarize a thread (by id or thread key) across all projects linked to a product.
             """
             await ensure_schema()
-            sender_alias = aliased(Agent)
-            try:
-                seed_id = int(thread_id)
-            except ValueError:
-                seed_id = None
-            criteria = [Message.thread_id == thread_id]
-            if seed_id is not None:
-                criteria.append(Message.id == seed_id)
-
             async with get_session() as session:
                 prod = await _get_product_by_key(session, product_key.strip())
                 if prod is None:
@@ -6750,64 +8707,20 @@ def build_mcp_server() -> FastMCP:
                 proj_ids_rows = await session.execute(
                     cast(Any, select(ProductProjectLink.project_id)).where(cast(Any, ProductProjectLink.product_id) == cast(Any, prod.id))  # type: ignore[call-overload]
                 )
-                proj_ids = [int(row[0]) for row in proj_ids_rows.fetchall()]
-                if not proj_ids:
-                    return {"thread_id": thread_id, "summary": {"participants": [], "key_points": [], "action_items": [], "total_messages": 0}, "examples": []}
-                stmt = (
-                    cast(Any, select(Message, sender_alias.name))  # type: ignore[call-overload]
-                    .join(sender_alias, cast(Any, Message.sender_id == sender_alias.id))
-                    .where(cast(Any, Message.project_id).in_(proj_ids), or_(*cast(Any, criteria)))
-                    .order_by(asc(cast(Any, Message.created_ts)))
-                )
-                if per_thread_limit:
-                    stmt = stmt.limit(per_thread_limit)
-                rows = (await session.execute(stmt)).all()
-            summary = _summarize_messages(rows)  # type: ignore[arg-type]
-
-            # Optional LLM refinement (same as project-level)
-            if llm_mode and get_settings().llm.enabled:
-                try:
-                    excerpts: list[str] = []
-                    for message, sender_name in rows[:15]:
-                        excerpts.append(f"- {sender_name}: {message.subject}\n{message.body_md[:800]}")
-                    if excerpts:
-                        system = (
-                            "You are a senior engineer. Produce a concise JSON summary with keys: "
-                            "participants[], key_points[], action_items[], mentions[{name,count}], code_references[], "
-                            "total_messages, open_actions, done_actions. Derive from the given thread excerpts."
-                        )
-                        user = "\n\n".join(excerpts)
-                        llm_resp = await complete_system_user(system, user, model=llm_model)
-                        parsed = _parse_json_safely(llm_resp.content)
-                        if parsed:
-                            for key in (
-                                "participants",
-                                "key_points",
-                                "action_items",
-                                "mentions",
-                                "code_references",
-                                "total_messages",
-                                "open_actions",
-                                "done_actions",
-                            ):
-                                value = parsed.get(key)
-                                if value:
-                                    summary[key] = value
-                except Exception as e:
-                    await ctx.debug(f"summarize_thread_product.llm_skipped: {e}")
-
-            examples: list[dict[str, Any]] = []
-            if include_examples:
-                for message, sender_name in rows[:3]:
-                    examples.append(
-                        {
-                            "id": message.id,
-                            "subject": message.subject,
-                            "from": sender_name,
-                            "created_ts": _iso(message.created_ts),
-                        }
-                    )
-            await ctx.info(f"Summarized thread '{thread_id}' across product '{product_key}' with {len(rows)} messages")
+                proj_ids = sorted(int(row[0]) for row in proj_ids_rows.fetchall())
+            if not proj_ids:
+                return {"thread_id": thread_id, "summary": {"participants": [], "key_points": [], "action_items": [], "total_messages": 0}, "examples": []}
+            # Linking or unlinking a project changes the scope, so a stale product-wide summary is never reused
+            summary, examples, total_messages = await _summarize_thread_across(
+                f"product:{prod.id}:{','.join(map(str, proj_ids))}",
+                proj_ids,
+                thread_id,
+                include_examples,
+                llm_mode,
+                llm_model,
+                per_thread_limit=per_thread_limit,
+            )
+            await ctx.info(f"Summarized thread '{thread_id}' across product '{product_key}' with {total_messages} messages")
             return {"thread_id": thread_id, "summary": summary, "examples": examples}
     else:
         async def summarize_thread_product(ctx: Context, product_key: str, thread_id: str, include_examples: bool = False, llm_mode: bool = True, llm_model: Optional[str] = None, per_thread_limit: Optional[int] = None) -> dict[str, Any]:  # type: ignore[misc]
@@ -6949,6 +8862,15 @@ def build_mcp_server() -> FastMCP:
                         "required_capabilities": ["messaging", "read"],
                         "usage_examples": [{"hint": "Poll", "sample": "fetch_inbox(project_key='backend', agent_name='BlueLake', since_ts='2025-10-24T00:00:00Z')"}],
                     },
+                    {
+                        "name": "wait_for_mail",
+                        "summary": "Long-poll the inbox: returns as soon as new mail is delivered, or [] after the timeout.",
+                        "use_when": "Idle agents waiting on coordination replies instead of polling fetch_inbox in a loop.",
+                        "related": ["fetch_inbox", "acknowledge_message"],
+                        "expected_frequency": "Whenever an agent would otherwise sleep between polls.",
+                        "required_capabilities": ["messaging", "read"],
+                        "usage_examples": [{"hint": "Wait", "sample": "wait_for_mail(project_key='backend', agent_name='BlueLake', timeout_seconds=60, since_ts='2025-10-24T00:00:00Z')"}],
+                    },
                     {
                         "name": "mark_message_read",
                         "summary": "Record read_ts for FYI messages without sending acknowledgements.",
@@ -7185,6 +9107,7 @@ def build_mcp_server() -> FastMCP:
         return {
             "generated_at": _iso(datetime.now(timezone.utc)),
             "tools": _tool_metrics_snapshot(),
+            "identity_cache": _identity_cache_snapshot(),
         }
 
     @mcp.resource("resource://tooling/locks", mime_type="application/json")
@@ -7675,6 +9598,8 @@ def build_mcp_server() -> FastMCP:
         urgent_only: bool = False,
         include_bodies: bool = False,
         limit: int = 20,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
     ) -> dict[str, Any]:
         """
         Read an agent's inbox for a project.
@@ -7693,6 +9618,8 @@ def build_mcp_server() -> FastMCP:
             Include message bodies in results (default false).
         limit : int
             Maximum number of messages to return (default 20).
+        before_id, after_id : Optional[int]
+            Page cursors: the messages just older / newer than this message id.
 
         Returns
         -------
@@ -7731,6 +9658,12 @@ def build_mcp_server() -> FastMCP:
                 if parsed.get("limit"):
                     with suppress(Exception):
                         limit = int(parsed["limit"][0])
+                if parsed.get("before_id"):
+                    with suppress(Exception):
+                        before_id = int(parsed["before_id"][0])
+                if parsed.get("after_id"):
+                    with suppress(Exception):
+                        after_id = int(parsed["after_id"][0])
             except Exception:
                 pass
 
@@ -7751,7 +9684,9 @@ def build_mcp_server() -> FastMCP:
         else:
             project_obj = await _get_project_by_identifier(project)
         agent_obj = await _get_agent(project_obj, agent)
-        messages = await _list_inbox(project_obj, agent_obj, limit, urgent_only, include_bodies, since_ts)
+        messages = await _list_inbox(
+            project_obj, agent_obj, limit, urgent_only, include_bodies, since_ts, before_id=before_id, after_id=after_id
+        )
         # Enrich with commit info for canonical markdown files (best-effort)
         enriched: list[dict[str, Any]] = []
         for item in messages:
@@ -8069,10 +10004,18 @@ def build_mcp_server() -> FastMCP:
         return {"project": project_obj.human_key, "agent": agent_obj.name, "count": len(out), "messages": out}
 
     @mcp.resource("resource://mailbox/{agent}", mime_type="application/json")
-    async def mailbox_resource(agent: str, project: Optional[str] = None, limit: int = 20) -> dict[str, Any]:
+    async def mailbox_resource(
+        agent: str,
+        project: Optional[str] = None,
+        limit: int = 20,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ) -> dict[str, Any]:
         """
         List recent messages in an agent's mailbox with lightweight Git commit context.
 
+        ``before_id`` / ``after_id`` page through older / newer messages by message id.
+
         Returns
         -------
         dict
@@ -8090,6 +10033,12 @@ def build_mcp_server() -> FastMCP:
                 if parsed.get("limit"):
                     with suppress(Exception):
                         limit = int(parsed["limit"][0])
+                if parsed.get("before_id"):
+                    with suppress(Exception):
+                        before_id = int(parsed["before_id"][0])
+                if parsed.get("after_id"):
+                    with suppress(Exception):
+                        after_id = int(parsed["after_id"][0])
             except Exception:
                 pass
 
@@ -8109,7 +10058,16 @@ def build_mcp_server() -> FastMCP:
         else:
             project_obj = await _get_project_by_identifier(project)
         agent_obj = await _get_agent(project_obj, agent)
-        items = await _list_inbox(project_obj, agent_obj, limit, urgent_only=False, include_bodies=False, since_ts=None)
+        items = await _list_inbox(
+            project_obj,
+            agent_obj,
+            limit,
+            urgent_only=False,
+            include_bodies=False,
+            since_ts=None,
+            before_id=before_id,
+            after_id=after_id,
+        )
 
         # Attach recent commit summaries touching the archive (best-effort)
         commits_index: dict[str, dict[str, str]] = {}
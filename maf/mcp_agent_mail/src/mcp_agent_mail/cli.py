@@ -42,8 +42,8 @@ except Exception:
     def _sanitize_fts_query(query: str) -> str:  # type: ignore[no-redef]
         return query
 from .config import get_settings
-from .db import ensure_schema, get_session
-from .guard import install_guard as install_guard_script, uninstall_guard as uninstall_guard_script
+from .db import FTS_MESSAGES_BM25, ensure_schema, get_session, rebuild_search_index, scope_fts_query
+from .guard import ReservationSnapshot, install_guard as install_guard_script, uninstall_guard as uninstall_guard_script
 from .models import Agent, FileReservation, Message, MessageRecipient, Product, ProductProjectLink, Project
 from .share import (
     DEFAULT_CHUNK_SIZE,
@@ -63,7 +63,7 @@ from .share import (
     sign_manifest,
     summarize_snapshot,
 )
-from .storage import ensure_archive
+from .storage import FILE_RESERVATIONS_SNAPSHOT_NAME, ensure_archive, shutdown_image_pool
 from .utils import slugify
 
 # Suppress annoying bleach CSS sanitizer warning from dependencies
@@ -80,6 +80,13 @@ ARCHIVE_STORAGE_DIRNAME = Path("storage_repo")
 DEFAULT_ARCHIVE_SCRUB_PRESET = "archive"
 app = typer.Typer(help="Developer utilities for the MCP Agent Mail service.")
 
+
+@app.callback()
+def _main(ctx: typer.Context) -> None:
+    # Commands that store attachments start image worker processes; stop them when the command exits
+    ctx.call_on_close(shutdown_image_pool)
+
+
 _PREVIEW_FORCE_TOKEN = 0
 _PREVIEW_FORCE_LOCK = threading.Lock()
 
@@ -524,18 +531,18 @@ def products_search(
             try:
                 result = await session.execute(
                     text(
-                        """
+                        f"""
                         SELECT m.id, m.subject, m.body_md, m.importance, m.ack_required, m.created_ts,
                                m.thread_id, a.name AS sender_name, m.project_id
                         FROM fts_messages
                         JOIN messages m ON fts_messages.rowid = m.id
                         JOIN agents a ON m.sender_id = a.id
                         WHERE m.project_id IN :proj_ids AND fts_messages MATCH :query
-                        ORDER BY bm25(fts_messages) ASC
+                        ORDER BY {FTS_MESSAGES_BM25} ASC
                         LIMIT :limit
                         """
                     ).bindparams(bindparam("proj_ids", expanding=True)),
-                    {"proj_ids": proj_ids, "query": sanitized_query, "limit": limit},
+                    {"proj_ids": proj_ids, "query": scope_fts_query(sanitized_query, proj_ids), "limit": limit},
                 )
                 return [dict(row) for row in result.mappings().all()]
             except Exception:
@@ -883,6 +890,14 @@ def share_export(
             show_default=True,
         ),
     ] = DEFAULT_CHUNK_SIZE,
+    range_requests: Annotated[
+        bool,
+        typer.Option(
+            "--range-requests/--no-range-requests",
+            help="Write a page index so the viewer fetches database pages lazily with HTTP Range requests.",
+            show_default=True,
+        ),
+    ] = False,
     dry_run: Annotated[
         bool,
         typer.Option(
@@ -991,6 +1006,7 @@ def share_export(
             snapshot_path=snapshot_path,
             project_filters=projects,
             scrub_preset=scrub_preset,
+            range_requests=range_requests,
         )
     except ShareExportError as exc:
         console.print(f"[red]Snapshot preparation failed:[/] {exc}")
@@ -1046,6 +1062,7 @@ def share_export(
             f"Recipients read/ack cleared: {scrub_summary.recipients_cleared}",
             f"File reservations removed: {scrub_summary.file_reservations_removed}",
             f"Agent links removed: {scrub_summary.agent_links_removed}",
+            f"Thread summaries cleared: {scrub_summary.thread_summaries_cleared}",
             f"Secrets redacted: {scrub_summary.secrets_replaced}",
             f"Bodies redacted: {scrub_summary.bodies_redacted}",
             f"Attachments cleared: {scrub_summary.attachments_cleared}",
@@ -1068,6 +1085,7 @@ def share_export(
         "detach_threshold": detach_threshold,
         "chunk_threshold": chunk_threshold,
         "chunk_size": chunk_size,
+        "range_requests": range_requests,
         "scrub_preset": scrub_preset,
         "projects": list(projects),
     }
@@ -1088,6 +1106,7 @@ def share_export(
             hosting_hints=hosting_hints,
             fts_enabled=fts_enabled,
             export_config=export_config,
+            range_requests=range_requests,
         )
     except ShareExportError as exc:
         console.print(f"[red]Failed to build bundle assets:[/] {exc}")
@@ -1101,6 +1120,7 @@ def share_export(
         console.print(
             f"[cyan]Chunked database into {chunk_manifest['chunk_count']} files of ~{chunk_manifest['chunk_size']//1024} KiB.[/]"
         )
+    _report_page_index(bundle_artifacts.page_index, range_requests)
 
 
     if signing_key is not None:
@@ -1319,6 +1339,38 @@ def _collect_preview_status(bundle_path: Path) -> dict[str, Any]:
     return payload
 
 
+def _report_page_index(page_index: Optional[dict[str, Any]], range_requests: bool) -> None:
+    if page_index:
+        bootstrap_pages = sum(count for _first, count in page_index["bootstrap"])
+        console.print(
+            f"[cyan]Wrote page index for range requests: first render reads {bootstrap_pages} of "
+            f"{page_index['page_count']} pages ({page_index['page_size']} bytes each).[/]"
+        )
+    elif range_requests:
+        console.print("[yellow]SQLite lacks the dbstat table; viewer will download the full database.[/]")
+
+
+def _parse_byte_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive offsets; ``None`` if it cannot be satisfied.
+
+    Raises ValueError for malformed or multi-range headers (served as a full 200 response).
+    """
+    unit, _, spec = header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(header)
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        suffix = int(last)
+        if suffix <= 0:
+            return None
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
 def _start_preview_server(bundle_path: Path, host: str, port: int) -> ThreadingHTTPServer:
     bundle_path = bundle_path.resolve()
 
@@ -1329,8 +1381,40 @@ def _start_preview_server(bundle_path: Path, host: str, port: int) -> ThreadingH
         def end_headers(self) -> None:  # type: ignore[override]
             self.send_header("Cache-Control", "no-store, no-cache, must-revalidate")
             self.send_header("Pragma", "no-cache")
+            self.send_header("Accept-Ranges", "bytes")
             super().end_headers()
 
+        def _send_byte_range(self) -> bool:
+            """Serve ``Range: bytes=a-b`` for regular files, as range-request bundles expect from static hosts."""
+            header = self.headers.get("Range")
+            if not header:
+                return False
+            path = Path(self.translate_path(self.path))
+            if not path.is_file():
+                return False
+            size = path.stat().st_size
+            try:
+                byte_range = _parse_byte_range(header, size)
+            except ValueError:
+                return False
+            if byte_range is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return True
+            start, end = byte_range
+            with path.open("rb") as handle:
+                handle.seek(start)
+                data = handle.read(end - start + 1)
+            self.send_response(206)
+            self.send_header("Content-Type", self.guess_type(str(path)))
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return True
+
         def do_GET(self) -> None:  # type: ignore[override]
             if self.path.startswith("/__preview__/status"):
                 payload = _collect_preview_status(bundle_path)
@@ -1348,6 +1432,8 @@ def _start_preview_server(bundle_path: Path, host: str, port: int) -> ThreadingH
                 self.send_response(204)
                 self.end_headers()
                 return
+            if self._send_byte_range():
+                return
             return super().do_GET()
 
     server = ThreadingHTTPServer((host, port), PreviewRequestHandler)
@@ -1382,6 +1468,10 @@ def share_update(
         Optional[int],
         typer.Option("--chunk-size", help="Override chunk size when chunking is enabled.", min=1024),
     ] = None,
+    range_requests_override: Annotated[
+        Optional[bool],
+        typer.Option("--range-requests/--no-range-requests", help="Override lazy range-request loading for the viewer."),
+    ] = None,
     scrub_preset_override: Annotated[
         Optional[str],
         typer.Option(
@@ -1436,6 +1526,7 @@ def share_update(
     detach_threshold = detach_threshold_override if detach_threshold_override is not None else stored_config.detach_threshold
     chunk_threshold = chunk_threshold_override if chunk_threshold_override is not None else stored_config.chunk_threshold
     chunk_size = chunk_size_override if chunk_size_override is not None else stored_config.chunk_size
+    range_requests = range_requests_override if range_requests_override is not None else stored_config.range_requests
 
     if inline_threshold < 0:
         console.print("[red]Inline threshold must be non-negative.[/]")
@@ -1495,6 +1586,7 @@ def share_update(
                 snapshot_path=snapshot_path,
                 project_filters=project_filters,
                 scrub_preset=scrub_preset,
+                range_requests=range_requests,
             )
         except ShareExportError as exc:
             console.print(f"[red]Snapshot preparation failed:[/] {exc}")
@@ -1516,6 +1608,7 @@ def share_update(
             "detach_threshold": detach_threshold,
             "chunk_threshold": chunk_threshold,
             "chunk_size": chunk_size,
+            "range_requests": range_requests,
             "scrub_preset": scrub_preset,
             "projects": project_filters,
         }
@@ -1536,6 +1629,7 @@ def share_update(
                 hosting_hints=hosting_hints,
                 fts_enabled=fts_enabled,
                 export_config=export_config,
+                range_requests=range_requests,
             )
         except ShareExportError as exc:
             console.print(f"[red]Failed to build bundle assets:[/] {exc}")
@@ -1547,6 +1641,7 @@ def share_update(
             console.print(
                 f"[cyan]Chunked database into {chunk_manifest['chunk_count']} files of ~{chunk_manifest['chunk_size']//1024} KiB.[/]"
             )
+        _report_page_index(bundle_artifacts.page_index, range_requests)
 
         console.print(f"[cyan]Synchronizing updated bundle into:[/] {bundle_path}")
         _copy_bundle_contents(temp_path, bundle_path)
@@ -1908,6 +2003,7 @@ class StoredExportConfig:
     chunk_threshold: int
     chunk_size: int
     scrub_preset: str
+    range_requests: bool = False
 
 
 def _coerce_int(value: Any, default: int) -> int:
@@ -1972,6 +2068,7 @@ def _load_bundle_export_config(bundle_dir: Path) -> StoredExportConfig:
         chunk_threshold=chunk_threshold,
         chunk_size=chunk_size,
         scrub_preset=scrub_preset,
+        range_requests=bool(export_config.get("range_requests", False)),
     )
 
 
@@ -2467,6 +2564,236 @@ def archive_restore_state(
     )
 
 
+@archive_app.command(
+    "migrate-layout",
+    help="Convert per-agent inbox/outbox message copies into index.jsonl entries pointing at the canonical file.",
+)
+def archive_migrate_layout(
+    projects: Annotated[
+        list[str] | None,
+        typer.Option("--project", "-p", help="Project slug or human key (repeatable). Defaults to every project."),
+    ] = None,
+    dry_run: Annotated[bool, typer.Option("--dry-run/--apply", help="Show counts without changing files.")] = True,
+) -> None:
+    from .storage import migrate_mailbox_layout
+
+    settings = get_settings()
+
+    async def _run() -> list[tuple[str, dict[str, int]]]:
+        if projects:
+            slugs = [(await _get_project_record(identifier)).slug for identifier in projects]
+        else:
+            projects_root = _resolve_path(settings.storage.root) / "projects"
+            slugs = sorted(p.name for p in projects_root.iterdir() if p.is_dir()) if projects_root.exists() else []
+        results: list[tuple[str, dict[str, int]]] = []
+        for slug in slugs:
+            archive = await ensure_archive(settings, slug)
+            results.append((slug, await migrate_mailbox_layout(archive, dry_run=dry_run)))
+        return results
+
+    try:
+        results = asyncio.run(_run())
+    except ValueError as exc:
+        console.print(f"[red]{exc}[/]")
+        raise typer.Exit(code=1) from exc
+
+    table = Table(title="Mailbox layout migration" + (" (dry-run)" if dry_run else ""))
+    table.add_column("Project")
+    table.add_column("Mailboxes", justify="right")
+    table.add_column("Copies", justify="right")
+    table.add_column("Indexed", justify="right")
+    table.add_column("Canonical restored", justify="right")
+    for slug, stats in results:
+        table.add_row(
+            slug,
+            str(stats["mailboxes"]),
+            str(stats["copies"]),
+            str(stats["indexed"]),
+            str(stats["restored_canonical"]),
+        )
+    console.print(table)
+    if dry_run:
+        console.print("[dim]Re-run with --apply to rewrite the archive, then set ARCHIVE_MAILBOX_LAYOUT=index.[/]")
+    else:
+        console.print("[green]✓ Mailboxes migrated. Set ARCHIVE_MAILBOX_LAYOUT=index so new messages use the same layout.[/]")
+
+
+@archive_app.command(
+    "outbox-requeue",
+    help="Retry (or skip) write-behind archive rows marked failed, unblocking their project's queue.",
+)
+def archive_outbox_requeue(
+    project: Annotated[
+        Optional[str],
+        typer.Option("--project", "-p", help="Project slug or human key. Defaults to every project."),
+    ] = None,
+    skip: Annotated[
+        bool, typer.Option("--skip", help="Mark failed rows skipped instead: their messages are never archived.")
+    ] = False,
+) -> None:
+    from .app import requeue_archive_outbox
+
+    async def _run() -> int:
+        project_id = (await _get_project_record(project)).id if project else None
+        return await requeue_archive_outbox(project_id, skip=skip)
+
+    try:
+        released = asyncio.run(_run())
+    except ValueError as exc:
+        console.print(f"[red]{exc}[/]")
+        raise typer.Exit(code=1) from exc
+    if not released:
+        console.print("[dim]No failed archive outbox rows.[/]")
+    elif skip:
+        console.print(f"[yellow]Skipped {released} failed archive outbox row(s); later rows will drain.[/]")
+    else:
+        console.print(f"[green]✓ Requeued {released} failed archive outbox row(s); the writer retries them next pass.[/]")
+
+
+@archive_app.command(
+    "compact",
+    help="Pack cold months into per-month compressed segment files and turn mailbox copies into references.",
+)
+def archive_compact(
+    projects: Annotated[
+        list[str] | None,
+        typer.Option("--project", "-p", help="Project slug or human key (repeatable). Defaults to every project."),
+    ] = None,
+    older_than_days: Annotated[
+        Optional[int],
+        typer.Option("--older-than-days", min=0, help="Compact months that ended this long ago (default: RETENTION_MAX_AGE_DAYS)."),
+    ] = None,
+    repack: Annotated[bool, typer.Option("--repack/--no-repack", help="Run git gc after compacting.")] = True,
+    dry_run: Annotated[bool, typer.Option("--dry-run/--apply", help="Show counts without changing files.")] = True,
+) -> None:
+    from .storage import compact_archive
+
+    settings = get_settings()
+    age_days = settings.retention_max_age_days if older_than_days is None else older_than_days
+
+    async def _run() -> list[tuple[str, dict[str, int]]]:
+        if projects:
+            slugs = [(await _get_project_record(identifier)).slug for identifier in projects]
+        else:
+            projects_root = _resolve_path(settings.storage.root) / "projects"
+            slugs = sorted(p.name for p in projects_root.iterdir() if p.is_dir()) if projects_root.exists() else []
+        results: list[tuple[str, dict[str, int]]] = []
+        for slug in slugs:
+            archive = await ensure_archive(settings, slug)
+            results.append(
+                (slug, await compact_archive(archive, older_than_days=age_days, dry_run=dry_run, repack=repack))
+            )
+        return results
+
+    try:
+        results = asyncio.run(_run())
+    except ValueError as exc:
+        console.print(f"[red]{exc}[/]")
+        raise typer.Exit(code=1) from exc
+
+    table = Table(title=f"Archive compaction, months older than {age_days} days" + (" (dry-run)" if dry_run else ""))
+    table.add_column("Project")
+    table.add_column("Months", justify="right")
+    table.add_column("Messages packed", justify="right")
+    table.add_column("Mailbox copies", justify="right")
+    table.add_column("Files before", justify="right")
+    table.add_column("Files after", justify="right")
+    for slug, stats in results:
+        table.add_row(
+            slug,
+            str(stats["months"]),
+            str(stats["messages"]),
+            str(stats["mailbox_copies"]),
+            str(stats["files_before"]),
+            str(stats["files_after"]),
+        )
+    console.print(table)
+    if dry_run:
+        console.print("[dim]Re-run with --apply to pack these months.[/]")
+
+
+@archive_app.command(
+    "rebuild-stats",
+    help="Recompute each project's stats.json (message counts by month, inbox counts, attachment bytes) from disk.",
+)
+def archive_rebuild_stats(
+    projects: Annotated[
+        list[str] | None,
+        typer.Option("--project", "-p", help="Project slug or human key (repeatable). Defaults to every project."),
+    ] = None,
+) -> None:
+    from .storage import rebuild_archive_stats
+
+    settings = get_settings()
+
+    async def _run() -> list[tuple[str, dict[str, Any]]]:
+        if projects:
+            slugs = [(await _get_project_record(identifier)).slug for identifier in projects]
+        else:
+            projects_root = _resolve_path(settings.storage.root) / "projects"
+            slugs = sorted(p.name for p in projects_root.iterdir() if p.is_dir()) if projects_root.exists() else []
+        results: list[tuple[str, dict[str, Any]]] = []
+        for slug in slugs:
+            archive = await ensure_archive(settings, slug)
+            results.append((slug, await rebuild_archive_stats(archive)))
+        return results
+
+    try:
+        results = asyncio.run(_run())
+    except ValueError as exc:
+        console.print(f"[red]{exc}[/]")
+        raise typer.Exit(code=1) from exc
+
+    table = Table(title="Archive statistics")
+    table.add_column("Project")
+    table.add_column("Messages", justify="right")
+    table.add_column("Months", justify="right")
+    table.add_column("Inbox entries", justify="right")
+    table.add_column("Attachments", justify="right")
+    table.add_column("Attachment bytes", justify="right")
+    for slug, stats in results:
+        by_month = stats["messages_by_month"]
+        table.add_row(
+            slug,
+            str(sum(by_month.values())),
+            str(len(by_month)),
+            str(sum(stats["inbox_counts"].values())),
+            str(stats["attachments"]),
+            str(stats["attachment_bytes"]),
+        )
+    console.print(table)
+
+
+@archive_app.command(
+    "backfill-commits",
+    help="Record metadata for archive commits made before the commit table existed (safe to re-run).",
+)
+def archive_backfill_commits(
+    batch_size: Annotated[int, typer.Option("--batch-size", min=1, help="Commits inserted per transaction.")] = 500,
+) -> None:
+    from git import Repo as _Repo
+
+    from .storage import backfill_archive_commits
+
+    settings = get_settings()
+    repo_root = _resolve_path(settings.storage.root)
+    if not (repo_root / ".git").exists():
+        console.print(f"[red]No archive repository at {repo_root}[/]")
+        raise typer.Exit(code=1)
+
+    async def _run() -> dict[str, int]:
+        repo = _Repo(str(repo_root))
+        try:
+            return await backfill_archive_commits(repo, batch_size=batch_size)
+        finally:
+            repo.close()
+
+    result = asyncio.run(_run())
+    console.print(
+        f"[green]Scanned {result['scanned']} commit(s); recorded {result['inserted']} new.[/]"
+    )
+
+
 @app.command("clear-and-reset-everything")
 def clear_and_reset_everything(
     force: bool = typer.Option(
@@ -2589,6 +2916,15 @@ def migrate() -> None:
     console.print("[dim]Note: To apply model changes, delete storage.sqlite3 and run this again.[/]")
 
 
+@app.command("rebuild-search-index")
+def rebuild_search_index_command() -> None:
+    """Drop and repopulate the project-partitioned full-text index (fts_messages) from the messages table."""
+    settings = get_settings()
+    with console.status("Rebuilding full-text search index..."):
+        indexed = asyncio.run(rebuild_search_index(settings))
+    console.print(f"[green]✓ Indexed {indexed} messages.[/]")
+
+
 @app.command("list-projects")
 def list_projects(
     include_agents: bool = typer.Option(False, help="Include agent counts."),
@@ -2821,10 +3157,13 @@ def am_run(
     ttl_seconds: Annotated[int, typer.Option("--ttl-seconds", help="Lease TTL seconds (default 3600)")] = 3600,
     shared: Annotated[bool, typer.Option("--shared/--exclusive", help="Shared (non-exclusive) lease",)] = False,
     block_on_conflicts: Annotated[bool, typer.Option("--block-on-conflicts/--no-block-on-conflicts", help="Exit 1 if exclusive conflicts are present")] = False,
+    wait_seconds: Annotated[float, typer.Option("--wait-seconds", help="Queue for the slot up to this many seconds before giving up")] = 0.0,
+    priority: Annotated[int, typer.Option("--priority", help="Queue priority (higher is served first)")] = 0,
 ) -> None:
     """
     Build wrapper that prepares environment variables and manages a build slot:
-    - Acquires the slot (advisory), prints conflicts in warn mode.
+    - Acquires the slot (waiting in the server's queue up to --wait-seconds), prints conflicts in warn mode.
+    - Exits 1 without running the command when the server does not grant the slot within the wait.
     - Renews lease in the background while the child runs.
     - Releases the slot on exit.
     """
@@ -2941,8 +3280,10 @@ def am_run(
 
             if use_server:
                 conflicts: list[dict[str, Any]] = []
+                result: dict[str, Any] = {}
                 try:
-                    with httpx.Client(timeout=5.0) as client:
+                    # The server holds the request open while queued, so allow for the full wait
+                    with httpx.Client(timeout=5.0 + max(0.0, wait_seconds)) as client:
                         headers = {}
                         if bearer:
                             headers["Authorization"] = f"Bearer {bearer}"
@@ -2958,16 +3299,34 @@ def am_run(
                                     "slot": slot,
                                     "ttl_seconds": int(ttl_seconds),
                                     "exclusive": (not shared),
+                                    "wait_seconds": max(0.0, wait_seconds),
+                                    "priority": int(priority),
                                 },
                             },
                         }
                         resp = client.post(server_url, json=req, headers=headers)
                         data = resp.json()
                         result = (data or {}).get("result") or {}
+                        # MCP wraps tool output as structuredContent; older servers returned it bare
+                        if isinstance(result.get("structuredContent"), dict):
+                            result = result["structuredContent"]
                         conflicts = list(result.get("conflicts") or [])
                 except Exception:
                     use_server = False
 
+                if use_server and "granted" in result and result["granted"] is None:
+                    # The slot stayed busy for the whole wait: never run the build without a lease
+                    console.print(
+                        f"[red]Build slot '{slot}' is busy (queue position {result.get('position')}); "
+                        f"not running the build. Retry later or raise --wait-seconds.[/]"
+                    )
+                    for c in conflicts:
+                        console.print(
+                            f"  - slot={c.get('slot','')} agent={c.get('agent','')} "
+                            f"branch={c.get('branch','')} expires={c.get('expires_ts','')}"
+                        )
+                    raise typer.Exit(code=1)
+
                 if conflicts and guard_mode == "warn":
                     console.print("[yellow]Build slot conflicts (server advisory, proceeding):[/]")
                     for c in conflicts:
@@ -3302,26 +3661,24 @@ def guard_check(
         console.print("[red]AGENT_NAME environment variable is required.[/]")
         raise typer.Exit(code=1)
 
-    def _git(cwd: Path, *args: str) -> str | None:
-        try:
-            cp = subprocess.run(["git", "-C", str(cwd), *args], check=True, capture_output=True, text=True)
-            return cp.stdout.strip()
-        except Exception:
-            return None
-
-    if repo is not None:
-        repo_root = repo.expanduser().resolve()
-    else:
-        guess = _git(Path.cwd(), "rev-parse", "--show-toplevel")
-        repo_root = Path(guess).expanduser().resolve() if guess else Path.cwd().expanduser().resolve()
-
-    # Map repo path to project archive
+    # Map repo path to project archive. Identity (repo root, slug, core.ignorecase) comes from the
+    # persistent identity cache, so repeated hook runs skip the git subprocesses entirely. Hooks must
+    # not modify the repository, so the lookup never writes the private project-id marker.
     try:
-        from mcp_agent_mail.app import _compute_project_slug as _compute_slug  # type: ignore
+        from mcp_agent_mail.app import _resolve_project_identity as _resolve_ident  # type: ignore
     except Exception:
-        console.print("[red]Internal error: cannot import slug helper.[/]")
+        console.print("[red]Internal error: cannot import identity helper.[/]")
         raise typer.Exit(code=1) from None
-    slug_value = _compute_slug(str(repo_root))
+    if repo is not None:
+        repo_root = repo.expanduser().resolve()
+        ident = _resolve_ident(str(repo_root), write_marker=False)
+    else:
+        cwd = Path.cwd().expanduser().resolve()
+        ident = _resolve_ident(str(cwd), write_marker=False)
+        repo_root = Path(ident.get("repo_root") or cwd).expanduser().resolve()
+        if repo_root != cwd:
+            ident = _resolve_ident(str(repo_root), write_marker=False)
+    slug_value = ident["slug"]
     archive = asyncio.run(ensure_archive(settings, slug_value))
 
     # Read NUL-delimited paths from STDIN
@@ -3340,10 +3697,7 @@ def guard_check(
         raise typer.Exit(code=0)
 
     # Matching semantics
-    ignorecase = False
-    ic = _git(repo_root, "config", "--get", "core.ignorecase")
-    if ic and ic.strip().lower() == "true":
-        ignorecase = True
+    ignorecase = bool(ident.get("core_ignorecase"))
     try:
         from pathspec import PathSpec as _PS  # type: ignore
     except Exception:
@@ -3379,29 +3733,34 @@ def guard_check(
     now = datetime.now(timezone.utc)
     conflicts: list[tuple[str, str, str]] = []
 
-    for candidate in sorted(fr_dir.glob("*.json")):
-        try:
-            data = json.loads(candidate.read_text(encoding="utf-8"))
-        except Exception:
-            continue
-        if data.get("agent") == agent_name:
-            continue
-        if not data.get("exclusive", True):
-            continue
-        expires = data.get("expires_ts")
-        if expires:
+    # Prefer the server-maintained compiled snapshot; scan the JSON artifacts only without one
+    snapshot = ReservationSnapshot.load(fr_dir / FILE_RESERVATIONS_SNAPSHOT_NAME, ignorecase=ignorecase)
+    if snapshot is not None:
+        conflicts = snapshot.conflicts(paths, agent_name, now=now)
+    else:
+        for candidate in sorted(fr_dir.glob("*.json")):
             try:
-                if datetime.fromisoformat(expires) < now:
-                    continue
+                data = json.loads(candidate.read_text(encoding="utf-8"))
             except Exception:
-                pass
-        pattern = (data.get("path_pattern") or "").strip()
-        if not pattern:
-            continue
-        spec = _compile(pattern)
-        for path_value in paths:
-            if _match(spec, path_value, pattern):
-                conflicts.append((path_value, data.get("agent", ""), pattern))
+                continue
+            if data.get("agent") == agent_name:
+                continue
+            if not data.get("exclusive", True):
+                continue
+            expires = data.get("expires_ts")
+            if expires:
+                try:
+                    if datetime.fromisoformat(expires) < now:
+                        continue
+                except Exception:
+                    pass
+            pattern = (data.get("path_pattern") or "").strip()
+            if not pattern:
+                continue
+            spec = _compile(pattern)
+            for path_value in paths:
+                if _match(spec, path_value, pattern):
+                    conflicts.append((path_value, data.get("agent", ""), pattern))
 
     if conflicts:
         console.print("[red]Exclusive file_reservation conflicts detected:[/]")
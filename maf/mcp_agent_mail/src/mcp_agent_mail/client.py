@@ -40,14 +40,15 @@ class AgentMailClient:
                 return [parts[1]]
         return []
 
-    def _request(self, payload: dict[str, Any]) -> Any:
+    def _request(self, payload: dict[str, Any], *, timeout_seconds: Optional[float] = None) -> Any:
         body = json.dumps(payload).encode("utf-8")
         headers = {"Content-Type": "application/json"}
         if self._bearer_token:
             headers["Authorization"] = f"Bearer {self._bearer_token}"
         req = urllib.request.Request(self._server_url, data=body, headers=headers, method="POST")
         try:
-            with urllib.request.urlopen(req, timeout=self._timeout_seconds) as resp:
+            timeout = self._timeout_seconds if timeout_seconds is None else timeout_seconds
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
                 raw = resp.read().decode("utf-8")
         except urllib.error.HTTPError as e:
             raise RuntimeError(f"HTTP {e.code}: {e.read().decode('utf-8', errors='replace')}") from e
@@ -95,14 +96,15 @@ class AgentMailClient:
                         return text
         return result
 
-    def _call_tool(self, name: str, arguments: dict[str, Any]) -> Any:
+    def _call_tool(self, name: str, arguments: dict[str, Any], *, timeout_seconds: Optional[float] = None) -> Any:
         resp = self._request(
             {
                 "jsonrpc": "2.0",
                 "id": f"client-{name}",
                 "method": "tools/call",
                 "params": {"name": name, "arguments": arguments},
-            }
+            },
+            timeout_seconds=timeout_seconds,
         )
         return self._extract_tool_result(resp)
 
@@ -127,6 +129,43 @@ class AgentMailClient:
                 "since_ts": since_ts or "",
             },
         )
+        return self._normalize_inbox(rows)
+
+    def wait_for_mail(
+        self,
+        *,
+        agent_name: str,
+        project_key: str,
+        timeout_seconds: float = 60.0,
+        since_ts: Optional[str] = None,
+        limit: int = 20,
+        include_bodies: bool = False,
+        urgent_only: bool = False,
+        after_id: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Block until new mail arrives (or ``timeout_seconds`` pass, returning ``[]``).
+
+        Results are oldest first: pass the last item's ``id`` as ``after_id`` to loop without gaps
+        (``since_ts`` skips messages sharing a timestamp when ``limit`` cuts a burst).
+        """
+        arguments: dict[str, Any] = {
+            "project_key": project_key,
+            "agent_name": agent_name,
+            "timeout_seconds": float(timeout_seconds),
+            "limit": int(limit),
+            "include_bodies": bool(include_bodies),
+            "urgent_only": bool(urgent_only),
+        }
+        if since_ts:
+            arguments["since_ts"] = since_ts
+        if after_id is not None:
+            arguments["after_id"] = int(after_id)
+        # The server holds the request open for up to timeout_seconds; allow our usual budget on top
+        rows = self._call_tool("wait_for_mail", arguments, timeout_seconds=float(timeout_seconds) + self._timeout_seconds)
+        return self._normalize_inbox(rows)
+
+    @staticmethod
+    def _normalize_inbox(rows: Any) -> list[dict[str, Any]]:
         msgs = rows if isinstance(rows, list) else []
         normalized: list[dict[str, Any]] = []
         for msg in msgs:
@@ -80,6 +80,18 @@ class StorageSettings:
     inline_image_max_bytes: int
     convert_images: bool
     keep_original_images: bool
+    # Worker processes for PNG/JPEG -> WebP conversion (0 = convert on the default thread executor)
+    image_convert_workers: int
+    # Write-behind: commit the DB row immediately and let a background writer drain archive_outbox into Git
+    write_behind_enabled: bool
+    write_behind_batch_size: int
+    write_behind_poll_interval_seconds: int
+    write_behind_max_attempts: int
+    # Group commit: fold archive writes arriving within the window into one Git commit (0 = one commit per write)
+    commit_batch_window_ms: int
+    commit_batch_max_files: int
+    # Mailbox layout: "copies" writes full inbox/outbox copies; "index" keeps one canonical file plus index.jsonl lines
+    mailbox_layout: str
 
 
 @dataclass(slots=True, frozen=True)
@@ -129,6 +141,9 @@ class Settings:
     file_reservation_activity_grace_seconds: int
     # Server-side enforcement
     file_reservations_enforcement_enabled: bool
+    # In-process per-project reservation trie used for conflict checks (reloaded from the DB after the TTL)
+    file_reservations_index_enabled: bool
+    file_reservations_index_ttl_seconds: int
     # Ack TTL warnings
     ack_ttl_enabled: bool
     ack_ttl_seconds: int
@@ -153,6 +168,18 @@ class Settings:
     # Tool metrics emission
     tool_metrics_emit_enabled: bool
     tool_metrics_emit_interval_seconds: int
+    # Background project-sibling scoring (the /mail pages only read the precomputed table)
+    project_siblings_refresh_enabled: bool
+    project_siblings_refresh_interval_seconds: int
+    project_siblings_refresh_max_pairs: int
+    project_siblings_refresh_concurrency: int
+    # Thread summaries cached in thread_summaries and advanced from the thread's high-water message id
+    thread_summary_cache_enabled: bool
+    thread_summary_llm_refresh_messages: int
+    # In-process Project/Agent identity cache (bounded, TTL'd, invalidated on ORM writes)
+    identity_cache_enabled: bool
+    identity_cache_ttl_seconds: int
+    identity_cache_max_entries: int
     # Retention/quota reporting (non-destructive)
     retention_report_enabled: bool
     retention_report_interval_seconds: int
@@ -231,7 +258,7 @@ def get_settings() -> Settings:
         rbac_default_role=_decouple_config("HTTP_RBAC_DEFAULT_ROLE", default="reader"),
         rbac_readonly_tools=_csv(
             "HTTP_RBAC_READONLY_TOOLS",
-            default="health_check,fetch_inbox,whois,search_messages,summarize_thread",
+            default="health_check,fetch_inbox,wait_for_mail,whois,search_messages,summarize_thread",
         ),
         allow_localhost_unauthenticated=_bool(_decouple_config("HTTP_ALLOW_LOCALHOST_UNAUTHENTICATED", default="true"), default=True),
     )
@@ -249,6 +276,16 @@ def get_settings() -> Settings:
         inline_image_max_bytes=_int(_decouple_config("INLINE_IMAGE_MAX_BYTES", default=str(64 * 1024)), default=64 * 1024),
         convert_images=_bool(_decouple_config("CONVERT_IMAGES", default="true"), default=True),
         keep_original_images=_bool(_decouple_config("KEEP_ORIGINAL_IMAGES", default="false"), default=False),
+        image_convert_workers=_int(_decouple_config("IMAGE_CONVERT_WORKERS", default="2"), default=2),
+        write_behind_enabled=_bool(_decouple_config("ARCHIVE_WRITE_BEHIND_ENABLED", default="false"), default=False),
+        write_behind_batch_size=_int(_decouple_config("ARCHIVE_WRITE_BEHIND_BATCH_SIZE", default="200"), default=200),
+        write_behind_poll_interval_seconds=_int(
+            _decouple_config("ARCHIVE_WRITE_BEHIND_POLL_INTERVAL_SECONDS", default="5"), default=5
+        ),
+        write_behind_max_attempts=_int(_decouple_config("ARCHIVE_WRITE_BEHIND_MAX_ATTEMPTS", default="5"), default=5),
+        commit_batch_window_ms=_int(_decouple_config("ARCHIVE_COMMIT_BATCH_WINDOW_MS", default="0"), default=0),
+        commit_batch_max_files=_int(_decouple_config("ARCHIVE_COMMIT_BATCH_MAX_FILES", default="1000"), default=1000),
+        mailbox_layout=_decouple_config("ARCHIVE_MAILBOX_LAYOUT", default="copies"),
     )
 
     cors_settings = CorsSettings(
@@ -301,6 +338,8 @@ def get_settings() -> Settings:
         file_reservation_inactivity_seconds=_int(_decouple_config("FILE_RESERVATION_INACTIVITY_SECONDS", default="1800"), default=1800),
         file_reservation_activity_grace_seconds=_int(_decouple_config("FILE_RESERVATION_ACTIVITY_GRACE_SECONDS", default="900"), default=900),
         file_reservations_enforcement_enabled=_bool(_decouple_config("FILE_RESERVATIONS_ENFORCEMENT_ENABLED", default="true"), default=True),
+        file_reservations_index_enabled=_bool(_decouple_config("FILE_RESERVATIONS_INDEX_ENABLED", default="true"), default=True),
+        file_reservations_index_ttl_seconds=_int(_decouple_config("FILE_RESERVATIONS_INDEX_TTL_SECONDS", default="30"), default=30),
         ack_ttl_enabled=_bool(_decouple_config("ACK_TTL_ENABLED", default="false"), default=False),
         ack_ttl_seconds=_int(_decouple_config("ACK_TTL_SECONDS", default="1800"), default=1800),
         ack_ttl_scan_interval_seconds=_int(_decouple_config("ACK_TTL_SCAN_INTERVAL_SECONDS", default="60"), default=60),
@@ -319,6 +358,15 @@ def get_settings() -> Settings:
         log_json_enabled=_bool(_decouple_config("LOG_JSON_ENABLED", default="false"), default=False),
         tool_metrics_emit_enabled=_bool(_decouple_config("TOOL_METRICS_EMIT_ENABLED", default="false"), default=False),
         tool_metrics_emit_interval_seconds=_int(_decouple_config("TOOL_METRICS_EMIT_INTERVAL_SECONDS", default="60"), default=60),
+        project_siblings_refresh_enabled=_bool(_decouple_config("PROJECT_SIBLINGS_REFRESH_ENABLED", default="true"), default=True),
+        project_siblings_refresh_interval_seconds=_int(_decouple_config("PROJECT_SIBLINGS_REFRESH_INTERVAL_SECONDS", default="300"), default=300),
+        project_siblings_refresh_max_pairs=_int(_decouple_config("PROJECT_SIBLINGS_REFRESH_MAX_PAIRS", default="12"), default=12),
+        project_siblings_refresh_concurrency=_int(_decouple_config("PROJECT_SIBLINGS_REFRESH_CONCURRENCY", default="4"), default=4),
+        thread_summary_cache_enabled=_bool(_decouple_config("THREAD_SUMMARY_CACHE_ENABLED", default="true"), default=True),
+        thread_summary_llm_refresh_messages=_int(_decouple_config("THREAD_SUMMARY_LLM_REFRESH_MESSAGES", default="5"), default=5),
+        identity_cache_enabled=_bool(_decouple_config("IDENTITY_CACHE_ENABLED", default="true"), default=True),
+        identity_cache_ttl_seconds=_int(_decouple_config("IDENTITY_CACHE_TTL_SECONDS", default="30"), default=30),
+        identity_cache_max_entries=_int(_decouple_config("IDENTITY_CACHE_MAX_ENTRIES", default="4096"), default=4096),
         retention_report_enabled=_bool(_decouple_config("RETENTION_REPORT_ENABLED", default="false"), default=False),
         retention_report_interval_seconds=_int(_decouple_config("RETENTION_REPORT_INTERVAL_SECONDS", default="3600"), default=3600),
         retention_max_age_days=_int(_decouple_config("RETENTION_MAX_AGE_DAYS", default="180"), default=180),
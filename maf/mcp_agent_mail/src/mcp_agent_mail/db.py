@@ -4,11 +4,12 @@ from __future__ import annotations
 
 import asyncio
 import random
-from collections.abc import AsyncIterator, Callable
+from collections.abc import AsyncIterator, Callable, Sequence
 from contextlib import asynccontextmanager
 from functools import wraps
 from typing import Any, TypeVar
 
+from sqlalchemy import insert, select
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
@@ -234,17 +235,47 @@ def reset_database_state() -> None:
     _schema_lock = None
 
 
-def _setup_fts(connection: Any) -> None:
-    connection.exec_driver_sql(
-        "CREATE VIRTUAL TABLE IF NOT EXISTS fts_messages USING fts5(message_id UNINDEXED, subject, body)"
-    )
+# fts_messages carries the owning project as an indexed token column ("p<id>") so searches can AND it into the
+# MATCH expression and FTS5 only walks that project's postings instead of ranking the whole corpus first.
+# thread_id/importance/created_ts ride along UNINDEXED for filtering without a join.
+_FTS_MESSAGES_COLUMNS = (
+    "message_id UNINDEXED, subject, body, project, thread_id UNINDEXED, importance UNINDEXED, created_ts UNINDEXED"
+)
+_FTS_MESSAGES_VALUES = "new.id, new.id, new.subject, new.body_md, 'p' || new.project_id, new.thread_id, new.importance, new.created_ts"
+_FTS_MESSAGES_TARGET = "fts_messages(rowid, message_id, subject, body, project, thread_id, importance, created_ts)"
+# bm25() weights per column: the project token is a filter, not a relevance signal
+FTS_MESSAGES_BM25 = "bm25(fts_messages, 0.0, 1.0, 1.0, 0.0)"
+
+
+def fts_project_token(project_id: int) -> str:
+    return f"p{int(project_id)}"
+
+
+def scope_fts_query(query: str, project_ids: Sequence[int]) -> str:
+    """Restrict an FTS5 expression over subject/body to the given projects' postings.
+
+    An empty ``project_ids`` has no valid FTS5 form (``project : ()`` is a syntax error); callers
+    skip the search instead, so it raises ``ValueError``.
+    """
+    if not project_ids:
+        raise ValueError("scope_fts_query needs at least one project id")
+    projects = " OR ".join(f'"{fts_project_token(pid)}"' for pid in project_ids)
+    return f"{{subject body}} : ({query}) AND project : ({projects})"
+
+
+def _fts_messages_columns(connection: Any) -> list[str]:
+    rows = connection.exec_driver_sql("SELECT name FROM pragma_table_info('fts_messages')").fetchall()
+    return [str(row[0]) for row in rows]
+
+
+def _create_fts_triggers(connection: Any) -> None:
     connection.exec_driver_sql(
-        """
+        f"""
         CREATE TRIGGER IF NOT EXISTS fts_messages_ai
         AFTER INSERT ON messages
         BEGIN
-            INSERT INTO fts_messages(rowid, message_id, subject, body)
-            VALUES (new.id, new.id, new.subject, new.body_md);
+            INSERT INTO {_FTS_MESSAGES_TARGET}
+            VALUES ({_FTS_MESSAGES_VALUES});
         END;
         """
     )
@@ -258,16 +289,49 @@ def _setup_fts(connection: Any) -> None:
         """
     )
     connection.exec_driver_sql(
-        """
+        f"""
         CREATE TRIGGER IF NOT EXISTS fts_messages_au
         AFTER UPDATE ON messages
         BEGIN
             DELETE FROM fts_messages WHERE rowid = old.id;
-            INSERT INTO fts_messages(rowid, message_id, subject, body)
-            VALUES (new.id, new.id, new.subject, new.body_md);
+            INSERT INTO {_FTS_MESSAGES_TARGET}
+            VALUES ({_FTS_MESSAGES_VALUES});
         END;
         """
     )
+
+
+def rebuild_fts_messages(connection: Any) -> int:
+    """Drop and repopulate fts_messages (and its triggers) from the messages table; returns rows indexed."""
+    for trigger in ("fts_messages_ai", "fts_messages_ad", "fts_messages_au"):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS fts_messages")
+    connection.exec_driver_sql(f"CREATE VIRTUAL TABLE fts_messages USING fts5({_FTS_MESSAGES_COLUMNS})")
+    _create_fts_triggers(connection)
+    connection.exec_driver_sql(
+        f"""
+        INSERT INTO {_FTS_MESSAGES_TARGET}
+        SELECT id, id, subject, body_md, 'p' || project_id, thread_id, importance, created_ts FROM messages
+        """
+    )
+    connection.exec_driver_sql("INSERT INTO fts_messages(fts_messages) VALUES('optimize')")
+    return int(connection.exec_driver_sql("SELECT COUNT(*) FROM fts_messages").scalar() or 0)
+
+
+async def rebuild_search_index(settings: Settings | None = None) -> int:
+    await ensure_schema(settings)
+    async with get_engine().begin() as conn:
+        return int(await conn.run_sync(rebuild_fts_messages))
+
+
+def _setup_fts(connection: Any) -> None:
+    columns = _fts_messages_columns(connection)
+    if columns and "project" not in columns:
+        # Pre-partitioning layout (message_id, subject, body): migrate in place
+        rebuild_fts_messages(connection)
+    else:
+        connection.exec_driver_sql(f"CREATE VIRTUAL TABLE IF NOT EXISTS fts_messages USING fts5({_FTS_MESSAGES_COLUMNS})")
+        _create_fts_triggers(connection)
     # Additional performance indexes for common access patterns
     connection.exec_driver_sql(
         "CREATE INDEX IF NOT EXISTS idx_messages_created_ts ON messages(created_ts)"
@@ -287,7 +351,182 @@ def _setup_fts(connection: Any) -> None:
     connection.exec_driver_sql(
         "CREATE INDEX IF NOT EXISTS idx_file_reservations_expires_ts ON file_reservations(expires_ts)"
     )
+    # The ack scheduler's catch-up scan is `ack_required = 1 AND id > :last`; the implicit trailing rowid makes
+    # that a range seek instead of a scan of every message.
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_messages_ack_required ON messages(ack_required)"
+    )
     connection.exec_driver_sql(
         "CREATE INDEX IF NOT EXISTS idx_message_recipients_agent ON message_recipients(agent_id)"
     )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_archive_outbox_status ON archive_outbox(status, project_id, id)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_build_slot_leases_queue ON build_slot_leases(project_id, slot, status, id)"
+    )
+    _setup_recent_contacts(connection)
+    _setup_mailbox_entries(connection)
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_archive_commit_entries_project "
+        "ON archive_commit_entries(project_slug, commit_ts DESC, id DESC)"
+    )
+    # Case-insensitive agent lookups filter on lower(name); expression indexes let SQLite SEARCH instead of
+    # scanning every agent. Trailing `name` keeps (id, name) lookups covering so the planner does not fall back
+    # to the (project_id, name) unique index. CREATE INDEX populates them for existing databases (the backfill).
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_agents_project_name_ci ON agents(project_id, lower(name), name)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_agents_name_ci ON agents(lower(name))"
+    )
 
+
+def _setup_recent_contacts(connection: Any) -> None:
+    # Pairs are stored once as (min, max) agent id. The unique (project_id, a_agent_id, b_agent_id) index serves
+    # lookups where the sender is the lower id; this one the other direction.
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_recent_contacts_b ON recent_contacts(project_id, b_agent_id, a_agent_id)"
+    )
+    connection.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS recent_contacts_ai
+        AFTER INSERT ON message_recipients
+        BEGIN
+            INSERT INTO recent_contacts(project_id, a_agent_id, b_agent_id, last_ts)
+            SELECT m.project_id, min(m.sender_id, new.agent_id), max(m.sender_id, new.agent_id), m.created_ts
+            FROM messages m WHERE m.id = new.message_id AND m.sender_id != new.agent_id
+            ON CONFLICT(project_id, a_agent_id, b_agent_id) DO UPDATE SET last_ts = max(last_ts, excluded.last_ts);
+        END;
+        """
+    )
+    # Databases that predate the table: fill it once from message history
+    if connection.exec_driver_sql("SELECT 1 FROM recent_contacts LIMIT 1").first() is None:
+        connection.exec_driver_sql(
+            """
+            INSERT INTO recent_contacts(project_id, a_agent_id, b_agent_id, last_ts)
+            SELECT m.project_id, min(m.sender_id, mr.agent_id), max(m.sender_id, mr.agent_id), max(m.created_ts)
+            FROM messages m JOIN message_recipients mr ON mr.message_id = m.id
+            WHERE m.sender_id != mr.agent_id
+            GROUP BY 1, 2, 3
+            """
+        )
+
+
+_MAILBOX_ENTRY_COLUMNS = "agent_id, message_id, project_id, created_ts, kind, importance, ack_required, read_ts, ack_ts"
+
+
+def _setup_mailbox_entries(connection: Any) -> None:
+    # Keyset pages seek on (agent_id, created_ts, message_id); read/ack ride along so unread filters stay covered
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_mailbox_entries_agent "
+        "ON mailbox_entries(agent_id, created_ts DESC, message_id DESC, read_ts, ack_ts)"
+    )
+    connection.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS mailbox_entries_ai
+        AFTER INSERT ON message_recipients
+        BEGIN
+            INSERT OR REPLACE INTO mailbox_entries({_MAILBOX_ENTRY_COLUMNS})
+            SELECT new.agent_id, new.message_id, m.project_id, m.created_ts, new.kind, m.importance, m.ack_required,
+                   new.read_ts, new.ack_ts
+            FROM messages m WHERE m.id = new.message_id;
+        END;
+        """
+    )
+    connection.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS mailbox_entries_au
+        AFTER UPDATE OF kind, read_ts, ack_ts ON message_recipients
+        BEGIN
+            UPDATE mailbox_entries SET kind = new.kind, read_ts = new.read_ts, ack_ts = new.ack_ts
+            WHERE agent_id = new.agent_id AND message_id = new.message_id;
+        END;
+        """
+    )
+    connection.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS mailbox_entries_ad
+        AFTER DELETE ON message_recipients
+        BEGIN
+            DELETE FROM mailbox_entries WHERE agent_id = old.agent_id AND message_id = old.message_id;
+        END;
+        """
+    )
+    connection.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS mailbox_entries_message_au
+        AFTER UPDATE OF project_id, created_ts, importance, ack_required ON messages
+        BEGIN
+            UPDATE mailbox_entries
+            SET project_id = new.project_id, created_ts = new.created_ts, importance = new.importance,
+                ack_required = new.ack_required
+            WHERE message_id = new.id;
+        END;
+        """
+    )
+    connection.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS mailbox_entries_message_ad
+        AFTER DELETE ON messages
+        BEGIN
+            DELETE FROM mailbox_entries WHERE message_id = old.id;
+        END;
+        """
+    )
+    # Databases that predate the table: fill it once from the recipient rows
+    if connection.exec_driver_sql("SELECT 1 FROM mailbox_entries LIMIT 1").first() is None:
+        connection.exec_driver_sql(
+            f"""
+            INSERT OR IGNORE INTO mailbox_entries({_MAILBOX_ENTRY_COLUMNS})
+            SELECT mr.agent_id, mr.message_id, m.project_id, m.created_ts, mr.kind, m.importance, m.ack_required,
+                   mr.read_ts, mr.ack_ts
+            FROM message_recipients mr JOIN messages m ON m.id = mr.message_id
+            """
+        )
+
+
+async def record_archive_commits(records: Sequence[dict[str, Any]]) -> int:
+    """Insert archive commit metadata (built by ``storage._archive_commit_record``); shas already stored are skipped.
+
+    Returns the number of commits inserted.
+    """
+    from .models import ArchiveCommit, ArchiveCommitEntry
+
+    if not records:
+        return 0
+    await ensure_schema()
+    inserted = 0
+    commit_table = ArchiveCommit.__table__  # type: ignore[attr-defined]
+    entry_table = ArchiveCommitEntry.__table__  # type: ignore[attr-defined]
+    async with get_session() as session:
+        for start in range(0, len(records), 500):
+            chunk = records[start : start + 500]
+            shas = [str(record["sha"]) for record in chunk]
+            existing = await session.execute(select(commit_table.c.sha).where(commit_table.c.sha.in_(shas)))
+            seen = {str(row[0]) for row in existing.fetchall()}
+            fresh: list[dict[str, Any]] = []
+            for record in chunk:
+                if record["sha"] not in seen:
+                    seen.add(record["sha"])
+                    fresh.append(record)
+            if not fresh:
+                continue
+            await session.execute(
+                insert(commit_table),
+                [{key: value for key, value in record.items() if key != "entries"} for record in fresh],
+            )
+            ids = await session.execute(
+                select(commit_table.c.sha, commit_table.c.id).where(commit_table.c.sha.in_([r["sha"] for r in fresh]))
+            )
+            id_by_sha = {str(sha): int(commit_id) for sha, commit_id in ids.fetchall()}
+            entries = [
+                {**entry, "commit_id": id_by_sha[record["sha"]], "commit_ts": record["commit_ts"]}
+                for record in fresh
+                for entry in record["entries"]
+            ]
+            if entries:
+                await session.execute(insert(entry_table), entries)
+            inserted += len(fresh)
+        await session.commit()
+    return inserted
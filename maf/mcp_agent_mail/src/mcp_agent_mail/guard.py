@@ -3,14 +3,24 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
+import re
 import subprocess
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Iterable, Optional
 
 from .config import Settings
-from .storage import ProjectArchive, ensure_archive
+from .storage import (
+    FILE_RESERVATIONS_SNAPSHOT_NAME,
+    FILE_RESERVATIONS_SNAPSHOT_VERSION,
+    ProjectArchive,
+    ensure_archive,
+)
 
 __all__ = [
+    "ReservationSnapshot",
     "install_guard",
     "install_prepush_guard",
     "render_precommit_script",
@@ -99,6 +109,173 @@ def _render_chain_runner_script(hook_name: str) -> str:
     return "\n".join(lines) + "\n"
 
 
+class ReservationSnapshot:
+    """Matcher over the compiled ``file_reservations/active.idx`` snapshot.
+
+    Staged paths only evaluate the combined matchers of the buckets keyed by their ancestor
+    directories; individual reservation regexes are compiled lazily on a bucket hit.
+    """
+
+    def __init__(self, payload: dict[str, Any], *, ignorecase: bool = False) -> None:
+        self._entries: list[dict[str, Any]] = [e for e in payload.get("entries") or [] if isinstance(e, dict)]
+        self._ignorecase = ignorecase
+        self._flags = re.IGNORECASE if ignorecase else 0
+        self._buckets: dict[str, list[dict[str, Any]]] = {}
+        for prefix, bucket in (payload.get("buckets") or {}).items():
+            key = prefix.lower() if ignorecase else prefix
+            self._buckets.setdefault(key, []).append(bucket)
+        self._matchers: dict[int, re.Pattern[str]] = {}
+        self._entry_regex: dict[int, re.Pattern[str]] = {}
+
+    @classmethod
+    def load(cls, path: Path, *, ignorecase: bool = False) -> Optional[ReservationSnapshot]:
+        """Return the snapshot at ``path``, or None when it is missing, unreadable or from another version."""
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(payload, dict) or payload.get("version") != FILE_RESERVATIONS_SNAPSHOT_VERSION:
+            return None
+        return cls(payload, ignorecase=ignorecase)
+
+    def _candidates(self, norm: str) -> Iterable[int]:
+        if self._ignorecase:
+            norm = norm.lower()
+        parts = norm.split("/")[:-1]
+        for prefix in [""] + ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]:
+            for bucket in self._buckets.get(prefix, ()):
+                matcher = self._matchers.get(id(bucket))
+                if matcher is None:
+                    matcher = self._matchers[id(bucket)] = re.compile(bucket.get("matcher") or "(?!)", self._flags)
+                if matcher.match(norm):
+                    yield from bucket.get("entries") or ()
+
+    def conflicts(
+        self, paths: Iterable[str], agent_name: str, *, now: Optional[datetime] = None
+    ) -> list[tuple[str, str, str]]:
+        """Return ``(path, holder, pattern)`` for each path held exclusively by another live reservation."""
+        current = now or datetime.now(timezone.utc)
+        found: list[tuple[str, str, str]] = []
+        for path_value in paths:
+            norm = path_value.replace("\\", "/").lstrip("/")
+            for index in self._candidates(norm):
+                if not 0 <= index < len(self._entries):
+                    continue
+                entry = self._entries[index]
+                holder = str(entry.get("agent") or "")
+                if holder and holder == agent_name:
+                    continue
+                expires = entry.get("expires_ts")
+                if expires:
+                    try:
+                        if datetime.fromisoformat(str(expires)) < current:
+                            continue
+                    except ValueError:
+                        pass
+                regex = self._entry_regex.get(index)
+                if regex is None:
+                    regex = self._entry_regex[index] = re.compile(str(entry.get("regex") or "(?!)"), self._flags)
+                if regex.match(norm):
+                    found.append((path_value, holder, str(entry.get("path_pattern") or "")))
+        return found
+
+
+def _render_snapshot_conflict_lines() -> list[str]:
+    """Hook-side twin of ``ReservationSnapshot`` (hooks must stay standalone scripts)."""
+    return [
+        "# Fast path: compiled active-reservation snapshot maintained by the server",
+        f"SNAPSHOT_PATH = FILE_RESERVATIONS_DIR / \"{FILE_RESERVATIONS_SNAPSHOT_NAME}\"",
+        "def _snapshot_conflicts(candidates):",
+        "    try:",
+        "        snap = json.loads(SNAPSHOT_PATH.read_text(encoding='utf-8'))",
+        "    except Exception:",
+        "        return None",
+        f"    if not isinstance(snap, dict) or snap.get('version') != {FILE_RESERVATIONS_SNAPSHOT_VERSION}:",
+        "        return None",
+        "    import re as _re",
+        "    # Honour core.ignorecase like the CLI guard check does",
+        "    try:",
+        "        ic = subprocess.run(['git','config','--get','core.ignorecase'],capture_output=True,text=True)",
+        "        ignorecase = ic.stdout.strip().lower() == 'true'",
+        "    except Exception:",
+        "        ignorecase = False",
+        "    flags = _re.IGNORECASE if ignorecase else 0",
+        "    entries = snap.get('entries') or []",
+        "    buckets = {}",
+        "    for key, bucket in (snap.get('buckets') or {}).items():",
+        "        buckets.setdefault(key.lower() if ignorecase else key, []).append(bucket)",
+        "    matchers = {}",
+        "    regexes = {}",
+        "    found = []",
+        "    for p in candidates:",
+        "        norm = p.replace('\\\\','/').lstrip('/')",
+        "        if ignorecase:",
+        "            norm = norm.lower()",
+        "        parts = norm.split('/')[:-1]",
+        "        for key in [''] + ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]:",
+        "            hits = []",
+        "            for bucket in buckets.get(key) or []:",
+        "                if id(bucket) not in matchers:",
+        "                    matchers[id(bucket)] = _re.compile(bucket.get('matcher') or '(?!)', flags)",
+        "                if matchers[id(bucket)].match(norm):",
+        "                    hits.extend(bucket.get('entries') or [])",
+        "            for idx in hits:",
+        "                e = entries[idx]",
+        "                holder = (e.get('agent') or '').strip()",
+        "                if holder and holder == AGENT_NAME:",
+        "                    continue",
+        "                if not _not_expired((e.get('expires_ts') or '').strip()):",
+        "                    continue",
+        "                if idx not in regexes:",
+        "                    regexes[idx] = _re.compile(e.get('regex') or '(?!)', flags)",
+        "                if regexes[idx].match(norm):",
+        "                    found.append((e.get('path_pattern') or '', p, holder))",
+        "    return found",
+        "try:",
+        "    conflicts = _snapshot_conflicts(CANDIDATES)",
+        "except Exception:",
+        "    conflicts = None",
+    ]
+
+
+def _render_scan_conflict_lines() -> list[str]:
+    """Fallback scan over every reservation JSON, used when no snapshot is available."""
+    return [
+        "if conflicts is None:",
+        "    conflicts = []",
+        "    try:",
+        "        for f in FILE_RESERVATIONS_DIR.iterdir():",
+        "            if not f.name.endswith('.json'):",
+        "                continue",
+        "            try:",
+        "                data = json.loads(f.read_text(encoding='utf-8'))",
+        "            except Exception:",
+        "                continue",
+        "            recs = data if isinstance(data, list) else [data]",
+        "            for r in recs:",
+        "                if not isinstance(r, dict):",
+        "                    continue",
+        "                patt = (r.get('path_pattern') or '').strip()",
+        "                if not patt:",
+        "                    continue",
+        "                holder = (r.get('agent') or '').strip()",
+        "                exclusive = r.get('exclusive', True)",
+        "                expires = (r.get('expires_ts') or '').strip()",
+        "                if not exclusive:",
+        "                    continue",
+        "                if holder and holder == AGENT_NAME:",
+        "                    continue",
+        "                spec = _compile_one(patt)",
+        "                for p in CANDIDATES:",
+        "                    norm = p.replace('\\\\','/').lstrip('/')",
+        "                    matched = spec.match_file(norm) if spec is not None else _fn.fnmatch(norm, patt)",
+        "                    if matched and _not_expired(expires):",
+        "                        conflicts.append((patt, p, holder))",
+        "    except Exception:",
+        "        conflicts = []",
+    ]
+
+
 def render_precommit_script(archive: ProjectArchive) -> str:
     """Return the pre-commit script content for the given archive.
 
@@ -200,37 +377,9 @@ def render_precommit_script(archive: ProjectArchive) -> str:
         "        except Exception:",
         "            return None",
         "    return None",
-        "conflicts = []",
-        "try:",
-        "    for f in FILE_RESERVATIONS_DIR.iterdir():",
-        "        if not f.name.endswith('.json'):",
-        "            continue",
-        "        try:",
-        "            data = json.loads(f.read_text(encoding='utf-8'))",
-        "        except Exception:",
-        "            continue",
-        "        recs = data if isinstance(data, list) else [data]",
-        "        for r in recs:",
-        "            if not isinstance(r, dict):",
-        "                continue",
-        "            patt = (r.get('path_pattern') or '').strip()",
-        "            if not patt:",
-        "                continue",
-        "            holder = (r.get('agent') or '').strip()",
-        "            exclusive = r.get('exclusive', True)",
-        "            expires = (r.get('expires_ts') or '').strip()",
-        "            if not exclusive:",
-        "                continue",
-        "            if holder and holder == AGENT_NAME:",
-        "                continue",
-        "            spec = _compile_one(patt)",
-        "            for p in paths:",
-        "                norm = p.replace('\\\\','/').lstrip('/')",
-        "                matched = spec.match_file(norm) if spec is not None else _fn.fnmatch(norm, patt)",
-        "                if matched and _not_expired(expires):",
-        "                    conflicts.append((patt, p, holder))",
-        "except Exception:",
-        "    conflicts = []",
+        "CANDIDATES = paths",
+        *_render_snapshot_conflict_lines(),
+        *_render_scan_conflict_lines(),
         "if conflicts:",
         "    sys.stderr.write(\"Exclusive file_reservation conflicts detected\\n\")",
         "    for patt, path, holder in conflicts[:10]:",
@@ -351,37 +500,9 @@ def render_prepush_script(archive: ProjectArchive) -> str:
         "        except Exception:",
         "            return None",
         "    return None",
-        "conflicts = []",
-        "try:",
-        "    for f in FILE_RESERVATIONS_DIR.iterdir():",
-        "        if not f.name.endswith('.json'):",
-        "            continue",
-        "        try:",
-        "            data = json.loads(f.read_text(encoding='utf-8'))",
-        "        except Exception:",
-        "            continue",
-        "        recs = data if isinstance(data, list) else [data]",
-        "        for r in recs:",
-        "            if not isinstance(r, dict):",
-        "                continue",
-        "            patt = (r.get('path_pattern') or '').strip()",
-        "            if not patt:",
-        "                continue",
-        "            holder = (r.get('agent') or '').strip()",
-        "            exclusive = r.get('exclusive', True)",
-        "            expires = (r.get('expires_ts') or '').strip()",
-        "            if not exclusive:",
-        "                continue",
-        "            if holder and holder == AGENT_NAME:",
-        "                continue",
-        "            spec = _compile_one(patt)",
-        "            for p in changed:",
-        "                norm = p.replace('\\\\','/').lstrip('/')",
-        "                matched = spec.match_file(norm) if spec is not None else _fn.fnmatch(norm, patt)",
-        "                if matched and _not_expired(expires):",
-        "                    conflicts.append((patt, p, holder))",
-        "except Exception:",
-        "    conflicts = []",
+        "CANDIDATES = changed",
+        *_render_snapshot_conflict_lines(),
+        *_render_scan_conflict_lines(),
         "if conflicts:",
         "    sys.stderr.write(\"Exclusive file_reservation conflicts detected\\n\")",
         "    for patt, path, holder in conflicts[:10]:",
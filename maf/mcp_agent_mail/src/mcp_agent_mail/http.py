@@ -10,8 +10,9 @@ import importlib
 import json
 import logging
 import re
-from collections.abc import MutableMapping
-from datetime import datetime, timezone
+from collections import defaultdict
+from collections.abc import MutableMapping, Sequence
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, cast
 
@@ -19,26 +20,40 @@ import structlog
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
-from sqlalchemy import text
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import NoResultFound
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.types import Receive, Scope, Send
 
 from .app import (
+    _ACK_DEADLINES,
+    _RESERVATION_INDEX,
+    ToolExecutionError,
+    _AckDeadline,
+    _as_utc,
     _expire_stale_file_reservations,
+    _get_agent,
+    _get_project_by_identifier,
+    _identity_cache_snapshot,
+    _parse_iso,
+    _refresh_file_reservations_snapshot,
     _tool_metrics_snapshot,
+    _wait_for_inbox,
     build_mcp_server,
     get_project_sibling_data,
     refresh_project_sibling_suggestions,
     update_project_sibling_status,
 )
 from .config import Settings, get_settings
-from .db import ensure_schema, get_session
+from .db import ensure_schema, get_session, scope_fts_query
 from .storage import (
+    archive_root_commit,
     archive_write_lock,
+    collect_archive_stats,
     collect_lock_status,
     ensure_archive,
+    find_commit_at,
     get_agent_communication_graph,
     get_archive_tree,
     get_commit_detail,
@@ -47,6 +62,8 @@ from .storage import (
     get_message_commit_sha,
     get_recent_commits,
     get_timeline_commits,
+    parse_snapshot_time,
+    relative_date,
     write_agent_profile,
     write_file_reservation_record,
 )
@@ -63,6 +80,359 @@ async def _project_slug_from_id(pid: int | None) -> str | None:
 
 __all__ = ["build_http_app", "main"]
 
+# Inbox event streams: idle connections get a keepalive comment this often; messages per wake-up
+_INBOX_EVENTS_KEEPALIVE_SECONDS = 15.0
+_INBOX_EVENTS_BATCH = 200
+
+
+async def _inbox_snapshot_from_db(project: str, agent: str, target: datetime, limit: int) -> list[dict[str, Any]] | None:
+    """Inbox of ``agent`` as of ``target`` from messages/message_recipients, newest first.
+
+    Returns None when the database has never delivered anything to that agent (archive-only data,
+    e.g. an imported mailbox), so the caller can fall back to reading the Git history.
+    """
+    async with get_session() as session:
+        agent_row = (
+            await session.execute(
+                text(
+                    "SELECT a.id, p.id FROM agents a JOIN projects p ON p.id = a.project_id "
+                    "WHERE (p.slug = :project OR p.human_key = :project) AND lower(a.name) = lower(:agent) LIMIT 1"
+                ),
+                {"project": project, "agent": agent},
+            )
+        ).fetchone()
+        if agent_row is None:
+            return None
+        agent_id, project_id = int(agent_row[0]), int(agent_row[1])
+        delivered = await session.execute(
+            text("SELECT 1 FROM message_recipients WHERE agent_id = :aid LIMIT 1"), {"aid": agent_id}
+        )
+        if delivered.fetchone() is None:
+            return None
+        # created_ts is stored as naive UTC text; compare in the same format
+        cutoff = target.astimezone(timezone.utc).replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S.%f")
+        rows = await session.execute(
+            text(
+                "SELECT m.id, m.subject, m.created_ts, m.importance, s.name "
+                "FROM message_recipients r "
+                "JOIN messages m ON m.id = r.message_id "
+                "JOIN agents s ON s.id = m.sender_id "
+                "WHERE r.agent_id = :aid AND m.project_id = :pid AND m.created_ts <= :cutoff "
+                "ORDER BY m.created_ts DESC, m.id DESC LIMIT :limit"
+            ),
+            {"aid": agent_id, "pid": project_id, "cutoff": cutoff, "limit": limit},
+        )
+        messages: list[dict[str, Any]] = []
+        for msg_id, subject, created_ts, importance, sender in rows.fetchall():
+            created = created_ts if isinstance(created_ts, datetime) else datetime.fromisoformat(str(created_ts))
+            messages.append(
+                {
+                    "id": str(msg_id),
+                    "subject": str(subject or "").strip() or "(no subject)",
+                    # Same shape as the archive filename prefix the Git snapshot reports
+                    "date": created.replace(tzinfo=None).strftime("%Y-%m-%dT%H-%M-%SZ"),
+                    "from": sender,
+                    "importance": importance or "normal",
+                }
+            )
+    return messages
+
+
+def _commit_time(value: Any) -> datetime:
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed
+
+
+async def _archive_commits_indexed(repo: Any) -> bool:
+    """True when ``archive_commits`` covers the archive from its first commit (recorded or backfilled)."""
+    root = await archive_root_commit(repo)
+    if root is None:
+        return False
+    async with get_session() as session:
+        row = await session.execute(text("SELECT 1 FROM archive_commits WHERE sha = :sha"), {"sha": root})
+        return row.fetchone() is not None
+
+
+async def _recent_commits_from_db(limit: int, offset: int) -> list[dict[str, Any]]:
+    """Newest-first page of archive commits, same shape as ``storage.get_recent_commits``."""
+    async with get_session() as session:
+        rows = await session.execute(
+            text(
+                "SELECT sha, commit_ts, author, email, subject, files_changed, insertions, deletions "
+                "FROM archive_commits ORDER BY commit_ts DESC, id DESC LIMIT :limit OFFSET :offset"
+            ),
+            {"limit": limit, "offset": offset},
+        )
+        commits: list[dict[str, Any]] = []
+        for sha, commit_ts, author, email, subject, files_changed, insertions, deletions in rows.fetchall():
+            when = _commit_time(commit_ts)
+            commits.append(
+                {
+                    "sha": sha,
+                    "short_sha": sha[:8],
+                    "author": author,
+                    "email": email,
+                    "date": when.isoformat(),
+                    "relative_date": relative_date(when),
+                    "subject": subject,
+                    "body": subject,
+                    "files_changed": int(files_changed or 0),
+                    "insertions": int(insertions or 0),
+                    "deletions": int(deletions or 0),
+                }
+            )
+    return commits
+
+
+async def _timeline_from_db(project: str, limit: int, offset: int) -> list[dict[str, Any]]:
+    """A page of a project's archive writes (newest page first, oldest-first within the page)."""
+    async with get_session() as session:
+        rows = await session.execute(
+            text(
+                "SELECT c.sha, e.commit_ts, e.subject, e.type, e.sender, e.recipients, c.author "
+                "FROM archive_commit_entries e JOIN archive_commits c ON c.id = e.commit_id "
+                "WHERE e.project_slug = :project "
+                "ORDER BY e.commit_ts DESC, e.id DESC LIMIT :limit OFFSET :offset"
+            ),
+            {"project": project, "limit": limit, "offset": offset},
+        )
+        timeline: list[dict[str, Any]] = []
+        for sha, commit_ts, subject, entry_type, sender, recipients, author in rows.fetchall():
+            when = _commit_time(commit_ts)
+            timeline.append(
+                {
+                    "sha": sha,
+                    "short_sha": sha[:8],
+                    "date": when.isoformat(),
+                    "timestamp": int(when.timestamp()),
+                    "subject": subject,
+                    "type": entry_type,
+                    "sender": sender,
+                    "recipients": json.loads(recipients) if isinstance(recipients, str) else list(recipients or []),
+                    "author": author,
+                }
+            )
+    timeline.reverse()
+    return timeline
+
+
+async def _communication_graph_from_db(project: str, limit: int) -> dict[str, Any]:
+    """Sender -> recipient counts over a project's ``limit`` most recent archived messages."""
+    recent = (
+        "SELECT sender, recipients FROM archive_commit_entries "
+        "WHERE project_slug = :project AND type = 'message' AND sender IS NOT NULL "
+        "ORDER BY commit_ts DESC, id DESC LIMIT :limit"
+    )
+    params = {"project": project, "limit": limit}
+    async with get_session() as session:
+        sent_rows = await session.execute(
+            text(f"SELECT sender, COUNT(*) FROM ({recent}) GROUP BY sender"), params
+        )
+        edge_rows = await session.execute(
+            text(
+                f"SELECT r.sender, j.value, COUNT(*) FROM ({recent}) AS r, json_each(r.recipients) AS j "
+                "WHERE j.value != '' GROUP BY r.sender, j.value"
+            ),
+            params,
+        )
+        sent = {str(sender): int(count) for sender, count in sent_rows.fetchall()}
+        edges: list[dict[str, Any]] = [
+            {"from": str(a), "to": str(b), "count": int(n)} for a, b, n in edge_rows.fetchall()
+        ]
+    received: dict[str, int] = {}
+    for edge in edges:
+        received[edge["to"]] = received.get(edge["to"], 0) + edge["count"]
+    nodes = [
+        {
+            "id": name,
+            "label": name,
+            "sent": sent.get(name, 0),
+            "received": received.get(name, 0),
+            "total": sent.get(name, 0) + received.get(name, 0),
+        }
+        for name in dict.fromkeys([*sent, *received])
+    ]
+    return {"nodes": nodes, "edges": edges}
+
+
+def _warn_ack_overdue(settings: Settings, entry: _AckDeadline, age_s: int) -> None:
+    try:
+        rich_console = importlib.import_module("rich.console")
+        rich_panel = importlib.import_module("rich.panel")
+        rich_text = importlib.import_module("rich.text")
+        Console = rich_console.Console
+        Panel = rich_panel.Panel
+        Text = rich_text.Text
+        con = Console()
+        body = Text.assemble(
+            ("message_id: ", "cyan"),
+            (str(entry.message_id), "white"),
+            "\n",
+            ("agent_id: ", "cyan"),
+            (str(entry.agent_id), "white"),
+            "\n",
+            ("project_id: ", "cyan"),
+            (str(entry.project_id), "white"),
+            "\n",
+            ("age_s: ", "cyan"),
+            (str(age_s), "white"),
+            "\n",
+            ("ttl_s: ", "cyan"),
+            (str(settings.ack_ttl_seconds), "white"),
+        )
+        con.print(Panel(body, title="ACK Overdue", border_style="red"))
+    except Exception:
+        print(
+            f"ack-warning message_id={entry.message_id} project_id={entry.project_id} agent_id={entry.agent_id} age_s={age_s} ttl_s={settings.ack_ttl_seconds}"
+        )
+    with contextlib.suppress(Exception):
+        structlog.get_logger("tasks").warning(
+            "ack_overdue",
+            message_id=str(entry.message_id),
+            project_id=str(entry.project_id),
+            agent_id=str(entry.agent_id),
+            age_s=age_s,
+            ttl_s=int(settings.ack_ttl_seconds),
+        )
+
+
+async def _resolve_ack_escalation_holder(settings: Settings, project_id: int, now: datetime) -> int | None:
+    """Return the ops holder id for ``project_id``, creating the agent (and its profile) on first use."""
+    holder_name = settings.ack_escalation_claim_holder_name
+    async with get_session() as session:
+        hid = (
+            await session.execute(
+                text("SELECT id FROM agents WHERE project_id = :pid AND name = :name"),
+                {"pid": project_id, "name": holder_name},
+            )
+        ).scalar_one_or_none()
+        if isinstance(hid, int):
+            return hid
+        await session.execute(
+            text(
+                "INSERT INTO agents(project_id, name, program, model, task_description, inception_ts, last_active_ts, attachments_policy, contact_policy) "
+                "VALUES (:pid, :name, :program, :model, :task, :ts, :ts, 'auto', 'auto')"
+            ),
+            {"pid": project_id, "name": holder_name, "program": "ops", "model": "system", "task": "ops-escalation", "ts": now},
+        )
+        await session.commit()
+        hid = (
+            await session.execute(
+                text("SELECT id FROM agents WHERE project_id = :pid AND name = :name"),
+                {"pid": project_id, "name": holder_name},
+            )
+        ).scalar_one_or_none()
+    if not isinstance(hid, int):
+        return None
+    project_slug = (await _project_slug_from_id(project_id)) or ""
+    archive = await ensure_archive(settings, project_slug)
+    async with archive_write_lock(archive):
+        await write_agent_profile(
+            archive,
+            {
+                "id": hid,
+                "name": holder_name,
+                "program": "ops",
+                "model": "system",
+                "project_slug": project_slug,
+                "inception_ts": now.astimezone().isoformat(),
+                "inception_iso": now.astimezone().isoformat(),
+                "task": "ops-escalation",
+            },
+        )
+    return hid
+
+
+async def _escalate_overdue_acks(settings: Settings, due: Sequence[_AckDeadline], now: datetime) -> int:
+    """Claim the overdue recipients' inbox folders, one transaction and archive write per project.
+
+    Returns the number of reservations created; identical patterns within a batch share one claim.
+    """
+    by_project: dict[int, list[_AckDeadline]] = defaultdict(list)
+    for entry in due:
+        by_project[entry.project_id].append(entry)
+    agent_ids = sorted({entry.agent_id for entry in due})
+    async with get_session() as session:
+        rows = await session.execute(
+            text("SELECT id, name FROM agents WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": agent_ids},
+        )
+        names = {int(aid): name for aid, name in rows.fetchall() if name}
+    expires_at = now + timedelta(seconds=settings.ack_escalation_claim_ttl_seconds)
+    created = 0
+    for project_id, entries in by_project.items():
+        try:
+            holder_id: int | None = None
+            if settings.ack_escalation_claim_holder_name:
+                holder_id = await _resolve_ack_escalation_holder(settings, project_id, now)
+            claims: dict[tuple[int, str], None] = {}
+            for entry in entries:
+                ts = _as_utc(entry.created_ts)
+                recipient_name = names.get(entry.agent_id, "*")
+                pattern = f"agents/{recipient_name}/inbox/{ts.strftime('%Y')}/{ts.strftime('%m')}/*.md"
+                claims.setdefault((holder_id if holder_id is not None else entry.agent_id, pattern), None)
+            params = [
+                {
+                    "pid": project_id,
+                    "holder": holder,
+                    "pattern": pattern,
+                    "exclusive": 1 if settings.ack_escalation_claim_exclusive else 0,
+                    "reason": "ack-overdue",
+                    "cts": now,
+                    "ets": expires_at,
+                }
+                for holder, pattern in claims
+            ]
+            async with get_session() as session:
+                await session.execute(
+                    text(
+                        """
+                        INSERT INTO file_reservations(project_id, agent_id, path_pattern, exclusive, reason, created_ts, expires_ts)
+                        VALUES (:pid, :holder, :pattern, :exclusive, :reason, :cts, :ets)
+                        """
+                    ),
+                    params,
+                )
+                await session.commit()
+            _RESERVATION_INDEX.invalidate(project_id)
+            project_slug = (await _project_slug_from_id(project_id)) or ""
+            archive = await ensure_archive(settings, project_slug)
+            async with archive_write_lock(archive):
+                for _holder, pattern in claims:
+                    await write_file_reservation_record(
+                        archive,
+                        {
+                            "project": project_slug,
+                            "agent": settings.ack_escalation_claim_holder_name or "ops",
+                            "path_pattern": pattern,
+                            "exclusive": settings.ack_escalation_claim_exclusive,
+                            "reason": "ack-overdue",
+                            "created_ts": now.astimezone().isoformat(),
+                            "expires_ts": expires_at.astimezone().isoformat(),
+                        },
+                    )
+                await _refresh_file_reservations_snapshot(project_id, project_slug)
+            created += len(params)
+        except Exception as exc:
+            with contextlib.suppress(Exception):
+                structlog.get_logger("tasks").warning("ack_escalation_failed", project_id=project_id, error=str(exc))
+    return created
+
+
+async def process_overdue_acks(settings: Settings, now: datetime | None = None) -> list[_AckDeadline]:
+    """One ack-TTL tick: sync the deadline heap, warn once per newly overdue pair, then escalate in bulk."""
+    now = now or datetime.now(timezone.utc)
+    await _ACK_DEADLINES.sync()
+    due = _ACK_DEADLINES.pop_due(now, settings.ack_ttl_seconds)
+    if not due:
+        return []
+    due = await _ACK_DEADLINES.still_unacknowledged(due)
+    for entry in due:
+        _warn_ack_overdue(settings, entry, int((now - _as_utc(entry.created_ts)).total_seconds()))
+    if due and settings.ack_escalation_enabled and (settings.ack_escalation_mode or "log").lower() == "file_reservation":
+        await _escalate_overdue_acks(settings, due, now)
+    return due
+
 
 def _decode_jwt_header_segment(token: str) -> dict[str, object] | None:
     """Return decoded JWT header without verifying signature."""
@@ -426,6 +796,7 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
             or settings.retention_report_enabled
             or settings.quota_enabled
             or settings.tool_metrics_emit_enabled
+            or settings.project_siblings_refresh_enabled
         ):
             fastapi_app.state._background_tasks = []
             return
@@ -467,197 +838,17 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                 await asyncio.sleep(settings.file_reservations_cleanup_interval_seconds)
 
         async def _worker_ack_ttl() -> None:
-            import datetime as _dt
-
             while True:
+                delay = float(settings.ack_ttl_scan_interval_seconds)
                 try:
-                    await ensure_schema()
-                    async with get_session() as session:
-                        result = await session.execute(
-                            text(
-                                """
-                            SELECT m.id, m.project_id, m.created_ts, mr.agent_id
-                            FROM messages m
-                            JOIN message_recipients mr ON mr.message_id = m.id
-                            WHERE m.ack_required = 1 AND mr.ack_ts IS NULL
-                            """
-                            )
-                        )
-                        rows = result.fetchall()
-                    now = _dt.datetime.now(_dt.timezone.utc)
-                    for mid, project_id, created_ts, agent_id in rows:
-                        # Normalize to timezone-aware UTC before arithmetic; SQLite may yield naive datetimes
-                        ts = created_ts
-                        if getattr(ts, "tzinfo", None) is None or ts.tzinfo.utcoffset(ts) is None:
-                            ts = ts.replace(tzinfo=_dt.timezone.utc)
-                        else:
-                            ts = ts.astimezone(_dt.timezone.utc)
-                        age = (now - ts).total_seconds()
-                        if age >= settings.ack_ttl_seconds:
-                            try:
-                                rich_console = importlib.import_module("rich.console")
-                                rich_panel = importlib.import_module("rich.panel")
-                                rich_text = importlib.import_module("rich.text")
-                                Console = rich_console.Console
-                                Panel = rich_panel.Panel
-                                Text = rich_text.Text
-                                con = Console()
-                                body = Text.assemble(
-                                    ("message_id: ", "cyan"),
-                                    (str(mid), "white"),
-                                    "\n",
-                                    ("agent_id: ", "cyan"),
-                                    (str(agent_id), "white"),
-                                    "\n",
-                                    ("project_id: ", "cyan"),
-                                    (str(project_id), "white"),
-                                    "\n",
-                                    ("age_s: ", "cyan"),
-                                    (str(int(age)), "white"),
-                                    "\n",
-                                    ("ttl_s: ", "cyan"),
-                                    (str(settings.ack_ttl_seconds), "white"),
-                                )
-                                con.print(Panel(body, title="ACK Overdue", border_style="red"))
-                            except Exception:
-                                print(
-                                    f"ack-warning message_id={mid} project_id={project_id} agent_id={agent_id} age_s={int(age)} ttl_s={settings.ack_ttl_seconds}"
-                                )
-                            with contextlib.suppress(Exception):
-                                structlog.get_logger("tasks").warning(
-                                    "ack_overdue",
-                                    message_id=str(mid),
-                                    project_id=str(project_id),
-                                    agent_id=str(agent_id),
-                                    age_s=int(age),
-                                    ttl_s=int(settings.ack_ttl_seconds),
-                                )
-                            if settings.ack_escalation_enabled:
-                                mode = (settings.ack_escalation_mode or "log").lower()
-                                if mode == "file_reservation":
-                                    try:
-                                        y_dir = created_ts.strftime("%Y")
-                                        m_dir = created_ts.strftime("%m")
-                                        # Resolve recipient name
-                                        async with get_session() as s_lookup:
-                                            name_row = await s_lookup.execute(
-                                                text("SELECT name FROM agents WHERE id = :aid"), {"aid": agent_id}
-                                            )
-                                            name_res = name_row.fetchone()
-                                        recipient_name = name_res[0] if name_res and name_res[0] else "*"
-                                        pattern = (
-                                            f"agents/{recipient_name}/inbox/{y_dir}/{m_dir}/*.md"
-                                            if recipient_name != "*"
-                                            else f"agents/*/inbox/{y_dir}/{m_dir}/*.md"
-                                        )
-                                        holder_agent_id = int(agent_id)
-                                        if settings.ack_escalation_claim_holder_name:
-                                            async with get_session() as s_holder:
-                                                hid_row = await s_holder.execute(
-                                                    text(
-                                                        "SELECT id FROM agents WHERE project_id = :pid AND name = :name"
-                                                    ),
-                                                    {
-                                                        "pid": project_id,
-                                                        "name": settings.ack_escalation_claim_holder_name,
-                                                    },
-                                                )
-                                                hid = hid_row.scalar_one_or_none()
-                                                if isinstance(hid, int):
-                                                    holder_agent_id = hid
-                                                else:
-                                                    # Auto-create ops holder in DB and write profile.json
-                                                    await s_holder.execute(
-                                                        text(
-                                                            "INSERT INTO agents(project_id, name, program, model, task_description, inception_ts, last_active_ts) VALUES (:pid, :name, :program, :model, :task, :ts, :ts)"
-                                                        ),
-                                                        {
-                                                            "pid": project_id,
-                                                            "name": settings.ack_escalation_claim_holder_name,
-                                                            "program": "ops",
-                                                            "model": "system",
-                                                            "task": "ops-escalation",
-                                                            "ts": now,
-                                                        },
-                                                    )
-                                                    await s_holder.commit()
-                                                    hid_row2 = await s_holder.execute(
-                                                        text(
-                                                            "SELECT id FROM agents WHERE project_id = :pid AND name = :name"
-                                                        ),
-                                                        {
-                                                            "pid": project_id,
-                                                            "name": settings.ack_escalation_claim_holder_name,
-                                                        },
-                                                    )
-                                                    hid2 = hid_row2.scalar_one_or_none()
-                                                    if isinstance(hid2, int):
-                                                        holder_agent_id = hid2
-                                                        # Write profile.json to archive
-                                                        archive = await ensure_archive(
-                                                            settings, (await _project_slug_from_id(project_id)) or ""
-                                                        )
-                                                        async with archive_write_lock(archive):
-                                                            await write_agent_profile(
-                                                                archive,
-                                                                {
-                                                                    "id": holder_agent_id,
-                                                                    "name": settings.ack_escalation_claim_holder_name,
-                                                                    "program": "ops",
-                                                                    "model": "system",
-                                                                    "project_slug": (
-                                                                        await _project_slug_from_id(project_id)
-                                                                    )
-                                                                    or "",
-                                                                    "inception_ts": now.astimezone().isoformat(),
-                                                                    "inception_iso": now.astimezone().isoformat(),
-                                                                    "task": "ops-escalation",
-                                                                },
-                                                            )
-                                        async with get_session() as s2:
-                                            await s2.execute(
-                                                text(
-                                                    """
-                                                INSERT INTO file_reservations(project_id, agent_id, path_pattern, exclusive, reason, created_ts, expires_ts)
-                                                VALUES (:pid, :holder, :pattern, :exclusive, :reason, :cts, :ets)
-                                                """
-                                                ),
-                                                {
-                                                    "pid": project_id,
-                                                    "holder": holder_agent_id,
-                                                    "pattern": pattern,
-                                                    "exclusive": 1 if settings.ack_escalation_claim_exclusive else 0,
-                                                    "reason": "ack-overdue",
-                                                    "cts": now,
-                                                    "ets": now
-                                                    + _dt.timedelta(seconds=settings.ack_escalation_claim_ttl_seconds),
-                                                },
-                                            )
-                                            await s2.commit()
-                                        # Also write JSON artifact to archive
-                                        project_slug = (await _project_slug_from_id(project_id)) or ""
-                                        archive = await ensure_archive(settings, project_slug)
-                                        expires_at = now + _dt.timedelta(
-                                            seconds=settings.ack_escalation_claim_ttl_seconds
-                                        )
-                                        async with archive_write_lock(archive):
-                                            await write_file_reservation_record(
-                                                archive,
-                                                {
-                                                    "project": project_slug,
-                                                    "agent": settings.ack_escalation_claim_holder_name or "ops",
-                                                    "path_pattern": pattern,
-                                                    "exclusive": settings.ack_escalation_claim_exclusive,
-                                                    "reason": "ack-overdue",
-                                                    "created_ts": now.astimezone().isoformat(),
-                                                    "expires_ts": expires_at.astimezone().isoformat(),
-                                                },
-                                            )
-                                    except Exception:
-                                        pass
+                    await process_overdue_acks(settings)
+                    # Wake for the next deadline if it lands before the regular catch-up scan
+                    upcoming = _ACK_DEADLINES.seconds_until_next(datetime.now(timezone.utc), settings.ack_ttl_seconds)
+                    if upcoming is not None:
+                        delay = max(1.0, min(delay, upcoming))
                 except Exception:
                     pass
-                await asyncio.sleep(settings.ack_ttl_scan_interval_seconds)
+                await asyncio.sleep(delay)
 
         async def _worker_tool_metrics() -> None:
             log = structlog.get_logger("tool.metrics")
@@ -665,11 +856,25 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                 try:
                     snapshot = _tool_metrics_snapshot()
                     if snapshot:
-                        log.info("tool_metrics_snapshot", tools=snapshot)
+                        log.info("tool_metrics_snapshot", tools=snapshot, identity_cache=_identity_cache_snapshot())
                 except Exception:
                     pass
                 await asyncio.sleep(max(5, settings.tool_metrics_emit_interval_seconds))
 
+        async def _worker_project_siblings() -> None:
+            log = structlog.get_logger("project_siblings")
+            while True:
+                try:
+                    scored = await refresh_project_sibling_suggestions(
+                        max_pairs=max(1, settings.project_siblings_refresh_max_pairs),
+                        concurrency=max(1, settings.project_siblings_refresh_concurrency),
+                    )
+                    if scored:
+                        log.info("project_siblings_refreshed", pairs=scored)
+                except Exception as exc:
+                    log.warning("project_siblings_refresh_failed", error=str(exc))
+                await asyncio.sleep(max(30, settings.project_siblings_refresh_interval_seconds))
+
         async def _worker_retention_quota() -> None:
             import datetime as _dt
             from pathlib import Path as _Path
@@ -682,47 +887,32 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                     cutoff = _dt.datetime.now(_dt.timezone.utc) - _dt.timedelta(
                         days=int(settings.retention_max_age_days)
                     )
-                    old_messages = 0
-                    total_attach_bytes = 0
-                    per_project_attach: dict[str, int] = {}
-                    per_project_inbox_counts: dict[str, int] = {}
-                    # Compile ignore patterns once per loop
-                    import fnmatch as _fnmatch
-
+                    cutoff_month = cutoff.strftime("%Y-%m")
                     ignore_patterns = list(getattr(settings, "retention_ignore_project_patterns", []) or [])
-                    for proj_dir in storage_root.iterdir() if storage_root.exists() else []:
-                        if not proj_dir.is_dir():
-                            continue
-                        proj_name = proj_dir.name
-                        # Skip test/demo projects in real server runs
-                        if any(_fnmatch.fnmatch(proj_name, pat) for pat in ignore_patterns):
-                            continue
-                        msg_root = proj_dir / "messages"
-                        if msg_root.exists():
-                            for ydir in msg_root.iterdir():
-                                for mdir in ydir.iterdir() if ydir.is_dir() else []:
-                                    for f in mdir.iterdir() if mdir.is_dir() else []:
-                                        if f.suffix.lower() == ".md":
-                                            with _suppress(Exception):
-                                                ts = _dt.datetime.fromtimestamp(f.stat().st_mtime, _dt.timezone.utc)
-                                                if ts < cutoff:
-                                                    old_messages += 1
-                        # Count per-agent inbox files (agents/*/inbox/YYYY/MM/*.md)
-                        inbox_root = proj_dir / "agents"
-                        if inbox_root.exists():
-                            count_inbox = 0
-                            for f in inbox_root.rglob("inbox/*/*/*.md"):
-                                with _suppress(Exception):
-                                    if f.is_file():
-                                        count_inbox += 1
-                            per_project_inbox_counts[proj_name] = count_inbox
-                        att_root = proj_dir / "attachments"
-                        if att_root.exists():
-                            for sub in att_root.rglob("*.webp"):
-                                with _suppress(Exception):
-                                    sz = sub.stat().st_size
-                                    total_attach_bytes += sz
-                                    per_project_attach[proj_name] = per_project_attach.get(proj_name, 0) + sz
+                    # Reads one stats.json per project (maintained by the archive write paths); projects
+                    # that predate the stats are walked once, off the event loop, to seed them
+                    project_stats = await collect_archive_stats(
+                        storage_root,
+                        ignore_patterns=ignore_patterns,
+                        rebuild_missing=True,
+                    )
+                    # Month granularity: a message counts as old once its whole month precedes the cutoff
+                    old_messages = sum(
+                        int(count)
+                        for stats in project_stats.values()
+                        for month, count in stats.get("messages_by_month", {}).items()
+                        if month < cutoff_month
+                    )
+                    per_project_attach = {
+                        slug: int(stats.get("attachment_bytes", 0))
+                        for slug, stats in project_stats.items()
+                        if stats.get("attachment_bytes")
+                    }
+                    total_attach_bytes = sum(per_project_attach.values())
+                    per_project_inbox_counts = {
+                        slug: sum(int(v) for v in stats.get("inbox_counts", {}).values())
+                        for slug, stats in project_stats.items()
+                    }
                     structlog.get_logger("maintenance").info(
                         "retention_quota_report",
                         old_messages=old_messages,
@@ -756,6 +946,8 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
             tasks.append(asyncio.create_task(_worker_ack_ttl()))
         if settings.tool_metrics_emit_enabled:
             tasks.append(asyncio.create_task(_worker_tool_metrics()))
+        if settings.project_siblings_refresh_enabled:
+            tasks.append(asyncio.create_task(_worker_project_siblings()))
         if settings.retention_report_enabled or settings.quota_enabled:
             tasks.append(asyncio.create_task(_worker_retention_quota()))
         fastapi_app.state._background_tasks = tasks
@@ -885,6 +1077,63 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
         return JSONResponse({"status": "ready"})
 
+    @fastapi_app.get("/api/projects/{project}/agents/{agent}/inbox/events")
+    async def inbox_events(
+        request: Request,
+        project: str,
+        agent: str,
+        since_ts: str | None = None,
+        urgent_only: bool = False,
+        include_bodies: bool = False,
+    ) -> StreamingResponse:
+        """Server-sent events: one ``message`` event per new inbox message, ``: keepalive`` comments while idle.
+
+        Without ``since_ts`` the stream starts at the time of the request; reconnect with the last
+        ``created_ts`` received to resume without gaps.
+        """
+        if since_ts and _parse_iso(since_ts) is None:
+            raise HTTPException(status_code=400, detail="since_ts must be an ISO-8601 timestamp")
+        try:
+            project_row = await _get_project_by_identifier(project)
+            agent_row = await _get_agent(project_row, agent)
+        except ToolExecutionError as exc:
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+        async def _events() -> Any:
+            cursor = since_ts or datetime.now(timezone.utc).isoformat()
+            last_id: int | None = None
+            yield "retry: 2000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    items = await _wait_for_inbox(
+                        project_row,
+                        agent_row,
+                        since_ts=cursor,
+                        after_id=last_id,
+                        timeout_seconds=_INBOX_EVENTS_KEEPALIVE_SECONDS,
+                        limit=_INBOX_EVENTS_BATCH,
+                        urgent_only=urgent_only,
+                        include_bodies=include_bodies,
+                    )
+                except ToolExecutionError:
+                    # The last message sent was deleted: fall back to its timestamp as the cursor
+                    last_id = None
+                    continue
+                if not items:
+                    yield ": keepalive\n\n"
+                    continue
+                for item in items:  # oldest first
+                    yield f"id: {item.get('id')}\nevent: message\ndata: {json.dumps(item, default=str)}\n\n"
+                # Resume just past the last row sent, so a burst larger than one batch drains over the next calls
+                cursor = str(items[-1].get("created_ts") or cursor)
+                last_id = int(items[-1]["id"])
+
+        return StreamingResponse(
+            _events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     # Well-known OAuth metadata endpoints (some clients probe these); return harmless JSON
     @fastapi_app.get("/.well-known/oauth-authorization-server")
     async def oauth_meta_root() -> JSONResponse:
@@ -1155,7 +1404,7 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
 
                 sibling_map: dict[int, dict[str, Any]] = {}
                 if include_projects:
-                    await refresh_project_sibling_suggestions()
+                    # Scored in the background (_worker_project_siblings); the page only reads the table
                     sibling_map = await get_project_sibling_data()
 
                 async with get_session() as session:
@@ -1306,7 +1555,6 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
         async def mail_projects_list() -> HTMLResponse:
             """Projects list view (moved from /mail)"""
             await ensure_schema()
-            await refresh_project_sibling_suggestions()
             sibling_map = await get_project_sibling_data()
             async with get_session() as session:
                 rows = await session.execute(
@@ -1364,12 +1612,12 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                         + (
                             "ORDER BY m.created_ts DESC "
                             if (order or "relevance") == "time"
-                            else f"ORDER BY bm25(fts_messages, {weights[0]}, {weights[1]}, {weights[2]}) "
+                            else f"ORDER BY bm25(fts_messages, {weights[0]}, {weights[1]}, {weights[2]}, 0.0) "
                         )
                         + "LIMIT 10000"
                     )
                     try:
-                        search = await session.execute(text(fts_sql), {"pid": pid, "q": fts_expr or q})
+                        search = await session.execute(text(fts_sql), {"pid": pid, "q": scope_fts_query(fts_expr or q, [pid])})
                         matched_messages = [
                             {
                                 "id": r[0],
@@ -1591,7 +1839,14 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
             )
 
         @fastapi_app.get("/mail/{project}/inbox/{agent}", response_class=HTMLResponse)
-        async def mail_inbox(project: str, agent: str, limit: int = 10000, page: int = 1) -> HTMLResponse:
+        async def mail_inbox(
+            project: str,
+            agent: str,
+            limit: int = 10000,
+            before_id: int | None = None,
+            after_id: int | None = None,
+        ) -> HTMLResponse:
+            limit = max(1, min(limit, 10000))
             await ensure_schema()
             async with get_session() as session:
                 prow = (
@@ -1611,22 +1866,36 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                 ).fetchone()
                 if not arow:
                     return await _render("error.html", message="Agent not found")
-                offset = max(0, (max(1, page) - 1) * max(1, limit))
+                # Keyset pages over the agent's mailbox index: "Older" seeks below the last row shown,
+                # "Newer" above the first, so deep pages cost the same as the first one.
+                cursor_sql, order = "", "DESC"
+                params: dict[str, Any] = {"aid": int(arow[0]), "pid": pid, "lim": limit + 1}
+                if before_id is not None:
+                    cursor_sql = "AND (e.created_ts, e.message_id) < (SELECT created_ts, id FROM messages WHERE id = :cursor)"
+                    params["cursor"] = before_id
+                elif after_id is not None:
+                    cursor_sql = "AND (e.created_ts, e.message_id) > (SELECT created_ts, id FROM messages WHERE id = :cursor)"
+                    params["cursor"] = after_id
+                    order = "ASC"
                 inbox_rows = await session.execute(
                     text(
-                        """
+                        f"""
                     SELECT m.id, m.subject, s.name, m.created_ts, m.importance, m.thread_id
-                    FROM messages m
-                    JOIN message_recipients mr ON mr.message_id = m.id
-                    JOIN agents a ON a.id = mr.agent_id
+                    FROM mailbox_entries e
+                    JOIN messages m ON m.id = e.message_id
                     JOIN agents s ON s.id = m.sender_id
-                    WHERE m.project_id = :pid AND a.name = :name
-                    ORDER BY m.created_ts DESC
-                    LIMIT :lim OFFSET :off
+                    WHERE e.agent_id = :aid AND e.project_id = :pid {cursor_sql}
+                    ORDER BY e.created_ts {order}, e.message_id {order}
+                    LIMIT :lim
                     """
                     ),
-                    {"pid": pid, "name": agent, "lim": limit, "off": offset},
+                    params,
                 )
+                rows = list(inbox_rows.fetchall())
+                more = len(rows) > limit
+                rows = rows[:limit]
+                if order == "ASC":
+                    rows.reverse()
                 items = [
                     {
                         "id": r[0],
@@ -1636,17 +1905,19 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                         "importance": r[4],
                         "thread_id": r[5],
                     }
-                    for r in inbox_rows.fetchall()
+                    for r in rows
                 ]
+            # Walking back (after_id) always has older rows behind it; walking forward has newer ones ahead
+            has_older = more if after_id is None else bool(items)
+            has_newer = (before_id is not None and bool(items)) or (after_id is not None and more)
             return await _render(
                 "mail_inbox.html",
                 project={"slug": prow[1], "human_key": prow[2]},
                 agent=agent,
                 items=items,
-                page=page,
                 limit=limit,
-                next_page=page + 1,
-                prev_page=page - 1 if page > 1 else None,
+                older_cursor=items[-1]["id"] if items and has_older else None,
+                newer_cursor=items[0]["id"] if items and has_newer else None,
             )
 
         @fastapi_app.get("/mail/{project}/message/{mid}", response_class=HTMLResponse)
@@ -2002,12 +2273,12 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                     + (
                         "ORDER BY m.created_ts DESC "
                         if (order or "relevance") == "time"
-                        else f"ORDER BY bm25(fts_messages, {weights[0]}, {weights[1]}, {weights[2]}) "
+                        else f"ORDER BY bm25(fts_messages, {weights[0]}, {weights[1]}, {weights[2]}, 0.0) "
                     )
                     + "LIMIT :lim"
                 )
                 try:
-                    rows = await session.execute(text(fts_sql), {"pid": pid, "q": fts_expr or q, "lim": limit})
+                    rows = await session.execute(text(fts_sql), {"pid": pid, "q": scope_fts_query(fts_expr or q, [pid]), "lim": limit})
                     results = [
                         {
                             "id": r[0],
@@ -2465,29 +2736,32 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                     else:
                         project_count = 0
 
-                    # Estimate size with timeout (run blocking 'du' in a worker thread)
-                    import asyncio as _asyncio
-                    import subprocess as _subprocess
-                    try:
-                        def _run_du():  # type: ignore[no-untyped-def]
-                            return _subprocess.run(
-                                ["du", "-sh", str(repo_root)],
-                                capture_output=True,
-                                text=True,
-                                timeout=5.0,
-                            )
-
-                        result = await _asyncio.to_thread(_run_du)
-                        repo_size = result.stdout.split()[0] if getattr(result, "returncode", 1) == 0 else "Unknown"
-                    except (_subprocess.TimeoutExpired, FileNotFoundError, PermissionError, OSError):
-                        # du not available, took too long, or other OS error
-                        repo_size = "Unknown"
-                    except Exception:
-                        # Catch-all for unexpected errors
+                    # Size and message totals come from the per-project stats.json files; projects that
+                    # predate them are walked once here to seed them
+                    project_stats = await collect_archive_stats(repo_root, rebuild_missing=True)
+                    if project_stats:
+                        content_bytes = sum(
+                            int(stats.get("message_bytes", 0)) + int(stats.get("attachment_bytes", 0))
+                            for stats in project_stats.values()
+                        )
+                        message_count = sum(
+                            int(count)
+                            for stats in project_stats.values()
+                            for count in stats.get("messages_by_month", {}).values()
+                        )
+                        size_value = float(content_bytes)
+                        for unit in ("B", "KB", "MB", "GB"):
+                            if size_value < 1024 or unit == "GB":
+                                break
+                            size_value /= 1024
+                        repo_size = f"{size_value:.0f} {unit}" if unit == "B" else f"{size_value:.1f} {unit}"
+                    else:
+                        message_count = 0
                         repo_size = "Unknown"
                 except Exception:
                     total_commits = "0"
                     project_count = 0
+                    message_count = 0
                     repo_size = "Unknown"
                     last_commit_time = "Unknown"
                 finally:
@@ -2496,6 +2770,7 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
             else:
                 total_commits = "0"
                 project_count = 0
+                message_count = 0
                 repo_size = "0 MB"
                 last_commit_time = "Never"
 
@@ -2509,16 +2784,19 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                 storage_root=storage_root,
                 total_commits=total_commits,
                 project_count=project_count,
+                message_count=message_count,
                 repo_size=repo_size,
                 last_commit_time=last_commit_time,
                 projects=projects,
             )
 
         @fastapi_app.get("/mail/archive/activity", response_class=HTMLResponse)
-        async def archive_activity(limit: int = 50) -> HTMLResponse:
+        async def archive_activity(limit: int = 50, page: int = 1) -> HTMLResponse:
             """Display recent commits across all projects."""
             # Validate and cap limit to prevent DoS
             limit = max(1, min(limit, 500))  # Between 1 and 500
+            page = max(1, page)
+            offset = (page - 1) * limit
 
             settings = get_settings()
             repo_root = Path(settings.storage.root).expanduser().resolve()
@@ -2526,12 +2804,22 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
             from git import Repo as GitRepo
 
             if not (repo_root / ".git").exists():
-                return await _render("archive_activity.html", commits=[])
+                return await _render("archive_activity.html", commits=[], page=1, limit=limit, has_next=False)
 
             repo = GitRepo(str(repo_root))
             try:
-                commits = await get_recent_commits(repo, limit=limit)
-                return await _render("archive_activity.html", commits=commits)
+                # One extra row tells whether an older page exists
+                if await _archive_commits_indexed(repo):
+                    commits = await _recent_commits_from_db(limit + 1, offset)
+                else:
+                    commits = await get_recent_commits(repo, limit=limit + 1, offset=offset)
+                return await _render(
+                    "archive_activity.html",
+                    commits=commits[:limit],
+                    page=page,
+                    limit=limit,
+                    has_next=len(commits) > limit,
+                )
             finally:
                 repo.close()
 
@@ -2562,8 +2850,10 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                     repo.close()
 
         @fastapi_app.get("/mail/archive/timeline", response_class=HTMLResponse)
-        async def archive_timeline(project: str | None = None) -> HTMLResponse:
+        async def archive_timeline(project: str | None = None, page: int = 1) -> HTMLResponse:
             """Display communication timeline with Mermaid.js visualization."""
+            page = max(1, page)
+            per_page = 100
             # Validate project slug if provided
             if project and not _validate_project_slug(project):
                 return await _render("error.html", message="Invalid project identifier")
@@ -2598,8 +2888,27 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
 
             repo = GitRepo(str(repo_root))
             try:
-                commits = await get_timeline_commits(repo, project, limit=100)
-                return await _render("archive_timeline.html", commits=commits, project=project, project_name=project_name)
+                offset = (page - 1) * per_page
+                if await _archive_commits_indexed(repo):
+                    commits = await _timeline_from_db(project, per_page + 1, offset)
+                    has_next = len(commits) > per_page
+                    commits = commits[1:] if has_next else commits  # drop the oldest (extra) row
+                else:
+                    git_commits = await get_timeline_commits(repo, project, limit=per_page + 1, offset=offset)
+                    has_next = len({c["sha"] for c in git_commits}) > per_page
+                    if has_next:
+                        oldest = git_commits[0]["sha"]
+                        commits = [c for c in git_commits if c["sha"] != oldest]
+                    else:
+                        commits = git_commits
+                return await _render(
+                    "archive_timeline.html",
+                    commits=commits,
+                    project=project,
+                    project_name=project_name,
+                    page=page,
+                    has_next=has_next,
+                )
             finally:
                 repo.close()
 
@@ -2643,8 +2952,9 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                 raise HTTPException(status_code=404, detail="File not found") from err
 
         @fastapi_app.get("/mail/archive/network", response_class=HTMLResponse)
-        async def archive_network(project: str | None = None) -> HTMLResponse:
+        async def archive_network(project: str | None = None, limit: int = 200) -> HTMLResponse:
             """Display agent communication network graph."""
+            limit = max(1, min(limit, 5000))
             # Validate project slug if provided
             if project and not _validate_project_slug(project):
                 return await _render("error.html", message="Invalid project identifier")
@@ -2679,7 +2989,10 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
 
             repo = GitRepo(str(repo_root))
             try:
-                graph = await get_agent_communication_graph(repo, project, limit=200)
+                if await _archive_commits_indexed(repo):
+                    graph = await _communication_graph_from_db(project, limit)
+                else:
+                    graph = await get_agent_communication_graph(repo, project, limit=limit)
                 return await _render("archive_network.html", graph=graph, project=project, project_name=project_name)
             finally:
                 repo.close()
@@ -2740,9 +3053,26 @@ def build_http_app(settings: Settings, server=None) -> FastAPI:  # type: ignore[
                 settings = get_settings()
                 repo = await ensure_archive(settings, project)
 
-                # Get historical snapshot
-                snapshot = await get_historical_inbox_snapshot(repo, agent, timestamp, limit=200)
-
+                try:
+                    target = parse_snapshot_time(timestamp)
+                except ValueError:
+                    target = None
+                db_messages = await _inbox_snapshot_from_db(project, agent, target, 200) if target is not None else None
+                if db_messages is None:
+                    # Unknown to the database (or an unparseable time): read the inbox tree from Git history
+                    snapshot = await get_historical_inbox_snapshot(repo, agent, timestamp, limit=200)
+                    return JSONResponse(snapshot)
+
+                commit = await find_commit_at(repo.repo, cast(datetime, target))
+                snapshot = {
+                    "messages": db_messages,
+                    "snapshot_time": commit.authored_datetime.isoformat() if commit else None,
+                    "commit_sha": commit.hexsha if commit else None,
+                    "requested_time": timestamp,
+                    "source": "database",
+                }
+                if commit is None:
+                    snapshot["note"] = "No commits found before this timestamp"
                 return JSONResponse(snapshot)
 
             except Exception as e:
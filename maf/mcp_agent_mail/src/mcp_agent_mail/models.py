@@ -67,6 +67,26 @@ class MessageRecipient(SQLModel, table=True):
     ack_ts: Optional[datetime] = Field(default=None)
 
 
+class MailboxEntry(SQLModel, table=True):
+    """Denormalized inbox row per (recipient, message), kept in sync by triggers on the source tables.
+
+    Carries the message's ``created_ts`` so an agent's inbox pages off one
+    ``(agent_id, created_ts DESC, message_id DESC)`` index instead of sorting its whole history.
+    """
+
+    __tablename__ = "mailbox_entries"
+
+    agent_id: int = Field(primary_key=True)
+    message_id: int = Field(primary_key=True)
+    project_id: int
+    created_ts: datetime
+    kind: str = Field(max_length=8, default="to")
+    importance: str = Field(default="normal", max_length=16)
+    ack_required: bool = Field(default=False)
+    read_ts: Optional[datetime] = Field(default=None)
+    ack_ts: Optional[datetime] = Field(default=None)
+
+
 class Message(SQLModel, table=True):
     __tablename__ = "messages"
 
@@ -85,6 +105,29 @@ class Message(SQLModel, table=True):
     )
 
 
+class ArchiveOutboxEntry(SQLModel, table=True):
+    """Pending Git archive write for a message, drained by the write-behind archive writer.
+
+    Rows are inserted in the same transaction as the message so the archive can always be
+    rebuilt from the database; ``id`` order is the per-project commit order.
+    """
+
+    __tablename__ = "archive_outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="projects.id", index=True)
+    message_id: int = Field(foreign_key="messages.id", index=True)
+    status: str = Field(default="pending", max_length=16)  # pending | done | failed | skipped
+    payload: dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSON, nullable=False, server_default="{}"),
+    )
+    attempts: int = Field(default=0)
+    last_error: str = Field(default="", max_length=2048)
+    created_ts: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    processed_ts: Optional[datetime] = Field(default=None)
+
+
 class FileReservation(SQLModel, table=True):
     __tablename__ = "file_reservations"
 
@@ -120,6 +163,24 @@ class AgentLink(SQLModel, table=True):
     expires_ts: Optional[datetime] = None
 
 
+class RecentContact(SQLModel, table=True):
+    """Latest message exchanged between two agents of a project, in either direction.
+
+    Pairs are stored once with ``a_agent_id < b_agent_id``. The ``recent_contacts_ai`` trigger on
+    ``message_recipients`` keeps ``last_ts`` current on every delivery, so the send-time contact
+    policy answers "talked within the TTL?" for all recipients with one indexed lookup.
+    """
+
+    __tablename__ = "recent_contacts"
+    __table_args__ = (UniqueConstraint("project_id", "a_agent_id", "b_agent_id", name="uq_recent_contact_pair"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="projects.id")
+    a_agent_id: int = Field(foreign_key="agents.id")
+    b_agent_id: int = Field(foreign_key="agents.id")
+    last_ts: datetime
+
+
 class ProjectSiblingSuggestion(SQLModel, table=True):
     """LLM-ranked sibling project suggestion (undirected pair)."""
 
@@ -136,3 +197,98 @@ class ProjectSiblingSuggestion(SQLModel, table=True):
     evaluated_ts: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     confirmed_ts: Optional[datetime] = Field(default=None)
     dismissed_ts: Optional[datetime] = Field(default=None)
+
+
+class ThreadSummary(SQLModel, table=True):
+    """Cached heuristic fold state (and last LLM refinement) for a thread, keyed by its high-water message id.
+
+    ``scope`` is ``project:<id>`` or ``product:<id>:<linked project ids>``; ``state`` is the incremental
+    summarizer state so newer messages can be folded in without reloading the thread.
+    """
+
+    __tablename__ = "thread_summaries"
+    __table_args__ = (UniqueConstraint("scope", "thread_key", name="uq_thread_summary_scope_thread"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    scope: str = Field(max_length=512)
+    thread_key: str = Field(max_length=128)
+    last_message_id: int = Field(default=0)
+    message_count: int = Field(default=0)
+    state: dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSON, nullable=False, server_default="{}"),
+    )
+    examples: list[dict[str, Any]] = Field(
+        default_factory=list,
+        sa_column=Column(JSON, nullable=False, server_default="[]"),
+    )
+    llm_model: str = Field(default="", max_length=128)
+    llm_message_count: int = Field(default=0)
+    llm_overrides: dict[str, Any] = Field(
+        default_factory=dict,
+        sa_column=Column(JSON, nullable=False, server_default="{}"),
+    )
+    updated_ts: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class BuildSlotLease(SQLModel, table=True):
+    """Lease (or queued request) on a named per-project build slot.
+
+    ``status`` moves ``waiting`` → ``active`` → ``released``/``expired``; waiters that give up become
+    ``cancelled``. For waiting rows ``expires_ts`` is the caller's wait deadline.
+    """
+
+    __tablename__ = "build_slot_leases"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="projects.id", index=True)
+    slot: str = Field(max_length=128)
+    agent: str = Field(max_length=128)
+    branch: str = Field(default="", max_length=255)
+    exclusive: bool = Field(default=True)
+    priority: int = Field(default=0)
+    status: str = Field(default="waiting", max_length=16)  # waiting | active | released | expired | cancelled
+    ttl_seconds: int = Field(default=3600)
+    requested_ts: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    acquired_ts: Optional[datetime] = Field(default=None)
+    expires_ts: datetime
+    released_ts: Optional[datetime] = Field(default=None)
+
+
+class ArchiveCommit(SQLModel, table=True):
+    """Metadata of one Git archive commit, recorded when it is made (or by ``archive backfill-commits``).
+
+    Lets the archive activity/timeline/network pages page through history with indexed queries
+    instead of walking Git and diffing every commit on each view.
+    """
+
+    __tablename__ = "archive_commits"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    sha: str = Field(index=True, unique=True, max_length=40)
+    commit_ts: datetime = Field(index=True)
+    author: str = Field(default="", max_length=255)
+    email: str = Field(default="", max_length=255)
+    subject: str = Field(default="", max_length=1024)
+    files_changed: int = Field(default=0)
+    insertions: int = Field(default=0)
+    deletions: int = Field(default=0)
+
+
+class ArchiveCommitEntry(SQLModel, table=True):
+    """One archive write folded into an :class:`ArchiveCommit` (group commits carry several), per project touched."""
+
+    __tablename__ = "archive_commit_entries"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    commit_id: int = Field(foreign_key="archive_commits.id", index=True)
+    seq: int = Field(default=0)
+    project_slug: Optional[str] = Field(default=None, max_length=255)
+    commit_ts: datetime
+    type: str = Field(default="other", max_length=32)  # message | file_reservation | chore | other
+    subject: str = Field(default="", max_length=1024)
+    sender: Optional[str] = Field(default=None, max_length=128)
+    recipients: list[str] = Field(
+        default_factory=list,
+        sa_column=Column(JSON, nullable=False, server_default="[]"),
+    )
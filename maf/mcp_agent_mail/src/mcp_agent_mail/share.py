@@ -12,13 +12,13 @@ import re
 import shutil
 import sqlite3
 import subprocess
-from collections import defaultdict
+from collections import defaultdict, deque
 from contextlib import suppress
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from importlib import abc, resources
 from pathlib import Path
-from typing import Any, Mapping, Optional, Sequence, cast
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence, cast
 from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
 
 from sqlalchemy.engine import make_url
@@ -39,6 +39,14 @@ SECRET_PATTERNS: tuple[re.Pattern[str], ...] = (
     re.compile(r"eyJ[0-9A-Za-z_-]+\.[0-9A-Za-z_-]+\.[0-9A-Za-z_-]+"),  # JWT tokens
 )
 
+# Lower-cased literal every SECRET_PATTERNS match starts with. A text containing none of them cannot
+# match any pattern, which lets the scrubber skip the regex passes for the vast majority of rows.
+SECRET_PATTERN_ANCHORS: tuple[str, ...] = ("ghp_", "github_pat_", "xox", "sk-", "bearer", "eyj")
+
+SCRUB_BATCH_SIZE = 2000
+SCRUB_PARALLEL_MIN_ROWS = 50_000
+SCRUB_MAX_WORKERS = 8
+
 ATTACHMENT_REDACT_KEYS: frozenset[str] = frozenset(
     {
         "download_url",
@@ -55,6 +63,11 @@ INLINE_ATTACHMENT_THRESHOLD = 64 * 1024  # 64 KiB
 DETACH_ATTACHMENT_THRESHOLD = 25 * 1024 * 1024  # 25 MiB
 DEFAULT_CHUNK_THRESHOLD = 20 * 1024 * 1024  # 20 MiB
 DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024  # 4 MiB
+DEFAULT_PAGE_SIZE = 1024  # httpvfs-friendly page size for fully downloaded bundles
+RANGE_PAGE_SIZE = 4096  # fewer, larger reads when the viewer fetches pages with HTTP Range requests
+PAGE_INDEX_FILENAME = "mailbox.sqlite3.pages.json"
+# Objects the viewer's first render reads in lazy (range-request) mode; their indexes are included automatically.
+RANGE_BOOTSTRAP_TABLES = ("message_overview_mv", "projects")
 INDEX_REDIRECT_HTML = """<!doctype html>
 <html lang="en">
 
@@ -157,6 +170,7 @@ class ScrubSummary:
     recipients_cleared: int
     file_reservations_removed: int
     agent_links_removed: int
+    thread_summaries_cleared: int
     secrets_replaced: int
     attachments_sanitized: int
     bodies_redacted: int
@@ -280,6 +294,7 @@ class BundleArtifacts:
     attachments_manifest: dict[str, Any]
     chunk_manifest: Optional[dict[str, Any]]
     viewer_data: Optional[dict[str, Any]]
+    page_index: Optional[dict[str, Any]] = None
 
 
 def _find_repo_root(start: Path) -> Optional[Path]:
@@ -663,6 +678,24 @@ def _format_in_clause(count: int) -> str:
     return ",".join("?" for _ in range(count))
 
 
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def _thread_summary_scope_allowed(scope: str, allowed_ids: set[int]) -> bool:
+    """``project:<id>`` must be retained; ``product:<id>:<ids>`` must only span retained projects."""
+    kind, _, rest = scope.partition(":")
+    try:
+        if kind == "project":
+            return int(rest) in allowed_ids
+        if kind == "product":
+            linked = rest.partition(":")[2]
+            return all(int(part) in allowed_ids for part in linked.split(",") if part)
+    except ValueError:
+        return False
+    return False
+
+
 def apply_project_scope(snapshot_path: Path, identifiers: Sequence[str]) -> ProjectScopeResult:
     """Restrict the snapshot to the requested projects and return retained records."""
 
@@ -718,6 +751,39 @@ def apply_project_scope(snapshot_path: Path, identifiers: Sequence[str]) -> Proj
             params + params,
         )
 
+        if _table_exists(conn, "recent_contacts"):
+            conn.execute(f"DELETE FROM recent_contacts WHERE project_id NOT IN ({placeholders})", params)
+
+        # Cached thread summaries embed subjects and participants of their scope's messages
+        if _table_exists(conn, "thread_summaries"):
+            allowed_set = set(allowed_ids)
+            stale_summaries = [
+                (int(row["id"]),)
+                for row in conn.execute("SELECT id, scope FROM thread_summaries")
+                if not _thread_summary_scope_allowed(str(row["scope"] or ""), allowed_set)
+            ]
+            conn.executemany("DELETE FROM thread_summaries WHERE id = ?", stale_summaries)
+
+        # Archive commit index rows carry slugs, subjects, senders and recipients; keep only the
+        # retained projects' entries (unattributed ones included in the purge) and their commits.
+        if _table_exists(conn, "archive_commit_entries"):
+            slugs = tuple(record.slug for record in selected)
+            conn.execute(
+                f"DELETE FROM archive_commit_entries WHERE project_slug IS NULL OR project_slug NOT IN ({_format_in_clause(len(slugs))})",
+                slugs,
+            )
+            if _table_exists(conn, "archive_commits"):
+                conn.execute(
+                    "DELETE FROM archive_commits WHERE id NOT IN (SELECT commit_id FROM archive_commit_entries)"
+                )
+
+        # Write-behind archive rows hold full message payloads and reference the removed messages
+        if _table_exists(conn, "archive_outbox"):
+            conn.execute(f"DELETE FROM archive_outbox WHERE project_id NOT IN ({placeholders})", params)
+
+        if _table_exists(conn, "mailbox_entries"):
+            conn.execute(f"DELETE FROM mailbox_entries WHERE project_id NOT IN ({placeholders})", params)
+
         # Collect message ids slated for removal to clean recipient table explicitly.
         to_remove_messages = conn.execute(
             f"SELECT id FROM messages WHERE project_id NOT IN ({placeholders})",
@@ -738,6 +804,8 @@ def apply_project_scope(snapshot_path: Path, identifiers: Sequence[str]) -> Proj
             f"DELETE FROM file_reservations WHERE project_id NOT IN ({placeholders})",
             params,
         )
+        if _table_exists(conn, "build_slot_leases"):
+            conn.execute(f"DELETE FROM build_slot_leases WHERE project_id NOT IN ({placeholders})", params)
         conn.execute(
             f"DELETE FROM agents WHERE project_id NOT IN ({placeholders})",
             params,
@@ -755,6 +823,11 @@ def apply_project_scope(snapshot_path: Path, identifiers: Sequence[str]) -> Proj
 
 
 def _scrub_text(value: str) -> tuple[str, int]:
+    if not value:
+        return value, 0
+    lowered = value.lower()
+    if not any(anchor in lowered for anchor in SECRET_PATTERN_ANCHORS):
+        return value, 0
     replacements = 0
     updated = value
     for pattern in SECRET_PATTERNS:
@@ -808,13 +881,118 @@ def _scrub_structure(value: Any) -> tuple[Any, int, int]:
     return value, 0, 0
 
 
+def _scrub_message_batch(
+    rows: Sequence[tuple[Any, ...]],
+    preset_opts: Mapping[str, Any],
+) -> tuple[list[tuple[Any, ...]], dict[str, int]]:
+    """Scrub ``(id, subject, body_md, attachments)`` rows.
+
+    Returns ``(subject, body_md, attachments, id)`` parameters for the rows that changed plus counters.
+    Module-level (and free of connection state) so batches can be shipped to a process pool.
+    """
+
+    scrub_secrets = bool(preset_opts.get("scrub_secrets", True))
+    redact_body = bool(preset_opts["redact_body"])
+    drop_attachments = bool(preset_opts["drop_attachments"])
+    body_placeholder = preset_opts.get("body_placeholder") or "[Message body redacted]"
+    counts = {"secrets_replaced": 0, "bodies_redacted": 0, "attachments_cleared": 0, "attachments_sanitized": 0}
+    updates: list[tuple[Any, ...]] = []
+    for msg_id, subject_value, body_value, attachments_value in rows:
+        subject_original = subject_value or ""
+        body_original = body_value or ""
+        if scrub_secrets:
+            subject, subj_replacements = _scrub_text(subject_original)
+            body, body_replacements = _scrub_text(body_original)
+            counts["secrets_replaced"] += subj_replacements + body_replacements
+        else:
+            subject = subject_original
+            body = body_original
+        attachments_updated = False
+        attachment_replacements = 0
+        attachment_keys_removed = 0
+        if attachments_value:
+            if isinstance(attachments_value, str):
+                try:
+                    attachments_data = json.loads(attachments_value)
+                except json.JSONDecodeError:
+                    attachments_data = attachments_value
+            else:
+                attachments_data = attachments_value
+        else:
+            attachments_data = []
+        if drop_attachments and attachments_data:
+            attachments_data = []
+            counts["attachments_cleared"] += 1
+            attachments_updated = True
+        if scrub_secrets and attachments_data:
+            sanitized, rep_count, removed_count = _scrub_structure(attachments_data)
+            attachment_replacements += rep_count
+            attachment_keys_removed += removed_count
+            if sanitized != attachments_data:
+                attachments_data = sanitized
+                attachments_updated = True
+        counts["secrets_replaced"] += attachment_replacements
+        if attachments_updated or attachment_replacements or attachment_keys_removed:
+            counts["attachments_sanitized"] += 1
+
+        new_attachments = (
+            json.dumps(attachments_data, separators=(",", ":"), sort_keys=True)
+            if attachments_updated
+            else attachments_value
+        )
+        if redact_body:
+            body = body_placeholder
+            if body_value != body:
+                counts["bodies_redacted"] += 1
+        if attachments_updated or subject != subject_value or body != body_value:
+            updates.append((subject, body, new_attachments, msg_id))
+    return updates, counts
+
+
+def _iter_message_batches(conn: sqlite3.Connection, batch_size: int) -> Iterator[list[tuple[Any, ...]]]:
+    """Yield message rows in id order, one keyset page at a time.
+
+    Each page is read to completion before its updates are written, so the writes never race an
+    open SELECT over ``messages`` on the same connection.
+    """
+
+    last_id: Any = None
+    while True:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        if last_id is None:
+            cursor.execute(
+                "SELECT id, subject, body_md, attachments FROM messages ORDER BY id LIMIT ?", (batch_size,)
+            )
+        else:
+            cursor.execute(
+                "SELECT id, subject, body_md, attachments FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            )
+        batch = cursor.fetchmany(batch_size)
+        cursor.close()
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][0]
+
+
 def scrub_snapshot(
     snapshot_path: Path,
     *,
     preset: str = "standard",
     export_salt: Optional[bytes] = None,
+    workers: Optional[int] = None,
+    batch_size: int = SCRUB_BATCH_SIZE,
 ) -> ScrubSummary:
-    """Apply in-place redactions to the snapshot and return a summary."""
+    """Apply in-place redactions to the snapshot and return a summary.
+
+    Messages are streamed in batches of ``batch_size`` and written back with ``executemany`` inside a
+    single transaction. Snapshots with at least ``SCRUB_PARALLEL_MIN_ROWS`` messages are scrubbed on a
+    process pool of ``workers`` processes (default: CPU count, capped at ``SCRUB_MAX_WORKERS``).
+    """
 
     preset_key = _normalize_scrub_preset(preset)
     preset_opts = SCRUB_PRESETS[preset_key]
@@ -822,10 +1000,9 @@ def scrub_snapshot(
     clear_recipients = bool(preset_opts.get("clear_recipients", True))
     clear_file_reservations = bool(preset_opts.get("clear_file_reservations", True))
     clear_agent_links = bool(preset_opts.get("clear_agent_links", True))
-    scrub_secrets = bool(preset_opts.get("scrub_secrets", True))
-
-    bodies_redacted = 0
-    attachments_cleared = 0
+    batch_size = max(1, int(batch_size))
+    if workers is None:
+        workers = min(os.cpu_count() or 1, SCRUB_MAX_WORKERS)
 
     conn = sqlite3.connect(str(snapshot_path))
     try:
@@ -863,65 +1040,44 @@ def scrub_snapshot(
         else:
             agent_links_removed = 0
 
-        secrets_replaced = 0
-        attachments_sanitized = 0
+        # Summary state and examples quote message subjects verbatim; reset them so they are rebuilt from scrubbed rows
+        if _table_exists(conn, "thread_summaries"):
+            summaries_cursor = conn.execute(
+                "UPDATE thread_summaries SET state = '{}', examples = '[]', llm_overrides = '{}', llm_model = '', "
+                "last_message_id = 0, message_count = 0, llm_message_count = 0"
+            )
+            thread_summaries_cleared = summaries_cursor.rowcount or 0
+        else:
+            thread_summaries_cleared = 0
 
-        message_rows = conn.execute("SELECT id, subject, body_md, attachments FROM messages").fetchall()
-        for msg in message_rows:
-            subject_original = msg["subject"] or ""
-            body_original = msg["body_md"] or ""
-            if scrub_secrets:
-                subject, subj_replacements = _scrub_text(subject_original)
-                body, body_replacements = _scrub_text(body_original)
-            else:
-                subject = subject_original
-                body = body_original
-                subj_replacements = 0
-                body_replacements = 0
-            secrets_replaced += subj_replacements + body_replacements
-            attachments_value = msg["attachments"]
-            attachments_updated = False
-            attachment_replacements = 0
-            attachment_keys_removed = 0
-            if attachments_value:
-                if isinstance(attachments_value, str):
-                    try:
-                        attachments_data = json.loads(attachments_value)
-                    except json.JSONDecodeError:
-                        attachments_data = attachments_value
-                else:
-                    attachments_data = attachments_value
-            else:
-                attachments_data = []
-            if preset_opts["drop_attachments"] and attachments_data:
-                attachments_data = []
-                attachments_cleared += 1
-                attachments_updated = True
-            if scrub_secrets and attachments_data:
-                sanitized, rep_count, removed_count = _scrub_structure(attachments_data)
-                attachment_replacements += rep_count
-                attachment_keys_removed += removed_count
-                if sanitized != attachments_data:
-                    attachments_data = sanitized
-                    attachments_updated = True
-            if attachments_updated:
-                sanitized_json = json.dumps(attachments_data, separators=(",", ":"), sort_keys=True)
-                conn.execute(
-                    "UPDATE messages SET attachments = ? WHERE id = ?",
-                    (sanitized_json, msg["id"]),
+        totals = {"secrets_replaced": 0, "bodies_redacted": 0, "attachments_cleared": 0, "attachments_sanitized": 0}
+
+        def _apply(result: tuple[list[tuple[Any, ...]], dict[str, int]]) -> None:
+            updates, counts = result
+            if updates:
+                conn.executemany(
+                    "UPDATE messages SET subject = ?, body_md = ?, attachments = ? WHERE id = ?", updates
                 )
-            if subject != msg["subject"]:
-                conn.execute("UPDATE messages SET subject = ? WHERE id = ?", (subject, msg["id"]))
-            if preset_opts["redact_body"]:
-                body = preset_opts.get("body_placeholder") or "[Message body redacted]"
-                if msg["body_md"] != body:
-                    bodies_redacted += 1
-                    conn.execute("UPDATE messages SET body_md = ? WHERE id = ?", (body, msg["id"]))
-            elif body != msg["body_md"]:
-                conn.execute("UPDATE messages SET body_md = ? WHERE id = ?", (body, msg["id"]))
-            secrets_replaced += attachment_replacements
-            if attachments_updated or attachment_replacements or attachment_keys_removed:
-                attachments_sanitized += 1
+            for key, value in counts.items():
+                totals[key] += value
+
+        batches = _iter_message_batches(conn, batch_size)
+        message_count = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] if workers > 1 else 0
+        if workers > 1 and message_count >= SCRUB_PARALLEL_MIN_ROWS:
+            from concurrent.futures import Future, ProcessPoolExecutor
+
+            # Bounded read-ahead: at most two batches per worker are held in memory at once
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending: deque[Future[tuple[list[tuple[Any, ...]], dict[str, int]]]] = deque()
+                for batch in batches:
+                    pending.append(pool.submit(_scrub_message_batch, batch, preset_opts))
+                    if len(pending) >= workers * 2:
+                        _apply(pending.popleft().result())
+                while pending:
+                    _apply(pending.popleft().result())
+        else:
+            for batch in batches:
+                _apply(_scrub_message_batch(batch, preset_opts))
 
         conn.commit()
     finally:
@@ -936,10 +1092,11 @@ def scrub_snapshot(
         recipients_cleared=recipients_cleared,
         file_reservations_removed=file_res_removed,
         agent_links_removed=agent_links_removed,
-        secrets_replaced=secrets_replaced,
-        attachments_sanitized=attachments_sanitized,
-        bodies_redacted=bodies_redacted,
-        attachments_cleared=attachments_cleared,
+        thread_summaries_cleared=thread_summaries_cleared,
+        secrets_replaced=totals["secrets_replaced"],
+        attachments_sanitized=totals["attachments_sanitized"],
+        bodies_redacted=totals["bodies_redacted"],
+        attachments_cleared=totals["attachments_cleared"],
     )
 
 
@@ -1008,12 +1165,12 @@ def build_search_indexes(snapshot_path: Path) -> bool:
         conn.close()
 
 
-def finalize_snapshot_for_export(snapshot_path: Path) -> None:
+def finalize_snapshot_for_export(snapshot_path: Path, *, page_size: int = DEFAULT_PAGE_SIZE) -> None:
     """Apply SQL hygiene optimizations to improve bundle size and httpvfs performance.
 
     Executes the optimization sequence from the sharing plan:
     - PRAGMA journal_mode=DELETE (single-file mode)
-    - PRAGMA page_size=1024 (httpvfs-friendly page size)
+    - PRAGMA page_size (1024 by default; ``RANGE_PAGE_SIZE`` for range-request bundles)
     - VACUUM (compact database, improve locality)
     - PRAGMA optimize (update query planner statistics)
     """
@@ -1024,7 +1181,7 @@ def finalize_snapshot_for_export(snapshot_path: Path) -> None:
 
         # Set page size for better httpvfs streaming performance
         # Must be done before VACUUM to take effect
-        conn.execute("PRAGMA page_size=1024")
+        conn.execute(f"PRAGMA page_size={int(page_size)}")
 
         # Compact database and improve page locality
         conn.execute("VACUUM")
@@ -1388,6 +1545,7 @@ def create_snapshot_context(
     snapshot_path: Path,
     project_filters: Sequence[str],
     scrub_preset: str,
+    range_requests: bool = False,
 ) -> SnapshotContext:
     """Materialize and prepare a snapshot for export."""
 
@@ -1397,7 +1555,7 @@ def create_snapshot_context(
     fts_enabled = build_search_indexes(snapshot_path)
     build_materialized_views(snapshot_path)
     create_performance_indexes(snapshot_path)
-    finalize_snapshot_for_export(snapshot_path)
+    finalize_snapshot_for_export(snapshot_path, page_size=RANGE_PAGE_SIZE if range_requests else DEFAULT_PAGE_SIZE)
     return SnapshotContext(
         snapshot_path=snapshot_path,
         scope=scope,
@@ -1629,6 +1787,88 @@ def maybe_chunk_database(
     return config
 
 
+def _page_runs(pages: Iterable[int]) -> list[list[int]]:
+    """Collapse page numbers into sorted ``[first_page, page_count]`` runs."""
+    runs: list[list[int]] = []
+    for page in sorted(set(pages)):
+        if runs and runs[-1][0] + runs[-1][1] == page:
+            runs[-1][1] += 1
+        else:
+            runs.append([page, 1])
+    return runs
+
+
+def build_page_index(
+    snapshot_path: Path,
+    output_dir: Path,
+    *,
+    chunk_manifest: Optional[dict[str, Any]] = None,
+) -> Optional[dict[str, Any]]:
+    """Write the page-index manifest the viewer uses to fetch database pages with HTTP Range requests.
+
+    Records the page runs of every table and index, the runs the first render needs (schema and
+    statistics, the ``RANGE_BOOTSTRAP_TABLES`` and their indexes, and the interior pages of ``messages`` so a body
+    lookup only fetches its leaf and overflow pages), and where a page lives when the database is
+    chunked. Returns ``None`` when SQLite was built without the ``dbstat`` virtual table.
+    """
+    conn = sqlite3.connect(str(snapshot_path))
+    try:
+        page_size = int(conn.execute("PRAGMA page_size").fetchone()[0])
+        page_count = int(conn.execute("PRAGMA page_count").fetchone()[0])
+        try:
+            rows = conn.execute("SELECT name, pageno, pagetype FROM dbstat ORDER BY pageno").fetchall()
+        except sqlite3.OperationalError:
+            return None
+        owners = {
+            str(name): str(tbl_name or name)
+            for name, tbl_name in conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')")
+        }
+        body_column = next(
+            (int(cid) for cid, name, *_rest in conn.execute("PRAGMA table_info(messages)") if name == "body_md"),
+            None,
+        )
+        messages_root = conn.execute("SELECT rootpage FROM sqlite_master WHERE type = 'table' AND name = 'messages'").fetchone()
+    finally:
+        conn.close()
+
+    object_pages: dict[str, list[int]] = defaultdict(list)
+    bootstrap: set[int] = {1}
+    for name, pageno, pagetype in rows:
+        object_pages[name].append(int(pageno))
+        # sqlite_stat* tables are read when the schema loads, so every connection touches them
+        if (
+            name == "sqlite_schema"
+            or name.startswith("sqlite_stat")
+            or owners.get(name) in RANGE_BOOTSTRAP_TABLES
+            or (name == "messages" and pagetype == "internal")
+        ):
+            bootstrap.add(int(pageno))
+
+    if chunk_manifest and int(chunk_manifest["chunk_size"]) % page_size:
+        raise ShareExportError(
+            f"chunk size {chunk_manifest['chunk_size']} must be a multiple of the {page_size}-byte page size "
+            "for range-request bundles."
+        )
+    page_index = {
+        "version": 1,
+        "page_size": page_size,
+        "page_count": page_count,
+        "size_bytes": snapshot_path.stat().st_size,
+        "database": {"path": snapshot_path.name} if not chunk_manifest else {
+            "pattern": chunk_manifest["pattern"],
+            "chunk_size": chunk_manifest["chunk_size"],
+        },
+        "bootstrap": _page_runs(bootstrap),
+        "objects": {name: _page_runs(pages) for name, pages in sorted(object_pages.items())},
+        "messages": {
+            "root_page": int(messages_root[0]) if messages_root else None,
+            "body_column": body_column,
+        },
+    }
+    _write_json_file(output_dir / PAGE_INDEX_FILENAME, page_index)
+    return page_index
+
+
 def build_bundle_assets(
     snapshot_path: Path,
     output_dir: Path,
@@ -1645,8 +1885,13 @@ def build_bundle_assets(
     fts_enabled: bool,
     export_config: Mapping[str, Any],
     exporter_version: str = "prototype",
+    range_requests: bool = False,
 ) -> BundleArtifacts:
-    """Bundle attachments, viewer assets, and scaffolding for the export."""
+    """Bundle attachments, viewer assets, and scaffolding for the export.
+
+    With ``range_requests`` a page-index manifest is written next to the database so the viewer can
+    render from the pages it needs instead of downloading the whole snapshot first.
+    """
 
     attachments_manifest = bundle_attachments(
         snapshot_path,
@@ -1661,6 +1906,7 @@ def build_bundle_assets(
         threshold_bytes=chunk_threshold,
         chunk_bytes=chunk_size,
     )
+    page_index = build_page_index(snapshot_path, output_dir, chunk_manifest=chunk_manifest) if range_requests else None
     copy_viewer_assets(output_dir)
     viewer_data = export_viewer_data(snapshot_path, output_dir, fts_enabled=fts_enabled)
     write_bundle_scaffolding(
@@ -1675,11 +1921,13 @@ def build_bundle_assets(
         viewer_data=viewer_data,
         exporter_version=exporter_version,
         export_config=export_config,
+        page_index=page_index,
     )
     return BundleArtifacts(
         attachments_manifest=attachments_manifest,
         chunk_manifest=chunk_manifest,
         viewer_data=viewer_data,
+        page_index=page_index,
     )
 
 
@@ -1954,6 +2202,7 @@ def write_bundle_scaffolding(
     viewer_data: Optional[dict[str, Any]],
     export_config: Mapping[str, Any],
     exporter_version: str = "prototype",
+    page_index: Optional[dict[str, Any]] = None,
 ) -> None:
     """Create manifest and helper docs around the freshly minted snapshot."""
 
@@ -1974,6 +2223,15 @@ def write_bundle_scaffolding(
             "sha256": _compute_sha256(snapshot),
             "chunked": bool(chunk_manifest),
             "chunk_manifest": chunk_manifest,
+            "page_index": (
+                {
+                    "path": PAGE_INDEX_FILENAME,
+                    "page_size": page_index["page_size"],
+                    "page_count": page_index["page_count"],
+                }
+                if page_index
+                else None
+            ),
         },
         "project_scope": {
             "requested": list(project_filters),
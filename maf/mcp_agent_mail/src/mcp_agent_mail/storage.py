@@ -5,24 +5,36 @@ from __future__ import annotations
 import asyncio
 import base64
 import contextlib
+import contextvars
+import fnmatch
+import gzip
 import hashlib
+import io
 import json
+import multiprocessing
 import os
 import re
+import struct
 import sys
+import threading
 import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Any, AsyncIterator, Iterable, Sequence, TypeVar
+from typing import Any, AsyncIterator, Iterable, Iterator, Sequence, TypeVar
 
 from filelock import SoftFileLock, Timeout
-from git import Actor, Repo
+from git import Actor, Commit, Repo
 from git.objects.tree import Tree
 from PIL import Image
 
 from .config import Settings
+from .db import record_archive_commits
 
 _IMAGE_PATTERN = re.compile(r"!\[(?P<alt>[^\]]*)\]\((?P<path>[^)]+)\)")
 
@@ -404,13 +416,26 @@ async def archive_write_lock(archive: ProjectArchive, *, timeout_seconds: float
 
     lock = AsyncFileLock(archive.lock_path, timeout_seconds=timeout_seconds)
     await lock.__aenter__()
+    # Group commits queued inside the lock are awaited only after it is released, so the batch
+    # window never keeps other writers of this archive waiting on the file lock.
+    deferred: list[asyncio.Future[None]] = []
+    token = _DEFERRED_COMMITS.set(deferred)
     try:
         yield
-    except Exception as exc:
+    except BaseException as exc:
+        _DEFERRED_COMMITS.reset(token)
         await lock.__aexit__(type(exc), exc, exc.__traceback__)
+        # The commits were already queued; consume their outcome so a failure is not reported as unretrieved
+        for future in deferred:
+            future.add_done_callback(_discard_future_result)
         raise
-    else:
-        await lock.__aexit__(None, None, None)
+    _DEFERRED_COMMITS.reset(token)
+    await lock.__aexit__(None, None, None)
+    if deferred:
+        outcomes = await asyncio.gather(*(asyncio.shield(future) for future in deferred), return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
 
 
 T = TypeVar('T')
@@ -520,7 +545,11 @@ async def ensure_archive_root(settings: Settings) -> tuple[Path, Repo]:
 async def ensure_archive(settings: Settings, slug: str) -> ProjectArchive:
     repo_root, repo = await ensure_archive_root(settings)
     project_root = repo_root / "projects" / slug
-    await _to_thread(project_root.mkdir, parents=True, exist_ok=True)
+    if not await _to_thread(project_root.exists):
+        await _to_thread(project_root.mkdir, parents=True, exist_ok=True)
+        # Brand-new archive: start the stats at zero so the write paths keep them exact from here on
+        async with AsyncFileLock(project_root / ".archive.lock"):
+            await _to_thread(_initialize_archive_stats, repo_root, project_root)
     return ProjectArchive(
         settings=settings,
         slug=slug,
@@ -598,6 +627,161 @@ async def write_file_reservation_record(archive: ProjectArchive, file_reservatio
     )
 
 
+FILE_RESERVATIONS_SNAPSHOT_NAME = "active.idx"
+# Persistent path -> project identity cache shared by the server, CLI and guard hooks (see app._ProjectIdentityCache)
+PROJECT_IDENTITY_CACHE_NAME = "identity_cache.json"
+FILE_RESERVATIONS_SNAPSHOT_VERSION = 1
+_GLOB_CHARS = frozenset("*?[\\")
+
+
+def _reservation_pattern_regex(pattern: str) -> tuple[str, str] | None:
+    """Translate a reservation pattern into ``(engine, regex)`` for the guard snapshot.
+
+    Uses the same Git wildmatch translation as ``PathSpec.from_lines("gitwildmatch", ...)`` when
+    pathspec is installed, otherwise the ``fnmatch`` translation the hooks fall back to. Negated
+    patterns never reserve anything and yield ``None``.
+    """
+    normalized = pattern.replace("\\", "/").strip()
+    if not normalized:
+        return None
+    try:
+        from pathspec import PathSpec
+    except Exception:
+        PathSpec = None  # type: ignore[assignment,misc]
+    if PathSpec is not None:
+        try:
+            compiled = PathSpec.from_lines("gitwildmatch", [normalized]).patterns
+        except Exception:
+            compiled = []
+        regex = getattr(compiled[0], "regex", None) if compiled else None
+        if not compiled or compiled[0].include is not True or not isinstance(regex, re.Pattern):
+            return None
+        # pathspec marks directory matches with a named group; names must be unique once combined
+        return "gitwildmatch", str(regex.pattern).replace("(?P<ps_d>", "(?:")
+    import fnmatch
+
+    return "fnmatch", fnmatch.translate(normalized.lstrip("/"))
+
+
+def reservation_literal_prefix(pattern: str) -> str:
+    """Return the literal directory prefix every path matched by ``pattern`` must start with.
+
+    Patterns without a (non-trailing) slash match at any depth and map to the root bucket ``""``.
+    """
+    normalized = pattern.replace("\\", "/").strip()
+    body = normalized.strip("/")
+    if not normalized.startswith("/") and "/" not in body:
+        return ""
+    prefix: list[str] = []
+    for segment in body.split("/")[:-1]:
+        if not segment or segment == "." or _GLOB_CHARS.intersection(segment):
+            break
+        prefix.append(segment)
+    return "/".join(prefix)
+
+
+def build_file_reservations_snapshot(
+    reservations: Iterable[dict[str, object]],
+    *,
+    generated_ts: str | None = None,
+) -> dict[str, object]:
+    """Compile active exclusive reservations into the snapshot consumed by the guard hooks.
+
+    Each entry carries its translated regex; ``buckets`` groups entry indexes by literal directory
+    prefix and stores one combined matcher per bucket, so a staged path only evaluates the buckets
+    for its ancestor directories and only inspects individual entries when a combined matcher hits.
+    """
+    entries: list[dict[str, object]] = []
+    grouped: dict[str, list[int]] = {}
+    engines: set[str] = set()
+    for record in reservations:
+        if not record.get("exclusive", True):
+            continue
+        pattern = str(record.get("path_pattern") or "").strip()
+        translated = _reservation_pattern_regex(pattern) if pattern else None
+        if translated is None:
+            continue
+        engine, regex = translated
+        engines.add(engine)
+        grouped.setdefault(reservation_literal_prefix(pattern), []).append(len(entries))
+        entries.append(
+            {
+                "id": record.get("id"),
+                "agent": str(record.get("agent") or ""),
+                "path_pattern": pattern,
+                "expires_ts": record.get("expires_ts"),
+                "regex": regex,
+            }
+        )
+    buckets = {
+        prefix: {
+            "entries": indexes,
+            "matcher": "|".join(f"(?:{entries[i]['regex']})" for i in indexes),
+        }
+        for prefix, indexes in sorted(grouped.items())
+    }
+    return {
+        "version": FILE_RESERVATIONS_SNAPSHOT_VERSION,
+        "generated_ts": generated_ts or datetime.now(timezone.utc).isoformat(),
+        "engine": engines.pop() if engines else "none",
+        "entries": entries,
+        "buckets": buckets,
+    }
+
+
+_SNAPSHOT_EXCLUDED_REPOS: set[str] = set()
+
+
+def _exclude_derived_files_from_git(repo_root: Path) -> None:
+    """Keep derived files (reservation snapshot, stats, identity cache) out of ``git status`` via info/exclude."""
+    key = str(repo_root)
+    if key in _SNAPSHOT_EXCLUDED_REPOS:
+        return
+    exclude_path = repo_root / ".git" / "info" / "exclude"
+    lines = (
+        f"/projects/*/file_reservations/{FILE_RESERVATIONS_SNAPSHOT_NAME}",
+        f"/projects/*/{ARCHIVE_STATS_NAME}",
+        f"/{PROJECT_IDENTITY_CACHE_NAME}",
+    )
+    existing = exclude_path.read_text(encoding="utf-8") if exclude_path.exists() else ""
+    missing = [line for line in lines if line not in existing.splitlines()]
+    if missing:
+        exclude_path.parent.mkdir(parents=True, exist_ok=True)
+        separator = "" if not existing or existing.endswith("\n") else "\n"
+        exclude_path.write_text(existing + separator + "".join(f"{line}\n" for line in missing), encoding="utf-8")
+    _SNAPSHOT_EXCLUDED_REPOS.add(key)
+
+
+async def write_file_reservations_snapshot(
+    archive: ProjectArchive, reservations: Iterable[dict[str, object]]
+) -> Path:
+    """Atomically rewrite ``file_reservations/active.idx`` from the active reservation set.
+
+    The snapshot is derived state (the per-reservation JSON files stay the audit trail), so it is
+    excluded from Git rather than committed on every reserve/release/expire. If the write fails the
+    stale snapshot is removed so hooks fall back to scanning the JSON artifacts.
+    """
+    snapshot = build_file_reservations_snapshot(reservations)
+    target = archive.root / "file_reservations" / FILE_RESERVATIONS_SNAPSHOT_NAME
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+
+    def _write() -> None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            _exclude_derived_files_from_git(archive.repo_root)
+            tmp.write_text(json.dumps(snapshot, separators=(",", ":")), encoding="utf-8")
+            tmp.replace(target)
+        except Exception:
+            with contextlib.suppress(Exception):
+                tmp.unlink(missing_ok=True)
+            with contextlib.suppress(Exception):
+                target.unlink(missing_ok=True)
+            raise
+
+    await _to_thread(_write)
+    return target
+
+
 async def write_message_bundle(
     archive: ProjectArchive,
     message: dict[str, object],
@@ -606,7 +790,14 @@ async def write_message_bundle(
     recipients: Sequence[str],
     extra_paths: Sequence[str] | None = None,
     commit_text: str | None = None,
-) -> None:
+    *,
+    commit: bool = True,
+) -> tuple[str, list[str]]:
+    """Write canonical, outbox and inbox copies of a message and commit them.
+
+    With ``commit=False`` the files are written but not committed; the caller gets back
+    ``(commit_message, rel_paths)`` to fold into a single :func:`commit_batch`.
+    """
     timestamp_obj: Any = message.get("created") or message.get("created_ts")
     timestamp_str = timestamp_obj if isinstance(timestamp_obj, str) else datetime.now(timezone.utc).isoformat()
     now = datetime.fromisoformat(timestamp_str)
@@ -618,6 +809,7 @@ async def write_message_bundle(
     inbox_dirs = [archive.root / "agents" / r / "inbox" / y_dir / m_dir for r in recipients]
 
     rel_paths: list[str] = []
+    index_layout = mailbox_layout(archive.settings) == "index"
 
     await _to_thread(canonical_dir.mkdir, parents=True, exist_ok=True)
     await _to_thread(outbox_dir.mkdir, parents=True, exist_ok=True)
@@ -638,17 +830,27 @@ async def write_message_bundle(
         else f"{created_iso}__{subject_slug}.md"
     )
     canonical_path = canonical_dir / filename
+    # Replays of the same bundle rewrite the same canonical file and must not be counted twice
+    is_new_message = not await _to_thread(canonical_path.exists)
     await _write_text(canonical_path, content)
     rel_paths.append(canonical_path.relative_to(archive.repo_root).as_posix())
 
-    outbox_path = outbox_dir / filename
-    await _write_text(outbox_path, content)
-    rel_paths.append(outbox_path.relative_to(archive.repo_root).as_posix())
+    if index_layout:
+        # Only the canonical file carries content; mailboxes get one compact index line each
+        index_line = _mailbox_index_line(message, canonical_path.relative_to(archive.root).as_posix())
+        for mailbox_dir in [outbox_dir, *inbox_dirs]:
+            index_path = mailbox_dir / MAILBOX_INDEX_NAME
+            await _to_thread(_append_mailbox_index_line, index_path, index_line)
+            rel_paths.append(index_path.relative_to(archive.repo_root).as_posix())
+    else:
+        outbox_path = outbox_dir / filename
+        await _write_text(outbox_path, content)
+        rel_paths.append(outbox_path.relative_to(archive.repo_root).as_posix())
 
-    for inbox_dir in inbox_dirs:
-        inbox_path = inbox_dir / filename
-        await _write_text(inbox_path, content)
-        rel_paths.append(inbox_path.relative_to(archive.repo_root).as_posix())
+        for inbox_dir in inbox_dirs:
+            inbox_path = inbox_dir / filename
+            await _write_text(inbox_path, content)
+            rel_paths.append(inbox_path.relative_to(archive.repo_root).as_posix())
 
     # Update thread-level digest for human review if thread_id present
     thread_id_obj = message.get("thread_id")
@@ -669,6 +871,15 @@ async def write_message_bundle(
         if digest_rel:
             rel_paths.append(digest_rel)
 
+    if is_new_message:
+        await _to_thread(
+            bump_archive_stats,
+            archive.root,
+            month=f"{y_dir}-{m_dir}",
+            message_bytes=len(content.encode("utf-8")),
+            inboxes=recipients,
+        )
+
     if extra_paths:
         rel_paths.extend(extra_paths)
     thread_key = message.get("thread_id") or message.get("id")
@@ -686,7 +897,551 @@ async def write_message_bundle(
             f"Thread: {thread_key}",
         ]
         commit_message = commit_subject + "\n\n" + "\n".join(commit_body_lines) + "\n"
-    await _commit(archive.repo, archive.settings, commit_message, rel_paths)
+    if commit:
+        await _commit(archive.repo, archive.settings, commit_message, rel_paths)
+    return commit_message, rel_paths
+
+
+MAILBOX_INDEX_NAME = "index.jsonl"
+_MAILBOX_DIR_PATTERN = re.compile(r"^agents/[^/]+/(?:inbox|outbox)/\d{4}/\d{2}$")
+
+
+def mailbox_layout(settings: Settings) -> str:
+    """Return the configured per-agent mailbox layout: ``copies`` (default) or ``index``."""
+    value = (settings.storage.mailbox_layout or "copies").strip().lower()
+    return "index" if value == "index" else "copies"
+
+
+def _mailbox_index_line(message: dict[str, object], canonical_rel: str) -> str:
+    """One ``index.jsonl`` line pointing at the canonical message file (path relative to the project)."""
+    entry = {
+        "id": message.get("id"),
+        "created": message.get("created") or message.get("created_ts"),
+        "subject": message.get("subject", ""),
+        "from": message.get("from", ""),
+        "importance": message.get("importance", "normal"),
+        "thread_id": message.get("thread_id"),
+        "path": canonical_rel,
+    }
+    return json.dumps(entry, sort_keys=True, ensure_ascii=False)
+
+
+_MAILBOX_INDEX_TAIL_BYTES = 64 * 1024
+
+
+def _append_mailbox_index_line(index_path: Path, line: str) -> bool:
+    """Append ``line`` unless the index tail already ends with it.
+
+    Only the last ``_MAILBOX_INDEX_TAIL_BYTES`` are checked, so appends stay O(1) as a mailbox grows;
+    an older duplicate that slips through is collapsed by ``parse_mailbox_index``.
+    """
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    prefix = ""
+    with contextlib.suppress(FileNotFoundError), index_path.open("rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - _MAILBOX_INDEX_TAIL_BYTES))
+        tail = f.read().decode("utf-8", errors="replace")
+        if line in tail.splitlines():
+            return False
+        if tail and not tail.endswith("\n"):
+            prefix = "\n"
+    with index_path.open("a", encoding="utf-8") as f:
+        f.write(prefix + line + "\n")
+    return True
+
+
+def parse_mailbox_index(content: str) -> list[dict[str, Any]]:
+    """Parse an ``index.jsonl`` mailbox file, skipping malformed lines and repeated entries."""
+    entries: list[dict[str, Any]] = []
+    seen: set[tuple[Any, str]] = set()
+    for raw in content.splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            entry = json.loads(raw)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(entry, dict) or not isinstance(entry.get("path"), str):
+            continue
+        key = (entry.get("id"), entry["path"])
+        if key in seen:
+            continue
+        seen.add(key)
+        entries.append(entry)
+    return entries
+
+
+def count_mailbox_entries(mailbox_root: Path) -> int:
+    """Count messages under an ``agents/<name>/inbox`` (or ``outbox``) tree in either layout."""
+    total = 0
+    for f in mailbox_root.glob("*/*/*"):
+        with contextlib.suppress(Exception):
+            if not f.is_file():
+                continue
+            if f.suffix.lower() == ".md":
+                total += 1
+            elif f.name == MAILBOX_INDEX_NAME:
+                total += len(parse_mailbox_index(f.read_text(encoding="utf-8")))
+    return total
+
+
+async def migrate_mailbox_layout(archive: ProjectArchive, *, dry_run: bool = True) -> dict[str, int]:
+    """Convert per-agent inbox/outbox message copies into ``index.jsonl`` entries.
+
+    Each copy is replaced by an index line pointing at ``messages/YYYY/MM/<file>``. When the
+    canonical file is missing, the copy is moved there first so no content is lost. The whole
+    conversion is recorded as a single archive commit.
+    """
+
+    def _plan_and_apply() -> tuple[dict[str, int], list[str]]:
+        stats = {"copies": 0, "indexed": 0, "restored_canonical": 0, "mailboxes": 0}
+        changed: set[str] = set()
+        agents_root = archive.root / "agents"
+        if not agents_root.exists():
+            return stats, []
+        for mailbox_dir in sorted(p for p in agents_root.glob("*/*/*/*") if p.is_dir()):
+            rel_dir = mailbox_dir.relative_to(archive.root).as_posix()
+            if not _MAILBOX_DIR_PATTERN.match(rel_dir):
+                continue
+            copies = sorted(f for f in mailbox_dir.iterdir() if f.is_file() and f.suffix.lower() == ".md")
+            if not copies:
+                continue
+            stats["mailboxes"] += 1
+            index_path = mailbox_dir / MAILBOX_INDEX_NAME
+            y_dir, m_dir = mailbox_dir.parts[-2], mailbox_dir.parts[-1]
+            for copy in copies:
+                stats["copies"] += 1
+                canonical = archive.root / "messages" / y_dir / m_dir / copy.name
+                try:
+                    frontmatter = _parse_frontmatter(copy.read_text(encoding="utf-8"))
+                except OSError:
+                    continue
+                if dry_run:
+                    stats["indexed"] += 1
+                    if not canonical.exists():
+                        stats["restored_canonical"] += 1
+                    continue
+                if not canonical.exists():
+                    canonical.parent.mkdir(parents=True, exist_ok=True)
+                    copy.replace(canonical)
+                    changed.add(canonical.relative_to(archive.repo_root).as_posix())
+                    stats["restored_canonical"] += 1
+                else:
+                    copy.unlink()
+                changed.add(copy.relative_to(archive.repo_root).as_posix())
+                line = _mailbox_index_line(frontmatter, canonical.relative_to(archive.root).as_posix())
+                _append_mailbox_index_line(index_path, line)
+                changed.add(index_path.relative_to(archive.repo_root).as_posix())
+                stats["indexed"] += 1
+        return stats, sorted(changed)
+
+    async with archive_write_lock(archive):
+        planned: tuple[dict[str, int], list[str]] = await _to_thread(_plan_and_apply)
+        stats, changed = planned
+        if changed:
+            await _commit(
+                archive.repo,
+                archive.settings,
+                f"chore: migrate {archive.slug} mailboxes to index layout ({stats['indexed']} entries)",
+                changed,
+            )
+    return stats
+
+
+# --- Archive compaction ----------------------------------------------------------------------
+
+SEGMENT_NAME = "segment.gz"
+SEGMENT_INDEX_NAME = "segment.idx.json"
+SEGMENT_INDEX_VERSION = 1
+_MESSAGE_MONTH_DIR_PATTERN = re.compile(r"^messages/(\d{4})/(\d{2})$")
+
+
+def _empty_segment_index() -> dict[str, Any]:
+    return {"version": SEGMENT_INDEX_VERSION, "codec": "gzip", "entries": {}}
+
+
+def parse_segment_index(content: str | bytes) -> dict[str, dict[str, int]]:
+    """Return ``{file_name: {"offset", "length", "size"}}`` from a ``segment.idx.json`` payload."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != SEGMENT_INDEX_VERSION:
+        return {}
+    entries = data.get("entries")
+    return entries if isinstance(entries, dict) else {}
+
+
+def _segment_blob_member(segment_blob: Any, entry: dict[str, int]) -> bytes:
+    """Inflate one member of a committed segment, streaming past the bytes before it rather than loading them."""
+    stream = segment_blob.data_stream
+    remaining = int(entry["offset"])
+    while remaining > 0:
+        skipped = stream.read(min(remaining, 1 << 20))
+        if not skipped:
+            break
+        remaining -= len(skipped)
+    return gzip.decompress(stream.read(int(entry["length"])))
+
+
+def read_segment_file(month_dir: Path, file_name: str) -> bytes | None:
+    """Read one message packed into ``month_dir``'s segment (working tree), or None when it is not there.
+
+    Each member is an independent gzip stream, so only the indexed byte range is read and inflated.
+    """
+    index_path = month_dir / SEGMENT_INDEX_NAME
+    try:
+        entry = parse_segment_index(index_path.read_bytes()).get(file_name)
+    except OSError:
+        return None
+    if entry is None:
+        return None
+    try:
+        with (month_dir / SEGMENT_NAME).open("rb") as fh:
+            fh.seek(int(entry["offset"]))
+            return gzip.decompress(fh.read(int(entry["length"])))
+    except (OSError, EOFError, gzip.BadGzipFile):
+        return None
+
+
+def segment_file_names(month_dir: Path) -> list[str]:
+    """Names of the messages packed into ``month_dir``'s segment (empty when the month is not compacted)."""
+    try:
+        return sorted(parse_segment_index((month_dir / SEGMENT_INDEX_NAME).read_bytes()))
+    except OSError:
+        return []
+
+
+def _segment_entry_at(commit: Any, slug: str, rel_path: str) -> tuple[Any, dict[str, int]] | None:
+    """Locate ``messages/YYYY/MM/<file>`` inside that month's segment at ``commit``: ``(segment_blob, entry)``."""
+    month_dir, _, file_name = rel_path.rpartition("/")
+    if not _MESSAGE_MONTH_DIR_PATTERN.match(month_dir) or not file_name:
+        return None
+    try:
+        index_blob = commit.tree / f"projects/{slug}/{month_dir}/{SEGMENT_INDEX_NAME}"
+        entry = parse_segment_index(index_blob.data_stream.read()).get(file_name)
+        if entry is None:
+            return None
+        return commit.tree / f"projects/{slug}/{month_dir}/{SEGMENT_NAME}", entry
+    except (KeyError, AttributeError):
+        return None
+
+
+def _pack_month_segment(month_dir: Path, files: Sequence[Path]) -> int:
+    """Append ``files`` to the month's segment as independent gzip members and drop the loose copies.
+
+    Members already in the segment are skipped (their loose copy is a leftover from an interrupted run),
+    so packing is idempotent. Returns the number of files packed.
+    """
+    index_path = month_dir / SEGMENT_INDEX_NAME
+    segment_path = month_dir / SEGMENT_NAME
+    try:
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        index = _empty_segment_index()
+    entries = index.setdefault("entries", {})
+    packed = 0
+    with segment_path.open("ab") as fh:
+        offset = fh.tell()
+        for f in files:
+            if f.name not in entries:
+                data = f.read_bytes()
+                member = gzip.compress(data, mtime=0)
+                fh.write(member)
+                entries[f.name] = {"offset": offset, "length": len(member), "size": len(data)}
+                offset += len(member)
+                packed += 1
+        fh.flush()
+        os.fsync(fh.fileno())
+    tmp_path = index_path.with_name(f".{index_path.name}.tmp")
+    tmp_path.write_text(json.dumps(index, sort_keys=True), encoding="utf-8")
+    tmp_path.replace(index_path)
+    for f in files:
+        f.unlink()
+    return packed
+
+
+async def compact_archive(
+    archive: ProjectArchive,
+    *,
+    older_than_days: int,
+    dry_run: bool = True,
+    repack: bool = True,
+) -> dict[str, int]:
+    """Pack cold months of ``archive`` into per-month segment files.
+
+    Every month that ended more than ``older_than_days`` ago is rewritten so that
+    ``messages/YYYY/MM/*.md`` live in ``segment.gz`` (one gzip member per message) with
+    ``segment.idx.json`` mapping file names to byte ranges, and per-agent inbox/outbox copies
+    for the month become ``index.jsonl`` references to the canonical path. Readers
+    (:func:`get_file_content`, :func:`get_archive_tree`, time travel) resolve those paths
+    through the segment. The rewrite is one archive commit; with ``repack`` the repository
+    then runs ``git gc`` so the removed loose objects are packed as well.
+    """
+    cutoff_month = (datetime.now(timezone.utc) - timedelta(days=max(0, older_than_days))).strftime("%Y-%m")
+
+    def _plan_and_apply() -> tuple[dict[str, int], list[str]]:
+        stats = {"months": 0, "messages": 0, "mailbox_copies": 0, "files_before": 0, "files_after": 0}
+        changed: set[str] = set()
+        cold: list[tuple[str, str]] = []
+        for month_dir in sorted((archive.root / "messages").glob("[0-9][0-9][0-9][0-9]/[0-9][0-9]")):
+            if month_dir.is_dir() and f"{month_dir.parent.name}-{month_dir.name}" < cutoff_month:
+                cold.append((month_dir.parent.name, month_dir.name))
+        for y_dir, m_dir in cold:
+            month_dir = archive.root / "messages" / y_dir / m_dir
+            mailbox_dirs = sorted(
+                p for p in (archive.root / "agents").glob(f"*/*/{y_dir}/{m_dir}") if p.is_dir()
+                and _MAILBOX_DIR_PATTERN.match(p.relative_to(archive.root).as_posix())
+            )
+            copies = {
+                d: sorted(f for f in d.iterdir() if f.is_file() and f.suffix.lower() == ".md") for d in mailbox_dirs
+            }
+            loose = sorted(f for f in month_dir.iterdir() if f.is_file() and f.suffix.lower() == ".md")
+            if not loose and not any(copies.values()):
+                continue
+            stats["months"] += 1
+            stats["files_before"] += len(loose) + sum(len(c) for c in copies.values())
+            packed_names = set(segment_file_names(month_dir))
+            # Mailbox copies first: each becomes an index line; a copy whose canonical file is gone is promoted
+            for mailbox_dir, mailbox_copies in copies.items():
+                index_path = mailbox_dir / MAILBOX_INDEX_NAME
+                for copy in mailbox_copies:
+                    stats["mailbox_copies"] += 1
+                    canonical = month_dir / copy.name
+                    if dry_run:
+                        continue
+                    try:
+                        frontmatter = _parse_frontmatter(copy.read_text(encoding="utf-8"))
+                    except OSError:
+                        continue
+                    if not canonical.exists() and copy.name not in packed_names:
+                        copy.replace(canonical)
+                        loose.append(canonical)
+                    else:
+                        copy.unlink()
+                    changed.add(copy.relative_to(archive.repo_root).as_posix())
+                    line = _mailbox_index_line(frontmatter, canonical.relative_to(archive.root).as_posix())
+                    _append_mailbox_index_line(index_path, line)
+                    changed.add(index_path.relative_to(archive.repo_root).as_posix())
+            stats["messages"] += len(loose)
+            # What the month holds afterwards: the segment pair plus one index.jsonl per mailbox
+            stats["files_after"] += 2 + sum(1 for d in mailbox_dirs if copies[d] or (d / MAILBOX_INDEX_NAME).exists())
+            if dry_run or not loose:
+                continue
+            _pack_month_segment(month_dir, sorted(set(loose)))
+            changed.update(f.relative_to(archive.repo_root).as_posix() for f in loose)
+            for name in (SEGMENT_NAME, SEGMENT_INDEX_NAME):
+                changed.add((month_dir / name).relative_to(archive.repo_root).as_posix())
+        return stats, sorted(changed)
+
+    async with archive_write_lock(archive):
+        planned: tuple[dict[str, int], list[str]] = await _to_thread(_plan_and_apply)
+        stats, changed = planned
+        if changed:
+            await _commit(
+                archive.repo,
+                archive.settings,
+                f"chore: compact {archive.slug} archive months before {cutoff_month} "
+                f"({stats['messages']} messages into {stats['months']} segments)",
+                changed,
+            )
+    if changed and repack:
+        working_tree = Path(archive.repo.working_tree_dir or archive.repo_root)
+        async with AsyncFileLock(working_tree.resolve() / ".commit.lock"):
+            await _to_thread(archive.repo.git.gc, "--quiet")
+    return stats
+
+
+# --- Archive statistics ----------------------------------------------------------------------
+
+ARCHIVE_STATS_NAME = "stats.json"
+ARCHIVE_STATS_VERSION = 1
+_ARCHIVE_STATS_LOCK = threading.Lock()
+
+
+def _empty_archive_stats() -> dict[str, Any]:
+    return {
+        "version": ARCHIVE_STATS_VERSION,
+        "messages_by_month": {},
+        "message_bytes": 0,
+        "inbox_counts": {},
+        "attachments": 0,
+        "attachment_bytes": 0,
+        "updated_ts": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _read_archive_stats(path: Path) -> dict[str, Any] | None:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != ARCHIVE_STATS_VERSION:
+        return None
+    return data
+
+
+def _write_archive_stats(path: Path, stats: dict[str, Any]) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(stats, sort_keys=True), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def _initialize_archive_stats(repo_root: Path, project_root: Path) -> None:
+    _exclude_derived_files_from_git(repo_root)
+    with _ARCHIVE_STATS_LOCK:
+        path = project_root / ARCHIVE_STATS_NAME
+        if not path.exists():
+            _write_archive_stats(path, _empty_archive_stats())
+
+
+def _seed_archive_stats(project_root: Path) -> dict[str, Any] | None:
+    """Compute and store ``stats.json`` unless another writer got there first (caller holds the archive lock)."""
+    path = project_root / ARCHIVE_STATS_NAME
+    with _ARCHIVE_STATS_LOCK:
+        stats = _read_archive_stats(path)
+        if stats is None and project_root.is_dir():
+            stats = compute_archive_stats(project_root)
+            _write_archive_stats(path, stats)
+        return stats
+
+
+def compute_archive_stats(project_root: Path) -> dict[str, Any]:
+    """Tally a project archive from scratch by walking ``messages/`` (loose files and segments), ``agents/*/inbox``
+    and ``attachments/``."""
+    stats = _empty_archive_stats()
+    messages_root = project_root / "messages"
+    for month_dir in sorted(messages_root.glob("[0-9][0-9][0-9][0-9]/[0-9][0-9]")):
+        count = 0
+        for f in month_dir.glob("*.md"):
+            with contextlib.suppress(OSError):
+                stats["message_bytes"] += f.stat().st_size
+                count += 1
+        # Compacted months: the segment index records each packed message's uncompressed size
+        with contextlib.suppress(OSError):
+            for entry in parse_segment_index((month_dir / SEGMENT_INDEX_NAME).read_bytes()).values():
+                stats["message_bytes"] += int(entry.get("size", 0))
+                count += 1
+        if count:
+            stats["messages_by_month"][f"{month_dir.parent.name}-{month_dir.name}"] = count
+    for inbox in sorted((project_root / "agents").glob("*/inbox")):
+        count = count_mailbox_entries(inbox)
+        if count:
+            stats["inbox_counts"][inbox.parent.name] = count
+    for f in (project_root / "attachments").glob("*/*.webp"):
+        with contextlib.suppress(OSError):
+            stats["attachment_bytes"] += f.stat().st_size
+            stats["attachments"] += 1
+    return stats
+
+
+def load_archive_stats(project_root: Path) -> dict[str, Any] | None:
+    """Read ``<project>/stats.json``; None when it is missing or from another version."""
+    return _read_archive_stats(project_root / ARCHIVE_STATS_NAME)
+
+
+def bump_archive_stats(
+    project_root: Path,
+    *,
+    month: str | None = None,
+    message_bytes: int = 0,
+    inboxes: Sequence[str] = (),
+    attachments: int = 0,
+    attachment_bytes: int = 0,
+) -> None:
+    """Apply one write's deltas to ``stats.json``.
+
+    Callers hold the project's archive write lock, which serialises this read-modify-write across
+    processes; the thread lock only covers concurrent worker threads. Archives without a stats file
+    (created before stats existed) are left alone until :func:`collect_archive_stats` or
+    ``archive rebuild-stats`` computes them in full.
+    """
+    path = project_root / ARCHIVE_STATS_NAME
+    with _ARCHIVE_STATS_LOCK:
+        stats = _read_archive_stats(path)
+        if stats is None:
+            return
+        if month:
+            by_month = stats.setdefault("messages_by_month", {})
+            by_month[month] = int(by_month.get(month, 0)) + 1
+        stats["message_bytes"] = int(stats.get("message_bytes", 0)) + message_bytes
+        inbox_counts = stats.setdefault("inbox_counts", {})
+        for name in inboxes:
+            inbox_counts[name] = int(inbox_counts.get(name, 0)) + 1
+        stats["attachments"] = int(stats.get("attachments", 0)) + attachments
+        stats["attachment_bytes"] = int(stats.get("attachment_bytes", 0)) + attachment_bytes
+        stats["updated_ts"] = datetime.now(timezone.utc).isoformat()
+        with contextlib.suppress(OSError):
+            _write_archive_stats(path, stats)
+
+
+async def collect_archive_stats(
+    repo_root: Path,
+    *,
+    ignore_patterns: Sequence[str] = (),
+    rebuild_missing: bool = False,
+    lock_timeout_seconds: float = 5.0,
+) -> dict[str, dict[str, Any]]:
+    """Return ``{slug: stats}`` for every project under ``repo_root/projects`` (one small read per project).
+
+    Projects without stats are skipped unless ``rebuild_missing`` is set, in which case they are walked
+    once under the project's archive lock. A project whose lock stays busy is skipped until the next call.
+    """
+
+    def _project_roots() -> list[Path]:
+        projects_root = repo_root / "projects"
+        if not projects_root.is_dir():
+            return []
+        return [
+            project_root
+            for project_root in sorted(projects_root.iterdir())
+            if project_root.is_dir() and not any(fnmatch.fnmatch(project_root.name, pat) for pat in ignore_patterns)
+        ]
+
+    result: dict[str, dict[str, Any]] = {}
+    project_roots: list[Path] = await _to_thread(_project_roots)
+    for project_root in project_roots:
+        stats: dict[str, Any] | None = await _to_thread(load_archive_stats, project_root)
+        if stats is None and rebuild_missing:
+            try:
+                async with AsyncFileLock(project_root / ".archive.lock", timeout_seconds=lock_timeout_seconds):
+                    stats = await _to_thread(_seed_archive_stats, project_root)
+            except TimeoutError:
+                continue
+        if stats is not None:
+            result[project_root.name] = stats
+    return result
+
+
+async def rebuild_archive_stats(archive: ProjectArchive) -> dict[str, Any]:
+    """Recompute ``stats.json`` for ``archive`` from the files on disk (offline repair)."""
+
+    def _rebuild() -> dict[str, Any]:
+        _exclude_derived_files_from_git(archive.repo_root)
+        stats = compute_archive_stats(archive.root)
+        with _ARCHIVE_STATS_LOCK:
+            _write_archive_stats(archive.root / ARCHIVE_STATS_NAME, stats)
+        return stats
+
+    async with archive_write_lock(archive):
+        stats: dict[str, Any] = await _to_thread(_rebuild)
+    return stats
+
+
+def _parse_frontmatter(content: str) -> dict[str, Any]:
+    """Return the JSON frontmatter of an archived message file (empty dict when absent)."""
+    if not content.startswith("---json"):
+        return {}
+    start = content.find("\n")
+    end = content.find("\n---", start)
+    if start < 0 or end < 0:
+        return {}
+    try:
+        data = json.loads(content[start + 1 : end])
+    except json.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
 
 
 async def _update_thread_digest(
@@ -845,46 +1600,136 @@ async def _convert_markdown_images(
     return "".join(result_parts)
 
 
-async def _store_image(archive: ProjectArchive, path: Path, *, embed_policy: str = "auto") -> tuple[dict[str, object], str | None]:
-    data = await _to_thread(path.read_bytes)
+_IMAGE_POOL: ProcessPoolExecutor | None = None
+_IMAGE_POOL_WORKERS = 0
+_IMAGE_POOL_LOCK = threading.Lock()
 
-    # Open image and convert, properly closing the original to prevent file handle leaks
-    def _open_and_convert(p: Path) -> Image.Image:
-        with Image.open(p) as pil:
-            return pil.convert("RGBA" if pil.mode in ("LA", "RGBA") else "RGB")  # type: ignore[no-any-return]
 
-    img = await _to_thread(_open_and_convert, path)
+def _convert_to_webp(data: bytes) -> tuple[bytes, int, int]:
+    """Decode image bytes and re-encode them as WebP; runs inside the image worker pool."""
+    with Image.open(io.BytesIO(data)) as pil:
+        img = pil.convert("RGBA" if pil.mode in ("LA", "RGBA") else "RGB")
     try:
+        out = io.BytesIO()
+        img.save(out, format="WEBP", method=6, quality=80)
         width, height = img.size
-        buffer_path = archive.attachments_dir
-        await _to_thread(buffer_path.mkdir, parents=True, exist_ok=True)
-        digest = hashlib.sha1(data).hexdigest()
-        target_dir = buffer_path / digest[:2]
-        await _to_thread(target_dir.mkdir, parents=True, exist_ok=True)
-        target_path = target_dir / f"{digest}.webp"
-        # Optionally store original alongside (in originals/)
-        original_rel: str | None = None
-        if archive.settings.storage.keep_original_images:
-            originals_dir = archive.root / "attachments" / "originals" / digest[:2]
-            await _to_thread(originals_dir.mkdir, parents=True, exist_ok=True)
-            orig_ext = path.suffix.lower().lstrip(".") or "bin"
-            orig_path = originals_dir / f"{digest}.{orig_ext}"
-            if not orig_path.exists():
-                await _to_thread(orig_path.write_bytes, data)
-            original_rel = orig_path.relative_to(archive.repo_root).as_posix()
-        if not target_path.exists():
-            await _save_webp(img, target_path)
-        new_bytes = await _to_thread(target_path.read_bytes)
-        rel_path = target_path.relative_to(archive.repo_root).as_posix()
+    finally:
+        img.close()
+    return out.getvalue(), width, height
+
+
+def _image_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared conversion pool, (re)creating it when the configured size changes."""
+    global _IMAGE_POOL, _IMAGE_POOL_WORKERS
+    with _IMAGE_POOL_LOCK:
+        if _IMAGE_POOL is None or workers != _IMAGE_POOL_WORKERS:
+            if _IMAGE_POOL is not None:
+                _IMAGE_POOL.shutdown(wait=False, cancel_futures=True)
+            # spawn: forking a process that runs an event loop plus helper threads is not safe
+            _IMAGE_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _IMAGE_POOL_WORKERS = workers
+        return _IMAGE_POOL
+
+
+def shutdown_image_pool() -> None:
+    """Stop the image conversion workers (they are started again on the next conversion)."""
+    global _IMAGE_POOL
+    with _IMAGE_POOL_LOCK:
+        if _IMAGE_POOL is not None:
+            _IMAGE_POOL.shutdown(wait=True, cancel_futures=True)
+            _IMAGE_POOL = None
+
+
+async def _convert_image(archive: ProjectArchive, data: bytes) -> tuple[bytes, int, int]:
+    workers = int(archive.settings.storage.image_convert_workers)
+    if workers <= 0:
+        return await _to_thread(_convert_to_webp, data)  # type: ignore[no-any-return]
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_image_pool(workers), _convert_to_webp, data)
+    except BrokenProcessPool:
+        # A worker died (OOM on a huge image, killed externally): drop the pool and convert in-process once
+        shutdown_image_pool()
+        return await _to_thread(_convert_to_webp, data)  # type: ignore[no-any-return]
+
+
+def _read_stored_webp(path: Path) -> tuple[bytes, int, int] | None:
+    """Return ``(bytes, width, height)`` of an already stored WebP, or None when it is missing or unreadable."""
+    try:
+        data = path.read_bytes()
+        with Image.open(io.BytesIO(data)) as pil:
+            width, height = pil.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    return data, width, height
+
+
+def _read_and_hash(path: Path) -> tuple[bytes, str]:
+    data = path.read_bytes()
+    return data, hashlib.sha1(data).hexdigest()
+
+
+def _load_stored_image(manifest_path: Path, target_path: Path) -> dict[str, Any] | None:
+    """Return the manifest of an already-converted image, or None when it must be (re)converted."""
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        size = target_path.stat().st_size
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("bytes_webp") != size:
+        return None
+    if not isinstance(manifest.get("width"), int) or not isinstance(manifest.get("height"), int):
+        return None
+    return manifest
+
+
+async def _store_image(archive: ProjectArchive, path: Path, *, embed_policy: str = "auto") -> tuple[dict[str, object], str | None]:
+    # Hash first: attachments are content-addressed, so a re-attached image is found without decoding it
+    data, digest = await _to_thread(_read_and_hash, path)
+    buffer_path = archive.attachments_dir
+    target_dir = buffer_path / digest[:2]
+    await _to_thread(target_dir.mkdir, parents=True, exist_ok=True)
+    target_path = target_dir / f"{digest}.webp"
+    manifest_dir = archive.root / "attachments" / "_manifests"
+    manifest_path = manifest_dir / f"{digest}.json"
+    stored = await _to_thread(_load_stored_image, manifest_path, target_path)
+    # Optionally store original alongside (in originals/)
+    original_rel: str | None = None
+    if archive.settings.storage.keep_original_images:
+        originals_dir = archive.root / "attachments" / "originals" / digest[:2]
+        await _to_thread(originals_dir.mkdir, parents=True, exist_ok=True)
+        orig_ext = path.suffix.lower().lstrip(".") or "bin"
+        orig_path = originals_dir / f"{digest}.{orig_ext}"
+        if not orig_path.exists():
+            await _to_thread(orig_path.write_bytes, data)
+        original_rel = orig_path.relative_to(archive.repo_root).as_posix()
+    rel_path = target_path.relative_to(archive.repo_root).as_posix()
+
+    new_bytes: bytes | None = None
+    if stored is not None:
+        width, height, bytes_webp = stored["width"], stored["height"], int(stored["bytes_webp"])
+        refresh_manifest = bool(original_rel) and stored.get("original_path") != original_rel
+    else:
+        existing: tuple[bytes, int, int] | None = await _to_thread(_read_stored_webp, target_path)
+        if existing is not None:
+            # The manifest is gone but the WebP is not: keep serving the stored bytes so the content stays stable
+            new_bytes, width, height = existing
+        else:
+            replaces_damaged = await _to_thread(target_path.exists)
+            new_bytes, width, height = await _convert_image(archive, data)
+            await _write_bytes_atomic(target_path, new_bytes)
+            if not replaces_damaged:
+                await _to_thread(bump_archive_stats, archive.root, attachments=1, attachment_bytes=len(new_bytes))
+        bytes_webp = len(new_bytes)
+        refresh_manifest = True
+    if refresh_manifest:
         # Update per-attachment manifest with metadata
         try:
-            manifest_dir = archive.root / "attachments" / "_manifests"
             await _to_thread(manifest_dir.mkdir, parents=True, exist_ok=True)
-            manifest_path = manifest_dir / f"{digest}.json"
             manifest_payload = {
                 "sha1": digest,
                 "webp_path": rel_path,
-                "bytes_webp": len(new_bytes),
+                "bytes_webp": bytes_webp,
                 "width": width,
                 "height": height,
                 "original_path": original_rel,
@@ -899,7 +1744,7 @@ async def _store_image(archive: ProjectArchive, path: Path, *, embed_policy: str
                     "event": "stored",
                     "ts": datetime.now(timezone.utc).isoformat(),
                     "webp_path": rel_path,
-                    "bytes_webp": len(new_bytes),
+                    "bytes_webp": bytes_webp,
                     "original_path": original_rel,
                     "bytes_original": len(data),
                     "ext": path.suffix.lower(),
@@ -908,43 +1753,48 @@ async def _store_image(archive: ProjectArchive, path: Path, *, embed_policy: str
         except Exception:
             pass
 
+    should_inline = False
+    if embed_policy == "inline":
+        should_inline = True
+    elif embed_policy == "file":
         should_inline = False
-        if embed_policy == "inline":
-            should_inline = True
-        elif embed_policy == "file":
-            should_inline = False
-        else:
-            should_inline = len(new_bytes) <= archive.settings.storage.inline_image_max_bytes
-        if should_inline:
-            encoded = base64.b64encode(new_bytes).decode("ascii")
-            return {
-                "type": "inline",
-                "media_type": "image/webp",
-                "bytes": len(new_bytes),
-                "width": width,
-                "height": height,
-                "sha1": digest,
-                "data_base64": encoded,
-            }, rel_path
-        meta: dict[str, object] = {
-            "type": "file",
+    else:
+        should_inline = bytes_webp <= archive.settings.storage.inline_image_max_bytes
+    if should_inline:
+        if new_bytes is None:
+            new_bytes = await _to_thread(target_path.read_bytes)
+        encoded = base64.b64encode(new_bytes).decode("ascii")
+        return {
+            "type": "inline",
             "media_type": "image/webp",
-            "bytes": len(new_bytes),
-            "path": rel_path,
+            "bytes": bytes_webp,
             "width": width,
             "height": height,
             "sha1": digest,
-        }
-        if original_rel:
-            meta["original_path"] = original_rel
-        return meta, rel_path
-    finally:
-        # Close the converted image to prevent file handle leaks
-        img.close()
+            "data_base64": encoded,
+        }, rel_path
+    meta: dict[str, object] = {
+        "type": "file",
+        "media_type": "image/webp",
+        "bytes": bytes_webp,
+        "path": rel_path,
+        "width": width,
+        "height": height,
+        "sha1": digest,
+    }
+    if original_rel:
+        meta["original_path"] = original_rel
+    return meta, rel_path
+
 
+async def _write_bytes_atomic(path: Path, content: bytes) -> None:
+    # Concurrent senders of the same image race on one content-addressed path; publish it whole or not at all
+    def _write() -> None:
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(content)
+        tmp_path.replace(path)
 
-async def _save_webp(img: Image.Image, path: Path) -> None:
-    await _to_thread(img.save, path, format="WEBP", method=6, quality=80)
+    await _to_thread(_write)
 
 
 async def _write_text(path: Path, content: str) -> None:
@@ -977,47 +1827,330 @@ async def _append_attachment_audit(archive: ProjectArchive, sha1: str, event: di
         pass
 
 
-async def _commit(repo: Repo, settings: Settings, message: str, rel_paths: Sequence[str]) -> None:
-    if not rel_paths:
-        return
+_BATCH_SUBJECT_PREFIX = "batch: "
+_BATCH_ENTRY_MARKER = re.compile(r"^-- entry \d+/\d+ --$", re.MULTILINE)
+
+
+def _with_trailers(message: str) -> str:
+    """Append Agent trailers derived from the message subject when not already present."""
+    # Append commit trailers with Agent and optional Thread if present in message text
+    trailers: list[str] = []
+    # Extract simple Agent/Thread heuristics from the message subject line
+    # Expected message formats include:
+    #   mail: <Agent> -> ... | <Subject>
+    #   file_reservation: <Agent> ...
+    try:
+        # Avoid duplicating trailers if already embedded
+        lower_msg = message.lower()
+        have_agent_line = "\nagent:" in lower_msg
+        if message.startswith("mail: ") and not have_agent_line:
+            head = message[len("mail: ") :]
+            agent_part = head.split("->", 1)[0].strip()
+            if agent_part:
+                trailers.append(f"Agent: {agent_part}")
+        elif message.startswith("file_reservation: ") and not have_agent_line:
+            head = message[len("file_reservation: ") :]
+            agent_part = head.split(" ", 1)[0].strip()
+            if agent_part:
+                trailers.append(f"Agent: {agent_part}")
+    except Exception:
+        pass
+    if trailers:
+        return message + "\n\n" + "\n".join(trailers) + "\n"
+    return message
+
+
+def _batch_commit_message(messages: Sequence[str]) -> str:
+    """Fold several archive commit messages into one, keeping each entry's subject and trailers.
+
+    Layout::
+
+        batch: <n> archive writes
+
+        -- entry 1/<n> --
+        <original message 1 with trailers>
+
+        -- entry 2/<n> --
+        ...
+    """
+    total = len(messages)
+    sections = [
+        f"-- entry {idx}/{total} --\n{_with_trailers(msg).strip()}\n" for idx, msg in enumerate(messages, start=1)
+    ]
+    return f"{_BATCH_SUBJECT_PREFIX}{total} archive writes\n\n" + "\n".join(sections)
+
+
+def split_commit_entries(message: str) -> list[str]:
+    """Return the per-write messages folded into a commit (a single entry for unbatched commits)."""
+    if not message.startswith(_BATCH_SUBJECT_PREFIX):
+        return [message]
+    parts = _BATCH_ENTRY_MARKER.split(message)
+    entries = [part.strip("\n") for part in parts[1:] if part.strip()]
+    return entries or [message]
+
+
+def _perform_batch_commit(
+    repo: Repo, settings: Settings, entries: Sequence[tuple[str, Sequence[str]]]
+) -> dict[str, Any] | None:
+    """Commit the batch and return its :func:`_archive_commit_record` (None when nothing changed)."""
+    paths: list[str] = []
+    seen: set[str] = set()
+    for _message, rel_paths in entries:
+        for rel in rel_paths:
+            if rel not in seen:
+                seen.add(rel)
+                paths.append(rel)
+    if not paths:
+        return None
     actor = Actor(settings.storage.git_author_name, settings.storage.git_author_email)
+    # One index rewrite for the whole batch; paths that no longer exist are staged as deletions
+    working_tree = Path(repo.working_tree_dir or "")
+    present = [rel for rel in paths if (working_tree / rel).exists()]
+    present_set = set(present)
+    removed = [rel for rel in paths if rel not in present_set]
+    if present:
+        repo.index.add(present)
+    if removed:
+        repo.index.remove(removed, working_tree=False, ignore_unmatch=True)
+    if repo.is_dirty(index=True, working_tree=True):
+        messages = [message for message, rel_paths in entries if rel_paths]
+        final_message = _with_trailers(messages[0]) if len(messages) == 1 else _batch_commit_message(messages)
+        commit = repo.index.commit(final_message, author=actor, committer=actor)
+        # Keep an existing time-travel index current; archives without one build it on first lookup
+        if _commit_index_path(repo).exists():
+            with contextlib.suppress(Exception):
+                sync_commit_index(repo)
+        try:
+            numstat = _batch_numstat(repo, commit, present, removed)
+        except Exception:
+            numstat = (len(paths), 0, 0)
+        return _archive_commit_record(commit, [(m, r) for m, r in entries if r], numstat)
+    return None
 
-    def _perform_commit() -> None:
-        repo.index.add(rel_paths)
-        if repo.is_dirty(index=True, working_tree=True):
-            # Append commit trailers with Agent and optional Thread if present in message text
-            trailers: list[str] = []
-            # Extract simple Agent/Thread heuristics from the message subject line
-            # Expected message formats include:
-            #   mail: <Agent> -> ... | <Subject>
-            #   file_reservation: <Agent> ...
-            try:
-                # Avoid duplicating trailers if already embedded
-                lower_msg = message.lower()
-                have_agent_line = "\nagent:" in lower_msg
-                if message.startswith("mail: ") and not have_agent_line:
-                    head = message[len("mail: ") :]
-                    agent_part = head.split("->", 1)[0].strip()
-                    if agent_part:
-                        trailers.append(f"Agent: {agent_part}")
-                elif message.startswith("file_reservation: ") and not have_agent_line:
-                    head = message[len("file_reservation: ") :]
-                    agent_part = head.split(" ", 1)[0].strip()
-                    if agent_part:
-                        trailers.append(f"Agent: {agent_part}")
-            except Exception:
-                pass
-            final_message = message
-            if trailers:
-                final_message = message + "\n\n" + "\n".join(trailers) + "\n"
-            repo.index.commit(final_message, author=actor, committer=actor)
+
+def _blob_line_count(data: bytes) -> int:
+    return data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+
+
+def _blob_is_binary(data: bytes) -> bool:
+    # Git's heuristic: a NUL in the first 8000 bytes marks the blob binary (numstat reports no lines)
+    return b"\0" in data[:8000]
+
+
+def _changed_line_counts(old: bytes, new: bytes) -> tuple[int, int]:
+    """``(insertions, deletions)`` for one modified text blob: the lines left after trimming the common head and tail."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    head = 0
+    limit = min(len(old_lines), len(new_lines))
+    while head < limit and old_lines[head] == new_lines[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old_lines[-1 - tail] == new_lines[-1 - tail]:
+        tail += 1
+    return len(new_lines) - head - tail, len(old_lines) - head - tail
+
+
+def _batch_numstat(
+    repo: Repo, commit: Commit, present: Sequence[str], removed: Sequence[str]
+) -> tuple[int, int, int]:
+    """``(files_changed, insertions, deletions)`` for a batch commit, from the blobs it just wrote.
+
+    Replaces a ``git diff-tree --numstat`` subprocess per commit. Archive writes are new files or
+    appends (mailbox indexes), so most paths never read the previous blob: an append is confirmed by
+    hashing the new file's prefix against the parent's blob id. Other rewrites count the lines left
+    after trimming the common head and tail, which matches Git for the single-hunk edits the archive makes.
+    """
+    parent_tree = commit.parents[0].tree if commit.parents else None
+    working_tree = Path(repo.working_tree_dir or "")
+    entries = repo.index.entries
+
+    def _old_blob(rel: str) -> Any:
+        if parent_tree is None:
+            return None
+        try:
+            return parent_tree / rel
+        except KeyError:
+            return None
+
+    files = insertions = deletions = 0
+    for rel in present:
+        entry = entries.get((rel, 0))
+        old_blob = _old_blob(rel)
+        if entry is not None and old_blob is not None and entry.binsha == old_blob.binsha:
+            continue  # staged unchanged
+        new = (working_tree / rel).read_bytes()
+        files += 1
+        if _blob_is_binary(new):
+            continue
+        if old_blob is None:
+            insertions += _blob_line_count(new)
+            continue
+        old_size = int(old_blob.size)
+        if (
+            0 < old_size < len(new)
+            and new[old_size - 1 : old_size] == b"\n"
+            and hashlib.sha1(b"blob %d\0" % old_size + new[:old_size]).digest() == old_blob.binsha
+        ):
+            insertions += _blob_line_count(new[old_size:])
+            continue
+        old = old_blob.data_stream.read()
+        if _blob_is_binary(old):
+            continue
+        added, dropped = _changed_line_counts(old, new)
+        insertions += added
+        deletions += dropped
+    for rel in removed:
+        old_blob = _old_blob(rel)
+        if old_blob is None:
+            continue
+        files += 1
+        old = old_blob.data_stream.read()
+        if not _blob_is_binary(old):
+            deletions += _blob_line_count(old)
+    return files, insertions, deletions
+
+
+async def commit_batch(repo: Repo, settings: Settings, entries: Sequence[tuple[str, Sequence[str]]]) -> None:
+    """Commit several archive writes as a single Git commit (one index update, one fsync)."""
+    if not any(rel_paths for _message, rel_paths in entries):
+        return
     # Serialize commits across all projects sharing the same Git repo to avoid index races
     working_tree = repo.working_tree_dir
     if working_tree is None:
         raise ValueError("Repository has no working tree directory")
     commit_lock_path = Path(working_tree).resolve() / ".commit.lock"
     async with AsyncFileLock(commit_lock_path):
-        await _to_thread(_perform_commit)
+        record = await _to_thread(_perform_batch_commit, repo, settings, list(entries))
+    if record is not None:
+        # Best-effort: a missed row only costs the activity pages that commit until the next backfill
+        with contextlib.suppress(Exception):
+            await record_archive_commits([record])
+
+
+@dataclass(slots=True)
+class _PendingCommit:
+    message: str
+    rel_paths: list[str]
+    future: asyncio.Future[None]
+
+
+class _GroupCommitter:
+    """Group-commit engine for one archive repo.
+
+    Writers enqueue their commit and wait; a single flush task folds everything that arrives within
+    ``commit_batch_window_ms`` (or until ``commit_batch_max_files`` paths are queued) into one commit.
+    While a commit is running, new writers accumulate for the next one, so commits per second stay
+    flat while writes per commit grow with the number of concurrent senders.
+    """
+
+    def __init__(self, repo: Repo, settings: Settings) -> None:
+        self._repo = repo
+        self._settings = settings
+        self._pending: list[_PendingCommit] = []
+        self._pending_files = 0
+        self._full = asyncio.Event()
+        self._flusher: asyncio.Task[None] | None = None
+
+    def enqueue(self, message: str, rel_paths: Sequence[str]) -> asyncio.Future[None]:
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingCommit(message, list(rel_paths), future))
+        self._pending_files += len(rel_paths)
+        if self._pending_files >= self._max_files:
+            self._full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+        return future
+
+    async def submit(self, message: str, rel_paths: Sequence[str]) -> None:
+        await asyncio.shield(self.enqueue(message, rel_paths))
+
+    @property
+    def _max_files(self) -> int:
+        return max(1, int(self._settings.storage.commit_batch_max_files))
+
+    async def _run(self) -> None:
+        window = max(0, int(self._settings.storage.commit_batch_window_ms)) / 1000.0
+        batch: list[_PendingCommit] = []
+        try:
+            await self._flush_pending(window, batch)
+        except BaseException as exc:
+            # Cancelled (loop shutdown) or crashed: nobody else will resolve these, so fail them now
+            stranded, self._pending = batch + self._pending, []
+            self._pending_files = 0
+            self._full.clear()
+            for item in stranded:
+                if item.future.done():
+                    continue
+                if isinstance(exc, Exception):
+                    item.future.set_exception(exc)
+                else:
+                    item.future.cancel()
+            raise
+
+    async def _flush_pending(self, window: float, batch: list[_PendingCommit]) -> None:
+        while self._pending:
+            batch.clear()
+            if not self._full.is_set():
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._full.wait(), timeout=window)
+            files = 0
+            while self._pending and (not batch or files + len(self._pending[0].rel_paths) <= self._max_files):
+                item = self._pending.pop(0)
+                batch.append(item)
+                files += len(item.rel_paths)
+            self._pending_files -= files
+            if self._pending_files < self._max_files:
+                self._full.clear()
+            try:
+                await commit_batch(self._repo, self._settings, [(item.message, item.rel_paths) for item in batch])
+            except Exception as exc:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(exc)
+            else:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_result(None)
+
+
+_DEFERRED_COMMITS: contextvars.ContextVar[list[asyncio.Future[None]] | None] = contextvars.ContextVar(
+    "mcp_agent_mail_deferred_commits", default=None
+)
+
+
+def _discard_future_result(future: asyncio.Future[None]) -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+_GROUP_COMMITTERS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, _GroupCommitter]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _group_committer(repo: Repo, settings: Settings) -> _GroupCommitter:
+    loop = asyncio.get_running_loop()
+    per_loop = _GROUP_COMMITTERS.setdefault(loop, {})
+    key = str(Path(repo.working_tree_dir or repo.git_dir).resolve())
+    committer = per_loop.get(key)
+    if committer is None or committer._repo is not repo:
+        committer = _GroupCommitter(repo, settings)
+        per_loop[key] = committer
+    return committer
+
+
+async def _commit(repo: Repo, settings: Settings, message: str, rel_paths: Sequence[str]) -> None:
+    if not rel_paths:
+        return
+    if settings.storage.commit_batch_window_ms > 0:
+        deferred = _DEFERRED_COMMITS.get()
+        if deferred is not None:
+            deferred.append(_group_committer(repo, settings).enqueue(message, rel_paths))
+            return
+        await _group_committer(repo, settings).submit(message, rel_paths)
+        return
+    await commit_batch(repo, settings, [(message, rel_paths)])
 
 
 async def heal_archive_locks(settings: Settings) -> dict[str, Any]:
@@ -1061,25 +2194,381 @@ async def heal_archive_locks(settings: Settings) -> dict[str, Any]:
     return summary
 
 
+# --- Time-travel commit index ----------------------------------------------------------------
+
+COMMIT_INDEX_NAME = "agent-mail-commit-times.idx"
+_COMMIT_INDEX_MAGIC = b"AMCTIDX1"
+# One fixed-width record per first-parent commit, oldest first: authored epoch seconds + binary sha
+_COMMIT_INDEX_RECORD = struct.Struct(">q20s")
+
+
+def _commit_index_path(repo: Repo) -> Path:
+    # Lives in the git dir: derived data that must never be committed or show up in ``git status``
+    return Path(repo.git_dir) / COMMIT_INDEX_NAME
+
+
+def _commit_index_tail(path: Path) -> tuple[int, bytes] | None:
+    """Return the last ``(timestamp, binsha)`` record, or None when the index is missing or malformed."""
+    try:
+        with path.open("rb") as fh:
+            if fh.read(len(_COMMIT_INDEX_MAGIC)) != _COMMIT_INDEX_MAGIC:
+                return None
+            size = os.fstat(fh.fileno()).st_size
+            body = size - len(_COMMIT_INDEX_MAGIC)
+            if body <= 0 or body % _COMMIT_INDEX_RECORD.size:
+                return None
+            fh.seek(size - _COMMIT_INDEX_RECORD.size)
+            ts, binsha = _COMMIT_INDEX_RECORD.unpack(fh.read(_COMMIT_INDEX_RECORD.size))
+            return int(ts), bytes(binsha)
+    except OSError:
+        return None
+
+
+def _pack_commit_records(commits: Sequence[Commit]) -> bytes:
+    # Each record stores the minimum authored time of its commit and every later one. The column is then
+    # sorted even with clock skew, and "last record <= t" is exactly the commit a newest-first walk
+    # stopping at the first ``authored_date <= t`` would pick.
+    records: list[bytes] = []
+    floor: int | None = None
+    for commit in reversed(commits):
+        authored = int(commit.authored_date)
+        floor = authored if floor is None else min(floor, authored)
+        records.append(_COMMIT_INDEX_RECORD.pack(floor, commit.binsha))
+    records.reverse()
+    return b"".join(records)
+
+
+def _commit_index_current(repo: Repo, path: Path) -> bool:
+    try:
+        head = repo.head.commit
+    except ValueError:
+        return True  # no commits yet
+    tail = _commit_index_tail(path)
+    return tail is not None and tail[1] == head.binsha
+
+
+def sync_commit_index(repo: Repo) -> Path:
+    """Bring the timestamp -> commit index up to HEAD and return its path.
+
+    New first-parent commits since the last indexed one are appended; if that commit is no longer
+    in history (restore, rewrite), or a new commit predates it, the index is rebuilt from scratch
+    with one ``rev-list`` walk. The caller must hold the repo's ``.commit.lock``: the index is shared
+    by every process serving the archive, and only commits (made under that lock) move HEAD.
+    """
+    path = _commit_index_path(repo)
+    try:
+        head = repo.head.commit
+    except ValueError:
+        return path  # no commits yet
+    tail = _commit_index_tail(path)
+    if tail is not None and tail[1] == head.binsha:
+        return path
+    pending: list[Commit] = []
+    reached_tail = False
+    for commit in repo.iter_commits(head, first_parent=True):
+        if tail is not None and commit.binsha == tail[1]:
+            reached_tail = True
+            break
+        pending.append(commit)
+    pending.reverse()
+    # A new commit authored before the indexed tail would lower earlier records: rebuild instead
+    if reached_tail and tail is not None and all(int(c.authored_date) >= tail[0] for c in pending):
+        with path.open("ab") as fh:
+            fh.write(_pack_commit_records(pending))
+    else:
+        if reached_tail:
+            pending = list(repo.iter_commits(head, first_parent=True))
+            pending.reverse()
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(_COMMIT_INDEX_MAGIC + _pack_commit_records(pending))
+        tmp_path.replace(path)
+    return path
+
+
+async def _synced_commit_index(repo: Repo) -> Path:
+    """Return the commit index path, catching it up to HEAD under the repo's commit lock when stale."""
+    path = _commit_index_path(repo)
+    if await _to_thread(_commit_index_current, repo, path):
+        return path
+    working_tree = Path(repo.working_tree_dir or repo.git_dir)
+    async with AsyncFileLock(working_tree.resolve() / ".commit.lock"):
+        synced: Path = await _to_thread(sync_commit_index, repo)
+    return synced
+
+
+def _lookup_commit_index(path: Path, target: float) -> bytes | None:
+    """Binary-search the index for the newest commit authored at or before ``target``."""
+    record = _COMMIT_INDEX_RECORD.size
+    header = len(_COMMIT_INDEX_MAGIC)
+    try:
+        with path.open("rb") as fh:
+            count = (os.fstat(fh.fileno()).st_size - header) // record
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                fh.seek(header + mid * record)
+                ts, _binsha = _COMMIT_INDEX_RECORD.unpack(fh.read(record))
+                if ts <= target:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo == 0:
+                return None
+            fh.seek(header + (lo - 1) * record)
+            return bytes(_COMMIT_INDEX_RECORD.unpack(fh.read(record))[1])
+    except OSError:
+        return None
+
+
+async def find_commit_at(repo: Repo, when: datetime) -> Commit | None:
+    """Return the newest first-parent commit authored at or before ``when`` (O(log n) via the commit index)."""
+
+    path = await _synced_commit_index(repo)
+
+    def _find() -> Commit | None:
+        binsha = _lookup_commit_index(path, _as_aware_utc(when).timestamp())
+        return repo.commit(binsha.hex()) if binsha is not None else None
+
+    result: Commit | None = await _to_thread(_find)
+    return result
+
+
+def _as_aware_utc(value: datetime) -> datetime:
+    # Naive timestamps (datetime-local inputs, SQLite columns) are UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def parse_snapshot_time(timestamp: str) -> datetime:
+    """Parse a time-travel timestamp (``Z`` suffix, offsets and naive values accepted; naive means UTC)."""
+    return _as_aware_utc(datetime.fromisoformat(timestamp.replace("Z", "+00:00")))
+
+
 # ==================================================================================
 # Git Archive Visualization & Analysis Helpers
 # ==================================================================================
 
+_PROJECT_PATH_RE = re.compile(r"^projects/([^/]+)/")
+_MESSAGE_PATH_RE = re.compile(r"^projects/[^/]+/messages/")
+_MAILBOX_PATH_RE = re.compile(r"^projects/[^/]+/agents/([^/]+)/(inbox|outbox)/")
+_LOG_RECORD_SEP = "\x1e"
+
+
+def _classify_commit_entry(subject: str) -> tuple[str, str | None, list[str]]:
+    """Return ``(type, sender, recipients)`` for one archive write subject line."""
+    sender: str | None = None
+    recipients: list[str] = []
+    if subject.startswith("mail: "):
+        # Format: "mail: Sender -> Recipient1, Recipient2 | Subject"
+        rest = subject[len("mail: "):]
+        sender_part = rest.split(" | ", 1)[0]
+        if " -> " in sender_part:
+            sender_str, recipients_str = sender_part.split(" -> ", 1)
+            sender = sender_str.strip()
+            recipients = [r.strip() for r in recipients_str.split(",")]
+        return "message", sender, recipients
+    if subject.startswith("file_reservation: "):
+        return "file_reservation", None, []
+    if subject.startswith("chore: "):
+        return "chore", None, []
+    return "other", None, []
+
+
+def relative_date(commit_time: datetime) -> str:
+    """Human-friendly age of a commit ("3 hours ago", or the date past 30 days)."""
+    delta = datetime.now(timezone.utc) - commit_time
+    if delta.days > 30:
+        return commit_time.strftime("%b %d, %Y")
+    if delta.days > 0:
+        return f"{delta.days} day{'s' if delta.days != 1 else ''} ago"
+    if delta.seconds > 3600:
+        hours = delta.seconds // 3600
+        return f"{hours} hour{'s' if hours != 1 else ''} ago"
+    if delta.seconds > 60:
+        minutes = delta.seconds // 60
+        return f"{minutes} minute{'s' if minutes != 1 else ''} ago"
+    return "just now"
+
+
+def _parse_numstat(output: str) -> tuple[int, int, int]:
+    """Return ``(files_changed, insertions, deletions)`` from ``--numstat`` lines (binary files count 0 lines)."""
+    files = insertions = deletions = 0
+    for line in output.splitlines():
+        parts = line.split("\t", 2)
+        if len(parts) != 3:
+            continue
+        files += 1
+        insertions += int(parts[0]) if parts[0].isdigit() else 0
+        deletions += int(parts[1]) if parts[1].isdigit() else 0
+    return files, insertions, deletions
+
+
+def _message_parties_from_paths(rel_paths: Sequence[str]) -> tuple[str | None, list[str]] | None:
+    """``(sender, recipients)`` from the outbox/inbox copies a message write touched; None if it wrote no message."""
+    if not any(_MESSAGE_PATH_RE.match(rel) for rel in rel_paths):
+        return None
+    sender: str | None = None
+    recipients: list[str] = []
+    for rel in rel_paths:
+        match = _MAILBOX_PATH_RE.match(rel)
+        if match is None:
+            continue
+        name, box = match.groups()
+        if box == "outbox":
+            sender = sender or name
+        elif name not in recipients:
+            recipients.append(name)
+    return sender, recipients
+
+
+def _paths_projects(rel_paths: Iterable[str]) -> list[str | None]:
+    slugs: list[str | None] = []
+    for rel in rel_paths:
+        match = _PROJECT_PATH_RE.match(rel)
+        if match and match.group(1) not in slugs:
+            slugs.append(match.group(1))
+    return slugs or [None]
+
+
+def _archive_commit_record(
+    commit: Commit, entries: Sequence[tuple[str, Sequence[str]]], numstat: tuple[int, int, int]
+) -> dict[str, Any]:
+    """Row data for ``db.record_archive_commits``: commit metadata plus one entry per write and project touched.
+
+    Writes whose subject is not a ``mail:`` line (e.g. the rendered tool-call panel ``send_message``
+    commits with) are classified from the mailbox paths they touched instead.
+    """
+    message = _ensure_str(commit.message)
+    rows: list[dict[str, Any]] = []
+    for seq, (entry_message, rel_paths) in enumerate(entries):
+        subject = entry_message.split("\n", 1)[0]
+        entry_type, sender, recipients = _classify_commit_entry(subject)
+        if entry_type in {"message", "other"} and sender is None:
+            parties = _message_parties_from_paths(rel_paths)
+            if parties is not None:
+                entry_type, (sender, recipients) = "message", parties
+        for slug in _paths_projects(rel_paths):
+            rows.append(
+                {
+                    "seq": seq,
+                    "project_slug": slug,
+                    "type": entry_type,
+                    "subject": subject[:1024],
+                    "sender": sender,
+                    "recipients": recipients,
+                }
+            )
+    files_changed, insertions, deletions = numstat
+    return {
+        "sha": commit.hexsha,
+        "commit_ts": datetime.fromtimestamp(int(commit.authored_date), tz=timezone.utc),
+        "author": str(commit.author.name or ""),
+        "email": str(commit.author.email or ""),
+        "subject": message.split("\n", 1)[0][:1024],
+        "files_changed": files_changed,
+        "insertions": insertions,
+        "deletions": deletions,
+        "entries": rows,
+    }
+
+
+def _iter_logged_commits(repo: Repo) -> Iterator[dict[str, Any]]:
+    """Stream commit records oldest-first from a single ``git log --numstat`` process.
+
+    The log does not say which files belong to which write of a group commit, so backfilled entries
+    are attributed to every project the commit touched.
+    """
+    proc = repo.git.log(
+        "--reverse",
+        "--no-renames",
+        "--numstat",
+        f"--format={_LOG_RECORD_SEP}%H%x00%at%x00%an%x00%ae%x00%B%x00",
+        as_process=True,
+    )
+    stdout = proc.proc.stdout
+
+    def _records() -> Iterator[str]:
+        pending = ""
+        while True:
+            chunk = stdout.read(1 << 16)
+            if not chunk:
+                break
+            pending += chunk.decode("utf-8", errors="replace")
+            *complete, pending = pending.split(_LOG_RECORD_SEP)
+            yield from complete
+        yield pending
+
+    try:
+        for raw in _records():
+            if not raw.strip():
+                continue
+            sha, authored, author, email, message, stat = raw.split("\x00", 5)
+            rel_paths = [line.split("\t", 2)[2] for line in stat.splitlines() if line.count("\t") >= 2]
+            commit = Commit(
+                repo, bytes.fromhex(sha), author=Actor(author, email), authored_date=int(authored), message=message
+            )
+            entries = [(entry, rel_paths) for entry in split_commit_entries(message)]
+            yield _archive_commit_record(commit, entries, _parse_numstat(stat))
+    finally:
+        proc.wait()
+
+
+async def backfill_archive_commits(repo: Repo, batch_size: int = 500) -> dict[str, int]:
+    """Record metadata for every archive commit the database does not know yet (idempotent).
+
+    Returns ``{"scanned": <commits read from Git>, "inserted": <new rows>}``.
+    """
+    if not repo.head.is_valid():
+        return {"scanned": 0, "inserted": 0}
+    records = _iter_logged_commits(repo)
+    scanned = inserted = 0
+    while True:
+        batch = await _to_thread(lambda: list(islice(records, max(1, batch_size))))
+        if not batch:
+            break
+        scanned += len(batch)
+        inserted += await record_archive_commits(batch)
+    return {"scanned": scanned, "inserted": inserted}
+
+
+async def archive_root_commit(repo: Repo) -> str | None:
+    """SHA of the archive's first commit (read from the time-travel index), or None for an empty repo."""
+
+    path = await _synced_commit_index(repo)
+
+    def _root() -> str | None:
+        try:
+            with path.open("rb") as fh:
+                fh.seek(len(_COMMIT_INDEX_MAGIC))
+                record = fh.read(_COMMIT_INDEX_RECORD.size)
+        except OSError:
+            return None
+        if len(record) != _COMMIT_INDEX_RECORD.size:
+            return None
+        return bytes(_COMMIT_INDEX_RECORD.unpack(record)[1]).hex()
+
+    result: str | None = await _to_thread(_root)
+    return result
+
 
 async def get_recent_commits(
     repo: Repo,
     limit: int = 50,
     project_slug: str | None = None,
     path_filter: str | None = None,
+    offset: int = 0,
 ) -> list[dict[str, Any]]:
     """
     Get recent commits from the Git repository.
 
+    The activity page reads ``archive_commits`` instead when the history has been
+    indexed; this walk (which diffs every commit) is the fallback.
+
     Args:
         repo: GitPython Repo object
         limit: Maximum number of commits to return
         project_slug: Optional slug to filter commits for specific project
         path_filter: Optional path pattern to filter commits
+        offset: Number of newest commits to skip (pagination)
 
     Returns:
         List of commit dicts with keys: sha, short_sha, author, email, date,
@@ -1096,9 +2585,9 @@ async def get_recent_commits(
 
         # Get commits, optionally filtered by path (explicit kwargs for better typing)
         if path_spec:
-            iterator = repo.iter_commits(paths=[path_spec], max_count=limit)
+            iterator = repo.iter_commits(paths=[path_spec], max_count=limit, skip=max(0, offset))
         else:
-            iterator = repo.iter_commits(max_count=limit)
+            iterator = repo.iter_commits(max_count=limit, skip=max(0, offset))
 
         for commit in iterator:
             # Parse commit stats
@@ -1106,24 +2595,7 @@ async def get_recent_commits(
             insertions = commit.stats.total["insertions"]
             deletions = commit.stats.total["deletions"]
 
-            # Calculate relative date
             commit_time = datetime.fromtimestamp(commit.authored_date, tz=timezone.utc)
-            now = datetime.now(timezone.utc)
-            delta = now - commit_time
-
-            if delta.days > 30:
-                relative_date = commit_time.strftime("%b %d, %Y")
-            elif delta.days > 0:
-                relative_date = f"{delta.days} day{'s' if delta.days != 1 else ''} ago"
-            elif delta.seconds > 3600:
-                hours = delta.seconds // 3600
-                relative_date = f"{hours} hour{'s' if hours != 1 else ''} ago"
-            elif delta.seconds > 60:
-                minutes = delta.seconds // 60
-                relative_date = f"{minutes} minute{'s' if minutes != 1 else ''} ago"
-            else:
-                relative_date = "just now"
-
             message_str = _ensure_str(commit.message)
             commits.append({
                 "sha": commit.hexsha,
@@ -1131,7 +2603,7 @@ async def get_recent_commits(
                 "author": commit.author.name,
                 "email": commit.author.email,
                 "date": commit_time.isoformat(),
-                "relative_date": relative_date,
+                "relative_date": relative_date(commit_time),
                 "subject": message_str.split("\n")[0],
                 "body": message_str,
                 "files_changed": files_changed,
@@ -1330,8 +2802,10 @@ async def get_message_commit_sha(archive: ProjectArchive, message_id: int) -> st
             for month_dir in year_dir.iterdir():
                 if not month_dir.is_dir():
                     continue
-                for md_file in month_dir.iterdir():
-                    if md_file.is_file() and md_file.name.endswith(pattern):
+                # Compacted months keep their messages in the segment; git history still has the original path
+                candidates = [*month_dir.iterdir(), *(month_dir / name for name in segment_file_names(month_dir))]
+                for md_file in candidates:
+                    if md_file.name.endswith(pattern) and (md_file.is_file() or not md_file.exists()):
                         try:
                             # Get relative path from repo root
                             rel_path = md_file.relative_to(archive.repo_root)
@@ -1353,6 +2827,50 @@ async def get_message_commit_sha(archive: ProjectArchive, message_id: int) -> st
     return result
 
 
+def _mailbox_index_tree_entries(commit: Any, slug: str, index_blob: Any) -> list[dict[str, Any]]:
+    entries: list[dict[str, Any]] = []
+    try:
+        content = index_blob.data_stream.read().decode("utf-8", errors="ignore")
+    except Exception:
+        return entries
+    for entry in parse_mailbox_index(content):
+        rel = entry["path"]
+        try:
+            blob = commit.tree / f"projects/{slug}/{rel}"
+            size, mode = blob.size, blob.mode
+        except KeyError:
+            located = _segment_entry_at(commit, slug, rel)
+            if located is None:
+                continue
+            size, mode = int(located[1].get("size", 0)), located[0].mode
+        entries.append({
+            "name": rel.rsplit("/", 1)[-1],
+            "path": rel,
+            "type": "file",
+            "size": size,
+            "mode": mode,
+        })
+    return entries
+
+
+def _segment_tree_entries(path: str, index_blob: Any, mode: int) -> list[dict[str, Any]]:
+    """List the messages packed into a month's segment as plain files of ``messages/YYYY/MM``."""
+    try:
+        packed = parse_segment_index(index_blob.data_stream.read())
+    except Exception:
+        return []
+    return [
+        {
+            "name": name,
+            "path": f"{path}/{name}" if path else name,
+            "type": "file",
+            "size": int(entry.get("size", 0)),
+            "mode": mode,
+        }
+        for name, entry in packed.items()
+    ]
+
+
 async def get_archive_tree(
     archive: ProjectArchive,
     path: str = "",
@@ -1423,6 +2941,12 @@ async def get_archive_tree(
                 "size": size,
                 "mode": item.mode,
             })
+            if item.type == "blob" and item.name == MAILBOX_INDEX_NAME and _MAILBOX_DIR_PATTERN.match(safe_path):
+                # Index layout: list the indexed messages as files that open the canonical copy
+                entries.extend(_mailbox_index_tree_entries(commit, archive.slug, item))
+            elif item.type == "blob" and item.name == SEGMENT_INDEX_NAME and _MESSAGE_MONTH_DIR_PATTERN.match(safe_path):
+                # Compacted month: packed messages browse like the loose files they replaced
+                entries.extend(_segment_tree_entries(path, item, item.mode))
 
         # Sort: directories first, then files, both alphabetically
         entries.sort(key=lambda x: (x["type"] != "dir", str(x["name"]).lower()))
@@ -1433,6 +2957,22 @@ async def get_archive_tree(
     return result
 
 
+def _resolve_mailbox_path(commit: Any, slug: str, rel_path: str) -> str | None:
+    """Map a per-agent mailbox file path to its canonical ``messages/`` path via ``index.jsonl``."""
+    mailbox_dir, _, file_name = rel_path.rpartition("/")
+    if not _MAILBOX_DIR_PATTERN.match(mailbox_dir) or not file_name:
+        return None
+    try:
+        index_blob = commit.tree / f"projects/{slug}/{mailbox_dir}/{MAILBOX_INDEX_NAME}"
+        content = index_blob.data_stream.read().decode("utf-8", errors="ignore")
+    except (KeyError, AttributeError):
+        return None
+    for entry in parse_mailbox_index(content):
+        if entry["path"].rsplit("/", 1)[-1] == file_name:
+            return str(entry["path"])
+    return None
+
+
 async def get_file_content(
     archive: ProjectArchive,
     path: str,
@@ -1480,7 +3020,29 @@ async def get_file_content(
         project_rel = f"projects/{archive.slug}/{safe_path}"
 
         try:
-            obj = commit.tree / project_rel
+            try:
+                obj = commit.tree / project_rel
+            except KeyError:
+                # Index layout: agents/<name>/(inbox|outbox)/YYYY/MM/<file> resolves to the canonical copy
+                canonical = _resolve_mailbox_path(commit, archive.slug, safe_path) or safe_path
+                try:
+                    obj = commit.tree / f"projects/{archive.slug}/{canonical}"
+                except KeyError:
+                    # Compacted month: the canonical file is a member of messages/YYYY/MM/segment.gz
+                    located = _segment_entry_at(commit, archive.slug, canonical)
+                    if located is None:
+                        raise
+                    segment_blob, entry = located
+                    if int(entry.get("size", 0)) > max_size_bytes:
+                        raise ValueError(f"File too large: {entry['size']} bytes (max {max_size_bytes})") from None
+                    data = None
+                    if not commit_sha:
+                        # HEAD matches the working tree, where the member's byte range can be read directly
+                        month_dir, _, file_name = canonical.rpartition("/")
+                        data = read_segment_file(archive.root / month_dir, file_name)
+                    if data is None:
+                        data = _segment_blob_member(segment_blob, entry)
+                    return data.decode("utf-8", errors="replace")
             # Check if it's a file (blob), not a directory (tree)
             if obj.type != "blob":
                 raise ValueError("Path is a directory, not a file")
@@ -1495,6 +3057,50 @@ async def get_file_content(
     return result
 
 
+def _count_mail_entry(
+    subject: str,
+    agent_stats: dict[str, dict[str, int]],
+    connections: dict[tuple[str, str], int],
+) -> None:
+    if not subject.startswith("mail: "):
+        return
+
+    # Extract sender and recipients
+    try:
+        rest = subject[len("mail: "):]
+        sender_part, _ = rest.split(" | ", 1) if " | " in rest else (rest, "")
+
+        if " -> " not in sender_part:
+            return
+
+        sender, recipients_str = sender_part.split(" -> ", 1)
+        sender = str(sender).strip()
+        recipients = [r.strip() for r in recipients_str.split(",")]
+
+        # Update sender stats
+        if sender not in agent_stats:
+            agent_stats[sender] = {"sent": 0, "received": 0}
+        agent_stats[sender]["sent"] = agent_stats[sender].get("sent", 0) + 1
+
+        # Update recipient stats and connections
+        for recipient in recipients:
+            if not recipient:
+                continue
+
+            recipient = str(recipient)
+            if recipient not in agent_stats:
+                agent_stats[recipient] = {"sent": 0, "received": 0}
+            agent_stats[recipient]["received"] = agent_stats[recipient].get("received", 0) + 1
+
+            # Track connection
+            conn_key: tuple[str, str] = (sender, recipient)
+            connections[conn_key] = int(connections.get(conn_key, 0)) + 1
+
+    except Exception:
+        # Skip malformed commit messages
+        return
+
+
 async def get_agent_communication_graph(
     repo: Repo,
     project_slug: str,
@@ -1521,46 +3127,9 @@ async def get_agent_communication_graph(
         for commit in repo.iter_commits(paths=[path_spec], max_count=limit):
             # Parse commit message to extract sender and recipients
             # Format: "mail: Sender -> Recipient1, Recipient2 | Subject"
-            message_str = _ensure_str(commit.message)
-            subject = message_str.split("\n")[0]
-
-            if not subject.startswith("mail: "):
-                continue
-
-            # Extract sender and recipients
-            try:
-                rest = subject[len("mail: "):]
-                sender_part, _ = rest.split(" | ", 1) if " | " in rest else (rest, "")
-
-                if " -> " not in sender_part:
-                    continue
-
-                sender, recipients_str = sender_part.split(" -> ", 1)
-                sender = str(sender).strip()
-                recipients = [r.strip() for r in recipients_str.split(",")]
-
-                # Update sender stats
-                if sender not in agent_stats:
-                    agent_stats[sender] = {"sent": 0, "received": 0}
-                agent_stats[sender]["sent"] = agent_stats[sender].get("sent", 0) + 1
-
-                # Update recipient stats and connections
-                for recipient in recipients:
-                    if not recipient:
-                        continue
-
-                    recipient = str(recipient)
-                    if recipient not in agent_stats:
-                        agent_stats[recipient] = {"sent": 0, "received": 0}
-                    agent_stats[recipient]["received"] = agent_stats[recipient].get("received", 0) + 1
-
-                    # Track connection
-                    conn_key: tuple[str, str] = (sender, recipient)
-                    connections[conn_key] = int(connections.get(conn_key, 0)) + 1
-
-            except Exception:
-                # Skip malformed commit messages
-                continue
+            # Group commits fold several writes into one commit; count each entry.
+            for entry in split_commit_entries(_ensure_str(commit.message)):
+                _count_mail_entry(entry.split("\n")[0], agent_stats, connections)
 
         # Build nodes list
         nodes = []
@@ -1596,6 +3165,7 @@ async def get_timeline_commits(
     repo: Repo,
     project_slug: str,
     limit: int = 100,
+    offset: int = 0,
 ) -> list[dict[str, Any]]:
     """
     Get commits formatted for timeline visualization with Mermaid.js.
@@ -1604,6 +3174,7 @@ async def get_timeline_commits(
         repo: GitPython Repo object
         project_slug: Project slug to analyze
         limit: Maximum number of commits
+        offset: Number of newest commits to skip (pagination)
 
     Returns:
         List of commit dicts with timeline-specific metadata
@@ -1612,44 +3183,24 @@ async def get_timeline_commits(
         path_spec = f"projects/{project_slug}"
 
         timeline = []
-        for commit in repo.iter_commits(paths=[path_spec], max_count=limit):
-            message_str = _ensure_str(commit.message)
-            subject = message_str.split("\n")[0]
+        for commit in repo.iter_commits(paths=[path_spec], max_count=limit, skip=max(0, offset)):
             commit_time = datetime.fromtimestamp(commit.authored_date, tz=timezone.utc)
-
-            # Classify commit type
-            commit_type = "other"
-            sender = None
-            recipients = []
-
-            if subject.startswith("mail: "):
-                commit_type = "message"
-                # Parse sender and recipients
-                try:
-                    rest = subject[len("mail: "):]
-                    sender_part, _ = rest.split(" | ", 1) if " | " in rest else (rest, "")
-                    if " -> " in sender_part:
-                        sender, recipients_str = sender_part.split(" -> ", 1)
-                        sender = sender.strip()
-                        recipients = [r.strip() for r in recipients_str.split(",")]
-                except Exception:
-                    pass
-            elif subject.startswith("file_reservation: "):
-                commit_type = "file_reservation"
-            elif subject.startswith("chore: "):
-                commit_type = "chore"
-
-            timeline.append({
-                "sha": commit.hexsha,
-                "short_sha": commit.hexsha[:8],
-                "date": commit_time.isoformat(),
-                "timestamp": commit.authored_date,
-                "subject": subject,
-                "type": commit_type,
-                "sender": sender,
-                "recipients": recipients,
-                "author": commit.author.name,
-            })
+            # Group commits carry one timeline entry per folded write (same sha)
+            for entry in split_commit_entries(_ensure_str(commit.message)):
+                subject = entry.split("\n")[0]
+                commit_type, sender, recipients = _classify_commit_entry(subject)
+
+                timeline.append({
+                    "sha": commit.hexsha,
+                    "short_sha": commit.hexsha[:8],
+                    "date": commit_time.isoformat(),
+                    "timestamp": commit.authored_date,
+                    "subject": subject,
+                    "type": commit_type,
+                    "sender": sender,
+                    "recipients": recipients,
+                    "author": commit.author.name,
+                })
 
         # Sort by timestamp (oldest first for timeline)
         def _get_timestamp(x: dict[str, Any]) -> int:
@@ -1672,9 +3223,11 @@ async def get_historical_inbox_snapshot(
     """
     Get historical snapshot of agent inbox at specific timestamp.
 
-    Traverses Git history to find the commit closest to (but not after)
-    the specified timestamp, then lists all message files in the agent's
-    inbox directory at that point in history.
+    Looks up the commit closest to (but not after) the specified timestamp
+    in the commit index (binary search, any history depth), then lists all
+    message files in the agent's inbox directory at that point in history.
+    The HTTP route answers from the database when it can and uses this as
+    the fallback for agents the database knows nothing about.
 
     Args:
         archive: ProjectArchive instance with Git repo
@@ -1691,19 +3244,11 @@ async def get_historical_inbox_snapshot(
     """
     # Cap limit for safety
     limit = max(1, min(limit, 500))
+    index_path = await _synced_commit_index(archive.repo)
 
     def _get_snapshot() -> dict[str, Any]:
         try:
-            # Parse timestamp - handle both with and without timezone
-            timestamp_clean = timestamp.replace('Z', '+00:00')
-            target_time = datetime.fromisoformat(timestamp_clean)
-
-            # If naive datetime (no timezone), assume UTC
-            # This handles datetime-local input which doesn't include timezone
-            if target_time.tzinfo is None:
-                target_time = target_time.replace(tzinfo=timezone.utc)
-
-            target_timestamp = target_time.timestamp()
+            target_timestamp = parse_snapshot_time(timestamp).timestamp()
         except (ValueError, AttributeError) as e:
             return {
                 "messages": [],
@@ -1713,12 +3258,9 @@ async def get_historical_inbox_snapshot(
                 "error": f"Invalid timestamp format: {e}"
             }
 
-        # Find commit closest to (but not after) target timestamp
-        closest_commit = None
-        for commit in archive.repo.iter_commits(max_count=10000):
-            if commit.authored_date <= target_timestamp:
-                closest_commit = commit
-                break
+        # Find commit closest to (but not after) target timestamp via the commit index
+        binsha = _lookup_commit_index(index_path, target_timestamp)
+        closest_commit = archive.repo.commit(binsha.hex()) if binsha is not None else None
 
         if not closest_commit:
             # No commits before this time
@@ -1747,7 +3289,24 @@ async def get_historical_inbox_snapshot(
                     return
 
                 for item in subtree:
-                    if item.type == "blob" and item.name.endswith(".md"):
+                    if item.type == "blob" and item.name == MAILBOX_INDEX_NAME:
+                        # Index layout: one JSON line per message pointing at the canonical file
+                        try:
+                            index_content = item.data_stream.read().decode("utf-8", errors="ignore")
+                        except Exception:
+                            continue
+                        for entry in parse_mailbox_index(index_content):
+                            file_name = entry["path"].rsplit("/", 1)[-1]
+                            messages.append({
+                                "id": str(entry.get("id", "unknown")),
+                                "subject": str(entry.get("subject") or "").strip() or "(no subject)",
+                                "date": file_name.split("__", 1)[0],
+                                "from": str(entry.get("from") or "unknown"),
+                                "importance": str(entry.get("importance") or "normal"),
+                            })
+                            if len(messages) >= limit:
+                                return
+                    elif item.type == "blob" and item.name.endswith(".md"):
                         # Parse filename: YYYY-MM-DDTHH-MM-SSZ__subject-slug__id.md
                         parts = item.name.rsplit("__", 2)
 
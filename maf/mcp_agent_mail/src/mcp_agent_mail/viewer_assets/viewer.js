@@ -19,6 +19,8 @@ const state = {
   databaseSource: "network",
   selectedMessageId: undefined,
   explainMode: false,
+  lazyPages: null,
+  completeDatabasePromise: null,
 };
 
 const ADMIN_SUBJECT_PATTERNS = [
@@ -331,6 +333,284 @@ async function fetchDatabaseFromNetwork(manifest) {
   return { bytes: merged, source: `${chunkManifest.pattern} (${chunkManifest.chunk_count} chunks)` };
 }
 
+// --- Range-request (lazy) loading -------------------------------------------------------------
+// Bundles exported with --range-requests ship a page index (mailbox.sqlite3.pages.json). The first
+// render only fetches the pages it reads (schema, message_overview_mv, projects); message bodies are
+// read straight from the messages b-tree, and the full file is only downloaded once a search needs it.
+
+const RANGE_FETCH_CONCURRENCY = 6;
+// Runs separated by fewer pages than this are fetched in one request
+const RANGE_MERGE_GAP_PAGES = 8;
+
+class RangeUnsupportedError extends Error {}
+
+async function fetchByteRange(path, start, end) {
+  const response = await fetch(path, { cache: "no-store", headers: { Range: `bytes=${start}-${end - 1}` } });
+  if (response.status !== 206) {
+    // Host ignored the Range header; the caller falls back to a full download
+    throw new RangeUnsupportedError(`Range request for ${path} returned ${response.status}`);
+  }
+  return new Uint8Array(await response.arrayBuffer());
+}
+
+function readUint16(bytes, offset) {
+  return (bytes[offset] << 8) | bytes[offset + 1];
+}
+
+function readUint32(bytes, offset) {
+  return ((bytes[offset] << 24) >>> 0) + (bytes[offset + 1] << 16) + (bytes[offset + 2] << 8) + bytes[offset + 3];
+}
+
+function readVarint(bytes, offset) {
+  let value = 0;
+  for (let index = 0; index < 8; index += 1) {
+    const byte = bytes[offset + index];
+    value = value * 128 + (byte & 0x7f);
+    if (byte < 0x80) {
+      return [value, offset + index + 1];
+    }
+  }
+  return [value * 256 + bytes[offset + 8], offset + 9];
+}
+
+function serialTypeSize(serialType) {
+  if (serialType < 5) {
+    return serialType;
+  }
+  if (serialType === 5) {
+    return 6;
+  }
+  if (serialType < 8) {
+    return 8;
+  }
+  if (serialType < 12) {
+    return 0;
+  }
+  return (serialType - (serialType % 2 ? 13 : 12)) / 2;
+}
+
+class LazyPageStore {
+  constructor(pageIndex) {
+    this.index = pageIndex;
+    this.pageSize = pageIndex.page_size;
+    this.pageCount = pageIndex.page_count;
+    this.pages = new Map();
+    this.requests = 0;
+    this.bytesFetched = 0;
+  }
+
+  // Byte requests covering a run of pages, split at chunk boundaries for chunked bundles
+  requestsForRun(firstPage, count) {
+    const database = this.index.database;
+    const start = (firstPage - 1) * this.pageSize;
+    const end = (firstPage - 1 + count) * this.pageSize;
+    if (!database.pattern) {
+      return [{ path: `../${database.path}`, start, end, firstPage }];
+    }
+    const requests = [];
+    for (let offset = start; offset < end;) {
+      const chunk = Math.floor(offset / database.chunk_size);
+      const chunkStart = chunk * database.chunk_size;
+      const stop = Math.min(end, chunkStart + database.chunk_size);
+      requests.push({
+        path: `../${formatChunkPath(database.pattern, chunk)}`,
+        start: offset - chunkStart,
+        end: stop - chunkStart,
+        firstPage: offset / this.pageSize + 1,
+      });
+      offset = stop;
+    }
+    return requests;
+  }
+
+  async load(runs) {
+    const missing = [];
+    for (const [firstPage, count] of runs) {
+      for (let page = firstPage; page < firstPage + count && page <= this.pageCount; page += 1) {
+        if (!this.pages.has(page)) {
+          missing.push(page);
+        }
+      }
+    }
+    if (missing.length === 0) {
+      return;
+    }
+    missing.sort((a, b) => a - b);
+    const merged = [];
+    for (const page of missing) {
+      const last = merged[merged.length - 1];
+      if (last && page - (last[0] + last[1]) < RANGE_MERGE_GAP_PAGES) {
+        last[1] = page - last[0] + 1;
+      } else {
+        merged.push([page, 1]);
+      }
+    }
+    const queue = merged.flatMap(([firstPage, count]) => this.requestsForRun(firstPage, count));
+    const worker = async () => {
+      while (queue.length > 0) {
+        const request = queue.shift();
+        const bytes = await fetchByteRange(request.path, request.start, request.end);
+        this.requests += 1;
+        this.bytesFetched += bytes.length;
+        for (let offset = 0; offset + this.pageSize <= bytes.length; offset += this.pageSize) {
+          const page = request.firstPage + offset / this.pageSize;
+          if (!this.pages.has(page)) {
+            this.pages.set(page, bytes.slice(offset, offset + this.pageSize));
+          }
+        }
+      }
+    };
+    await Promise.all(Array.from({ length: Math.min(RANGE_FETCH_CONCURRENCY, queue.length) }, worker));
+  }
+
+  async page(pageNumber) {
+    if (!this.pages.has(pageNumber)) {
+      await this.load([[pageNumber, 1]]);
+    }
+    const page = this.pages.get(pageNumber);
+    if (!page) {
+      throw new Error(`Database page ${pageNumber} is out of range`);
+    }
+    return page;
+  }
+
+  // Full-size image with only the fetched pages filled in; SQLite rejects files shorter than the header's page count
+  toDatabaseBytes() {
+    const bytes = new Uint8Array(this.pageCount * this.pageSize);
+    for (const [pageNumber, page] of this.pages) {
+      bytes.set(page, (pageNumber - 1) * this.pageSize);
+    }
+    return bytes;
+  }
+
+  async readPayload(page, offset, payloadSize) {
+    const header = await this.page(1);
+    const usable = this.pageSize - header[20];
+    const maxLocal = usable - 35;
+    if (payloadSize <= maxLocal) {
+      return page.subarray(offset, offset + payloadSize);
+    }
+    const minLocal = Math.floor(((usable - 12) * 32) / 255) - 23;
+    let local = minLocal + ((payloadSize - minLocal) % (usable - 4));
+    if (local > maxLocal) {
+      local = minLocal;
+    }
+    const payload = new Uint8Array(payloadSize);
+    payload.set(page.subarray(offset, offset + local), 0);
+    let filled = local;
+    let next = readUint32(page, offset + local);
+    // VACUUM lays overflow chains out contiguously, so fetch the whole chain in one request up front
+    await this.load([[next, Math.ceil((payloadSize - local) / (usable - 4))]]);
+    while (filled < payloadSize && next) {
+      const overflow = await this.page(next);
+      const take = Math.min(usable - 4, payloadSize - filled);
+      payload.set(overflow.subarray(4, 4 + take), filled);
+      filled += take;
+      next = readUint32(overflow, 0);
+    }
+    return payload;
+  }
+
+  // Walk a table b-tree by rowid, fetching only the pages on the path (interior pages are in the bootstrap set)
+  async readRow(rootPage, rowid) {
+    let pageNumber = rootPage;
+    for (let depth = 0; depth < 32; depth += 1) {
+      const page = await this.page(pageNumber);
+      const base = pageNumber === 1 ? 100 : 0;
+      const type = page[base];
+      const cellCount = readUint16(page, base + 3);
+      const cellPointers = base + (type === 0x05 ? 12 : 8);
+      let low = 0;
+      let high = cellCount - 1;
+      if (type === 0x05) {
+        let child = readUint32(page, base + 8);
+        while (low <= high) {
+          const mid = (low + high) >> 1;
+          const cell = readUint16(page, cellPointers + mid * 2);
+          if (rowid <= readVarint(page, cell + 4)[0]) {
+            child = readUint32(page, cell);
+            high = mid - 1;
+          } else {
+            low = mid + 1;
+          }
+        }
+        pageNumber = child;
+        continue;
+      }
+      if (type !== 0x0d) {
+        throw new Error(`Unexpected b-tree page type ${type} on page ${pageNumber}`);
+      }
+      while (low <= high) {
+        const mid = (low + high) >> 1;
+        const cell = readUint16(page, cellPointers + mid * 2);
+        const [payloadSize, keyOffset] = readVarint(page, cell);
+        const [key, payloadOffset] = readVarint(page, keyOffset);
+        if (key === rowid) {
+          return this.readPayload(page, payloadOffset, payloadSize);
+        }
+        if (key < rowid) {
+          low = mid + 1;
+        } else {
+          high = mid - 1;
+        }
+      }
+      return null;
+    }
+    throw new Error("b-tree is deeper than expected");
+  }
+
+  async readMessageBody(messageId) {
+    const { root_page: rootPage, body_column: bodyColumn } = this.index.messages ?? {};
+    const header = await this.page(1);
+    // Text is decoded as UTF-8 only; other encodings wait for the complete database
+    if (!rootPage || bodyColumn == null || readUint32(header, 56) !== 1) {
+      return null;
+    }
+    const record = await this.readRow(rootPage, Number(messageId));
+    if (!record) {
+      return "";
+    }
+    let [headerSize, offset] = readVarint(record, 0);
+    let body = headerSize;
+    for (let column = 0; offset < headerSize; column += 1) {
+      let serialType;
+      [serialType, offset] = readVarint(record, offset);
+      const size = serialTypeSize(serialType);
+      if (column === bodyColumn) {
+        return serialType >= 13 && serialType % 2 === 1
+          ? new TextDecoder().decode(record.subarray(body, body + size))
+          : "";
+      }
+      body += size;
+    }
+    return "";
+  }
+}
+
+async function openLazyDatabase(manifest) {
+  const pageIndexInfo = manifest.database?.page_index;
+  if (!pageIndexInfo) {
+    return null;
+  }
+  try {
+    const pageIndex = await loadJSON(`../${pageIndexInfo.path}`);
+    const store = new LazyPageStore(pageIndex);
+    await store.load(pageIndex.bootstrap);
+    const fetchedKiB = Math.round(store.bytesFetched / 1024);
+    return {
+      bytes: store.toDatabaseBytes(),
+      source: `${pageIndexInfo.path} (range requests: ${store.requests} requests, ${fetchedKiB} KiB)`,
+      store,
+    };
+  } catch (error) {
+    if (error instanceof RangeUnsupportedError) {
+      console.warn("[viewer] Host does not serve byte ranges; downloading the full database", error);
+      return null;
+    }
+    throw error;
+  }
+}
+
 async function loadDatabaseBytes(manifest) {
   const sha = manifest.database?.sha256;
   const fallbackKey = manifest.database?.path && manifest.database?.size_bytes
@@ -363,6 +643,15 @@ async function loadDatabaseBytes(manifest) {
     }
   }
 
+  const lazy = await openLazyDatabase(manifest);
+  if (lazy) {
+    // Sparse image: never cached to OPFS; the complete file replaces it once downloaded
+    state.lazyPages = lazy.store;
+    state.databaseSource = lazy.source;
+    state.cacheState = CACHE_SUPPORTED ? "none" : "unsupported";
+    return lazy;
+  }
+
   const network = await fetchDatabaseFromNetwork(manifest);
   state.lastDatabaseBytes = network.bytes;
   state.databaseSource = network.source;
@@ -495,9 +784,45 @@ function loadProjectMap(db) {
   }
 }
 
+// Thread rollup from message_overview_mv only, for range-request bundles before the full file is loaded
+const OVERVIEW_THREAD_LIST_SQL = `
+  WITH keyed AS (
+    SELECT
+      CASE WHEN thread_id IS NULL OR thread_id = '' THEN printf('msg:%d', id) ELSE thread_id END AS thread_key,
+      id, subject, importance, created_ts, latest_snippet
+    FROM message_overview_mv
+  )
+  SELECT
+    thread_key,
+    COUNT(*) AS message_count,
+    MAX(created_ts) AS last_created_ts,
+    (
+      SELECT subject FROM keyed k2
+      WHERE k2.thread_key = k.thread_key
+      ORDER BY datetime(k2.created_ts) DESC, k2.id DESC
+      LIMIT 1
+    ) AS latest_subject,
+    (
+      SELECT importance FROM keyed k2
+      WHERE k2.thread_key = k.thread_key
+      ORDER BY datetime(k2.created_ts) DESC, k2.id DESC
+      LIMIT 1
+    ) AS latest_importance,
+    (
+      SELECT substr(latest_snippet, 1, 160) FROM keyed k2
+      WHERE k2.thread_key = k.thread_key
+      ORDER BY datetime(k2.created_ts) DESC, k2.id DESC
+      LIMIT 1
+    ) AS latest_snippet
+  FROM keyed k
+  GROUP BY thread_key
+  ORDER BY datetime(last_created_ts) DESC
+  LIMIT ?;
+`;
+
 function buildThreadList(db, limit = 50000) {
   const threads = [];
-  const sql = `
+  const sql = state.lazyPages ? OVERVIEW_THREAD_LIST_SQL : `
     WITH normalized AS (
       SELECT
         id,
@@ -771,8 +1096,11 @@ function viewerController() {
         this.ftsEnabled = Boolean(this.manifest.database?.fts_enabled) && detectFts(state.db);
         state.ftsEnabled = this.ftsEnabled;
 
-        // Load data
-        this.totalMessages = Number(getScalar(state.db, "SELECT COUNT(*) FROM messages") || 0);
+        // Load data (range-request bundles read only the overview until the full file arrives)
+        const countSql = state.lazyPages
+          ? "SELECT COUNT(*) FROM message_overview_mv"
+          : "SELECT COUNT(*) FROM messages";
+        this.totalMessages = Number(getScalar(state.db, countSql) || 0);
         state.totalMessages = this.totalMessages;
         loadProjectMap(state.db);
 
@@ -808,22 +1136,7 @@ function viewerController() {
           cacheState: this.cacheState
         });
 
-        // Opportunistic background cache to OPFS after first successful load
-        if (CACHE_SUPPORTED && state.cacheKey && state.cacheState !== 'opfs' && state.lastDatabaseBytes) {
-          const idle = window.requestIdleCallback || ((cb) => setTimeout(cb, 200));
-          idle(async () => {
-            try {
-              const ok = await writeToOpfs(state.cacheKey, state.lastDatabaseBytes);
-              if (ok) {
-                state.cacheState = 'opfs';
-                this.cacheState = 'opfs';
-                console.info('[viewer] Cached database to OPFS', { key: state.cacheKey });
-              }
-            } catch (err) {
-              console.debug('[viewer] OPFS cache write skipped', err);
-            }
-          });
-        }
+        this.scheduleOpfsCache();
 
       } catch (error) {
         console.error('[Alpine] Initialization failed', error);
@@ -831,6 +1144,55 @@ function viewerController() {
         alert(`Failed to initialize viewer: ${error.message}`);
       }
     },
+    // Opportunistic background cache to OPFS after a complete database has been loaded
+    scheduleOpfsCache() {
+      if (CACHE_SUPPORTED && state.cacheKey && state.cacheState !== 'opfs' && state.lastDatabaseBytes) {
+        const idle = window.requestIdleCallback || ((cb) => setTimeout(cb, 200));
+        idle(async () => {
+          try {
+            const ok = await writeToOpfs(state.cacheKey, state.lastDatabaseBytes);
+            if (ok) {
+              state.cacheState = 'opfs';
+              this.cacheState = 'opfs';
+              console.info('[viewer] Cached database to OPFS', { key: state.cacheKey });
+            }
+          } catch (err) {
+            console.debug('[viewer] OPFS cache write skipped', err);
+          }
+        });
+      }
+    },
+
+    // Replace the sparse range-request image with the complete file (needed for full-text search)
+    ensureCompleteDatabase() {
+      if (!state.lazyPages) {
+        return Promise.resolve();
+      }
+      if (!state.completeDatabasePromise) {
+        state.completeDatabasePromise = (async () => {
+          const { bytes, source } = await fetchDatabaseFromNetwork(this.manifest);
+          const previous = state.db;
+          state.db = new state.SQL.Database(bytes);
+          previous?.close();
+          state.lazyPages = null;
+          state.lastDatabaseBytes = bytes;
+          state.databaseSource = source;
+          this.databaseSource = source;
+          this.ftsEnabled = Boolean(this.manifest.database?.fts_enabled) && detectFts(state.db);
+          state.ftsEnabled = this.ftsEnabled;
+          console.info('[viewer] Complete database loaded', { source });
+          if (this.searchQuery.trim()) {
+            this.filterMessages();
+          }
+          this.scheduleOpfsCache();
+        })().catch((error) => {
+          state.completeDatabasePromise = null;
+          console.warn('[viewer] Complete database download failed; search stays limited to subjects and snippets', error);
+        });
+      }
+      return state.completeDatabasePromise;
+    },
+
     setupResponsiveHandlers() {
       if (typeof window === 'undefined' || typeof window.matchMedia === 'undefined') {
         return;
@@ -883,7 +1245,7 @@ function viewerController() {
           mv.created_ts,
           mv.importance,
           mv.thread_id,
-          m.project_id,
+          mv.project_id,
           CASE WHEN mv.thread_id IS NULL OR mv.thread_id = '' THEN printf('msg:%d', mv.id) ELSE mv.thread_id END AS thread_key,
           mv.body_length,
           mv.latest_snippet,
@@ -892,8 +1254,7 @@ function viewerController() {
           COALESCE(p.slug, 'unknown') AS project_slug,
           COALESCE(p.human_key, 'Unknown Project') AS project_name
         FROM message_overview_mv mv
-        JOIN messages m ON m.id = mv.id
-        LEFT JOIN projects p ON p.id = m.project_id
+        LEFT JOIN projects p ON p.id = mv.project_id
         ORDER BY datetime(mv.created_ts) DESC, mv.id DESC
       `);
 
@@ -905,8 +1266,9 @@ function viewerController() {
         stmt.free();
       }
 
-      // Build a recipients map in a single query (MUCH faster than N+1 queries)
-      const recipientsMap = this.buildRecipientsMap();
+      // Build a recipients map in a single query (MUCH faster than N+1 queries);
+      // range-request bundles rely on the overview's recipients column instead
+      const recipientsMap = state.lazyPages ? new Map() : this.buildRecipientsMap();
       this.recipientsMap = recipientsMap;
 
       // Enrich messages with recipients and formatted dates
@@ -944,6 +1306,17 @@ function viewerController() {
     },
 
     async loadMessageBodyById(id) {
+      if (state.lazyPages) {
+        try {
+          const lazyBody = await state.lazyPages.readMessageBody(id);
+          if (lazyBody !== null) {
+            return lazyBody;
+          }
+        } catch (error) {
+          console.warn('[viewer] Range read of message body failed; waiting for the complete database', error);
+        }
+        await this.ensureCompleteDatabase();
+      }
       let body = '';
       const stmt = state.db.prepare(`SELECT COALESCE(body_md, '') AS body_md FROM messages WHERE id = ? LIMIT 1`);
       try {
@@ -1057,7 +1430,13 @@ function viewerController() {
         return '';
       }
 
-      if (this.ftsEnabled) {
+      // Range-request bundles search subjects and snippets until the complete file (with FTS) arrives
+      const partial = Boolean(state.lazyPages);
+      if (partial) {
+        this.ensureCompleteDatabase();
+      }
+
+      if (this.ftsEnabled && !partial) {
         const ftsExpr = buildFts(ast).trim();
         if (ftsExpr) {
           const sql = `SELECT rowid AS id FROM fts_messages WHERE fts_messages MATCH ?`;
@@ -1084,7 +1463,9 @@ function viewerController() {
         switch (node.type) {
           case 'term': {
             const needle = `%${String(node.value).toLowerCase()}%`;
-            acc.sql.push('(subject_lower LIKE ? OR LOWER(COALESCE(body_md, "")) LIKE ?)');
+            acc.sql.push(partial
+              ? '(LOWER(COALESCE(subject, "")) LIKE ? OR LOWER(COALESCE(latest_snippet, "")) LIKE ?)'
+              : '(subject_lower LIKE ? OR LOWER(COALESCE(body_md, "")) LIKE ?)');
             acc.params.push(needle, needle);
             break;
           }
@@ -1118,7 +1499,7 @@ function viewerController() {
 
       const acc = { sql: [], params: [] };
       buildLike(ast, acc);
-      const likeSql = `SELECT id FROM messages WHERE ${acc.sql.join(' ')}`;
+      const likeSql = `SELECT id FROM ${partial ? 'message_overview_mv' : 'messages'} WHERE ${acc.sql.join(' ')}`;
       let likeStmt;
       try {
         explainQuery(state.db, likeSql, acc.params, 'searchDatabaseIds (LIKE)');
@@ -1212,7 +1593,23 @@ function viewerController() {
 
     getMessagesInThread(threadKey) {
       const results = [];
-      const stmt = state.db.prepare(`
+      const stmt = state.db.prepare(state.lazyPages ? `
+        SELECT
+          id,
+          subject,
+          created_ts,
+          importance,
+          latest_snippet AS body_md,
+          COALESCE(latest_snippet, '') AS latest_snippet,
+          COALESCE(attachment_count, 0) AS attachment_count,
+          COALESCE(recipients, '') AS recipients,
+          COALESCE(sender_name, 'Unknown') AS sender
+        FROM message_overview_mv
+        WHERE
+          (thread_id = ?)
+          OR (thread_id IS NULL AND printf('msg:%d', id) = ?)
+        ORDER BY datetime(created_ts) ASC, id ASC
+      ` : `
         SELECT
           m.id,
           m.subject,
@@ -0,0 +1,186 @@
+"""Ack-TTL deadline heap: seeded once, fed by send/ack, fires each overdue pair once, batched escalation."""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastmcp import Client
+from sqlalchemy import text
+
+from mcp_agent_mail import config as _config
+from mcp_agent_mail.app import _ACK_DEADLINES, build_mcp_server
+from mcp_agent_mail.db import ensure_schema, get_session
+from mcp_agent_mail.http import process_overdue_acks
+
+
+async def _setup(client: Client) -> None:
+    await client.call_tool("ensure_project", {"human_key": "/backend"})
+    for name in ("BlueLake", "GreenCastle", "RedStone"):
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+        )
+
+
+async def _send_ack_required(client: Client, to: list[str], subject: str) -> int:
+    result = await client.call_tool(
+        "send_message",
+        {"project_key": "Backend", "sender_name": "BlueLake", "to": to, "subject": subject, "body_md": "x", "ack_required": True},
+    )
+    return int(result.data["deliveries"][0]["payload"]["id"])
+
+
+def _later(hours: int = 2) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=hours)
+
+
+@pytest.mark.asyncio
+async def test_overdue_pairs_fire_once_and_acks_cancel(isolated_env):
+    settings = _config.get_settings()
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        # Deadlines that already exist when the worker starts come from the seed query
+        seeded = await _send_ack_required(client, ["GreenCastle"], "Before start")
+        assert await process_overdue_acks(settings) == []
+        assert _ACK_DEADLINES.outstanding == 1
+
+        # Later sends are pushed straight onto the heap
+        mid = await _send_ack_required(client, ["GreenCastle", "RedStone"], "Review")
+        assert _ACK_DEADLINES.outstanding == 3
+        await client.call_tool("acknowledge_message", {"project_key": "Backend", "agent_name": "GreenCastle", "message_id": mid})
+        assert _ACK_DEADLINES.outstanding == 2
+
+        due = await process_overdue_acks(settings, now=_later())
+        async with get_session() as session:
+            ids = dict((await session.execute(text("SELECT name, id FROM agents"))).all())
+        assert sorted((entry.message_id, entry.agent_id) for entry in due) == [
+            (seeded, ids["GreenCastle"]),
+            (mid, ids["RedStone"]),
+        ]
+        # Still unacknowledged, but each pair is only reported once
+        assert await process_overdue_acks(settings, now=_later(4)) == []
+
+
+@pytest.mark.asyncio
+async def test_catch_up_scan_and_out_of_band_acks(isolated_env):
+    settings = _config.get_settings()
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        mid = await _send_ack_required(client, ["GreenCastle"], "Tracked")
+        assert await process_overdue_acks(settings) == []
+        async with get_session() as session:
+            # Acked by another process: the heap entry survives until verified against the DB
+            await session.execute(text("UPDATE message_recipients SET ack_ts = datetime('now') WHERE message_id = :mid"), {"mid": mid})
+            # Written by another process: only the incremental scan can see it
+            pid, sid, rid = (
+                await session.execute(
+                    text(
+                        "SELECT p.id, s.id, r.id FROM projects p JOIN agents s ON s.project_id = p.id AND s.name = 'BlueLake' "
+                        "JOIN agents r ON r.project_id = p.id AND r.name = 'RedStone'"
+                    )
+                )
+            ).one()
+            await session.execute(
+                text(
+                    "INSERT INTO messages(project_id, sender_id, subject, body_md, importance, ack_required, created_ts, attachments) "
+                    "VALUES (:pid, :sid, 'external', 'x', 'normal', 1, '2020-01-01 00:00:00', '[]')"
+                ),
+                {"pid": pid, "sid": sid},
+            )
+            external = (await session.execute(text("SELECT MAX(id) FROM messages"))).scalar_one()
+            await session.execute(
+                text("INSERT INTO message_recipients(message_id, agent_id, kind) VALUES (:mid, :aid, 'to')"),
+                {"mid": external, "aid": rid},
+            )
+            await session.commit()
+
+        due = await process_overdue_acks(settings, now=_later())
+        assert [(entry.message_id, entry.agent_id) for entry in due] == [(external, rid)]
+
+
+@pytest.mark.asyncio
+async def test_escalation_batches_claims_per_project(isolated_env, monkeypatch):
+    monkeypatch.setenv("ACK_ESCALATION_ENABLED", "true")
+    monkeypatch.setenv("ACK_ESCALATION_MODE", "file_reservation")
+    monkeypatch.setenv("ACK_ESCALATION_CLAIM_HOLDER_NAME", "OpsHolder")
+    _config.clear_settings_cache()
+    settings = _config.get_settings()
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        assert await process_overdue_acks(settings) == []
+        for idx in range(3):
+            await _send_ack_required(client, ["GreenCastle", "RedStone"], f"Escalate {idx}")
+        due = await process_overdue_acks(settings, now=_later())
+        assert len(due) == 6
+
+    async with get_session() as session:
+        holders = (await session.execute(text("SELECT COUNT(*) FROM agents WHERE name = 'OpsHolder'"))).scalar_one()
+        patterns = (
+            await session.execute(text("SELECT path_pattern FROM file_reservations WHERE reason = 'ack-overdue'"))
+        ).scalars().all()
+    assert holders == 1
+    # Six overdue pairs, two recipients in one month: one claim per inbox folder
+    month = datetime.now(timezone.utc).strftime("%Y/%m")
+    assert sorted(patterns) == [f"agents/GreenCastle/inbox/{month}/*.md", f"agents/RedStone/inbox/{month}/*.md"]
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_ack_ticks_with_100k_outstanding(isolated_env):
+    settings = _config.get_settings()
+    total = 100_000
+    await ensure_schema()
+    async with get_session() as session:
+        await session.execute(text("INSERT INTO projects (slug, human_key, created_at) VALUES ('bench', '/bench', datetime('now'))"))
+        await session.execute(
+            text(
+                "INSERT INTO agents(project_id, name, program, model, task_description, inception_ts, last_active_ts, "
+                "attachments_policy, contact_policy) VALUES (1, 'BlueLake', 'codex', 'gpt-5', '', datetime('now'), datetime('now'), 'auto', 'auto')"
+            )
+        )
+        start_ts = datetime.now(timezone.utc) - timedelta(minutes=10)
+        await session.execute(
+            text(
+                "INSERT INTO messages(id, project_id, sender_id, subject, body_md, importance, ack_required, created_ts, attachments) "
+                "VALUES (:id, 1, 1, 's', 'x', 'normal', 1, :ts, '[]')"
+            ),
+            [{"id": i, "ts": (start_ts + timedelta(milliseconds=i * 5)).replace(tzinfo=None)} for i in range(1, total + 1)],
+        )
+        await session.execute(
+            text("INSERT INTO message_recipients(message_id, agent_id, kind) SELECT id, 1, 'to' FROM messages")
+        )
+        await session.commit()
+
+    legacy_query = text(
+        "SELECT m.id, m.project_id, m.created_ts, mr.agent_id FROM messages m "
+        "JOIN message_recipients mr ON mr.message_id = m.id WHERE m.ack_required = 1 AND mr.ack_ts IS NULL"
+    )
+    start = time.perf_counter()
+    async with get_session() as session:
+        legacy_rows = len((await session.execute(legacy_query)).fetchall())
+    legacy_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await process_overdue_acks(settings, now=start_ts)
+    seed_elapsed = time.perf_counter() - start
+    assert _ACK_DEADLINES.outstanding == total == legacy_rows
+
+    # Steady state: catch-up scan plus a heap peek, nothing due
+    start = time.perf_counter()
+    for _ in range(10):
+        assert await process_overdue_acks(settings, now=start_ts) == []
+    tick_elapsed = (time.perf_counter() - start) / 10
+
+    # The first 1000 deadlines lapse: only those are popped and verified
+    start = time.perf_counter()
+    due = await process_overdue_acks(settings, now=start_ts + timedelta(seconds=settings.ack_ttl_seconds + 5))
+    due_elapsed = time.perf_counter() - start
+
+    print(
+        f"\n100k outstanding acks: seed {seed_elapsed * 1000:.0f} ms, idle tick {tick_elapsed * 1000:.2f} ms, "
+        f"{len(due)} due {due_elapsed * 1000:.0f} ms, legacy rescan {legacy_elapsed * 1000:.0f} ms"
+    )
+    assert len(due) == 1000
+    assert tick_elapsed * 20 < legacy_elapsed
@@ -0,0 +1,122 @@
+"""Query plan checks for case-insensitive agent name lookups.
+
+`_get_agent`, the HTTP inbox routes and the contact-policy checks filter on
+`lower(agents.name)`. These tests run EXPLAIN QUERY PLAN against the real schema
+(created by `ensure_schema`, including `_setup_fts`) to prove the lookups SEARCH the
+`lower(name)` expression indexes instead of scanning the agents table.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+
+from mcp_agent_mail.config import get_settings
+from mcp_agent_mail.db import ensure_schema
+from mcp_agent_mail.models import Agent
+
+
+def _explain_query(conn: sqlite3.Connection, sql: str, params: list | None = None) -> list[dict[str, str]]:
+    """Run EXPLAIN QUERY PLAN and return the plan as a list of dicts."""
+    cursor = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or [])
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row, strict=False)) for row in cursor.fetchall()]
+
+
+def _details(plan: list[dict[str, str]]) -> str:
+    return " | ".join(step.get("detail", "") for step in plan)
+
+
+def _compile(stmt) -> str:
+    return str(stmt.compile(dialect=sqlite_dialect.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.fixture
+def agents_db(isolated_env) -> Path:
+    asyncio.run(ensure_schema())
+    db_path = Path(get_settings().database.url.split("///", 1)[1])
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executemany(
+            "INSERT INTO projects (id, slug, human_key, created_at) VALUES (?, ?, ?, datetime('now'))",
+            [(pid, f"p{pid}", f"/p{pid}") for pid in range(1, 6)],
+        )
+        conn.executemany(
+            "INSERT INTO agents (project_id, name, program, model, task_description, inception_ts, last_active_ts, "
+            "attachments_policy, contact_policy) VALUES (?, ?, 'codex', 'gpt-5', '', datetime('now'), datetime('now'), 'auto', 'auto')",
+            [((i % 5) + 1, f"Agent{i:04d}") for i in range(2000)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return db_path
+
+
+def test_expression_indexes_exist(agents_db: Path) -> None:
+    conn = sqlite3.connect(agents_db)
+    try:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+    assert {"idx_agents_project_name_ci", "idx_agents_name_ci"} <= names
+
+
+def test_get_agent_lookup_uses_project_name_ci_index(agents_db: Path) -> None:
+    # Same statement shape as app._get_agent
+    stmt = select(Agent).where(Agent.project_id == 3, func.lower(Agent.name) == "agent0002")  # type: ignore[arg-type]
+    conn = sqlite3.connect(agents_db)
+    try:
+        plan = _explain_query(conn, _compile(stmt))
+    finally:
+        conn.close()
+    detail = _details(plan)
+    print(f"\n_get_agent plan: {detail}")
+    assert "idx_agents_project_name_ci" in detail
+    assert "SCAN agents" not in detail
+
+
+def test_http_inbox_lookup_uses_project_name_ci_index(agents_db: Path) -> None:
+    # Query used by the /mail/{project}/inbox/{agent} route
+    sql = "SELECT id, name FROM agents WHERE project_id = ? AND lower(name) = lower(?)"
+    conn = sqlite3.connect(agents_db)
+    try:
+        plan = _explain_query(conn, sql, [2, "AGENT0001"])
+        row = conn.execute(sql, [2, "AGENT0001"]).fetchone()
+    finally:
+        conn.close()
+    assert "idx_agents_project_name_ci" in _details(plan)
+    assert row is not None and row[1] == "Agent0001"
+
+
+def test_cross_project_name_lookup_uses_name_ci_index(agents_db: Path) -> None:
+    # resource://inbox/{agent} without a project auto-detects the project by agent name
+    stmt = select(Agent.project_id).where(func.lower(Agent.name) == "agent0042")  # type: ignore[call-overload]
+    conn = sqlite3.connect(agents_db)
+    try:
+        plan = _explain_query(conn, _compile(stmt))
+    finally:
+        conn.close()
+    detail = _details(plan)
+    assert "idx_agents_name_ci" in detail
+    assert "SCAN agents" not in detail
+
+
+def test_batched_recipient_lookup_uses_index(agents_db: Path) -> None:
+    # Same statement shape as app._get_agents_batch
+    stmt = select(Agent).where(
+        Agent.project_id == 1,  # type: ignore[arg-type]
+        func.lower(Agent.name).in_(["agent0000", "agent0005", "agent0010"]),
+    )
+    conn = sqlite3.connect(agents_db)
+    try:
+        plan = _explain_query(conn, _compile(stmt))
+    finally:
+        conn.close()
+    detail = _details(plan)
+    assert "idx_agents_project_name_ci" in detail
+    assert "SCAN agents" not in detail
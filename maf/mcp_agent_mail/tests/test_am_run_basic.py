@@ -1,6 +1,11 @@
 import sys
 from pathlib import Path
+from typing import Any
 
+import pytest
+import typer
+
+from mcp_agent_mail import cli as cli_module
 from mcp_agent_mail.cli import am_run
 from mcp_agent_mail.config import get_settings
 
@@ -38,3 +43,68 @@ def test_am_run_creates_lease_when_enabled(tmp_path: Path, monkeypatch) -> None:
     assert found, "Expected a lease JSON file to be created for am-run"
 
 
+
+
+class _BusySlotClient:
+    """httpx.Client stand-in for a server whose slot stays held past the wait."""
+
+    calls: list[str] = []
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_BusySlotClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+    def post(self, url: str, json: dict[str, Any], headers: Any = None) -> Any:
+        name = json["params"]["name"]
+        type(self).calls.append(name)
+        result: dict[str, Any] = {}
+        if name == "acquire_build_slot":
+            result = {
+                "content": [],
+                "structuredContent": {
+                    "granted": None,
+                    "conflicts": [{"slot": "ci", "agent": "OtherAgent", "branch": "main", "expires_ts": ""}],
+                    "position": 2,
+                    "waited_seconds": 0.0,
+                },
+                "isError": False,
+            }
+
+        class _Resp:
+            def json(self) -> dict[str, Any]:
+                return {"jsonrpc": "2.0", "id": json["id"], "result": result}
+
+        return _Resp()
+
+
+def test_am_run_does_not_run_without_granted_slot(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("STORAGE_ROOT", str(tmp_path / "archive"))
+    monkeypatch.setenv("WORKTREES_ENABLED", "1")
+    monkeypatch.setenv("AGENT_MAIL_GUARD_MODE", "warn")
+    get_settings.cache_clear()  # type: ignore[attr-defined]
+    monkeypatch.setattr(_BusySlotClient, "calls", [])
+    monkeypatch.setattr(cli_module.httpx, "Client", _BusySlotClient)
+
+    proj = tmp_path / "proj"
+    proj.mkdir(parents=True, exist_ok=True)
+    marker = tmp_path / "ran.txt"
+    with pytest.raises(typer.Exit) as excinfo:
+        am_run(
+            slot="ci",
+            cmd=[sys.executable, "-c", f"open({str(marker)!r}, 'w').write('ran')"],
+            project_path=proj,
+            agent="TestAgent",
+            ttl_seconds=120,
+            shared=False,
+            wait_seconds=1.0,
+        )
+    assert excinfo.value.exit_code == 1
+    assert not marker.exists(), "build must not run without a granted lease"
+    # The queued request is withdrawn and no renewal is attempted
+    assert "release_build_slot" in _BusySlotClient.calls
+    assert "renew_build_slot" not in _BusySlotClient.calls
@@ -0,0 +1,128 @@
+"""Archive commit metadata table: recorded on commit, backfilled from Git, serving the activity views."""
+
+from __future__ import annotations
+
+import pytest
+from fastmcp import Client
+from git import Repo
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from mcp_agent_mail import config as _config, http as http_module
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.db import get_session
+from mcp_agent_mail.http import build_http_app
+from mcp_agent_mail.storage import backfill_archive_commits
+
+
+async def _seed(client: Client) -> None:
+    for key in ("/backend", "/frontend"):
+        await client.call_tool("ensure_project", {"human_key": key})
+        for name in ("BlueLake", "GreenCastle"):
+            await client.call_tool(
+                "register_agent",
+                {"project_key": key, "program": "codex", "model": "gpt-5", "name": name},
+            )
+    for idx in range(3):
+        await client.call_tool(
+            "send_message",
+            {"project_key": "/backend", "sender_name": "BlueLake", "to": ["GreenCastle"], "subject": f"Ping {idx}", "body_md": "x"},
+        )
+    await client.call_tool(
+        "send_message",
+        {"project_key": "/frontend", "sender_name": "GreenCastle", "to": ["BlueLake"], "subject": "Hello", "body_md": "y"},
+    )
+
+
+async def _rows(sql: str) -> list[tuple]:
+    async with get_session() as session:
+        return [tuple(row) for row in (await session.execute(text(sql))).fetchall()]
+
+
+def _no_git_walks(monkeypatch) -> None:
+    def _fail(*_args, **_kwargs):
+        raise AssertionError("page walked Git history instead of querying archive_commits")
+
+    for name in ("get_recent_commits", "get_timeline_commits", "get_agent_communication_graph"):
+        monkeypatch.setattr(http_module, name, _fail)
+
+
+@pytest.fixture
+def mail_env(isolated_env, monkeypatch):
+    monkeypatch.setenv("CONTACT_ENFORCEMENT_ENABLED", "false")
+    _config.clear_settings_cache()
+    return isolated_env
+
+
+@pytest.mark.asyncio
+async def test_commits_are_recorded_and_pages_query_the_table(mail_env, monkeypatch):
+    async with Client(build_mcp_server()) as client:
+        await _seed(client)
+    repo = Repo(str(_config.get_settings().storage.root))
+    shas = repo.git.rev_list("HEAD").split()
+    assert sorted(r[0] for r in await _rows("SELECT sha FROM archive_commits")) == sorted(shas)
+    messages = await _rows(
+        "SELECT project_slug, sender, recipients FROM archive_commit_entries WHERE type = 'message' ORDER BY id"
+    )
+    assert messages == [("backend", "BlueLake", '["GreenCastle"]')] * 3 + [("frontend", "GreenCastle", '["BlueLake"]')]
+    # Sizes are computed from the written blobs (no diff-tree per commit) and agree with Git's numstat
+    sizes = {r[0]: r[1:] for r in await _rows("SELECT sha, files_changed, insertions, deletions FROM archive_commits")}
+    for sha in shas:
+        stats = repo.commit(sha).stats
+        assert sizes[sha] == (len(stats.files), stats.total["insertions"], stats.total["deletions"])
+
+    _no_git_walks(monkeypatch)
+    app = build_http_app(_config.get_settings(), build_mcp_server())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+        first = await http.get("/mail/archive/activity", params={"limit": 2})
+        assert first.status_code == 200
+        assert shas[0] in first.text and shas[1] in first.text and shas[2] not in first.text
+        assert "page=2" in first.text
+        second = await http.get("/mail/archive/activity", params={"limit": 2, "page": 2})
+        assert shas[2] in second.text and shas[0] not in second.text
+
+        timeline = await http.get("/mail/archive/timeline", params={"project": "backend"})
+        assert timeline.status_code == 200
+        assert timeline.text.count("→ GreenCastle") == 3 and shas[0] not in timeline.text  # head is the frontend send
+
+        network = await http.get("/mail/archive/network", params={"project": "backend"})
+        assert network.status_code == 200
+        assert '"count": 3, "from": "BlueLake", "to": "GreenCastle"' in network.text
+    repo.close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_restores_index_and_matches_git_views(mail_env):
+    async with Client(build_mcp_server()) as client:
+        await _seed(client)
+    repo = Repo(str(_config.get_settings().storage.root))
+    recorded = await _rows(
+        "SELECT c.sha, e.seq, e.project_slug, e.type, e.subject, e.sender, e.recipients "
+        "FROM archive_commit_entries e JOIN archive_commits c ON c.id = e.commit_id ORDER BY c.sha, e.seq, e.project_slug"
+    )
+    async with get_session() as session:
+        await session.execute(text("DELETE FROM archive_commit_entries"))
+        await session.execute(text("DELETE FROM archive_commits"))
+        await session.commit()
+    assert not await http_module._archive_commits_indexed(repo)
+
+    git_timeline = await http_module.get_timeline_commits(repo, "backend")
+
+    total = len(repo.git.rev_list("HEAD").split())
+    assert await backfill_archive_commits(repo, batch_size=3) == {"scanned": total, "inserted": total}
+    assert await backfill_archive_commits(repo) == {"scanned": total, "inserted": 0}
+    assert await http_module._archive_commits_indexed(repo)
+    backfilled = await _rows(
+        "SELECT c.sha, e.seq, e.project_slug, e.type, e.subject, e.sender, e.recipients "
+        "FROM archive_commit_entries e JOIN archive_commits c ON c.id = e.commit_id ORDER BY c.sha, e.seq, e.project_slug"
+    )
+    assert backfilled == recorded
+
+    db_graph = await http_module._communication_graph_from_db("backend", 200)
+    assert db_graph["edges"] == [{"from": "BlueLake", "to": "GreenCastle", "count": 3}]
+    assert {n["id"]: (n["sent"], n["received"]) for n in db_graph["nodes"]} == {"BlueLake": (3, 0), "GreenCastle": (0, 3)}
+    db_timeline = await http_module._timeline_from_db("backend", 100, 0)
+    assert [e["timestamp"] for e in db_timeline] == sorted(e["timestamp"] for e in db_timeline)
+    assert sorted(e["sha"] for e in db_timeline) == sorted(e["sha"] for e in git_timeline)
+    repo.close()
+
@@ -0,0 +1,92 @@
+"""Archive compaction: cold months packed into segment files stay readable through every archive reader."""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+from mcp_agent_mail.config import get_settings
+from mcp_agent_mail.storage import (
+    SEGMENT_INDEX_NAME,
+    SEGMENT_NAME,
+    compact_archive,
+    compute_archive_stats,
+    ensure_archive,
+    get_archive_tree,
+    get_file_content,
+    get_historical_inbox_snapshot,
+    read_segment_file,
+    write_message_bundle,
+)
+
+
+def _message(idx: int, created: str) -> dict[str, object]:
+    return {
+        "id": idx,
+        "subject": f"Report {idx}",
+        "created": created,
+        "from": "BlueLake",
+        "to": ["GreenCastle", "RedStone"],
+        "importance": "normal",
+    }
+
+
+async def _seed(archive) -> None:
+    for idx in range(1, 6):
+        message = _message(idx, f"2020-01-0{idx}T10:00:00+00:00")
+        await write_message_bundle(archive, message, f"old body {idx}", "BlueLake", ["GreenCastle", "RedStone"])
+    recent = datetime.now(timezone.utc).isoformat()
+    await write_message_bundle(archive, _message(99, recent), "fresh body", "BlueLake", ["GreenCastle"])
+
+
+def _files(root) -> list[str]:
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file())
+
+
+@pytest.mark.asyncio
+async def test_compaction_packs_cold_month_and_readers_follow(isolated_env):
+    archive = await ensure_archive(get_settings(), "backend")
+    await _seed(archive)
+    month_dir = archive.root / "messages" / "2020" / "01"
+    names = sorted(p.name for p in month_dir.glob("*.md"))
+    stats_before = compute_archive_stats(archive.root)
+
+    preview = await compact_archive(archive, older_than_days=30, dry_run=True)
+    assert preview["months"] == 1 and preview["messages"] == 5 and preview["mailbox_copies"] == 15
+    assert sorted(p.name for p in month_dir.glob("*.md")) == names
+
+    before = len([f for f in _files(archive.root) if "/2020/01/" in f])
+    result = await compact_archive(archive, older_than_days=30, dry_run=False, repack=False)
+    after_files = [f for f in _files(archive.root) if "/2020/01/" in f]
+    assert result["messages"] == 5
+    assert sorted(p.name for p in month_dir.iterdir()) == sorted([SEGMENT_INDEX_NAME, SEGMENT_NAME])
+    assert not list((archive.root / "agents").glob("*/*/2020/01/*.md"))
+    assert len(after_files) * 4 <= before  # 20 loose files -> segment pair + 3 mailbox indexes
+    # The current month is untouched
+    assert list((archive.root / "messages").glob(f"{datetime.now(timezone.utc):%Y/%m}/*.md"))
+
+    packed = read_segment_file(month_dir, names[0])
+    assert packed is not None and b"old body 1" in packed
+    assert compute_archive_stats(archive.root)["messages_by_month"] == stats_before["messages_by_month"]
+    assert compute_archive_stats(archive.root)["message_bytes"] == stats_before["message_bytes"]
+
+    content = await get_file_content(archive, f"messages/2020/01/{names[2]}")
+    assert content is not None and "old body 3" in content
+    inbox_content = await get_file_content(archive, f"agents/GreenCastle/inbox/2020/01/{names[4]}")
+    assert inbox_content is not None and "old body 5" in inbox_content
+    # A pinned commit streams the member out of the committed segment blob
+    pinned = await get_file_content(archive, f"messages/2020/01/{names[3]}", commit_sha=archive.repo.head.commit.hexsha)
+    assert pinned is not None and "old body 4" in pinned
+
+    tree = await get_archive_tree(archive, "messages/2020/01")
+    assert {item["name"] for item in tree} >= set(names)
+    inbox_tree = await get_archive_tree(archive, "agents/RedStone/inbox/2020/01")
+    assert {item["name"] for item in inbox_tree if item["name"] != "index.jsonl"} == set(names)
+
+    snapshot = await get_historical_inbox_snapshot(archive, "GreenCastle", "2999-01-01T00:00:00")
+    assert {m["subject"] for m in snapshot["messages"]} >= {f"Report {idx}" for idx in range(1, 6)}
+
+    # Re-running finds nothing left to pack
+    again = await compact_archive(archive, older_than_days=30, dry_run=False, repack=False)
+    assert again["messages"] == 0
@@ -0,0 +1,127 @@
+"""Per-project archive stats (stats.json) maintained by the write paths and read by the retention worker."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+from PIL import Image
+from sqlalchemy import text
+from typer.testing import CliRunner
+
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.cli import app as cli_app
+from mcp_agent_mail.config import get_settings
+from mcp_agent_mail.db import ensure_schema, get_session
+from mcp_agent_mail.storage import (
+    ARCHIVE_STATS_NAME,
+    collect_archive_stats,
+    compute_archive_stats,
+    ensure_archive,
+    load_archive_stats,
+    write_message_bundle,
+)
+
+
+def _comparable(stats: dict) -> dict:
+    return {key: value for key, value in stats.items() if key != "updated_ts"}
+
+
+def _message(idx: int, created: str) -> dict[str, object]:
+    return {"id": idx, "subject": f"Status {idx}", "created": created, "from": "BlueLake", "to": ["GreenCastle"]}
+
+
+def _write_image() -> Path:
+    storage_root = Path(get_settings().storage.root).expanduser().resolve()
+    img_path = storage_root.parent / "diagram.png"
+    Image.new("RGB", (4, 4), color=(255, 0, 0)).save(img_path)
+    return img_path
+
+
+@pytest.mark.asyncio
+async def test_write_paths_keep_stats_in_step_with_archive(isolated_env):
+    img_path = await asyncio.to_thread(_write_image)
+
+    async with Client(build_mcp_server()) as client:
+        await client.call_tool("ensure_project", {"human_key": "/backend"})
+        for name in ("BlueLake", "GreenCastle", "RedStone"):
+            await client.call_tool(
+                "register_agent",
+                {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+            )
+        await client.call_tool(
+            "send_message",
+            {"project_key": "Backend", "sender_name": "BlueLake", "to": ["GreenCastle", "RedStone"], "subject": "A", "body_md": "x"},
+        )
+        await client.call_tool(
+            "send_message",
+            {
+                "project_key": "Backend",
+                "sender_name": "GreenCastle",
+                "to": ["BlueLake"],
+                "subject": "B",
+                "body_md": "see",
+                "attachment_paths": [str(img_path)],
+            },
+        )
+
+    archive = await ensure_archive(get_settings(), "backend")
+    stats = load_archive_stats(archive.root)
+    assert stats is not None
+    # Includes the auto contact-request messages sent ahead of the first delivery
+    assert sum(stats["messages_by_month"].values()) == len(list((archive.root / "messages").rglob("*.md")))
+    assert stats["inbox_counts"]["BlueLake"] == 1
+    assert stats["attachments"] == 1 and stats["attachment_bytes"] > 0
+    assert _comparable(stats) == _comparable(compute_archive_stats(archive.root))
+    # Derived state, never committed
+    assert not any(path.endswith(ARCHIVE_STATS_NAME) for path in archive.repo.untracked_files)
+
+    # Replaying a bundle (write-behind retry) rewrites the same files and must not double count
+    replay = _message(99, "2025-01-15T10:00:00+00:00")
+    await write_message_bundle(archive, replay, "hello", "BlueLake", ["GreenCastle"])
+    await write_message_bundle(archive, replay, "hello", "BlueLake", ["GreenCastle"])
+    stats = load_archive_stats(archive.root)
+    assert stats is not None and stats["messages_by_month"]["2025-01"] == 1
+    assert _comparable(stats) == _comparable(compute_archive_stats(archive.root))
+
+
+@pytest.mark.asyncio
+async def test_archives_without_stats_are_seeded_once(isolated_env):
+    archive = await ensure_archive(get_settings(), "legacy")
+    (archive.root / ARCHIVE_STATS_NAME).unlink()
+    await write_message_bundle(archive, _message(1, "2024-06-01T09:00:00+00:00"), "old", "BlueLake", ["GreenCastle"])
+    # No baseline to add to: the delta is dropped rather than recorded as a partial count
+    assert load_archive_stats(archive.root) is None
+    assert await collect_archive_stats(archive.repo_root) == {}
+
+    seeded = await collect_archive_stats(archive.repo_root, rebuild_missing=True)
+    assert seeded["legacy"]["messages_by_month"] == {"2024-06": 1}
+    assert load_archive_stats(archive.root) is not None
+    await write_message_bundle(archive, _message(2, "2024-06-02T09:00:00+00:00"), "new", "BlueLake", ["GreenCastle"])
+    assert (await collect_archive_stats(archive.repo_root))["legacy"]["inbox_counts"] == {"GreenCastle": 2}
+
+
+def test_rebuild_stats_cli_repairs_drift(isolated_env):
+    async def _seed():
+        await ensure_schema()
+        async with get_session() as session:
+            await session.execute(
+                text("INSERT INTO projects (slug, human_key, created_at) VALUES ('backend', '/backend', datetime('now'))")
+            )
+            await session.commit()
+        archive = await ensure_archive(get_settings(), "backend")
+        await write_message_bundle(archive, _message(1, "2025-03-01T10:00:00+00:00"), "hi", "BlueLake", ["GreenCastle"])
+        return archive
+
+    archive = asyncio.run(_seed())
+    stats_path = archive.root / ARCHIVE_STATS_NAME
+    drifted = json.loads(stats_path.read_text(encoding="utf-8"))
+    drifted["messages_by_month"] = {"2025-03": 40}
+    stats_path.write_text(json.dumps(drifted), encoding="utf-8")
+
+    result = CliRunner().invoke(cli_app, ["archive", "rebuild-stats", "--project", "backend"])
+    assert result.exit_code == 0, result.output
+    assert json.loads(stats_path.read_text(encoding="utf-8"))["messages_by_month"] == {"2025-03": 1}
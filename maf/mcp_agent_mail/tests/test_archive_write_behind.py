@@ -0,0 +1,218 @@
+"""Write-behind archive mode: DB commit first, Git archive drained from archive_outbox."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+from git import Repo
+from sqlalchemy import text
+
+from mcp_agent_mail.app import (
+    _archive_outbox_status,
+    build_mcp_server,
+    drain_archive_outbox,
+    requeue_archive_outbox,
+)
+from mcp_agent_mail.config import clear_settings_cache, get_settings
+from mcp_agent_mail.db import get_session
+
+
+@pytest.fixture
+def write_behind_env(isolated_env, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_WRITE_BEHIND_ENABLED", "true")
+    # Long poll interval: the background writer only runs when woken by a send
+    monkeypatch.setenv("ARCHIVE_WRITE_BEHIND_POLL_INTERVAL_SECONDS", "3600")
+    clear_settings_cache()
+    yield
+    clear_settings_cache()
+
+
+async def _setup(client: Client) -> None:
+    await client.call_tool("ensure_project", {"human_key": "/backend"})
+    for name in ("BlueLake", "GreenCastle"):
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+        )
+
+
+@pytest.mark.asyncio
+async def test_write_behind_send_is_archived_in_order(write_behind_env):
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client)
+        for idx in range(3):
+            await client.call_tool(
+                "send_message",
+                {
+                    "project_key": "Backend",
+                    "sender_name": "BlueLake",
+                    "to": ["GreenCastle"],
+                    "subject": f"Ordered {idx}",
+                    "body_md": f"body {idx}",
+                },
+            )
+        await drain_archive_outbox()
+
+        health = await client.call_tool("health_check", {})
+        outbox = health.data["archive_outbox"]
+        assert outbox["enabled"] is True
+        assert outbox["depth"] == 0
+        assert outbox["failed"] == 0
+
+    async with get_session() as session:
+        rows = await session.execute(
+            text(
+                "SELECT o.status FROM archive_outbox o JOIN messages m ON m.id = o.message_id "
+                "WHERE m.subject LIKE 'Ordered%' ORDER BY o.id"
+            )
+        )
+        statuses = [row[0] for row in rows.fetchall()]
+    assert statuses == ["done", "done", "done"]
+
+    archive_root = get_settings().storage.root
+    project_root = Path(archive_root) / "projects" / "backend"
+    inbox_files = sorted((project_root / "agents" / "GreenCastle" / "inbox").rglob("*__ordered-*.md"))
+    assert len(inbox_files) == 3
+
+    repo = Repo(archive_root)
+    try:
+        commits = list(repo.iter_commits(paths=["projects/backend/messages"]))
+        order = [
+            path.rsplit("__", 2)[1]
+            for commit in reversed(commits)  # iter_commits is newest-first
+            for path in commit.stats.files
+            if "/messages/20" in str(path) and "__ordered-" in str(path)
+        ]
+    finally:
+        repo.close()
+    assert order == ["ordered-0", "ordered-1", "ordered-2"]
+
+
+@pytest.mark.asyncio
+async def test_health_check_reports_pending_depth_and_lag(write_behind_env):
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client)
+    # The lifespan (and its background writer) has exited: nothing drains the row inspected below
+    async with get_session() as session:
+        pid = (await session.execute(text("SELECT id FROM projects WHERE slug = 'backend'"))).scalar_one()
+        sid = (await session.execute(text("SELECT id FROM agents WHERE name = 'BlueLake'"))).scalar_one()
+        await session.execute(
+            text(
+                "INSERT INTO messages(project_id, sender_id, subject, body_md, importance, ack_required, created_ts, attachments) "
+                "VALUES (:pid, :sid, 'queued', 'x', 'normal', 0, '2020-01-01 00:00:00', '[]')"
+            ),
+            {"pid": pid, "sid": sid},
+        )
+        mid = (await session.execute(text("SELECT MAX(id) FROM messages"))).scalar_one()
+        await session.execute(
+            text(
+                "INSERT INTO archive_outbox(project_id, message_id, status, payload, attempts, last_error, created_ts) "
+                "VALUES (:pid, :mid, 'pending', '{}', 0, '', '2020-01-01 00:00:00')"
+            ),
+            {"pid": pid, "mid": mid},
+        )
+        await session.commit()
+    try:
+        outbox = await _archive_outbox_status(get_settings())
+        assert outbox["depth"] == 1
+        assert outbox["blocked"] == 0
+        assert outbox["lag_seconds"] > 3600
+        assert outbox["oldest_pending_ts"].startswith("2020-01-01")
+    finally:
+        async with get_session() as session:
+            await session.execute(text("DELETE FROM archive_outbox WHERE message_id = :mid"), {"mid": mid})
+            await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_failures_stay_queued_then_dead_letter(write_behind_env, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_WRITE_BEHIND_MAX_ATTEMPTS", "2")
+    clear_settings_cache()
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client)
+
+    from mcp_agent_mail import app as app_module
+
+    async def _boom(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(app_module, "write_message_bundle", _boom)
+    async with Client(build_mcp_server()) as client:
+        await client.call_tool(
+            "send_message",
+            {"project_key": "Backend", "sender_name": "BlueLake", "to": ["GreenCastle"], "subject": "x", "body_md": "y"},
+        )
+        # Message is readable immediately even though the archive write keeps failing
+        inbox = await client.call_tool("fetch_inbox", {"project_key": "Backend", "agent_name": "GreenCastle"})
+        assert "x" in [m["subject"] for m in inbox.structured_content["result"]]
+        await drain_archive_outbox()
+        await drain_archive_outbox()
+
+    async with get_session() as session:
+        row = (
+            await session.execute(
+                text(
+                    "SELECT o.status, o.attempts, o.last_error FROM archive_outbox o "
+                    "JOIN messages m ON m.id = o.message_id WHERE m.subject = 'x'"
+                )
+            )
+        ).one()
+    assert row[0] == "failed"
+    assert row[1] == 2
+    assert "disk full" in row[2]
+
+
+@pytest.mark.asyncio
+async def test_dead_lettered_row_blocks_later_rows_of_its_project(write_behind_env, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_WRITE_BEHIND_MAX_ATTEMPTS", "1")
+    clear_settings_cache()
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+
+    from mcp_agent_mail import app as app_module
+
+    real_write = app_module.write_message_bundle
+
+    async def _fail_first(archive, frontmatter, *args, **kwargs):
+        if frontmatter.get("subject") == "first":
+            raise OSError("disk full")
+        return await real_write(archive, frontmatter, *args, **kwargs)
+
+    monkeypatch.setattr(app_module, "write_message_bundle", _fail_first)
+    async with Client(build_mcp_server()) as client:
+        for subject in ("first", "second"):
+            await client.call_tool(
+                "send_message",
+                {"project_key": "Backend", "sender_name": "BlueLake", "to": ["GreenCastle"], "subject": subject, "body_md": "y"},
+            )
+        await drain_archive_outbox()
+
+    async def _statuses() -> dict[str, str]:
+        async with get_session() as session:
+            rows = await session.execute(
+                text("SELECT m.subject, o.status FROM archive_outbox o JOIN messages m ON m.id = o.message_id")
+            )
+            return dict(rows.fetchall())
+
+    assert await _statuses() == {"first": "failed", "second": "pending"}
+    outbox = await _archive_outbox_status(get_settings())
+    assert outbox["failed"] == 1 and outbox["blocked"] == 1
+
+    # Dropping the dead letter releases the rest of the project's queue
+    async with get_session() as session:
+        await session.execute(text("DELETE FROM archive_outbox WHERE status = 'failed'"))
+        await session.commit()
+    await drain_archive_outbox()
+    assert await _statuses() == {"second": "done"}
+
+    # Requeueing the dead-lettered row releases the project; once the write succeeds both rows drain in order
+    monkeypatch.setattr(app_module, "write_message_bundle", real_write)
+    assert await requeue_archive_outbox() == 1
+    assert (await drain_archive_outbox())["written"] == 2
+    assert await _statuses() == {"first": "done", "second": "done"}
+    assert await requeue_archive_outbox() == 0
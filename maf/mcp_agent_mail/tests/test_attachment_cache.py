@@ -0,0 +1,127 @@
+"""Content-addressed image cache: hash-first hits skip decode, misses convert in the worker pool."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+from PIL import Image
+
+from mcp_agent_mail import config as _config, storage as storage_module
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.config import get_settings
+from mcp_agent_mail.storage import ensure_archive
+
+
+def _image(name: str, size: tuple[int, int], color: tuple[int, int, int]) -> Path:
+    path = Path(get_settings().storage.root).expanduser().resolve().parent / name
+    Image.new("RGB", size, color=color).save(path)
+    return path
+
+
+def _track_conversions(monkeypatch) -> list[int]:
+    conversions: list[int] = []
+    original = storage_module._convert_image
+
+    async def _tracking(archive, data):
+        conversions.append(len(data))
+        return await original(archive, data)
+
+    monkeypatch.setattr(storage_module, "_convert_image", _tracking)
+    return conversions
+
+
+async def _send(client: Client, subject: str, path: Path) -> list[dict]:
+    result = await client.call_tool(
+        "send_message",
+        {
+            "project_key": "Backend",
+            "sender_name": "BlueLake",
+            "to": ["BlueLake"],
+            "subject": subject,
+            "body_md": "see attached",
+            "attachment_paths": [str(path)],
+        },
+    )
+    return result.data["deliveries"][0]["payload"]["attachments"]
+
+
+@pytest.mark.asyncio
+async def test_reattached_image_reuses_stored_metadata(isolated_env, monkeypatch):
+    monkeypatch.setenv("INLINE_IMAGE_MAX_BYTES", "1")
+    _config.clear_settings_cache()
+    conversions = _track_conversions(monkeypatch)
+    path = _image("screenshot.png", (32, 24), (10, 120, 200))
+    async with Client(build_mcp_server()) as client:
+        await client.call_tool("ensure_project", {"human_key": "/backend"})
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": "BlueLake"},
+        )
+        first = await _send(client, "First", path)
+        archive = await ensure_archive(get_settings(), "backend")
+        digest = first[0]["sha1"]
+        audit = archive.root / "attachments" / "_audit" / f"{digest}.log"
+        manifest = archive.root / "attachments" / "_manifests" / f"{digest}.json"
+        manifest_before = manifest.read_text(encoding="utf-8")
+
+        second = await _send(client, "Second", path)
+        assert conversions == [path.stat().st_size]
+        assert second == first
+        assert (first[0]["width"], first[0]["height"]) == (32, 24)
+        # A hit neither rewrites the manifest nor appends to the audit log
+        assert manifest.read_text(encoding="utf-8") == manifest_before
+        assert len(audit.read_text(encoding="utf-8").splitlines()) == 1
+
+        # Inline hits read the stored WebP back instead of re-encoding
+        monkeypatch.setenv("INLINE_IMAGE_MAX_BYTES", "1048576")
+        _config.clear_settings_cache()
+        inline = await _send(client, "Inline", path)
+        assert conversions == [path.stat().st_size]
+        assert inline[0]["type"] == "inline" and inline[0]["bytes"] == first[0]["bytes"]
+
+        # A damaged cache entry (WebP size no longer matches the manifest) falls back to a full conversion
+        webp = archive.repo_root / first[0]["path"]
+        webp.write_bytes(b"truncated")
+        manifest.write_text(json.dumps({**json.loads(manifest_before), "bytes_webp": 123}), encoding="utf-8")
+        repaired = await _send(client, "Repaired", path)
+        assert len(conversions) == 2
+        assert repaired[0]["width"] == 32
+        assert json.loads(manifest.read_text(encoding="utf-8"))["bytes_webp"] == repaired[0]["bytes"]
+
+        # Manifest lost but the WebP intact: the stored bytes are reused as-is, not re-encoded
+        stored_bytes = webp.read_bytes()
+        manifest.unlink()
+        recovered = await _send(client, "Recovered", path)
+        assert len(conversions) == 2
+        assert webp.read_bytes() == stored_bytes
+        assert recovered[0]["bytes"] == len(stored_bytes) and recovered[0]["width"] == 32
+        assert json.loads(manifest.read_text(encoding="utf-8"))["bytes_webp"] == len(stored_bytes)
+    path.unlink(missing_ok=True)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_new_images_convert_in_worker_pool(isolated_env, monkeypatch):
+    monkeypatch.setenv("IMAGE_CONVERT_WORKERS", "2")
+    _config.clear_settings_cache()
+    archive = await ensure_archive(get_settings(), "backend")
+    paths = [_image(f"shot{idx}.png", (40 + idx, 30), (idx * 20, 50, 90)) for idx in range(6)]
+    try:
+        results = await asyncio.gather(*(storage_module._store_image(archive, p, embed_policy="file") for p in paths))
+        assert [meta["width"] for meta, _rel in results] == [40 + idx for idx in range(6)]
+        assert storage_module._IMAGE_POOL is not None and storage_module._IMAGE_POOL_WORKERS == 2
+        for meta, rel_path in results:
+            with Image.open(archive.repo_root / rel_path) as stored:
+                assert stored.format == "WEBP" and stored.size == (meta["width"], meta["height"])
+
+        # Same bytes sent concurrently: one content-addressed file, identical metadata everywhere
+        repeated = await asyncio.gather(*(storage_module._store_image(archive, paths[0]) for _ in range(4)))
+        assert {meta["sha1"] for meta, _rel in repeated} == {results[0][0]["sha1"]}
+        assert not list(archive.attachments_dir.rglob("*.tmp"))
+    finally:
+        storage_module.shutdown_image_pool()
+        for p in paths:
+            p.unlink(missing_ok=True)
@@ -0,0 +1,147 @@
+"""DB-backed build slots: atomic exclusive grants, FIFO/priority handoff, expiry handoff, timed-out waiters."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastmcp import Client
+from sqlalchemy import text, update
+
+from mcp_agent_mail import config as _config
+from mcp_agent_mail.app import (
+    acquire_build_slot_lease,
+    build_mcp_server,
+    release_build_slot_lease,
+)
+from mcp_agent_mail.db import ensure_schema, get_session
+from mcp_agent_mail.models import BuildSlotLease
+
+
+@pytest.fixture
+def worktrees_env(isolated_env, monkeypatch):
+    monkeypatch.setenv("WORKTREES_ENABLED", "1")
+    _config.clear_settings_cache()
+    return isolated_env
+
+
+async def _project_id() -> int:
+    await ensure_schema()
+    async with get_session() as session:
+        await session.execute(text("INSERT INTO projects (slug, human_key, created_at) VALUES ('backend', '/backend', datetime('now'))"))
+        await session.commit()
+        return int((await session.execute(text("SELECT id FROM projects WHERE slug = 'backend'"))).scalar_one())
+
+
+async def _statuses() -> dict[str, str]:
+    async with get_session() as session:
+        rows = await session.execute(text("SELECT agent, status FROM build_slot_leases ORDER BY id"))
+        return dict(rows.all())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_exclusive_requests_get_one_grant(worktrees_env):
+    pid = await _project_id()
+    results = await asyncio.gather(
+        *(acquire_build_slot_lease(pid, "build", f"Agent{idx}", "main") for idx in range(10))
+    )
+    granted = [result for result in results if result["granted"]]
+    assert len(granted) == 1
+    holder = granted[0]["granted"]["agent"]
+    for result in results:
+        if result["granted"] is None:
+            assert [c["agent"] for c in result["conflicts"]] == [holder]
+            assert 0 <= result["position"] < 9
+    # Losers do not linger in the queue; re-acquiring by the holder just extends its lease
+    assert sorted(set((await _statuses()).values())) == ["active", "cancelled"]
+    again = await acquire_build_slot_lease(pid, "build", holder, "main")
+    assert again["granted"]["agent"] == holder
+
+
+@pytest.mark.asyncio
+async def test_release_hands_off_in_priority_then_fifo_order(worktrees_env):
+    pid = await _project_id()
+    assert (await acquire_build_slot_lease(pid, "build", "Holder", "main"))["granted"]
+    order: list[str] = []
+
+    async def _wait(agent: str, priority: int) -> None:
+        result = await acquire_build_slot_lease(pid, "build", agent, "main", priority=priority, wait_seconds=10)
+        assert result["granted"], agent
+        order.append(agent)
+        await asyncio.sleep(0.01)
+        await release_build_slot_lease(pid, "build", agent, "main")
+
+    waiters = []
+    for idx in range(8):
+        waiters.append(asyncio.create_task(_wait(f"Waiter{idx}", 5 if idx == 6 else 0)))
+        await asyncio.sleep(0.02)
+    released, handed_off = await release_build_slot_lease(pid, "build", "Holder", "main")
+    assert released and [lease.agent for lease in handed_off] == ["Waiter6"]
+    await asyncio.wait_for(asyncio.gather(*waiters), timeout=30)
+    assert order == ["Waiter6", "Waiter0", "Waiter1", "Waiter2", "Waiter3", "Waiter4", "Waiter5", "Waiter7"]
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_passes_to_waiter(worktrees_env):
+    pid = await _project_id()
+    assert (await acquire_build_slot_lease(pid, "build", "Crashed", "main"))["granted"]
+    # Simulate a holder that stopped renewing: its lease lapses in half a second
+    async with get_session() as session:
+        soon = datetime.now(timezone.utc) + timedelta(seconds=0.5)
+        await session.execute(update(BuildSlotLease).values(expires_ts=soon))
+        await session.commit()
+    result = await acquire_build_slot_lease(pid, "build", "Next", "main", wait_seconds=5)
+    assert result["granted"]["agent"] == "Next"
+    assert 0.2 < result["waited_seconds"] < 4
+    assert await _statuses() == {"Crashed": "expired", "Next": "active"}
+
+
+@pytest.mark.asyncio
+async def test_shared_and_exclusive_queueing(worktrees_env):
+    pid = await _project_id()
+    first = await acquire_build_slot_lease(pid, "watch", "ReaderA", "main", exclusive=False)
+    second = await acquire_build_slot_lease(pid, "watch", "ReaderB", "main", exclusive=False)
+    assert first["granted"] and second["granted"]
+    assert [c["agent"] for c in second["conflicts"]] == ["ReaderA"]
+
+    timed_out = await acquire_build_slot_lease(pid, "watch", "Writer", "main", wait_seconds=0.3)
+    assert timed_out["granted"] is None and timed_out["position"] == 0
+    assert (await _statuses())["Writer"] == "cancelled"
+
+    # A queued exclusive request blocks later shared requests (no barging) until it has run
+    writer = asyncio.create_task(acquire_build_slot_lease(pid, "watch", "Writer", "main", wait_seconds=10))
+    await asyncio.sleep(0.1)
+    late = await acquire_build_slot_lease(pid, "watch", "ReaderC", "main", exclusive=False)
+    assert late["granted"] is None and late["position"] == 1
+    await release_build_slot_lease(pid, "watch", "ReaderA", "main")
+    assert not writer.done()
+    await release_build_slot_lease(pid, "watch", "ReaderB", "main")
+    assert (await asyncio.wait_for(writer, timeout=5))["granted"]["agent"] == "Writer"
+
+
+@pytest.mark.asyncio
+async def test_build_slot_tools_round_trip(worktrees_env):
+    async with Client(build_mcp_server()) as client:
+        await client.call_tool("ensure_project", {"human_key": "/backend"})
+        for name in ("BlueLake", "GreenCastle"):
+            await client.call_tool(
+                "register_agent",
+                {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+            )
+        base = {"project_key": "Backend", "slot": "frontend-build"}
+        acquired = await client.call_tool("acquire_build_slot", {**base, "agent_name": "BlueLake"})
+        assert acquired.data["granted"]["agent"] == "BlueLake"
+        busy = await client.call_tool("acquire_build_slot", {**base, "agent_name": "GreenCastle"})
+        assert busy.data["granted"] is None
+        assert [c["agent"] for c in busy.data["conflicts"]] == ["BlueLake"]
+
+        renewed = await client.call_tool("renew_build_slot", {**base, "agent_name": "BlueLake", "extend_seconds": 7200})
+        assert renewed.data["renewed"] is True
+        missing = await client.call_tool("renew_build_slot", {**base, "agent_name": "GreenCastle"})
+        assert missing.data["renewed"] is False
+
+        released = await client.call_tool("release_build_slot", {**base, "agent_name": "BlueLake"})
+        assert released.data["released"] is True
+        assert released.data["handed_off_to"] == []
+        assert (await client.call_tool("acquire_build_slot", {**base, "agent_name": "GreenCastle"})).data["granted"]
@@ -0,0 +1,167 @@
+"""Group commit: concurrent archive writes share a Git commit without losing per-write metadata."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastmcp import Client
+
+from mcp_agent_mail.app import build_mcp_server, drain_archive_outbox
+from mcp_agent_mail.config import clear_settings_cache, get_settings
+from mcp_agent_mail.storage import (
+    _group_committer,
+    archive_write_lock,
+    ensure_archive,
+    get_agent_communication_graph,
+    get_timeline_commits,
+    split_commit_entries,
+    write_message_bundle,
+)
+
+
+@pytest.fixture
+def batch_env(isolated_env, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_COMMIT_BATCH_WINDOW_MS", "200")
+    clear_settings_cache()
+    yield
+    clear_settings_cache()
+
+
+def _frontmatter(idx: int) -> dict[str, object]:
+    return {
+        "id": idx,
+        "subject": f"Batch {idx}",
+        "created": f"2025-01-01T00:00:0{idx}+00:00",
+        "from": "BlueLake",
+        "to": ["GreenCastle"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_commit(batch_env):
+    settings = get_settings()
+    archive = await ensure_archive(settings, "backend")
+    head_before = archive.repo.head.commit.hexsha
+
+    await asyncio.gather(
+        *(
+            write_message_bundle(archive, _frontmatter(idx), f"body {idx}", "BlueLake", ["GreenCastle"])
+            for idx in range(4)
+        )
+    )
+
+    commits = list(archive.repo.iter_commits(f"{head_before}..HEAD"))
+    assert len(commits) == 1
+    message = str(commits[0].message)
+    assert message.startswith("batch: 4 archive writes")
+    entries = split_commit_entries(message)
+    assert len(entries) == 4
+    for entry in entries:
+        assert entry.startswith("mail: BlueLake -> GreenCastle | Batch ")
+        assert "Agent: BlueLake" in entry
+
+    graph = await get_agent_communication_graph(archive.repo, "backend")
+    edges = {(edge["from"], edge["to"]): edge["count"] for edge in graph["edges"]}
+    assert edges[("BlueLake", "GreenCastle")] == 4
+
+    timeline = await get_timeline_commits(archive.repo, "backend")
+    messages = [item for item in timeline if item["type"] == "message"]
+    assert len(messages) == 4
+    assert {item["sha"] for item in messages} == {commits[0].hexsha}
+
+
+@pytest.mark.asyncio
+async def test_max_files_cap_flushes_early(batch_env, monkeypatch):
+    # Each bundle touches 3 paths (canonical, outbox, inbox): a cap of 3 forces one commit per write
+    monkeypatch.setenv("ARCHIVE_COMMIT_BATCH_MAX_FILES", "3")
+    clear_settings_cache()
+    settings = get_settings()
+    archive = await ensure_archive(settings, "backend")
+    head_before = archive.repo.head.commit.hexsha
+
+    await asyncio.gather(
+        *(
+            write_message_bundle(archive, _frontmatter(idx), f"body {idx}", "BlueLake", ["GreenCastle"])
+            for idx in range(3)
+        )
+    )
+
+    commits = list(archive.repo.iter_commits(f"{head_before}..HEAD"))
+    assert len(commits) == 3
+    assert all(str(c.message).startswith("mail: BlueLake -> GreenCastle") for c in commits)
+
+
+@pytest.mark.asyncio
+async def test_archive_lock_is_released_before_waiting_on_the_batch(batch_env):
+    archive = await ensure_archive(get_settings(), "backend")
+    head_before = archive.repo.head.commit.hexsha
+
+    async def _locked_write() -> None:
+        async with archive_write_lock(archive):
+            await write_message_bundle(archive, _frontmatter(1), "body", "BlueLake", ["GreenCastle"])
+
+    writer = asyncio.create_task(_locked_write())
+    await asyncio.sleep(0.05)
+    # The writer is still inside the 200ms batch window, but the archive lock is already free
+    async with archive_write_lock(archive, timeout_seconds=0.1):
+        assert not writer.done()
+    await writer
+    assert len(list(archive.repo.iter_commits(f"{head_before}..HEAD"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_fails_waiting_writers(batch_env):
+    archive = await ensure_archive(get_settings(), "backend")
+    committer = _group_committer(archive.repo, get_settings())
+    future = committer.enqueue("mail: A -> B | stranded", ["messages/nothing.md"])
+    await asyncio.sleep(0)
+    assert committer._flusher is not None
+    committer._flusher.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await future
+    assert committer._pending == []
+
+
+def test_single_entry_commit_keeps_original_message():
+    assert split_commit_entries("mail: A -> B | hi\n\nAgent: A\n") == ["mail: A -> B | hi\n\nAgent: A\n"]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_drain_uses_one_commit(isolated_env, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_WRITE_BEHIND_ENABLED", "true")
+    monkeypatch.setenv("ARCHIVE_WRITE_BEHIND_POLL_INTERVAL_SECONDS", "3600")
+    clear_settings_cache()
+    from mcp_agent_mail import app as app_module
+
+    # Keep the background writer asleep so this test's drain sees the whole backlog
+    monkeypatch.setattr(app_module, "_signal_archive_outbox", lambda: None)
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await client.call_tool("ensure_project", {"human_key": "/backend"})
+        for name in ("BlueLake", "GreenCastle"):
+            await client.call_tool(
+                "register_agent",
+                {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+            )
+        await drain_archive_outbox()
+        archive = await ensure_archive(get_settings(), "backend")
+        head_before = archive.repo.head.commit.hexsha
+        for idx in range(3):
+            await client.call_tool(
+                "send_message",
+                {
+                    "project_key": "Backend",
+                    "sender_name": "BlueLake",
+                    "to": ["GreenCastle"],
+                    "subject": f"Drained {idx}",
+                    "body_md": "x",
+                },
+            )
+        result = await drain_archive_outbox()
+    clear_settings_cache()
+
+    assert result["written"] >= 3
+    commits = list(archive.repo.iter_commits(f"{head_before}..HEAD"))
+    assert len(commits) == 1
+    assert len(split_commit_entries(str(commits[0].message))) == result["written"]
@@ -0,0 +1,169 @@
+"""Project-partitioned fts_messages: scoped MATCH, legacy-layout migration, rebuild command, 1M benchmark."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+from sqlalchemy import create_engine, text
+from typer.testing import CliRunner
+
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.cli import app as cli_app
+from mcp_agent_mail.db import (
+    FTS_MESSAGES_BM25,
+    ensure_schema,
+    get_session,
+    rebuild_fts_messages,
+    reset_database_state,
+    scope_fts_query,
+)
+
+_LEGACY_FTS = (
+    "CREATE VIRTUAL TABLE fts_messages USING fts5(message_id UNINDEXED, subject, body)",
+    """
+    CREATE TRIGGER fts_messages_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO fts_messages(rowid, message_id, subject, body) VALUES (new.id, new.id, new.subject, new.body_md);
+    END
+    """,
+)
+
+
+async def _seed_two_projects() -> None:
+    async with Client(build_mcp_server()) as client:
+        for key in ("/backend", "/frontend"):
+            await client.call_tool("ensure_project", {"human_key": key})
+            await client.call_tool(
+                "register_agent",
+                {"project_key": key, "program": "codex", "model": "gpt-5", "name": "BlueLake"},
+            )
+            await client.call_tool(
+                "send_message",
+                {"project_key": key, "sender_name": "BlueLake", "to": ["BlueLake"], "subject": f"Deploy plan {key}", "body_md": "rollout"},
+            )
+
+
+async def _search(project_key: str, query: str) -> list[str]:
+    async with Client(build_mcp_server()) as client:
+        result = await client.call_tool("search_messages", {"project_key": project_key, "query": query})
+    return [item["subject"] for item in result.structured_content["result"]]
+
+
+async def _fts_columns() -> list[str]:
+    async with get_session() as session:
+        rows = await session.execute(text("SELECT name FROM pragma_table_info('fts_messages')"))
+        return [row[0] for row in rows.fetchall()]
+
+
+@pytest.mark.asyncio
+async def test_search_only_matches_target_project(isolated_env):
+    await _seed_two_projects()
+    assert await _search("/backend", "deploy") == ["Deploy plan /backend"]
+    assert await _search("/frontend", "rollout") == ["Deploy plan /frontend"]
+    # The project token is a filter column, never matched by the user's terms
+    assert await _search("/backend", "p1") == []
+
+
+def test_scope_without_projects_is_rejected():
+    assert scope_fts_query("deploy", [3]).endswith('project : ("p3")')
+    with pytest.raises(ValueError):
+        scope_fts_query("deploy", [])
+
+
+@pytest.mark.asyncio
+async def test_legacy_layout_is_migrated_on_startup(isolated_env):
+    await ensure_schema()
+    async with get_session() as session:
+        for trigger in ("fts_messages_ai", "fts_messages_ad", "fts_messages_au"):
+            await session.execute(text(f"DROP TRIGGER {trigger}"))
+        await session.execute(text("DROP TABLE fts_messages"))
+        for statement in _LEGACY_FTS:
+            await session.execute(text(statement))
+        await session.commit()
+    await _seed_two_projects()
+    assert "project" not in await _fts_columns()
+
+    reset_database_state()
+    await ensure_schema()
+    assert "project" in await _fts_columns()
+    assert await _search("/frontend", "deploy") == ["Deploy plan /frontend"]
+
+
+def test_rebuild_search_index_cli(isolated_env):
+    asyncio.run(_seed_two_projects())
+
+    async def _drop_rows() -> None:
+        async with get_session() as session:
+            await session.execute(text("DELETE FROM fts_messages"))
+            await session.commit()
+
+    asyncio.run(_drop_rows())
+    assert asyncio.run(_search("/backend", "deploy")) == []
+
+    reset_database_state()
+    result = CliRunner().invoke(cli_app, ["rebuild-search-index"])
+    assert result.exit_code == 0, result.output
+    reset_database_state()
+    assert asyncio.run(_search("/backend", "deploy")) == ["Deploy plan /backend"]
+
+
+@pytest.mark.benchmark
+def test_scoped_search_latency_1m_messages(tmp_path: Path):
+    total, projects = 1_000_000, 200
+    engine = create_engine(f"sqlite:///{tmp_path / 'fts.sqlite3'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY, project_id INTEGER, subject TEXT, body_md TEXT, "
+            "importance TEXT, thread_id TEXT, created_ts TEXT)"
+        )
+        # 40% of traffic comes from one noisy project; the rest is spread over 199 others
+        conn.exec_driver_sql(
+            f"""
+            WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < {total})
+            INSERT INTO messages
+            SELECT i,
+                   CASE WHEN i % 5 < 2 THEN 1 ELSE 2 + (i * 7919) % {projects - 1} END,
+                   'deploy term' || (i * 31 % 4000),
+                   'term' || (i * 17 % 4000) || ' term' || (i * 131 % 4000) || ' term' || (i * 977 % 4000),
+                   'normal', NULL, '2025-01-01 00:00:00'
+            FROM seq
+            """
+        )
+        conn.exec_driver_sql("CREATE INDEX idx_messages_project_created ON messages(project_id, created_ts DESC)")
+        start = time.perf_counter()
+        assert rebuild_fts_messages(conn) == total
+        build_elapsed = time.perf_counter() - start
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE fts_legacy USING fts5(message_id UNINDEXED, subject, body)")
+        conn.exec_driver_sql("INSERT INTO fts_legacy(rowid, message_id, subject, body) SELECT id, id, subject, body_md FROM messages")
+
+    legacy_sql = (
+        "SELECT m.id FROM fts_legacy JOIN messages m ON m.id = fts_legacy.rowid "
+        "WHERE m.project_id = :pid AND fts_legacy MATCH :q ORDER BY bm25(fts_legacy) LIMIT 20"
+    )
+    scoped_sql = (
+        "SELECT m.id FROM fts_messages JOIN messages m ON m.id = fts_messages.rowid "
+        f"WHERE m.project_id = :pid AND fts_messages MATCH :q ORDER BY {FTS_MESSAGES_BM25} LIMIT 20"
+    )
+    queries = ["deploy", "term5 OR term9", "term17"]
+    quiet_projects = [7, 42, 150]
+    legacy_elapsed = scoped_elapsed = 0.0
+    with engine.connect() as conn:
+        for q in queries:
+            for pid in quiet_projects:
+                start = time.perf_counter()
+                legacy = conn.execute(text(legacy_sql), {"pid": pid, "q": q}).fetchall()
+                legacy_elapsed += time.perf_counter() - start
+                start = time.perf_counter()
+                scoped = conn.execute(text(scoped_sql), {"pid": pid, "q": scope_fts_query(q, [pid])}).fetchall()
+                scoped_elapsed += time.perf_counter() - start
+                # Same hits in the same bm25 order
+                assert scoped == legacy, (q, pid)
+    searches = len(queries) * len(quiet_projects)
+    print(
+        f"\n1M messages / {projects} projects: index build {build_elapsed:.1f} s, quiet-project search "
+        f"scoped {scoped_elapsed / searches * 1000:.1f} ms vs legacy {legacy_elapsed / searches * 1000:.1f} ms"
+    )
+    assert scoped_elapsed * 2 < legacy_elapsed
@@ -0,0 +1,184 @@
+"""Compiled active-reservation snapshot (file_reservations/active.idx) used by the guard hooks."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+from pathspec import PathSpec
+
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.config import get_settings
+from mcp_agent_mail.guard import ReservationSnapshot, render_precommit_script
+from mcp_agent_mail.storage import (
+    FILE_RESERVATIONS_SNAPSHOT_NAME,
+    build_file_reservations_snapshot,
+    ensure_archive,
+    reservation_literal_prefix,
+    write_file_reservations_snapshot,
+)
+
+_FUTURE = "2999-01-01T00:00:00+00:00"
+
+
+def _load(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+@pytest.mark.asyncio
+async def test_snapshot_tracks_reserve_and_release(isolated_env):
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await client.call_tool("ensure_project", {"human_key": "/backend"})
+        for name in ("BlueLake", "GreenCastle"):
+            await client.call_tool(
+                "register_agent",
+                {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+            )
+        await client.call_tool(
+            "file_reservation_paths",
+            {"project_key": "Backend", "agent_name": "BlueLake", "paths": ["src/api/*.py", "*.lock"]},
+        )
+        await client.call_tool(
+            "file_reservation_paths",
+            {"project_key": "Backend", "agent_name": "GreenCastle", "paths": ["docs/**"], "exclusive": False},
+        )
+
+        archive = await ensure_archive(get_settings(), "backend")
+        snapshot_path = archive.root / "file_reservations" / FILE_RESERVATIONS_SNAPSHOT_NAME
+        snapshot = _load(snapshot_path)
+        # Shared reservations never block commits and are left out
+        assert {e["path_pattern"] for e in snapshot["entries"]} == {"src/api/*.py", "*.lock"}
+        assert set(snapshot["buckets"]) == {"", "src/api"}
+        # Derived state: excluded from Git instead of committed on every change
+        assert not any(p.endswith(FILE_RESERVATIONS_SNAPSHOT_NAME) for p in archive.repo.untracked_files)
+
+        await client.call_tool(
+            "release_file_reservations",
+            {"project_key": "Backend", "agent_name": "BlueLake", "paths": ["src/api/*.py"]},
+        )
+        snapshot = _load(snapshot_path)
+        assert [e["path_pattern"] for e in snapshot["entries"]] == ["*.lock"]
+
+
+def test_literal_prefix_buckets() -> None:
+    assert reservation_literal_prefix("src/api/*.py") == "src/api"
+    assert reservation_literal_prefix("/docs/**") == "docs"
+    assert reservation_literal_prefix("a/**/b.py") == "a"
+    assert reservation_literal_prefix("src/app.py") == "src"
+    # Slash-free patterns match at any depth
+    assert reservation_literal_prefix("*.py") == ""
+    assert reservation_literal_prefix("build/") == ""
+    assert reservation_literal_prefix("**/x.txt") == ""
+
+
+def test_snapshot_matches_pathspec_semantics() -> None:
+    patterns = ["src/api/*.py", "*.lock", "/docs/**", "a/**/b.py", "build/", "README.md", "!src/keep.py"]
+    snapshot = ReservationSnapshot(
+        build_file_reservations_snapshot(
+            {"agent": "Other", "path_pattern": p, "expires_ts": _FUTURE} for p in patterns
+        )
+    )
+    paths = [
+        "src/api/users.py",
+        "src/api/v2/users.py",
+        "deps/poetry.lock",
+        "docs/guide/intro.md",
+        "src/docs/x.md",
+        "a/b.py",
+        "a/x/y/b.py",
+        "pkg/build/out.o",
+        "README.md",
+        "sub/README.md",
+        "src/keep.py",
+        "src/main.py",
+    ]
+    expected = {
+        (path, pattern)
+        for pattern in patterns
+        if not pattern.startswith("!")
+        for path in paths
+        if PathSpec.from_lines("gitwildmatch", [pattern]).match_file(path)
+    }
+    found = {(path, pattern) for path, _holder, pattern in snapshot.conflicts(paths, "Me")}
+    assert found == expected
+
+
+def test_snapshot_skips_own_and_expired_and_honors_ignorecase() -> None:
+    past = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    payload = build_file_reservations_snapshot(
+        [
+            {"agent": "Me", "path_pattern": "src/*.py", "expires_ts": _FUTURE},
+            {"agent": "Old", "path_pattern": "lib/*.py", "expires_ts": past},
+            {"agent": "Other", "path_pattern": "Docs/*.md", "expires_ts": _FUTURE},
+        ]
+    )
+    assert ReservationSnapshot(payload).conflicts(["src/a.py", "lib/b.py", "docs/c.md"], "Me") == []
+    insensitive = ReservationSnapshot(payload, ignorecase=True)
+    assert insensitive.conflicts(["docs/c.md"], "Me") == [("docs/c.md", "Other", "Docs/*.md")]
+
+
+@pytest.mark.benchmark
+def test_snapshot_checks_thousands_of_paths_quickly() -> None:
+    records = [
+        {"agent": f"Agent{i % 50}", "path_pattern": f"services/svc{i}/src/**/*.py", "expires_ts": _FUTURE}
+        for i in range(2000)
+    ]
+    records.append({"agent": "Agent7", "path_pattern": "*.lock", "expires_ts": _FUTURE})
+    snapshot = ReservationSnapshot(build_file_reservations_snapshot(records))
+    paths = [f"apps/app{i}/module{i % 17}/file{i}.ts" for i in range(5000)]
+    paths += ["services/svc42/src/core/models.py", "frontend/yarn.lock"]
+
+    start = time.perf_counter()
+    conflicts = snapshot.conflicts(paths, "Me")
+    elapsed = time.perf_counter() - start
+    print(f"\nsnapshot check: {len(paths)} paths x {len(records)} reservations in {elapsed * 1000:.1f} ms")
+    assert {pattern for _path, _holder, pattern in conflicts} == {"services/svc42/src/**/*.py", "*.lock"}
+    assert elapsed < 1.0
+
+
+def test_precommit_hook_uses_snapshot(isolated_env, tmp_path: Path):
+    async def _seed():
+        archive = await ensure_archive(get_settings(), "backend")
+        # Only the snapshot knows about this reservation; no per-reservation JSON artifact exists
+        await write_file_reservations_snapshot(
+            archive, [{"agent": "Other", "path_pattern": "src/api/*.py", "expires_ts": _FUTURE}]
+        )
+        return archive
+
+    archive = asyncio.run(_seed())
+    script_path = tmp_path / "precommit.py"
+    script_path.write_text(render_precommit_script(archive), encoding="utf-8")
+
+    code_repo = tmp_path / "code"
+    code_repo.mkdir()
+    subprocess.run(["git", "init"], cwd=code_repo, check=True, capture_output=True)
+    target = code_repo / "src" / "api" / "users.py"
+    target.parent.mkdir(parents=True)
+    target.write_text("x", encoding="utf-8")
+    subprocess.run(["git", "add", "src/api/users.py"], cwd=code_repo, check=True)
+
+    env = {**os.environ, "AGENT_NAME": "Me", "WORKTREES_ENABLED": "1"}
+    proc = subprocess.run(["python", str(script_path)], cwd=code_repo, env=env, capture_output=True, text=True)
+    assert proc.returncode == 1
+    assert "src/api/users.py matches src/api/*.py (holder: Other)" in proc.stderr
+
+    # With core.ignorecase the hook matches a differently-cased path, like the CLI check does
+    subprocess.run(["git", "reset", "-q"], cwd=code_repo, check=True)
+    other = code_repo / "SRC" / "Api" / "Users.py"
+    other.parent.mkdir(parents=True)
+    other.write_text("x", encoding="utf-8")
+    subprocess.run(["git", "add", "SRC/Api/Users.py"], cwd=code_repo, check=True)
+    proc = subprocess.run(["python", str(script_path)], cwd=code_repo, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0
+    subprocess.run(["git", "config", "core.ignorecase", "true"], cwd=code_repo, check=True)
+    proc = subprocess.run(["python", str(script_path)], cwd=code_repo, env=env, capture_output=True, text=True)
+    assert proc.returncode == 1
+    assert "SRC/Api/Users.py matches src/api/*.py (holder: Other)" in proc.stderr
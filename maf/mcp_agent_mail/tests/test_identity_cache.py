@@ -0,0 +1,119 @@
+"""In-process Project/Agent identity cache: hits, write-through invalidation, batched lookups."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastmcp import Client
+from sqlalchemy import event
+
+from mcp_agent_mail import app as app_module
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.config import clear_settings_cache
+from mcp_agent_mail.db import get_engine
+
+
+async def _setup(client: Client, names: tuple[str, ...] = ("BlueLake", "GreenCastle")) -> None:
+    await client.call_tool("ensure_project", {"human_key": "/backend"})
+    for name in names:
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+        )
+
+
+@pytest.mark.asyncio
+async def test_repeat_lookups_hit_cache_and_metrics_report_it(isolated_env):
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client)
+        before = app_module._identity_cache_snapshot()
+        for _ in range(3):
+            await client.call_tool("fetch_inbox", {"project_key": "Backend", "agent_name": "bluelake"})
+        after = app_module._identity_cache_snapshot()
+        assert after["hits"] - before["hits"] >= 6  # project + agent per call
+
+        blocks = await client.read_resource("resource://tooling/metrics")
+        payload = json.loads(blocks[0].text)
+        assert payload["identity_cache"]["hits"] >= after["hits"]
+        assert "misses" in payload["identity_cache"]
+
+
+@pytest.mark.asyncio
+async def test_policy_change_invalidates_cached_agent(isolated_env):
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client)
+        project = await app_module._get_project_by_identifier("Backend")
+        agent = await app_module._get_agent(project, "GreenCastle")
+        assert agent.contact_policy == "auto"
+
+        await client.call_tool(
+            "set_contact_policy", {"project_key": "Backend", "agent_name": "GreenCastle", "policy": "block_all"}
+        )
+        refreshed = await app_module._get_agent(project, "greencastle")
+        assert refreshed.contact_policy == "block_all"
+
+
+@pytest.mark.asyncio
+async def test_multi_recipient_resolution_uses_one_query(isolated_env, monkeypatch):
+    names = ("BlueLake", "GreenCastle", "RedStone", "PurpleBear")
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client, names)
+        project = await app_module._get_project_by_identifier("Backend")
+        app_module._IDENTITY_CACHE.clear()
+
+        statements: list[str] = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            if "FROM agents" in statement:
+                statements.append(statement)
+
+        engine = get_engine().sync_engine
+        event.listen(engine, "before_cursor_execute", _capture)
+        try:
+            agents = await app_module._resolve_agents(project, ["greencastle", "RedStone", "PURPLEBEAR"])
+            assert [a.name for a in agents] == ["GreenCastle", "RedStone", "PurpleBear"]
+            assert len(statements) == 1
+            assert " IN " in statements[0].upper()
+
+            # Second resolution is served entirely from the cache
+            statements.clear()
+            await app_module._resolve_agents(project, ["GreenCastle", "RedStone"])
+            assert statements == []
+        finally:
+            event.remove(engine, "before_cursor_execute", _capture)
+
+
+@pytest.mark.asyncio
+async def test_cache_can_be_disabled(isolated_env, monkeypatch):
+    monkeypatch.setenv("IDENTITY_CACHE_ENABLED", "false")
+    clear_settings_cache()
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client)
+        before = app_module._identity_cache_snapshot()
+        await client.call_tool("fetch_inbox", {"project_key": "Backend", "agent_name": "BlueLake"})
+        after = app_module._identity_cache_snapshot()
+        assert after["hits"] == before["hits"]
+        assert after["misses"] == before["misses"]
+    clear_settings_cache()
+
+
+@pytest.mark.asyncio
+async def test_eviction_drops_reverse_mapping(isolated_env, monkeypatch):
+    monkeypatch.setenv("IDENTITY_CACHE_MAX_ENTRIES", "2")
+    clear_settings_cache()
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await _setup(client, ("BlueLake", "GreenCastle", "RedStone"))
+        app_module._IDENTITY_CACHE.clear()
+        project = await app_module._get_project_by_identifier("Backend")
+        for name in ("BlueLake", "GreenCastle", "RedStone"):
+            await app_module._get_agent(project, name)
+        cache = app_module._IDENTITY_CACHE
+        assert len(cache._entries) == 2
+        assert set(cache._keys_by_row.values()) == set(cache._entries)
+    clear_settings_cache()
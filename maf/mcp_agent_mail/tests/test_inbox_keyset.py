@@ -0,0 +1,118 @@
+"""mailbox_entries index maintenance and keyset (before_id/after_id) inbox paging."""
+
+from __future__ import annotations
+
+import pytest
+from fastmcp import Client
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from mcp_agent_mail import config as _config, db as db_module
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.db import get_engine, get_session
+from mcp_agent_mail.http import build_http_app
+
+
+@pytest.fixture
+def mail_env(isolated_env, monkeypatch):
+    monkeypatch.setenv("CONTACT_ENFORCEMENT_ENABLED", "false")
+    _config.clear_settings_cache()
+    return isolated_env
+
+
+async def _setup(client: Client, count: int) -> list[int]:
+    await client.call_tool("ensure_project", {"human_key": "/backend"})
+    for name in ("BlueLake", "GreenCastle"):
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+        )
+    ids = []
+    for idx in range(count):
+        result = await client.call_tool(
+            "send_message",
+            {
+                "project_key": "Backend",
+                "sender_name": "GreenCastle",
+                "to": ["BlueLake"],
+                "subject": f"M{idx}",
+                "body_md": "x",
+                "ack_required": idx == 0,
+            },
+        )
+        ids.append(int(result.data["deliveries"][0]["payload"]["id"]))
+    return ids
+
+
+async def _entries() -> list[tuple]:
+    async with get_session() as session:
+        rows = await session.execute(
+            text("SELECT message_id, kind, read_ts IS NOT NULL, ack_ts IS NOT NULL FROM mailbox_entries ORDER BY message_id")
+        )
+        return [tuple(row) for row in rows.fetchall()]
+
+
+async def _fetch(client: Client, **extra) -> list[int]:
+    result = await client.call_tool(
+        "fetch_inbox", {"project_key": "Backend", "agent_name": "BlueLake", "include_bodies": False, **extra}
+    )
+    return [int(item["id"]) for item in result.structured_content["result"]]
+
+
+@pytest.mark.asyncio
+async def test_mailbox_entries_follow_reads_acks_and_backfill(mail_env):
+    async with Client(build_mcp_server()) as client:
+        ids = await _setup(client, 2)
+        await client.call_tool(
+            "acknowledge_message", {"project_key": "Backend", "agent_name": "BlueLake", "message_id": ids[0]}
+        )
+    expected = [(ids[0], "to", 1, 1), (ids[1], "to", 0, 0)]
+    assert await _entries() == expected
+
+    async with get_session() as session:
+        await session.execute(text("DELETE FROM mailbox_entries"))
+        await session.commit()
+    async with get_engine().begin() as conn:
+        await conn.run_sync(db_module._setup_mailbox_entries)
+    assert await _entries() == expected
+
+
+@pytest.mark.asyncio
+async def test_fetch_inbox_keyset_pages_cover_the_inbox_once(mail_env):
+    async with Client(build_mcp_server()) as client:
+        ids = await _setup(client, 7)
+        newest_first = sorted(ids, reverse=True)
+        assert await _fetch(client, limit=50) == newest_first
+
+        pages, cursor = [], None
+        while True:
+            page = await _fetch(client, limit=3, **({"before_id": cursor} if cursor else {}))
+            if not page:
+                break
+            pages.append(page)
+            cursor = page[-1]
+        assert [mid for page in pages for mid in page] == newest_first
+
+        # Walking back towards newer mail returns the page just above the cursor, still newest-first
+        assert await _fetch(client, limit=3, after_id=newest_first[-1]) == newest_first[3:6]
+
+        with pytest.raises(Exception, match="not found"):
+            await _fetch(client, before_id=999999)
+
+
+@pytest.mark.asyncio
+async def test_html_inbox_renders_cursor_links(mail_env):
+    async with Client(build_mcp_server()) as client:
+        ids = await _setup(client, 5)
+    newest_first = sorted(ids, reverse=True)
+    app = build_http_app(_config.get_settings(), build_mcp_server())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+        first = await http.get("/mail/backend/inbox/BlueLake", params={"limit": 2})
+        assert first.status_code == 200
+        assert f"before_id={newest_first[1]}" in first.text
+        assert "after_id=" not in first.text
+
+        second = await http.get("/mail/backend/inbox/BlueLake", params={"limit": 2, "before_id": newest_first[1]})
+        assert second.status_code == 200
+        assert f"before_id={newest_first[3]}" in second.text
+        assert f"after_id={newest_first[2]}" in second.text
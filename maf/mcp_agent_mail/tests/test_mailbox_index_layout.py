@@ -0,0 +1,125 @@
+"""Index mailbox layout: one canonical message file, per-agent index.jsonl entries."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from typer.testing import CliRunner
+
+from mcp_agent_mail import storage as storage_module
+from mcp_agent_mail.cli import app as cli_app
+from mcp_agent_mail.config import clear_settings_cache, get_settings
+from mcp_agent_mail.db import ensure_schema, get_session
+from mcp_agent_mail.storage import (
+    _append_mailbox_index_line,
+    count_mailbox_entries,
+    ensure_archive,
+    get_archive_tree,
+    get_file_content,
+    get_historical_inbox_snapshot,
+    write_message_bundle,
+)
+
+
+def _message(idx: int) -> dict[str, object]:
+    return {
+        "id": idx,
+        "subject": f"Broadcast {idx}",
+        "created": f"2025-03-0{idx}T10:00:00+00:00",
+        "from": "BlueLake",
+        "to": ["GreenCastle", "RedStone"],
+        "importance": "high",
+    }
+
+
+@pytest.fixture
+def index_layout(isolated_env, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_MAILBOX_LAYOUT", "index")
+    clear_settings_cache()
+    yield
+    clear_settings_cache()
+
+
+@pytest.mark.asyncio
+async def test_index_layout_writes_single_copy(index_layout):
+    archive = await ensure_archive(get_settings(), "backend")
+    await write_message_bundle(archive, _message(1), "hello", "BlueLake", ["GreenCastle", "RedStone"])
+    await write_message_bundle(archive, _message(2), "again", "BlueLake", ["GreenCastle", "RedStone"])
+
+    md_files = sorted(p.relative_to(archive.root).as_posix() for p in archive.root.rglob("*.md"))
+    assert all(path.startswith("messages/2025/03/") for path in md_files)
+    assert len(md_files) == 2
+
+    inbox_index = archive.root / "agents" / "GreenCastle" / "inbox" / "2025" / "03" / "index.jsonl"
+    entries = [json.loads(line) for line in inbox_index.read_text(encoding="utf-8").splitlines()]
+    assert [entry["id"] for entry in entries] == [1, 2]
+    assert entries[0]["path"] in md_files
+    assert count_mailbox_entries(archive.root / "agents" / "RedStone" / "inbox") == 2
+    assert count_mailbox_entries(archive.root / "agents" / "BlueLake" / "outbox") == 2
+
+    # Replaying the same bundle (write-behind retry) does not duplicate index lines
+    await write_message_bundle(archive, _message(2), "again", "BlueLake", ["GreenCastle", "RedStone"])
+    assert len(inbox_index.read_text(encoding="utf-8").splitlines()) == 2
+
+    snapshot = await get_historical_inbox_snapshot(archive, "GreenCastle", "2999-01-01T00:00:00")
+    assert {m["subject"] for m in snapshot["messages"]} == {"Broadcast 1", "Broadcast 2"}
+    assert {m["from"] for m in snapshot["messages"]} == {"BlueLake"}
+
+    tree = await get_archive_tree(archive, "agents/GreenCastle/inbox/2025/03")
+    indexed = [item for item in tree if item["name"] != "index.jsonl"]
+    assert {item["path"] for item in indexed} == set(md_files)
+    mailbox_file = f"agents/GreenCastle/inbox/2025/03/{Path(md_files[0]).name}"
+    content = await get_file_content(archive, mailbox_file)
+    assert content is not None and "Broadcast 1" in content
+
+
+def test_migrate_layout_cli_converts_copies(isolated_env):
+    async def _seed():
+        await ensure_schema()
+        async with get_session() as session:
+            await session.execute(
+                text("INSERT INTO projects (slug, human_key, created_at) VALUES ('backend', '/backend', datetime('now'))")
+            )
+            await session.commit()
+        archive = await ensure_archive(get_settings(), "backend")
+        await write_message_bundle(archive, _message(1), "hello", "BlueLake", ["GreenCastle", "RedStone"])
+        return archive
+
+    archive = asyncio.run(_seed())
+    copy_path = archive.root / "agents" / "RedStone" / "inbox" / "2025" / "03"
+    assert len(list(copy_path.glob("*.md"))) == 1
+
+    runner = CliRunner()
+    dry = runner.invoke(cli_app, ["archive", "migrate-layout", "--project", "backend"])
+    assert dry.exit_code == 0, dry.output
+    assert len(list(copy_path.glob("*.md"))) == 1
+
+    result = runner.invoke(cli_app, ["archive", "migrate-layout", "--project", "backend", "--apply"])
+    assert result.exit_code == 0, result.output
+    assert not list(copy_path.glob("*.md"))
+    assert count_mailbox_entries(archive.root / "agents" / "RedStone" / "inbox") == 1
+    assert count_mailbox_entries(archive.root / "agents" / "BlueLake" / "outbox") == 1
+    assert len(list((archive.root / "messages").rglob("*.md"))) == 1
+
+    assert not archive.repo.is_dirty(untracked_files=True)
+    head = archive.repo.head.commit
+    assert str(head.message).startswith("chore: migrate backend mailboxes")
+    snapshot = asyncio.run(get_historical_inbox_snapshot(archive, "RedStone", "2999-01-01T00:00:00"))
+    assert [m["subject"] for m in snapshot["messages"]] == ["Broadcast 1"]
+
+
+def test_index_append_checks_only_the_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, "_MAILBOX_INDEX_TAIL_BYTES", 200)
+    index_path = tmp_path / "inbox" / "2025" / "03" / "index.jsonl"
+    lines = [json.dumps({"id": idx, "path": f"messages/2025/03/m{idx}.md"}) for idx in range(10)]
+    for line in lines:
+        assert _append_mailbox_index_line(index_path, line)
+    # A replay of the newest bundle is caught by the tail check
+    assert not _append_mailbox_index_line(index_path, lines[-1])
+    # An old line outside the tail window is appended again, and readers collapse it
+    assert _append_mailbox_index_line(index_path, lines[0])
+    assert count_mailbox_entries(tmp_path / "inbox") == 10
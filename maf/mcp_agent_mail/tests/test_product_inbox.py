@@ -0,0 +1,115 @@
+"""Product inbox: one cross-project statement, newest-first merge, bounded per-project fallback."""
+
+from __future__ import annotations
+
+import pytest
+from fastmcp import Client
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from mcp_agent_mail import app as app_module, config as _config
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.db import get_engine, get_session
+
+_PROJECTS = ("/alpha", "/beta", "/gamma", "/delta")
+
+
+@pytest.fixture
+def worktrees_env(isolated_env, monkeypatch):
+    monkeypatch.setenv("WORKTREES_ENABLED", "1")
+    monkeypatch.setenv("CONTACT_ENFORCEMENT_ENABLED", "false")
+    _config.clear_settings_cache()
+    return isolated_env
+
+
+async def _seed(client: Client) -> None:
+    await client.call_tool("ensure_product", {"product_key": "Suite"})
+    for key in _PROJECTS:
+        await client.call_tool("ensure_project", {"human_key": key})
+        await client.call_tool("products_link", {"product_key": "Suite", "project_key": key})
+        # delta has no BlueLake: it must contribute nothing rather than fail the call
+        names = ("GreenCastle",) if key == "/delta" else ("BlueLake", "GreenCastle")
+        for name in names:
+            await client.call_tool(
+                "register_agent",
+                {"project_key": key, "program": "codex", "model": "gpt-5", "name": name},
+            )
+    for idx in range(12):
+        key = _PROJECTS[idx % len(_PROJECTS)]
+        await client.call_tool(
+            "send_message",
+            {
+                "project_key": key,
+                "sender_name": "GreenCastle",
+                "to": ["GreenCastle" if key == "/delta" else "BlueLake"],
+                "subject": f"Update {idx}",
+                "body_md": f"body {idx}",
+                "importance": "urgent" if idx % 3 == 0 else "normal",
+            },
+        )
+    # Spread timestamps so the merge order interleaves projects deterministically
+    async with get_session() as session:
+        await session.execute(
+            text(
+                "UPDATE messages SET created_ts = datetime('2025-01-01', '+' || substr(subject, 8) || ' minutes') "
+                "WHERE subject LIKE 'Update %'"
+            )
+        )
+        await session.commit()
+
+
+async def _fetch(client: Client, **kwargs) -> list[dict]:
+    result = await client.call_tool("fetch_inbox_product", {"product_key": "Suite", "agent_name": "bluelake", **kwargs})
+    return result.structured_content["result"]
+
+
+@pytest.mark.asyncio
+async def test_product_inbox_single_query_matches_fanout(worktrees_env, monkeypatch):
+    per_project_calls: list[int] = []
+    original = app_module._list_inbox
+
+    async def _tracking(project, *args, **kwargs):
+        per_project_calls.append(project.id)
+        return await original(project, *args, **kwargs)
+
+    monkeypatch.setattr(app_module, "_list_inbox", _tracking)
+    async with Client(build_mcp_server()) as client:
+        await _seed(client)
+        statements: list[str] = []
+
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            if "product_project_links" in statement:
+                statements.append(statement)
+
+        engine = get_engine().sync_engine
+        event.listen(engine, "before_cursor_execute", _capture)
+        try:
+            items = await _fetch(client, limit=5)
+        finally:
+            event.remove(engine, "before_cursor_execute", _capture)
+        # Served from the per-agent mailbox index, not the recipients table
+        assert any("mailbox_entries" in sql for sql in statements)
+        assert not any("message_recipients" in sql for sql in statements)
+        assert [item["subject"] for item in items] == ["Update 10", "Update 9", "Update 8", "Update 6", "Update 5"]
+        assert {item["project_id"] for item in items} == {1, 2, 3}
+        assert all(item["from"] == "GreenCastle" and item["kind"] == "to" for item in items)
+        assert "body_md" not in items[0]
+        assert per_project_calls == []
+
+        urgent = await _fetch(client, urgent_only=True, include_bodies=True)
+        assert [item["subject"] for item in urgent] == ["Update 9", "Update 6", "Update 0"]
+        assert urgent[0]["body_md"] == "body 9"
+        since = await _fetch(client, since_ts="2025-01-01T00:08:30+00:00")
+        assert [item["subject"] for item in since] == ["Update 10", "Update 9"]
+        assert await _fetch(client, limit=0) == []
+
+        # Same answers from the bounded per-project fallback when the joined query cannot run
+        async def _broken(*_args, **_kwargs):
+            raise OperationalError("SELECT", {}, Exception("boom"))
+
+        monkeypatch.setattr(app_module, "_list_inbox_product", _broken)
+        monkeypatch.setattr(app_module, "_PRODUCT_FANOUT_CONCURRENCY", 2)
+        assert await _fetch(client, limit=5) == items
+        assert await _fetch(client, urgent_only=True, include_bodies=True) == urgent
+        assert await _fetch(client, since_ts="2025-01-01T00:08:30+00:00") == since
+        assert sorted(set(per_project_calls)) == [1, 2, 3]
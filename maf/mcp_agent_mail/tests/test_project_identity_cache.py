@@ -0,0 +1,91 @@
+"""Persistent project identity cache: hits skip git entirely, metadata changes invalidate, the file is shared."""
+
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from mcp_agent_mail import app as app_module, config as _config
+from mcp_agent_mail.app import _PROJECT_IDENTITY_CACHE, _compute_project_slug, _resolve_project_identity
+
+
+def _git(cwd: Path, *args: str) -> str:
+    cp = subprocess.run(["git", "-C", str(cwd), *args], check=True, capture_output=True, text=True)
+    return cp.stdout.strip()
+
+
+@pytest.fixture
+def remote_mode(isolated_env, tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKTREES_ENABLED", "1")
+    monkeypatch.setenv("PROJECT_IDENTITY_MODE", "git-remote")
+    _config.clear_settings_cache()
+    _PROJECT_IDENTITY_CACHE.clear()
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init")
+    _git(repo, "remote", "add", "origin", "https://github.com/owner/alpha.git")
+    yield repo
+    _PROJECT_IDENTITY_CACHE.clear()
+
+
+def _forbid_git(monkeypatch) -> None:
+    def _boom(*_args, **_kwargs):
+        raise AssertionError("identity cache miss: git was consulted")
+
+    monkeypatch.setattr(app_module, "_git_repo", _boom)
+
+
+def test_repeat_resolution_is_served_without_git(remote_mode, monkeypatch):
+    repo = remote_mode
+    slug = _compute_project_slug(str(repo))
+    ident = _resolve_project_identity(str(repo))
+    assert slug.startswith("alpha-")
+    assert ident["slug"] == slug
+
+    _forbid_git(monkeypatch)
+    assert _compute_project_slug(str(repo)) == slug
+    assert _resolve_project_identity(str(repo / "nested" / "..")) == ident
+
+
+def test_remote_change_invalidates_entry(remote_mode):
+    repo = remote_mode
+    before = _compute_project_slug(str(repo))
+    _git(repo, "remote", "set-url", "origin", "https://github.com/owner/beta-renamed.git")
+    after = _compute_project_slug(str(repo))
+    assert before.startswith("alpha-")
+    assert after.startswith("beta-renamed-")
+
+
+def test_cache_file_is_shared_across_processes(remote_mode, monkeypatch):
+    repo = remote_mode
+    slug = _compute_project_slug(str(repo))
+    cache_file = Path(_config.get_settings().storage.root) / "identity_cache.json"
+    assert cache_file.exists()
+
+    # A fresh process starts with an empty in-memory cache and reads the file
+    _PROJECT_IDENTITY_CACHE.clear()
+    _forbid_git(monkeypatch)
+    assert _compute_project_slug(str(repo)) == slug
+
+
+def test_global_gitconfig_change_invalidates_entry(remote_mode, tmp_path, monkeypatch):
+    repo = remote_mode
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("XDG_CONFIG_HOME", raising=False)
+    assert _resolve_project_identity(str(repo))["core_ignorecase"] is False
+    (home / ".gitconfig").write_text("[core]\n\tignorecase = true\n", encoding="utf-8")
+    assert _resolve_project_identity(str(repo))["core_ignorecase"] is True
+
+
+def test_readonly_lookup_never_writes_private_marker(remote_mode):
+    repo = remote_mode
+    marker = repo / ".git" / "agent-mail" / "project-id"
+    ident = _resolve_project_identity(str(repo), write_marker=False)
+    assert not marker.exists()
+    # The cached read-only entry does not stop a writing lookup from creating the marker
+    assert _resolve_project_identity(str(repo))["project_uid"] == ident["project_uid"]
+    assert marker.read_text(encoding="utf-8").strip() == ident["project_uid"]
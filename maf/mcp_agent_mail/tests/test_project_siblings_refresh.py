@@ -0,0 +1,109 @@
+"""Background project-sibling scoring: page never scores inline, bounded concurrency, mtime-keyed profiles."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+from httpx import ASGITransport, AsyncClient
+
+from mcp_agent_mail import app as app_module, config as _config
+from mcp_agent_mail.app import (
+    _build_project_profile,
+    build_mcp_server,
+    get_project_sibling_data,
+    refresh_project_sibling_suggestions,
+)
+from mcp_agent_mail.http import build_http_app
+from mcp_agent_mail.models import Project
+
+
+async def _ensure_projects(*human_keys: str) -> None:
+    async with Client(build_mcp_server()) as client:
+        for human_key in human_keys:
+            await client.call_tool("ensure_project", {"human_key": human_key})
+
+
+@pytest.mark.asyncio
+async def test_mail_pages_read_precomputed_suggestions_only(isolated_env, monkeypatch):
+    monkeypatch.setenv("LLM_ENABLED", "false")
+    _config.clear_settings_cache()
+    await _ensure_projects("/data/projects/backend_core", "/data/projects/backend_core_ui")
+
+    scored: list[tuple[str, str]] = []
+    original = app_module._score_project_pair
+
+    async def _tracking_score(project_a, profile_a, project_b, profile_b):
+        scored.append((project_a.slug, project_b.slug))
+        return await original(project_a, profile_a, project_b, profile_b)
+
+    monkeypatch.setattr(app_module, "_score_project_pair", _tracking_score)
+
+    app = build_http_app(_config.get_settings(), build_mcp_server())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        for route in ("/mail", "/mail/projects", "/mail/api/unified-inbox"):
+            resp = await client.get(route)
+            assert resp.status_code == 200, route
+    assert scored == []
+    assert await get_project_sibling_data() == {}
+
+    # What the background worker runs each interval
+    assert await refresh_project_sibling_suggestions(max_pairs=5) == 1
+    assert len(scored) == 1
+    data = await get_project_sibling_data()
+    assert len(data) == 2
+    # Fresh rows are not rescored until the TTL lapses
+    assert await refresh_project_sibling_suggestions(max_pairs=5) == 0
+
+
+@pytest.mark.asyncio
+async def test_refresh_scores_pairs_concurrently_with_cap(isolated_env, monkeypatch):
+    await _ensure_projects(*(f"/data/projects/svc_{name}" for name in ("alpha", "beta", "gamma", "delta")))
+    in_flight = 0
+    peak = 0
+
+    async def _slow_score(project_a, profile_a, project_b, profile_b):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return 0.5, "stub"
+
+    monkeypatch.setattr(app_module, "_score_project_pair", _slow_score)
+    assert await refresh_project_sibling_suggestions(max_pairs=10, concurrency=2) == 6
+    assert peak == 2
+    data = await get_project_sibling_data()
+    assert len(data) == 4
+
+
+@pytest.mark.asyncio
+async def test_project_profile_cached_until_file_changes(isolated_env, monkeypatch, tmp_path: Path):
+    readme = tmp_path / "README.md"
+    readme.write_text("# Billing service\n", encoding="utf-8")
+    project = Project(id=1, slug="billing", human_key=str(tmp_path))
+    reads: list[Path] = []
+    original = app_module._read_file_preview
+
+    async def _counting_read(path: Path, *, max_chars: int) -> str:
+        reads.append(path)
+        return await original(path, max_chars=max_chars)
+
+    monkeypatch.setattr(app_module, "_read_file_preview", _counting_read)
+    monkeypatch.setattr(app_module, "_PROJECT_PROFILE_CACHE", {})
+
+    first = await _build_project_profile(project, ["BlueLake"])
+    assert "Billing service" in first
+    assert await _build_project_profile(project, ["BlueLake"]) == first
+    assert reads == [readme]
+
+    readme.write_text("# Billing and invoicing\n", encoding="utf-8")
+    stat = readme.stat()
+    os.utime(readme, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert "invoicing" in await _build_project_profile(project, ["BlueLake"])
+    # A roster change also invalidates the cached profile
+    assert "GreenCastle" in await _build_project_profile(project, ["BlueLake", "GreenCastle"])
+    assert len(reads) == 3
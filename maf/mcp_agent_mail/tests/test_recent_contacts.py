@@ -0,0 +1,147 @@
+"""recent_contacts pair table and approved-link cache behind the send-time contact policy."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+from fastmcp import Client
+from sqlalchemy import event, text
+
+from mcp_agent_mail import config as _config, db as db_module
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.db import get_engine, get_session
+
+
+async def _register(client: Client, *names: str) -> None:
+    await client.call_tool("ensure_project", {"human_key": "/backend"})
+    for name in names:
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+        )
+
+
+async def _send(client: Client, sender: str, to: list[str], **extra):
+    return await client.call_tool(
+        "send_message",
+        {"project_key": "Backend", "sender_name": sender, "to": to, "subject": "Hi", "body_md": "ping", **extra},
+    )
+
+
+async def _pairs() -> list[tuple[str, str]]:
+    async with get_session() as session:
+        rows = await session.execute(
+            text(
+                "SELECT a.name, b.name FROM recent_contacts rc "
+                "JOIN agents a ON a.id = rc.a_agent_id JOIN agents b ON b.id = rc.b_agent_id ORDER BY a.id, b.id"
+            )
+        )
+        return [tuple(row) for row in rows.fetchall()]
+
+
+def _set_enforcement(monkeypatch, enabled: bool) -> None:
+    monkeypatch.setenv("CONTACT_ENFORCEMENT_ENABLED", "true" if enabled else "false")
+    _config.clear_settings_cache()
+
+
+@pytest.mark.asyncio
+async def test_delivery_maintains_pairs_and_backfill_rebuilds_them(isolated_env, monkeypatch):
+    _set_enforcement(monkeypatch, False)
+    async with Client(build_mcp_server()) as client:
+        await _register(client, "BlueLake", "GreenCastle", "RedStone")
+        await _send(client, "GreenCastle", ["BlueLake"])
+        await _send(client, "BlueLake", ["GreenCastle", "RedStone", "BlueLake"])
+    # One row per unordered pair; self-sends are not contacts
+    expected = [("BlueLake", "GreenCastle"), ("BlueLake", "RedStone")]
+    assert await _pairs() == expected
+
+    async with get_session() as session:
+        await session.execute(text("DELETE FROM recent_contacts"))
+        await session.commit()
+    async with get_engine().begin() as conn:
+        await conn.run_sync(db_module._setup_recent_contacts)
+    assert await _pairs() == expected
+
+
+@pytest.mark.asyncio
+async def test_recent_contact_in_either_direction_allows_auto_policy(isolated_env, monkeypatch):
+    monkeypatch.setenv("MESSAGING_AUTO_HANDSHAKE_ON_BLOCK", "false")
+    _set_enforcement(monkeypatch, True)
+    async with Client(build_mcp_server()) as client:
+        await _register(client, "BlueLake", "GreenCastle")
+        with pytest.raises(Exception, match="Contact approval required"):
+            await _send(client, "BlueLake", ["GreenCastle"])
+
+        _set_enforcement(monkeypatch, False)
+        await _send(client, "GreenCastle", ["BlueLake"])
+        _set_enforcement(monkeypatch, True)
+        result = await _send(client, "BlueLake", ["GreenCastle"])
+        assert result.data["deliveries"]
+
+
+@pytest.mark.asyncio
+async def test_link_approval_invalidates_cached_link_set(isolated_env, monkeypatch):
+    monkeypatch.setenv("MESSAGING_AUTO_HANDSHAKE_ON_BLOCK", "false")
+    _set_enforcement(monkeypatch, True)
+    async with Client(build_mcp_server()) as client:
+        await _register(client, "BlueLake", "GreenCastle")
+        await client.call_tool(
+            "set_contact_policy", {"project_key": "Backend", "agent_name": "GreenCastle", "policy": "contacts_only"}
+        )
+        # The blocked attempt caches BlueLake's (empty) approved-link set
+        with pytest.raises(Exception, match="Contact approval required"):
+            await _send(client, "BlueLake", ["GreenCastle"])
+        await client.call_tool(
+            "request_contact", {"project_key": "Backend", "from_agent": "BlueLake", "to_agent": "GreenCastle"}
+        )
+        await client.call_tool(
+            "respond_contact",
+            {"project_key": "Backend", "to_agent": "GreenCastle", "from_agent": "BlueLake", "accept": True},
+        )
+        result = await _send(client, "BlueLake", ["GreenCastle"])
+        assert result.data["deliveries"]
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_broadcast_to_30_recipients_uses_one_contact_lookup(isolated_env, monkeypatch):
+    _set_enforcement(monkeypatch, False)
+    async with Client(build_mcp_server()) as client:
+        await _register(client, "BlueLake")
+        # Generated adjective+noun names pass name enforcement in every mode
+        recipients: list[str] = []
+        for _ in range(30):
+            identity = await client.call_tool(
+                "create_agent_identity", {"project_key": "Backend", "program": "codex", "model": "gpt-5"}
+            )
+            recipients.append(identity.data["name"])
+        for name in recipients:
+            await _send(client, name, ["BlueLake"])
+
+        _set_enforcement(monkeypatch, True)
+        statements: list[str] = []
+
+        def _capture(_conn, _cursor, statement, *_args) -> None:
+            statements.append(statement)
+
+        engine = get_engine().sync_engine
+        event.listen(engine, "before_cursor_execute", _capture)
+        try:
+            rounds = 10
+            start = time.perf_counter()
+            for _ in range(rounds):
+                await _send(client, "BlueLake", recipients)
+            elapsed = time.perf_counter() - start
+        finally:
+            event.remove(engine, "before_cursor_execute", _capture)
+
+    contact_reads = [s for s in statements if "FROM recent_contacts" in s]
+    link_reads = [s for s in statements if "FROM agent_links" in s]
+    print(
+        f"\n{rounds} sends x {len(recipients)} recipients: {elapsed * 1000 / rounds:.1f} ms/send, "
+        f"{len(contact_reads)} recent_contacts + {len(link_reads)} agent_links queries"
+    )
+    assert len(contact_reads) == rounds
+    assert len(link_reads) <= 1  # cached after the first send
+    assert not any("message_recipients mr JOIN agents" in s for s in statements)
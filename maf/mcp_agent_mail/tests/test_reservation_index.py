@@ -0,0 +1,174 @@
+"""Per-project reservation trie: incremental maintenance, pathspec-equivalent conflicts, 5k benchmark."""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastmcp import Client
+from pathspec import PathSpec
+
+from mcp_agent_mail import app as app_module
+from mcp_agent_mail.app import _IndexedReservation, _ProjectReservationIndex, build_mcp_server
+
+_FUTURE = datetime(2999, 1, 1, tzinfo=timezone.utc)
+
+
+def _entry(rid: int, pattern: str, *, agent_id: int = 2, exclusive: bool = True) -> _IndexedReservation:
+    return _IndexedReservation(
+        id=rid, agent_id=agent_id, holder=f"Agent{agent_id}", path_pattern=pattern, exclusive=exclusive, expires_ts=_FUTURE
+    )
+
+
+def _brute_force(patterns: dict[int, str], path: str) -> set[int]:
+    # Previous behaviour: build a PathSpec per reservation for every comparison
+    return {rid for rid, pattern in patterns.items() if PathSpec.from_lines("gitwildmatch", [pattern]).match_file(path)}
+
+
+@pytest.mark.asyncio
+async def test_index_tracks_acquire_release_renew(isolated_env):
+    server = build_mcp_server()
+    async with Client(server) as client:
+        await client.call_tool("ensure_project", {"human_key": "/backend"})
+        for name in ("BlueLake", "GreenCastle"):
+            await client.call_tool(
+                "register_agent",
+                {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+            )
+        first = await client.call_tool(
+            "file_reservation_paths",
+            {"project_key": "Backend", "agent_name": "BlueLake", "paths": ["src/api/*.py"]},
+        )
+        assert first.data["conflicts"] == []
+        loads = app_module._RESERVATION_INDEX.loads
+
+        contested = await client.call_tool(
+            "file_reservation_paths",
+            {"project_key": "Backend", "agent_name": "GreenCastle", "paths": ["src/api/users.py", "docs/x.md"]},
+        )
+        assert [c["path"] for c in contested.data["conflicts"]] == ["src/api/users.py"]
+        dotted = await client.call_tool(
+            "file_reservation_paths",
+            {"project_key": "Backend", "agent_name": "GreenCastle", "paths": ["./src/api/x.py"]},
+        )
+        assert [c["path"] for c in dotted.data["conflicts"]] == ["./src/api/x.py"]
+        assert contested.data["conflicts"][0]["holders"][0]["agent"] == "BlueLake"
+
+        renewed = await client.call_tool(
+            "renew_file_reservations", {"project_key": "Backend", "agent_name": "BlueLake", "extend_seconds": 7200}
+        )
+        project = await app_module._get_project_by_identifier("Backend")
+        assert project.id is not None
+        index = await app_module._RESERVATION_INDEX.get(project.id)
+        blue_id = renewed.data["file_reservations"][0]["id"]
+        assert index.entries[blue_id].expires_ts > datetime.now(timezone.utc) + timedelta(hours=2)
+
+        await client.call_tool("release_file_reservations", {"project_key": "Backend", "agent_name": "BlueLake"})
+        assert blue_id not in index.entries
+        after_release = await client.call_tool(
+            "file_reservation_paths",
+            {"project_key": "Backend", "agent_name": "GreenCastle", "paths": ["src/api/orders.py"]},
+        )
+        assert after_release.data["conflicts"] == []
+        # Every change above was applied in place; the project index was never reloaded from the DB
+        assert app_module._RESERVATION_INDEX.loads == loads
+
+
+def test_trie_candidates_follow_literal_prefix() -> None:
+    index = _ProjectReservationIndex()
+    for rid, pattern in enumerate(["src/api/*.py", "src/**", "docs/*.md", "*.lock", "src\\api\\x.py"]):
+        index.add(_entry(rid, pattern))
+    assert {e.path_pattern for e in index.candidates("src/api/users.py")} == {
+        "src/api/*.py",
+        "src/**",
+        "*.lock",
+        "src\\api\\x.py",
+    }
+    assert {e.path_pattern for e in index.candidates("README.md")} == {"*.lock", "src\\api\\x.py"}
+    index.discard(0)
+    assert "src/api/*.py" not in {e.path_pattern for e in index.candidates("src/api/users.py")}
+
+
+def test_trie_conflicts_match_pathspec() -> None:
+    patterns = {
+        1: "src/api/*.py",
+        2: "src/**",
+        3: "/docs/**",
+        4: "*.lock",
+        5: "a/**/b.py",
+        6: "build/",
+        7: "agents/*/inbox/*/*/*.md",
+        8: "README.md",
+    }
+    index = _ProjectReservationIndex()
+    for rid, pattern in patterns.items():
+        index.add(_entry(rid, pattern))
+    paths = [
+        "src/api/users.py",
+        "src/api/v2/users.py",
+        "docs/guide/intro.md",
+        "sub/docs/x.md",
+        "deps/poetry.lock",
+        "a/x/y/b.py",
+        "pkg/build/out.o",
+        "agents/BlueLake/inbox/2025/10/*.md",
+        "sub/README.md",
+        "app/*.py",
+    ]
+    now = datetime.now(timezone.utc)
+    for path in paths:
+        found = {e.id for e in index.conflicts(path, exclusive=True, agent_id=1, now=now)}
+        assert found == _brute_force(patterns, path), path
+
+
+def test_trie_conflicts_canonicalize_candidate_paths() -> None:
+    index = _ProjectReservationIndex()
+    index.add(_entry(1, "src/api/*.py"))
+    index.add(_entry(2, "build/"))
+    now = datetime.now(timezone.utc)
+    for path in ("./src/api/x.py", "src//api/x.py", "src/./api/x.py", "/src/api/x.py", ".\\src\\api\\x.py"):
+        assert [e.id for e in index.conflicts(path, exclusive=True, agent_id=1, now=now)] == [1], path
+    assert [e.id for e in index.conflicts("./build/out.o", exclusive=True, agent_id=1, now=now)] == [2]
+
+
+def test_trie_conflicts_respect_owner_shared_and_expiry() -> None:
+    index = _ProjectReservationIndex()
+    index.add(_entry(1, "src/*.py", agent_id=1))
+    index.add(_entry(2, "src/*.py", agent_id=2, exclusive=False))
+    expired = _entry(3, "src/*.py", agent_id=3)
+    expired.expires_ts = datetime.now(timezone.utc) - timedelta(seconds=1)
+    index.add(expired)
+    now = datetime.now(timezone.utc)
+    # Own reservations, shared-vs-shared and expired entries never conflict
+    assert index.conflicts("src/a.py", exclusive=False, agent_id=1, now=now) == []
+    assert [e.id for e in index.conflicts("src/a.py", exclusive=True, agent_id=1, now=now)] == [2]
+
+
+@pytest.mark.benchmark
+def test_conflict_checks_with_5k_reservations() -> None:
+    patterns = {rid: f"services/svc{rid % 500}/module{rid}/**/*.py" for rid in range(5000)}
+    patterns[5000] = "*.lock"
+    index = _ProjectReservationIndex()
+    for rid, pattern in patterns.items():
+        index.add(_entry(rid, pattern))
+    paths = [f"services/svc{i % 500}/module{(i * 7) % 5000}/pkg/file{i}.py" for i in range(200)]
+    paths += ["frontend/yarn.lock", "docs/readme.md"]
+    now = datetime.now(timezone.utc)
+
+    start = time.perf_counter()
+    indexed = {path: {e.id for e in index.conflicts(path, exclusive=True, agent_id=-1, now=now)} for path in paths}
+    trie_elapsed = time.perf_counter() - start
+
+    sample = paths[:2] + paths[-2:]
+    start = time.perf_counter()
+    brute = {path: _brute_force(patterns, path) for path in sample}
+    brute_elapsed = (time.perf_counter() - start) * len(paths) / len(sample)
+
+    print(
+        f"\n5k reservations, {len(paths)} paths: trie {trie_elapsed * 1000:.1f} ms, "
+        f"pairwise PathSpec ~{brute_elapsed * 1000:.0f} ms (extrapolated)"
+    )
+    assert all(indexed[path] == brute[path] for path in sample)
+    assert indexed["frontend/yarn.lock"] == {5000}
+    assert trie_elapsed * 20 < brute_elapsed
@@ -4,6 +4,7 @@ import base64
 import json
 import sqlite3
 import threading
+import urllib.error
 import urllib.request
 import warnings
 from pathlib import Path
@@ -15,9 +16,13 @@ import mcp_agent_mail.share as share
 from mcp_agent_mail import cli as cli_module
 from mcp_agent_mail.config import clear_settings_cache
 from mcp_agent_mail.share import (
+    PAGE_INDEX_FILENAME,
+    RANGE_PAGE_SIZE,
     SCRUB_PRESETS,
     ShareExportError,
+    apply_project_scope,
     build_materialized_views,
+    build_page_index,
     bundle_attachments,
     create_performance_indexes,
     finalize_snapshot_for_export,
@@ -117,6 +122,210 @@ def _build_snapshot(tmp_path: Path) -> Path:
     return snapshot
 
 
+def _add_scoped_project(snapshot: Path) -> None:
+    # A second project with its own message and build slot lease, plus cached thread summaries for both projects and a product
+    conn = sqlite3.connect(snapshot)
+    try:
+        conn.executescript(
+            """
+            CREATE TABLE thread_summaries (
+                id INTEGER PRIMARY KEY,
+                scope TEXT,
+                thread_key TEXT,
+                last_message_id INTEGER DEFAULT 0,
+                message_count INTEGER DEFAULT 0,
+                state TEXT DEFAULT '{}',
+                examples TEXT DEFAULT '[]',
+                llm_model TEXT DEFAULT '',
+                llm_message_count INTEGER DEFAULT 0,
+                llm_overrides TEXT DEFAULT '{}'
+            );
+            CREATE TABLE build_slot_leases (
+                id INTEGER PRIMARY KEY,
+                project_id INTEGER NOT NULL REFERENCES projects(id),
+                slot TEXT,
+                agent TEXT,
+                branch TEXT DEFAULT '',
+                status TEXT DEFAULT 'active'
+            );
+            INSERT INTO projects (id, slug, human_key) VALUES (2, 'beta', 'beta-human');
+            INSERT INTO build_slot_leases (id, project_id, slot, agent, branch) VALUES (1, 1, 'ci', 'Alice Agent', 'main');
+            INSERT INTO build_slot_leases (id, project_id, slot, agent, branch) VALUES (2, 2, 'ci', 'Bob Agent', 'beta-secret');
+            INSERT INTO agents (id, project_id, name) VALUES (2, 2, 'Bob Agent');
+            INSERT INTO messages (id, project_id, sender_id, thread_id, subject, body_md, importance, ack_required, created_ts, attachments)
+            VALUES (2, 2, 2, 'thread-2', 'secret /beta', 'x', 'normal', 0, '2025-01-02T00:00:00Z', '[]');
+            """
+        )
+        rows = [
+            (1, "project:1", "thread-1", '[{"subject": "demo plan"}]'),
+            (2, "project:2", "thread-2", '[{"subject": "secret /beta"}]'),
+            (3, "product:7:1,2", "thread-2", '[{"subject": "secret /beta"}]'),
+            (4, "product:8:1", "thread-1", '[{"subject": "demo plan"}]'),
+        ]
+        conn.executemany(
+            "INSERT INTO thread_summaries (id, scope, thread_key, last_message_id, message_count, state, examples) "
+            "VALUES (?, ?, ?, 1, 1, '{\"subjects\": [\"x\"]}', ?)",
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_project_scope_prunes_other_projects_thread_summaries(tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    _add_scoped_project(snapshot)
+
+    result = apply_project_scope(snapshot, ["demo"])
+    assert [record.slug for record in result.projects] == ["demo"]
+
+    conn = sqlite3.connect(snapshot)
+    try:
+        scopes = [row[0] for row in conn.execute("SELECT scope FROM thread_summaries ORDER BY id")]
+        dumped = " ".join(row[0] for row in conn.execute("SELECT examples FROM thread_summaries"))
+    finally:
+        conn.close()
+    assert scopes == ["project:1", "product:8:1"]
+    assert "secret /beta" not in dumped
+
+
+def test_project_scope_prunes_other_projects_build_slot_leases(tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    _add_scoped_project(snapshot)
+
+    apply_project_scope(snapshot, ["demo"])
+
+    conn = sqlite3.connect(snapshot)
+    try:
+        leases = conn.execute("SELECT project_id, branch FROM build_slot_leases ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    assert leases == [(1, "main")]
+
+
+def test_project_scope_prunes_other_projects_archive_commits(tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    _add_scoped_project(snapshot)
+    conn = sqlite3.connect(snapshot)
+    try:
+        conn.executescript(
+            """
+            CREATE TABLE archive_commits (id INTEGER PRIMARY KEY, sha TEXT, subject TEXT);
+            CREATE TABLE archive_commit_entries (
+                id INTEGER PRIMARY KEY,
+                commit_id INTEGER NOT NULL REFERENCES archive_commits(id),
+                project_slug TEXT,
+                subject TEXT,
+                sender TEXT,
+                recipients TEXT DEFAULT '[]'
+            );
+            INSERT INTO archive_commits (id, sha, subject) VALUES (1, 'a1', 'mail: demo plan');
+            INSERT INTO archive_commits (id, sha, subject) VALUES (2, 'b2', 'mail: secret /beta');
+            INSERT INTO archive_commits (id, sha, subject) VALUES (3, 'c3', 'mail: batch of 2');
+            INSERT INTO archive_commit_entries (commit_id, project_slug, subject, sender, recipients)
+            VALUES (1, 'demo', 'demo plan', 'Alice Agent', '["Alice Agent"]');
+            INSERT INTO archive_commit_entries (commit_id, project_slug, subject, sender, recipients)
+            VALUES (2, 'beta', 'secret /beta', 'Bob Agent', '["Bob Agent"]');
+            INSERT INTO archive_commit_entries (commit_id, project_slug, subject, sender, recipients)
+            VALUES (3, 'demo', 'demo follow-up', 'Alice Agent', '[]');
+            INSERT INTO archive_commit_entries (commit_id, project_slug, subject, sender, recipients)
+            VALUES (3, 'beta', 'secret /beta again', 'Bob Agent', '[]');
+            """
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    apply_project_scope(snapshot, ["demo"])
+
+    conn = sqlite3.connect(snapshot)
+    try:
+        commits = [row[0] for row in conn.execute("SELECT sha FROM archive_commits ORDER BY id")]
+        entries = conn.execute("SELECT commit_id, project_slug, sender FROM archive_commit_entries ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    assert commits == ["a1", "c3"]
+    assert entries == [(1, "demo", "Alice Agent"), (3, "demo", "Alice Agent")]
+
+
+def test_project_scope_prunes_other_projects_archive_outbox(tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    _add_scoped_project(snapshot)
+    conn = sqlite3.connect(snapshot)
+    try:
+        conn.executescript(
+            """
+            CREATE TABLE archive_outbox (
+                id INTEGER PRIMARY KEY,
+                project_id INTEGER NOT NULL REFERENCES projects(id),
+                message_id INTEGER NOT NULL REFERENCES messages(id),
+                status TEXT DEFAULT 'pending',
+                payload TEXT DEFAULT '{}'
+            );
+            INSERT INTO archive_outbox (id, project_id, message_id, status, payload) VALUES (1, 1, 1, 'done', '{"subject": "demo plan"}');
+            INSERT INTO archive_outbox (id, project_id, message_id, status, payload) VALUES (2, 2, 2, 'failed', '{"subject": "secret /beta"}');
+            """
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    apply_project_scope(snapshot, ["demo"])
+
+    conn = sqlite3.connect(snapshot)
+    try:
+        remaining = [row[0] for row in conn.execute("SELECT message_id FROM archive_outbox ORDER BY id")]
+    finally:
+        conn.close()
+    assert remaining == [1]
+
+
+def test_project_scope_prunes_other_projects_mailbox_entries(tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    _add_scoped_project(snapshot)
+    conn = sqlite3.connect(snapshot)
+    try:
+        conn.executescript(
+            """
+            CREATE TABLE mailbox_entries (
+                agent_id INTEGER, message_id INTEGER, project_id INTEGER, created_ts TEXT, kind TEXT DEFAULT 'to',
+                PRIMARY KEY (agent_id, message_id)
+            );
+            INSERT INTO mailbox_entries (agent_id, message_id, project_id, created_ts) VALUES (1, 1, 1, '2025-01-01T00:00:00Z');
+            INSERT INTO mailbox_entries (agent_id, message_id, project_id, created_ts) VALUES (2, 2, 2, '2025-01-02T00:00:00Z');
+            """
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    apply_project_scope(snapshot, ["demo"])
+
+    conn = sqlite3.connect(snapshot)
+    try:
+        remaining = [row[0] for row in conn.execute("SELECT message_id FROM mailbox_entries")]
+    finally:
+        conn.close()
+    assert remaining == [1]
+
+
+def test_scrub_clears_thread_summary_state(tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    _add_scoped_project(snapshot)
+
+    summary = scrub_snapshot(snapshot, export_salt=b"unit-test-salt")
+    assert summary.thread_summaries_cleared == 4
+
+    conn = sqlite3.connect(snapshot)
+    try:
+        rows = conn.execute(
+            "SELECT DISTINCT state, examples, llm_overrides, last_message_id FROM thread_summaries"
+        ).fetchall()
+    finally:
+        conn.close()
+    assert rows == [("{}", "[]", "{}", 0)]
+
+
 def _read_message(snapshot: Path) -> tuple[str, str, list[dict[str, object]]]:
     conn = sqlite3.connect(snapshot)
     try:
@@ -165,6 +374,52 @@ def test_scrub_snapshot_pseudonymizes_and_clears(tmp_path: Path) -> None:
     assert "download_url" not in attachments[0]
 
 
+def test_secret_anchors_cover_every_pattern() -> None:
+    # The anchor pre-filter must never skip text that one of the patterns would redact
+    samples = [
+        "ghp_" + "a" * 36,
+        "GITHUB_PAT_" + "b" * 20,
+        "xoxb-" + "1" * 10,
+        "sk-" + "C" * 20,
+        "Authorization: BEARER " + "d" * 16,
+        "eyJhbGciOi.eyJzdWIiOi.c2lnbmF0dXJl",
+    ]
+    for pattern, sample in zip(share.SECRET_PATTERNS, samples, strict=True):
+        assert pattern.search(sample), pattern.pattern
+        scrubbed, count = share._scrub_text(f"prefix {sample} suffix")
+        assert count == 1
+        assert scrubbed == f"prefix {pattern.sub('[REDACTED]', sample)} suffix"
+
+
+def test_scrub_snapshot_parallel_batches_match_serial(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / "serial").mkdir()
+    (tmp_path / "parallel").mkdir()
+    serial = _build_snapshot(tmp_path / "serial")
+    parallel = _build_snapshot(tmp_path / "parallel")
+    for snapshot in (serial, parallel):
+        conn = sqlite3.connect(snapshot)
+        try:
+            conn.executemany(
+                "INSERT INTO messages (id, project_id, sender_id, subject, body_md, attachments) VALUES (?, 1, 1, ?, ?, '[]')",
+                [(i, f"Subject {i}", f"body {i} sk-{'Z' * 24}" if i % 3 == 0 else f"body {i}") for i in range(2, 40)],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    serial_summary = scrub_snapshot(serial, workers=1, batch_size=7)
+    monkeypatch.setattr(share, "SCRUB_PARALLEL_MIN_ROWS", 0)
+    parallel_summary = scrub_snapshot(parallel, workers=2, batch_size=7)
+
+    assert parallel_summary == serial_summary
+    query = "SELECT id, subject, body_md, attachments FROM messages ORDER BY id"
+    with sqlite3.connect(serial) as serial_conn, sqlite3.connect(parallel) as parallel_conn:
+        rows = parallel_conn.execute(query).fetchall()
+        assert rows == serial_conn.execute(query).fetchall()
+    assert len(rows) == 39
+    assert all("sk-" not in row[2] for row in rows)
+
+
 def test_scrub_snapshot_strict_preset(tmp_path: Path) -> None:
     snapshot = _build_snapshot(tmp_path)
 
@@ -479,6 +734,110 @@ def test_start_preview_server_serves_content(tmp_path: Path) -> None:
         thread.join(timeout=2)
 
 
+def test_start_preview_server_serves_byte_ranges(tmp_path: Path) -> None:
+    bundle = tmp_path / "bundle"
+    bundle.mkdir()
+    (bundle / "mailbox.sqlite3").write_bytes(bytes(range(256)) * 4)
+
+    server = cli_module._start_preview_server(bundle, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address[:2]
+        url = f"http://{host}:{port}/mailbox.sqlite3"
+        request = urllib.request.Request(url, headers={"Range": "bytes=256-511"})
+        with urllib.request.urlopen(request, timeout=2) as response:
+            assert response.status == 206
+            assert response.headers["Content-Range"] == "bytes 256-511/1024"
+            assert response.read() == bytes(range(256))
+        suffix = urllib.request.Request(url, headers={"Range": "bytes=-4"})
+        with urllib.request.urlopen(suffix, timeout=2) as response:
+            assert response.read() == bytes([252, 253, 254, 255])
+        with urllib.request.urlopen(url, timeout=2) as response:
+            assert response.status == 200
+            assert response.headers["Accept-Ranges"] == "bytes"
+            assert len(response.read()) == 1024
+        beyond = urllib.request.Request(url, headers={"Range": "bytes=4096-"})
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(beyond, timeout=2)
+        assert excinfo.value.code == 416
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=2)
+
+
+def test_share_export_range_requests_page_index(monkeypatch, tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    monkeypatch.setenv("STORAGE_ROOT", str(tmp_path / "env" / "storage"))
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{snapshot}")
+    monkeypatch.setenv("APP_ENVIRONMENT", "test")
+
+    output_dir = tmp_path / "bundle"
+    clear_settings_cache()
+    try:
+        result = CliRunner().invoke(
+            cli_module.app,
+            ["share", "export", "--output", str(output_dir), "--range-requests", "--no-zip"],
+        )
+        assert result.exit_code == 0, result.output
+
+        manifest = json.loads((output_dir / "manifest.json").read_text())
+        assert manifest["database"]["page_index"]["path"] == PAGE_INDEX_FILENAME
+        assert manifest["export_config"]["range_requests"] is True
+        assert cli_module._load_bundle_export_config(output_dir).range_requests is True
+
+        page_index = json.loads((output_dir / PAGE_INDEX_FILENAME).read_text())
+        db_path = output_dir / "mailbox.sqlite3"
+        assert page_index["page_size"] == RANGE_PAGE_SIZE
+        assert page_index["page_count"] * RANGE_PAGE_SIZE == db_path.stat().st_size
+        assert page_index["database"] == {"path": "mailbox.sqlite3"}
+        conn = sqlite3.connect(db_path)
+        try:
+            root_page, body_column = conn.execute(
+                "SELECT rootpage, (SELECT cid FROM pragma_table_info('messages') WHERE name = 'body_md') "
+                "FROM sqlite_master WHERE name = 'messages'"
+            ).fetchone()
+        finally:
+            conn.close()
+        assert page_index["messages"] == {"root_page": root_page, "body_column": body_column}
+        bootstrap = {page for first, count in page_index["bootstrap"] for page in range(first, first + count)}
+        for name in ("sqlite_schema", "message_overview_mv", "idx_msg_overview_created", "projects"):
+            for first, count in page_index["objects"][name]:
+                assert set(range(first, first + count)) <= bootstrap, name
+    finally:
+        clear_settings_cache()
+
+
+def test_page_index_maps_chunks_and_skips_body_pages(tmp_path: Path) -> None:
+    snapshot = _build_snapshot(tmp_path)
+    conn = sqlite3.connect(snapshot)
+    try:
+        conn.executemany(
+            "INSERT INTO messages (id, project_id, sender_id, thread_id, subject, body_md, importance, ack_required, created_ts, attachments) "
+            "VALUES (?, 1, 1, 'bulk', ?, ?, 'normal', 0, '2025-01-02T00:00:00Z', '[]')",
+            [(idx, f"Bulk {idx}", "lorem ipsum " * 400) for idx in range(2, 3000)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    build_materialized_views(snapshot)
+    finalize_snapshot_for_export(snapshot, page_size=RANGE_PAGE_SIZE)
+
+    output_dir = tmp_path / "bundle"
+    output_dir.mkdir()
+    chunk_manifest = maybe_chunk_database(snapshot, output_dir, threshold_bytes=1, chunk_bytes=64 * RANGE_PAGE_SIZE)
+    assert chunk_manifest is not None
+    page_index = build_page_index(snapshot, output_dir, chunk_manifest=chunk_manifest)
+    assert page_index is not None
+    assert page_index["database"] == {"pattern": "chunks/{index:05d}.bin", "chunk_size": 64 * RANGE_PAGE_SIZE}
+    # The first render reads a small slice of the file; message bodies stay on the server until opened
+    bootstrap_pages = sum(count for _first, count in page_index["bootstrap"])
+    assert bootstrap_pages * 10 < page_index["page_count"]
+    with pytest.raises(ShareExportError):
+        build_page_index(snapshot, tmp_path, chunk_manifest={"chunk_size": 5000, "pattern": "chunks/{index:05d}.bin"})
+
+
 def test_share_export_chunking_and_viewer_data(monkeypatch, tmp_path: Path) -> None:
     snapshot = _build_snapshot(tmp_path)
     storage_root = tmp_path / "env" / "storage"
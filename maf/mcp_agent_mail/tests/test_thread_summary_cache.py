@@ -0,0 +1,182 @@
+"""Thread summary cache: incremental folding past the high-water mark, LLM refresh threshold, hot-thread benchmark."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+from fastmcp import Client
+from sqlalchemy import text
+
+from mcp_agent_mail import app as app_module, config as _config
+from mcp_agent_mail.app import _compute_thread_summary, _get_project_by_identifier, build_mcp_server
+from mcp_agent_mail.db import get_session
+
+_BODIES = [
+    "- kickoff with @GreenCastle\n- [ ] TODO wire `src/api/users.py`",
+    "1. review `docs/plan.md`\n- [x] done with migration\nBLOCKED on @RedStone",
+    "@GreenCastle please check `src/api/orders.py`\n* follow-up item",
+]
+
+
+class _StubOut:
+    def __init__(self, content: str):
+        self.content = content
+        self.model = "m"
+        self.provider = "p"
+
+
+async def _setup(client: Client) -> None:
+    await client.call_tool("ensure_project", {"human_key": "/backend"})
+    for name in ("BlueLake", "GreenCastle"):
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+        )
+
+
+async def _post(client: Client, count: int, *, start: int = 0) -> None:
+    for idx in range(start, start + count):
+        await client.call_tool(
+            "send_message",
+            {
+                "project_key": "Backend",
+                "sender_name": "BlueLake" if idx % 2 else "GreenCastle",
+                "to": ["BlueLake"],
+                "subject": f"Plan {idx}",
+                "body_md": _BODIES[idx % len(_BODIES)] + f"\n- point {idx}",
+                "thread_id": "TKT-1",
+            },
+        )
+
+
+def _track_loads(monkeypatch) -> list[int]:
+    loads: list[int] = []
+    original = app_module._load_thread_rows
+
+    async def _tracking(project_ids, thread_id, *, after_id=0, limit=None):
+        rows = await original(project_ids, thread_id, after_id=after_id, limit=limit)
+        loads.append(len(rows))
+        return rows
+
+    monkeypatch.setattr(app_module, "_load_thread_rows", _tracking)
+    return loads
+
+
+async def _uncached(monkeypatch, project) -> dict:
+    monkeypatch.setenv("THREAD_SUMMARY_CACHE_ENABLED", "false")
+    _config.clear_settings_cache()
+    summary, _examples, _total = await _compute_thread_summary(project, "TKT-1", False, False, None)
+    monkeypatch.delenv("THREAD_SUMMARY_CACHE_ENABLED")
+    _config.clear_settings_cache()
+    return summary
+
+
+@pytest.mark.asyncio
+async def test_cached_summary_folds_only_new_messages(isolated_env, monkeypatch):
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        await _post(client, 12)
+        project = await _get_project_by_identifier("Backend")
+        loads = _track_loads(monkeypatch)
+
+        first = await client.call_tool("summarize_thread", {"project_key": "Backend", "thread_id": "TKT-1", "include_examples": True})
+        assert loads == [12]
+        again = await client.call_tool("summarize_thread", {"project_key": "Backend", "thread_id": "TKT-1", "include_examples": True})
+        # Unchanged thread: served from the cache row without touching message bodies
+        assert loads == [12]
+        assert again.data == first.data
+
+        await _post(client, 3, start=12)
+        grown = await client.call_tool("summarize_thread", {"project_key": "Backend", "thread_id": "TKT-1", "include_examples": True})
+        assert loads == [12, 3]
+        summary = grown.data["summary"]
+        assert summary["total_messages"] == 15
+        assert [example["subject"] for example in grown.data["examples"]] == ["Plan 0", "Plan 1", "Plan 2"]
+        assert summary == await _uncached(monkeypatch, project)
+
+        # Messages removed below the high-water mark force a full rebuild instead of a stale fold
+        async with get_session() as session:
+            await session.execute(text("DELETE FROM messages WHERE subject = 'Plan 4'"))
+            await session.commit()
+        rebuilt, _examples, total = await _compute_thread_summary(project, "TKT-1", False, False, None)
+        assert total == 14 and loads[-1] == 14
+        assert rebuilt == await _uncached(monkeypatch, project)
+
+
+@pytest.mark.asyncio
+async def test_llm_refinement_reused_until_thread_grows(isolated_env, monkeypatch):
+    monkeypatch.setenv("LLM_ENABLED", "true")
+    monkeypatch.setenv("THREAD_SUMMARY_LLM_REFRESH_MESSAGES", "3")
+    _config.clear_settings_cache()
+    calls: list[str] = []
+
+    async def _fake_complete(system, user, **_kwargs):
+        calls.append(user)
+        return _StubOut('{"key_points": ["refined %d"]}' % len(calls))
+
+    monkeypatch.setattr(app_module, "complete_system_user", _fake_complete)
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        await _post(client, 2)
+        args = {"project_key": "Backend", "thread_id": "TKT-1"}
+        first = await client.call_tool("summarize_thread", args)
+        assert first.data["summary"]["key_points"] == ["refined 1"]
+        await client.call_tool("summarize_thread", args)
+        await _post(client, 2, start=2)
+        below_threshold = await client.call_tool("summarize_thread", args)
+        assert len(calls) == 1
+        # Heuristic fields still advance; the stored LLM keys are layered on top
+        assert below_threshold.data["summary"]["total_messages"] == 4
+        assert below_threshold.data["summary"]["key_points"] == ["refined 1"]
+
+        await _post(client, 1, start=4)
+        refreshed = await client.call_tool("summarize_thread", args)
+        assert len(calls) == 2
+        assert refreshed.data["summary"]["key_points"] == ["refined 2"]
+        # A different model is a different refinement
+        await client.call_tool("summarize_thread", {**args, "llm_model": "other"})
+        assert len(calls) == 3
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_hot_thread_summary_is_constant_time(isolated_env, monkeypatch):
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+    total = 3000
+    async with get_session() as session:
+        await session.execute(
+            text(
+                "INSERT INTO messages(project_id, sender_id, thread_id, subject, body_md, importance, ack_required, created_ts, attachments) "
+                "VALUES (1, :sender, 'HOT', :subject, :body, 'normal', 0, datetime('now'), '[]')"
+            ),
+            [
+                {"sender": 1 + idx % 2, "subject": f"Hot {idx}", "body": _BODIES[idx % len(_BODIES)] * 4}
+                for idx in range(total)
+            ],
+        )
+        await session.commit()
+    project = await _get_project_by_identifier("Backend")
+
+    monkeypatch.setenv("THREAD_SUMMARY_CACHE_ENABLED", "false")
+    _config.clear_settings_cache()
+    start = time.perf_counter()
+    expected, _examples, _count = await _compute_thread_summary(project, "HOT", False, False, None)
+    uncached_elapsed = time.perf_counter() - start
+
+    monkeypatch.delenv("THREAD_SUMMARY_CACHE_ENABLED")
+    _config.clear_settings_cache()
+    await _compute_thread_summary(project, "HOT", False, False, None)
+    start = time.perf_counter()
+    for _ in range(10):
+        summary, _examples, count = await _compute_thread_summary(project, "HOT", False, False, None)
+    cached_elapsed = (time.perf_counter() - start) / 10
+
+    print(
+        f"\n{total}-message thread: uncached summary {uncached_elapsed * 1000:.1f} ms, "
+        f"cached {cached_elapsed * 1000:.2f} ms"
+    )
+    assert count == total
+    assert summary == expected
+    assert cached_elapsed * 5 < uncached_elapsed
@@ -0,0 +1,142 @@
+"""Time-travel commit index: binary search past 10k commits, incremental upkeep, DB-backed snapshots."""
+
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastmcp import Client
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import update
+
+from mcp_agent_mail import config as _config
+from mcp_agent_mail.app import build_mcp_server
+from mcp_agent_mail.config import get_settings
+from mcp_agent_mail.db import get_session
+from mcp_agent_mail.http import build_http_app
+from mcp_agent_mail.models import Message
+from mcp_agent_mail.storage import (
+    _commit_index_path,
+    ensure_archive,
+    find_commit_at,
+    get_historical_inbox_snapshot,
+    write_message_bundle,
+)
+
+_BASE_TS = 1_700_000_000
+
+
+def _fast_import(repo_root, count: int) -> None:
+    """Append ``count`` commits one minute apart (each rewrites one inbox file) straight into the object store."""
+    parent = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_root, capture_output=True, text=True).stdout.strip()
+    path = "projects/backend/agents/GreenCastle/inbox/2023/11/2023-11-14T00-00-00Z__deep__1000.md"
+    lines: list[str] = []
+    for idx in range(count):
+        content = f"---json\n{{\"from\": \"BlueLake\", \"subject\": \"Deep {idx}\"}}\n---\n\nbody\n"
+        lines += [
+            "commit refs/heads/master",
+            f"committer mcp-agent <mcp-agent@example.com> {_BASE_TS + idx * 60} +0000",
+            f"data {len(f'deep {idx}')}",
+            f"deep {idx}",
+        ]
+        if idx == 0 and parent:
+            lines.append(f"from {parent}")
+        lines += [f"M 100644 inline {path}", f"data {len(content.encode())}", content]
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=repo_root, input="\n".join(lines) + "\n", text=True, check=True)
+    subprocess.run(["git", "checkout", "-q", "-f", "master"], cwd=repo_root, check=True)
+
+
+@pytest.mark.asyncio
+async def test_commit_index_finds_commits_beyond_ten_thousand(isolated_env):
+    archive = await ensure_archive(get_settings(), "backend")
+    await asyncio.to_thread(_fast_import, archive.repo_root, 12_000)
+
+    oldest = datetime.fromtimestamp(_BASE_TS + 30, tz=timezone.utc)
+    start = time.perf_counter()
+    commit = await find_commit_at(archive.repo, oldest)
+    build_elapsed = time.perf_counter() - start
+    assert commit is not None and commit.message.strip() == "deep 0"
+
+    lookups = [_BASE_TS + 59, _BASE_TS + 5_000 * 60, _BASE_TS + 11_999 * 60 + 5]
+    start = time.perf_counter()
+    found = [await find_commit_at(archive.repo, datetime.fromtimestamp(ts, tz=timezone.utc)) for ts in lookups]
+    lookup_elapsed = (time.perf_counter() - start) / len(lookups)
+    assert [c.message.strip() for c in found if c] == ["deep 0", "deep 5000", "deep 11999"]
+    assert await find_commit_at(archive.repo, datetime(2000, 1, 1, tzinfo=timezone.utc)) is None
+    print(f"\n12k-commit archive: index build {build_elapsed * 1000:.0f} ms, lookup {lookup_elapsed * 1000:.2f} ms")
+    assert lookup_elapsed < 0.05
+
+    # The old 10k-commit walk never reached this far back; the Git fallback now does
+    snapshot = await get_historical_inbox_snapshot(archive, "GreenCastle", "2023-11-14T22:13:30Z")
+    assert snapshot["commit_sha"] == commit.hexsha
+    assert [m["subject"] for m in snapshot["messages"]] == ["Deep 0"]
+
+    # New archive commits append one record instead of re-walking history
+    index_path = _commit_index_path(archive.repo)
+    size = index_path.stat().st_size
+    message = {"id": 1, "subject": "Fresh", "created": datetime.now(timezone.utc).isoformat()}
+    await write_message_bundle(archive, message, "body", "BlueLake", ["GreenCastle"])
+    assert index_path.stat().st_size == size + 28
+    latest = await find_commit_at(archive.repo, datetime.now(timezone.utc))
+    assert latest is not None and latest.hexsha == archive.repo.head.commit.hexsha
+
+    # Rewritten history (restore/reset) is detected and the index rebuilt
+    target = found[1].hexsha
+    await asyncio.to_thread(
+        subprocess.run, ["git", "reset", "-q", "--hard", target], cwd=archive.repo_root, check=True
+    )
+    again = await find_commit_at(archive.repo, datetime.now(timezone.utc))
+    assert again is not None and again.hexsha == target
+    assert index_path.stat().st_size < size
+
+
+@pytest.mark.asyncio
+async def test_snapshot_route_answers_from_database(isolated_env, monkeypatch):
+    monkeypatch.setenv("CONTACT_ENFORCEMENT_ENABLED", "false")
+    _config.clear_settings_cache()
+    async with Client(build_mcp_server()) as client:
+        await client.call_tool("ensure_project", {"human_key": "/backend"})
+        for name in ("BlueLake", "GreenCastle"):
+            await client.call_tool(
+                "register_agent",
+                {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+            )
+        for idx in range(3):
+            await client.call_tool(
+                "send_message",
+                {"project_key": "Backend", "sender_name": "BlueLake", "to": ["GreenCastle"], "subject": f"Step {idx}", "body_md": "x"},
+            )
+    async with get_session() as session:
+        for idx in range(3):
+            await session.execute(
+                update(Message)
+                .where(Message.subject == f"Step {idx}")
+                .values(created_ts=datetime(2025, 3, 1, 12, idx * 10, tzinfo=timezone.utc))
+            )
+        await session.commit()
+
+    app = build_http_app(_config.get_settings(), build_mcp_server())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+        resp = await http.get(
+            "/mail/archive/time-travel/snapshot",
+            params={"project": "backend", "agent": "GreenCastle", "timestamp": "2025-03-01T12:15:00Z"},
+        )
+        data = resp.json()
+        assert data["source"] == "database"
+        assert [m["subject"] for m in data["messages"]] == ["Step 1", "Step 0"]
+        assert data["messages"][0]["from"] == "BlueLake"
+        assert data["messages"][0]["date"] == "2025-03-01T12-10-00Z"
+        # Archive commits were all made "now", so none precede the requested time
+        assert data["commit_sha"] is None and data["note"]
+
+        current = await http.get(
+            "/mail/archive/time-travel/snapshot",
+            params={"project": "backend", "agent": "GreenCastle", "timestamp": "2099-01-01T00:00:00+05:30"},
+        )
+        latest = current.json()
+        assert [m["subject"] for m in latest["messages"]] == ["Step 2", "Step 1", "Step 0"]
+        archive = await ensure_archive(_config.get_settings(), "backend")
+        assert latest["commit_sha"] == archive.repo.head.commit.hexsha
@@ -0,0 +1,191 @@
+"""wait_for_mail long-poll: wake-up on delivery, since_ts catch-up, timeouts, and the SSE endpoint's guards."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastmcp import Client
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from mcp_agent_mail import app as app_module, config as _config, http as http_module
+from mcp_agent_mail.app import _get_agent, _get_project_by_identifier, _wait_for_inbox, build_mcp_server
+from mcp_agent_mail.db import get_session
+from mcp_agent_mail.http import build_http_app
+
+
+@pytest.fixture
+def mail_env(isolated_env, monkeypatch):
+    monkeypatch.setenv("CONTACT_ENFORCEMENT_ENABLED", "false")
+    _config.clear_settings_cache()
+    return isolated_env
+
+
+async def _setup(client: Client) -> None:
+    await client.call_tool("ensure_project", {"human_key": "/backend"})
+    for name in ("BlueLake", "GreenCastle"):
+        await client.call_tool(
+            "register_agent",
+            {"project_key": "Backend", "program": "codex", "model": "gpt-5", "name": name},
+        )
+
+
+async def _send(client: Client, subject: str) -> dict:
+    result = await client.call_tool(
+        "send_message",
+        {"project_key": "Backend", "sender_name": "GreenCastle", "to": ["BlueLake"], "subject": subject, "body_md": "x"},
+    )
+    return result.data["deliveries"][0]["payload"]
+
+
+@pytest.mark.asyncio
+async def test_delivery_wakes_waiter_without_polling(mail_env, monkeypatch):
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        project = await _get_project_by_identifier("Backend")
+        agent = await _get_agent(project, "BlueLake")
+
+        queries = 0
+        real_list_inbox = app_module._list_inbox
+
+        async def _counting(*args, **kwargs):
+            nonlocal queries
+            queries += 1
+            return await real_list_inbox(*args, **kwargs)
+
+        monkeypatch.setattr(app_module, "_list_inbox", _counting)
+        waiter = asyncio.create_task(
+            _wait_for_inbox(
+                project, agent, since_ts=None, timeout_seconds=20, limit=10, urgent_only=False, include_bodies=False
+            )
+        )
+        await asyncio.sleep(0.3)
+        assert not waiter.done()
+        assert queries == 1  # the up-front check only; idle waiting does no database work
+
+        started = time.monotonic()
+        await _send(client, "Wake up")
+        items = await asyncio.wait_for(waiter, timeout=5)
+        assert time.monotonic() - started < 2
+        assert [item["subject"] for item in items] == ["Wake up"]
+        assert queries == 2
+
+
+@pytest.mark.asyncio
+async def test_tool_returns_backlog_immediately_and_empty_on_timeout(mail_env):
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        first = await _send(client, "Before")
+
+        backlog = await client.call_tool(
+            "wait_for_mail",
+            {"project_key": "Backend", "agent_name": "BlueLake", "since_ts": "2000-01-01T00:00:00+00:00"},
+        )
+        assert [item["subject"] for item in backlog.structured_content["result"]] == ["Before"]
+
+        started = time.monotonic()
+        idle = await client.call_tool(
+            "wait_for_mail",
+            {"project_key": "Backend", "agent_name": "BlueLake", "since_ts": first["created_ts"], "timeout_seconds": 0.2},
+        )
+        assert idle.structured_content["result"] == []
+        assert time.monotonic() - started < 5
+
+
+@pytest.mark.asyncio
+async def test_inbox_events_rejects_unknown_agent_and_bad_cursor(mail_env):
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+    app = build_http_app(_config.get_settings(), build_mcp_server())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+        missing = await http.get("/api/projects/backend/agents/NoSuchAgent/inbox/events")
+        assert missing.status_code == 404
+        bad = await http.get("/api/projects/backend/agents/BlueLake/inbox/events", params={"since_ts": "yesterday"})
+        assert bad.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_tool_drains_backlog_larger_than_limit_in_order(mail_env):
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        subjects = [f"Burst {idx}" for idx in range(5)]
+        for subject in subjects:
+            await _send(client, subject)
+
+        received: list[str] = []
+        cursor = "2000-01-01T00:00:00+00:00"
+        while True:
+            page = await client.call_tool(
+                "wait_for_mail",
+                {"project_key": "Backend", "agent_name": "BlueLake", "since_ts": cursor, "limit": 2, "timeout_seconds": 0.2},
+            )
+            items = page.structured_content["result"]
+            if not items:
+                break
+            received.extend(item["subject"] for item in items)
+            cursor = items[-1]["created_ts"]
+        assert received == subjects
+
+
+@pytest.mark.asyncio
+async def test_tool_after_id_cursor_keeps_messages_sharing_a_timestamp(mail_env):
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        subjects = [f"Same {idx}" for idx in range(4)]
+        for subject in subjects:
+            await _send(client, subject)
+        # One burst, one timestamp: a strict since_ts cursor would skip whatever a page boundary cuts off
+        async with get_session() as session:
+            for table in ("messages", "mailbox_entries"):
+                await session.execute(text(f"UPDATE {table} SET created_ts = '2025-01-01 00:00:00.000000'"))
+            await session.commit()
+
+        received: list[str] = []
+        after_id = None
+        while True:
+            arguments = {"project_key": "Backend", "agent_name": "BlueLake", "limit": 3, "timeout_seconds": 0.2}
+            if after_id is None:
+                arguments["since_ts"] = "2000-01-01T00:00:00+00:00"
+            else:
+                arguments["after_id"] = after_id
+            page = await client.call_tool("wait_for_mail", arguments)
+            items = page.structured_content["result"]
+            if not items:
+                break
+            received.extend(item["subject"] for item in items)
+            after_id = items[-1]["id"]
+        assert received == subjects
+
+
+class _Connected:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+@pytest.mark.asyncio
+async def test_inbox_events_stream_every_message_of_a_burst_larger_than_a_batch(mail_env, monkeypatch):
+    monkeypatch.setattr(http_module, "_INBOX_EVENTS_BATCH", 2)
+    async with Client(build_mcp_server()) as client:
+        await _setup(client)
+        sent = [await _send(client, f"Burst {idx}") for idx in range(5)]
+    app = build_http_app(_config.get_settings(), build_mcp_server())
+    route = next(r for r in app.routes if getattr(r, "path", "") == "/api/projects/{project}/agents/{agent}/inbox/events")
+    response = await route.endpoint(
+        request=_Connected(), project="backend", agent="BlueLake", since_ts="2000-01-01T00:00:00+00:00"
+    )
+
+    async def _collect(count: int) -> list[dict]:
+        events: list[dict] = []
+        async for chunk in response.body_iterator:
+            if "event: message" in chunk:
+                events.append(json.loads(chunk.split("data: ", 1)[1]))
+                if len(events) == count:
+                    break
+        return events
+
+    events = await asyncio.wait_for(_collect(len(sent)), timeout=10)
+    await response.body_iterator.aclose()
+    assert [event["id"] for event in events] == [item["id"] for item in sent]
@@ -5,18 +5,29 @@ AGENT_NAME="${1:-}"
 LIMIT="${2:-10}"
 PROJECT_KEY="${AGENT_MAIL_PROJECT:-/root/projects/roundtable}"
 MCP_URL="${AGENT_MAIL_MCP_URL:-http://127.0.0.1:8765/mcp/}"
+# >0: block up to this many seconds for new mail (wait_for_mail) instead of returning the current inbox
+WAIT_SECONDS="${AGENT_MAIL_WAIT_SECONDS:-0}"
 
 if [[ -z "$AGENT_NAME" ]]; then
   echo "Agent Mail: missing agent name"
   exit 0
 fi
 
+if [[ "$WAIT_SECONDS" =~ ^[0-9]+$ && "$WAIT_SECONDS" -gt 0 ]]; then
+payload=$(cat <<EOF
+{"jsonrpc":"2.0","id":"wait_for_mail","method":"tools/call","params":{"name":"wait_for_mail","arguments":{"project_key":"$PROJECT_KEY","agent_name":"$AGENT_NAME","limit":$LIMIT,"include_bodies":false,"timeout_seconds":$WAIT_SECONDS}}}
+EOF
+)
+  max_time=$((WAIT_SECONDS + 10))
+else
 payload=$(cat <<EOF
 {"jsonrpc":"2.0","id":"fetch_inbox","method":"tools/call","params":{"name":"fetch_inbox","arguments":{"project_key":"$PROJECT_KEY","agent_name":"$AGENT_NAME","limit":$LIMIT,"include_bodies":false}}}
 EOF
 )
+  max_time=30
+fi
 
-response=$(curl -s -H "Content-Type: application/json" -d "$payload" "$MCP_URL" || true)
+response=$(curl -s --max-time "$max_time" -H "Content-Type: application/json" -d "$payload" "$MCP_URL" || true)
 
 if [[ -z "$response" ]]; then
   echo "Agent Mail: fetch failed"
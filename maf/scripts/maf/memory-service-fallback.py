@@ -7,7 +7,9 @@ Uses simple file-based storage when Memlayer is not available
 import os
 import sys
 import json
+import math
 import re
+import heapq
 from datetime import datetime
 from pathlib import Path
 
@@ -15,6 +17,182 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 DEFAULT_STORAGE_PATH = os.getenv("MEMLAYER_STORAGE_PATH") or str(PROJECT_ROOT / ".maf" / "state" / "memory")
 DEFAULT_MAX_MEMORIES = int(os.getenv("MAF_MEMORY_MAX_PER_AGENT", "200"))
 
+MEMORY_CATEGORIES = ("code_changes", "decisions", "context", "errors", "communication")
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+def _tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def _file_stamp(path):
+    """Size and mtime of the memory JSONL; the index is trusted only while these match"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class MemoryIndex:
+    """
+    BM25 inverted index over individual memory items (one document per item)
+    Persisted as <agent>_memories.idx.json beside the JSONL and updated incrementally;
+    rebuilt from the JSONL whenever the file was changed behind its back (clean, manual edits)
+    """
+
+    VERSION = 1
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.docs = {}           # doc_id -> {seq, category, bead_id, timestamp, content, len, tf}
+        self.postings = {}       # term -> set(doc_id)
+        self.by_bead = {}        # bead_id -> set(doc_id)
+        self.by_category = {}    # category -> set(doc_id)
+        self.total_len = 0
+        self.next_doc = 0
+        self.next_seq = 0        # sequence number of the next memory record (line) appended
+        self.record_count = 0
+        self.source = None       # _file_stamp() of the JSONL this index reflects
+
+    @classmethod
+    def build(cls, jsonl_path):
+        index = cls()
+        if jsonl_path.exists():
+            with open(jsonl_path, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        index.add_memory(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        index.source = _file_stamp(jsonl_path)
+        return index
+
+    @classmethod
+    def load(cls, index_path):
+        try:
+            with open(index_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if data.get("version") != cls.VERSION:
+            return None
+        index = cls()
+        for key in ("total_len", "next_doc", "next_seq", "record_count", "source"):
+            setattr(index, key, data.get(key))
+        for doc_id, doc in data.get("docs", {}).items():
+            index._link(int(doc_id), doc)
+        return index
+
+    def save(self, index_path):
+        payload = {
+            "version": self.VERSION,
+            "total_len": self.total_len,
+            "next_doc": self.next_doc,
+            "next_seq": self.next_seq,
+            "record_count": self.record_count,
+            "source": self.source,
+            "docs": self.docs,
+        }
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, index_path)
+
+    def _link(self, doc_id, doc):
+        self.docs[doc_id] = doc
+        for term in doc["tf"]:
+            self.postings.setdefault(term, set()).add(doc_id)
+        self.by_bead.setdefault(doc.get("bead_id"), set()).add(doc_id)
+        self.by_category.setdefault(doc["category"], set()).add(doc_id)
+
+    def add_memory(self, memory):
+        """Index every item of one memory record (one JSONL line)"""
+        seq = self.next_seq
+        self.next_seq += 1
+        self.record_count += 1
+        for category, items in (memory.get('categories') or {}).items():
+            for item in items or []:
+                tf = {}
+                terms = _tokenize(item)
+                for term in terms:
+                    tf[term] = tf.get(term, 0) + 1
+                doc = {
+                    "seq": seq,
+                    "category": category,
+                    "bead_id": memory.get('bead_id'),
+                    "timestamp": memory.get('timestamp'),
+                    "content": item,
+                    "len": len(terms),
+                    "tf": tf,
+                }
+                self._link(self.next_doc, doc)
+                self.total_len += len(terms)
+                self.next_doc += 1
+
+    def keep_recent(self, keep):
+        """Drop items of all but the newest `keep` records (mirrors _cleanup_old_memories)"""
+        if self.record_count <= keep:
+            return
+        min_seq = self.next_seq - keep
+        for doc_id in [d for d, doc in self.docs.items() if doc["seq"] < min_seq]:
+            doc = self.docs.pop(doc_id)
+            self.total_len -= doc["len"]
+            for term in doc["tf"]:
+                self._unlink(self.postings, term, doc_id)
+            self._unlink(self.by_bead, doc.get("bead_id"), doc_id)
+            self._unlink(self.by_category, doc["category"], doc_id)
+        self.record_count = keep
+
+    @staticmethod
+    def _unlink(mapping, key, doc_id):
+        bucket = mapping.get(key)
+        if bucket is not None:
+            bucket.discard(doc_id)
+            if not bucket:
+                del mapping[key]
+
+    def search(self, query, bead_id=None, category=None, limit=5):
+        """
+        Top `limit` items by BM25 score, restricted to the bead/category posting sets
+        Falls back to the most recent items when nothing matches the query
+        """
+        candidates = None
+        if bead_id:
+            candidates = self.by_bead.get(bead_id, set())
+        if category:
+            in_category = self.by_category.get(category, set())
+            candidates = in_category if candidates is None else candidates & in_category
+        if candidates is not None and not candidates:
+            return []
+
+        scores = {}
+        total_docs = len(self.docs)
+        avg_len = (self.total_len / total_docs) if total_docs else 0.0
+        for term in set(_tokenize(query or "")):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            matched = posting if candidates is None else (
+                posting & candidates if len(posting) > len(candidates) else candidates & posting
+            )
+            for doc_id in matched:
+                doc = self.docs[doc_id]
+                tf = doc["tf"][term]
+                norm = 1 - self.B + self.B * (doc["len"] / avg_len if avg_len else 0.0)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + self.K1 * norm)
+
+        if scores:
+            # Ties go to the newer item
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda entry: (entry[1], entry[0]))
+            return [self.docs[doc_id] for doc_id, _score in ranked]
+        pool = self.docs.keys() if candidates is None else candidates
+        return [self.docs[doc_id] for doc_id in heapq.nlargest(limit, pool)]
+
 class SimpleMemoryService:
     """
     Simple file-based memory service as fallback when Memlayer fails
@@ -25,6 +203,24 @@ class SimpleMemoryService:
         """Initialize simple memory service"""
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        self._indexes = {}
+
+    def _index_path(self, agent_name):
+        return self.storage_path / f"{agent_name}_memories.idx.json"
+
+    def _load_index(self, agent_name):
+        """Return the agent's index, rebuilding it if it no longer matches the JSONL"""
+        agent_file = self.storage_path / f"{agent_name}_memories.jsonl"
+        stamp = _file_stamp(agent_file)
+        index = self._indexes.get(agent_name)
+        if index is None or index.source != stamp:
+            index = MemoryIndex.load(self._index_path(agent_name))
+        if index is None or index.source != stamp:
+            index = MemoryIndex.build(agent_file)
+            if stamp is not None:
+                index.save(self._index_path(agent_name))
+        self._indexes[agent_name] = index
+        return index
 
     def extract_memories(self, content, agent_name="unknown", bead_id=None):
         """
@@ -99,19 +295,29 @@ class SimpleMemoryService:
 
         # Create agent-specific memory file
         agent_file = self.storage_path / f"{agent_name}_memories.jsonl"
+        index = self._load_index(agent_name)
 
         # Append new memories
         with open(agent_file, 'a') as f:
             json.dump(memories, f)
             f.write('\n')
 
-        # Keep only recent memories
-        self._cleanup_old_memories(agent_file, keep=DEFAULT_MAX_MEMORIES)
+        # Keep only recent memories (the index knows the record count, so this rarely touches the file)
+        self._cleanup_old_memories(agent_file, keep=DEFAULT_MAX_MEMORIES, record_count=index.record_count + 1)
+
+        # Apply the same append + trim to the index instead of re-reading the file
+        index.add_memory(memories)
+        index.keep_recent(DEFAULT_MAX_MEMORIES)
+        index.source = _file_stamp(agent_file)
+        index.save(self._index_path(agent_name))
 
         return memories
 
     def retrieve_relevant_memories(self, query, agent_name=None, bead_id=None, limit=5):
-        """Retrieve relevant memories"""
+        """
+        Retrieve the memory items most relevant to `query`
+        Each category holds its top `limit` items by BM25 score (most recent items if nothing matches)
+        """
         if not agent_name:
             return self._empty_categories()
 
@@ -119,32 +325,15 @@ class SimpleMemoryService:
         if not agent_file.exists():
             return self._empty_categories()
 
-        # Read all memories for agent
-        memories = []
-        with open(agent_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    memories.append(json.loads(line))
-
-        # Filter by bead if specified
-        if bead_id:
-            memories = [m for m in memories if m.get('bead_id') == bead_id]
-
-        # Get most recent memories
-        memories = memories[-limit:] if limit else memories
-
-        # Organize by category
+        index = self._load_index(agent_name)
         organized = self._empty_categories()
-
-        for memory in memories:
-            for category, items in memory.get('categories', {}).items():
-                if category in organized and items:
-                    for item in items:
-                        organized[category].append({
-                            "content": item,
-                            "timestamp": memory.get('timestamp'),
-                            "bead_id": memory.get('bead_id')
-                        })
+        for category in organized:
+            for doc in index.search(query, bead_id=bead_id, category=category, limit=limit or len(index.docs)):
+                organized[category].append({
+                    "content": doc["content"],
+                    "timestamp": doc.get('timestamp'),
+                    "bead_id": doc.get('bead_id')
+                })
 
         return organized
 
@@ -188,33 +377,35 @@ class SimpleMemoryService:
 
     def _empty_categories(self):
         """Return empty categories structure"""
-        return {
-            "code_changes": [],
-            "decisions": [],
-            "context": [],
-            "errors": [],
-            "communication": []
-        }
+        return {category: [] for category in MEMORY_CATEGORIES}
 
-    def _cleanup_old_memories(self, file_path, keep=50):
-        """Keep only the most recent memories"""
+    def _cleanup_old_memories(self, file_path, keep=50, record_count=None):
+        """
+        Keep only the most recent memories
+        `record_count` (from the agent's index) skips the file entirely while under the limit
+        """
+        if record_count is not None and record_count <= keep:
+            return
         if not file_path.exists():
             return
 
-        memories = []
         with open(file_path, 'r') as f:
-            for line in f:
-                if line.strip():
-                    memories.append(json.loads(line))
-
-        # Keep only the most recent
-        memories = memories[-keep:]
+            lines = [line for line in f if line.strip()]
+        if len(lines) <= keep:
+            return
 
-        # Write back
+        # Records are one JSON object per line, so trimming never needs to parse them
         with open(file_path, 'w') as f:
-            for memory in memories:
-                json.dump(memory, f)
-                f.write('\n')
+            f.writelines(lines[-keep:])
+
+    def _reindex_after_clean(self, file_path, agent_name):
+        """Rebuild (or drop) the BM25 sidecar of a memory file that clean_memories rewrote"""
+        self._indexes.pop(agent_name, None)
+        index_path = self._index_path(agent_name)
+        if file_path.exists():
+            MemoryIndex.build(file_path).save(index_path)
+        elif index_path.exists():
+            index_path.unlink()
 
     def clean_memories(self, agent_name=None, days=30, scope="age", dry_run=False, force=False):
         """
@@ -312,10 +503,14 @@ class SimpleMemoryService:
 
                 # Write back if not dry run
                 if not dry_run and deleted_count > 0:
-                    with open(file_path, 'w') as f:
-                        for memory in filtered_memories:
-                            json.dump(memory, f)
-                            f.write('\n')
+                    if filtered_memories:
+                        with open(file_path, 'w') as f:
+                            for memory in filtered_memories:
+                                json.dump(memory, f)
+                                f.write('\n')
+                    else:
+                        file_path.unlink()
+                    self._reindex_after_clean(file_path, file_agent)
 
             except Exception as e:
                 print(f"Warning: Failed to process {file_path}: {e}")